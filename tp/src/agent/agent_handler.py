@@ -1,28 +1,22 @@
 from vFense.agent import *
 import logging
-import logging.config
 
 from vFense.utils.common import *
 from vFense.agent.agents import update_agent_field, get_agent_info
-from vFense.tagging.tagManager import get_tags_by_agent_id, delete_agent_from_all_tags
-from vFense.tagging.tagManager import delete_agent_from_all_tags
+from vFense.tagging.tagManager import get_tags_by_agent_id
 from vFense.tagging import *
 from vFense.db.client import db_create_close, r
-from vFense.plugins.patching.rv_db_calls import \
-    get_all_app_stats_by_agentid, delete_all_app_data_for_agent,\
-    update_all_app_data_for_agent
+from vFense.plugins.patching.rv_db_calls import get_all_app_stats_by_agentid
 from vFense.plugins.patching import *
 from vFense.errorz.error_messages import GenericResults
 from vFense.server.hierarchy import Collection, api
-import redis
-from rq import Queue
+from vFense.agent.bulk import PurgeAction, customer_agent_ids, \
+    delete_agents, delete_agent_tags, move_agents, start_purge, \
+    read_settings, PurgeSettingKey
 
-rq_host = 'localhost'
-rq_port = 6379
-rq_db = 0
-rq_pool = redis.StrictRedis(host=rq_host, port=rq_port, db=rq_db)
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -217,10 +211,14 @@ class AgentManager():
                     .run(conn)
                 )
 
+                # The few tag and hardware rows of a single agent are
+                # deleted right away, the purge only finds its apps.
                 (
                     r
                     .table(HardwarePerAgentCollection)
-                    .get_all(self.agent_id, index=HardwarePerAgentIndexes.AgentId)
+                    .get_all(
+                        self.agent_id, index=HardwarePerAgentIndexes.AgentId
+                    )
                     .delete()
                     .run(conn)
                 )
@@ -232,11 +230,9 @@ class AgentManager():
                     .run(conn)
                 )
 
-                rv_q = Queue('delete_agent', connection=rq_pool)
-                rv_q.enqueue_call(
-                    func=delete_all_app_data_for_agent,
-                    args=(self.agent_id,),
-                    timeout=3600,
+                start_purge(
+                    PurgeAction.Delete, [self.agent_id], self.customer_name,
+                    self.username
                 )
                 status = (
                     GenericResults(
@@ -281,12 +277,10 @@ class AgentManager():
                     self.username,
                     uri, method
                 )
-                delete_agent_from_all_tags(self.agent_id)
-                rv_q = Queue('move_agent', connection=rq_pool)
-                rv_q.enqueue_call(
-                    func=update_all_app_data_for_agent,
-                    args=(self.agent_id, customer_data),
-                    timeout=3600,
+                delete_agent_tags([self.agent_id])
+                start_purge(
+                    PurgeAction.Move, [self.agent_id], self.customer_name,
+                    self.username, new_customer=customer_name
                 )
                 status = (
                     GenericResults(
@@ -307,6 +301,132 @@ class AgentManager():
                 ).something_broke(self.agent_id, 'agents', e)
             )
             logger.exception(e)
-        
+
+        return(status)
+
+
+class BulkAgentManager():
+    """Deletes or moves many agents, given by id or by tag, with one
+    throttled purge of their rows, see vFense.agent.bulk.
+    """
+
+    def __init__(self, customer_name='default', username='system_user'):
+        self.customer_name = customer_name
+        self.username = username
+
+    def _agents(self, agent_ids, tag_id):
+        requested = agent_ids or []
+        found = customer_agent_ids(
+            self.customer_name, agent_ids=requested, tag_id=tag_id
+        )
+        found_ids = set(found)
+        missing = [
+            agent_id for agent_id in requested if agent_id not in found_ids
+        ]
+
+        return(found, missing)
+
+    def delete_agents(self, agent_ids=None, tag_id=None, uri=None,
+                      method=None):
+        try:
+            found, missing = self._agents(agent_ids, tag_id)
+            if found:
+                delete_agents(
+                    found,
+                    agent_batch=read_settings()[PurgeSettingKey.AgentBatch]
+                )
+                job_id = start_purge(
+                    PurgeAction.Delete, found, self.customer_name,
+                    self.username
+                )
+                status = (
+                    GenericResults(
+                        self.username, uri, method
+                    ).object_deleted(job_id, 'agents')
+                )
+
+            else:
+                job_id = None
+                status = (
+                    GenericResults(
+                        self.username, uri, method
+                    ).invalid_id(tag_id or agent_ids, 'agents')
+                )
+
+            status['data'] = {
+                'agentids_deleted': found,
+                'agentids_not_deleted': missing,
+                'purge_job_id': job_id,
+            }
+            logger.info(status['message'])
+
+        except Exception as e:
+            status = (
+                GenericResults(
+                    self.username, uri, method
+                ).something_broke(tag_id or agent_ids, 'agents', e)
+            )
+            logger.exception(status['message'])
+
         return(status)
 
+    @db_create_close
+    def change_customer(self, customer_name, agent_ids=None, tag_id=None,
+                        uri=None, method=None, conn=None):
+        try:
+            cexists = (
+                r
+                .table(Collection.Customers)
+                .get(customer_name)
+                .run(conn)
+            )
+            found, missing = self._agents(agent_ids, tag_id)
+            job_id = None
+            if cexists and found:
+                move_agents(
+                    found, customer_name,
+                    agent_batch=read_settings()[PurgeSettingKey.AgentBatch]
+                )
+                job_id = start_purge(
+                    PurgeAction.Move, found, self.customer_name,
+                    self.username, new_customer=customer_name
+                )
+                status = (
+                    GenericResults(
+                        self.username, uri, method
+                    ).object_updated(
+                        job_id, 'agents',
+                        {AgentKey.CustomerName: customer_name}
+                    )
+                )
+
+            elif not cexists:
+                found, missing = [], agent_ids or []
+                status = (
+                    GenericResults(
+                        self.username, uri, method
+                    ).invalid_id(customer_name, 'customer')
+                )
+
+            else:
+                status = (
+                    GenericResults(
+                        self.username, uri, method
+                    ).invalid_id(tag_id or agent_ids, 'agents')
+                )
+
+            status['data'] = {
+                'agentids_moved': found,
+                'agentids_not_moved': missing,
+                'purge_job_id': job_id,
+            }
+
+        except Exception as e:
+            status = (
+                GenericResults(
+                    self.username, uri, method
+                ).something_broke(tag_id or agent_ids, 'agents', e)
+            )
+            logger.exception(e)
+
+        return(status)
@@ -1,5 +1,4 @@
 import logging
-import logging.config
 from vFense.agent import *
 
 from vFense.utils.common import *
@@ -7,8 +6,9 @@ from vFense.db.client import db_create_close, r
 from vFense.plugins.patching import *
 from vFense.plugins.patching.rv_db_calls import get_all_app_stats_by_agentid
 from vFense.errorz.error_messages import GenericResults
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -4,8 +4,9 @@ from time import mktime
 from datetime import datetime
 from vFense.agent import *
 from vFense.db.client import r , db_connect
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('agentstatus')
 
 def all_agent_status():
@@ -11,11 +11,13 @@ from vFense.server.hierarchy import Collection, api
 import redis
 from rq import Queue
 
+from vFense.logger.logsetup import configure_logging
+
 rq_host = 'localhost'
 rq_port = 6379
 rq_db = 0
 rq_pool = redis.StrictRedis(host=rq_host, port=rq_port, db=rq_db)
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
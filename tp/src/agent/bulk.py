@@ -0,0 +1,516 @@
+"""
+Bulk delete and move of agents.
+
+Deleting or moving agents is done in two steps. The agents documents are
+deleted, or moved to the new customer, right away, in batches of
+agent_batch agents. A moved agent is taken out of the tags of its old
+customer right away as well, so tag operations of that customer no
+longer reach it. The rows that reference the agents in the other
+tables are purged by one background job per request, run_purge, on the
+delete_agent or move_agent RQ queue, served by the purges worker group
+of the RQ supervisor:
+
+    * delete: the rows of apps_per_agent, custom_apps_per_agent,
+      supported_apps_per_agent, agent_apps_per_agent, tags_per_agent and
+      hardware_per_agent are deleted and the agents are taken out of the
+      agent_ids of the files.
+    * move: the app rows are moved to the new customer.
+
+The purge goes through the tables one at a time, agent_batch agents and
+at most row_batch rows per query, and sleeps between the queries so no
+more than rows_per_second rows are written a second. Its progress is
+kept in a Redis hash, see purge_progress.
+
+The settings can be changed in /opt/TopPatch/conf/agent_purge.conf:
+
+    [purge]
+    agent_batch = 100
+    row_batch = 1000
+    rows_per_second = 2000
+"""
+import json
+import logging
+import ConfigParser
+from time import time, sleep
+from uuid import uuid4
+
+import redis
+
+from vFense.agent import AgentsCollection, AgentKey, \
+    HardwarePerAgentCollection, HardwarePerAgentIndexes
+from vFense.tagging import TagsPerAgentCollection, TagsPerAgentKey, \
+    TagsPerAgentIndexes
+from vFense.plugins.patching import AppsPerAgentCollection, \
+    CustomAppsPerAgentCollection, SupportedAppsPerAgentCollection, \
+    AgentAppsPerAgentCollection, FilesCollection, FilesKey, FilesIndexes
+from vFense.db.client import db_create_close, r, pool
+from vFense.db.hardware import Hardware
+from vFense.receiver.fairqueue import fair_enqueue, Lane
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+CONFIG_FILE = '/opt/TopPatch/conf/agent_purge.conf'
+SETTINGS_SECTION = 'purge'
+
+AGENT_BATCH = 100
+ROW_BATCH = 1000
+ROWS_PER_SECOND = 2000
+# RQ timeout of a purge, a throttled purge of thousands of agents takes
+# hours.
+PURGE_TIMEOUT = 12 * 3600
+# Seconds the progress of a purge is kept.
+PROGRESS_TTL = 7 * 86400
+
+APP_TABLES = (
+    AppsPerAgentCollection,
+    CustomAppsPerAgentCollection,
+    SupportedAppsPerAgentCollection,
+    AgentAppsPerAgentCollection,
+)
+
+
+class PurgeSettingKey():
+    AgentBatch = 'agent_batch'
+    RowBatch = 'row_batch'
+    RowsPerSecond = 'rows_per_second'
+
+
+class PurgeAction():
+    Delete = 'delete'
+    Move = 'move'
+
+
+PURGE_QUEUES = {
+    PurgeAction.Delete: 'delete_agent',
+    PurgeAction.Move: 'move_agent',
+}
+
+
+class PurgeStatus():
+    Queued = 'queued'
+    Running = 'running'
+    Done = 'done'
+    Failed = 'failed'
+
+
+class PurgeKey():
+    Job = 'vfense:agents:purge:%s'
+    Agents = 'vfense:agents:purge:%s:agents'
+
+
+class PurgeJobKey():
+    JobId = 'job_id'
+    Action = 'action'
+    CustomerName = 'customer_name'
+    NewCustomer = 'new_customer'
+    Username = 'username'
+    Agents = 'agents'
+    Status = 'status'
+    Table = 'table'
+    TablesDone = 'tables_done'
+    TablesTotal = 'tables_total'
+    # Agents of the current table done.
+    AgentsDone = 'agents_done'
+    Rows = 'rows'
+    Created = 'created'
+    Started = 'started'
+    Finished = 'finished'
+    Error = 'error'
+    # Prefix of the rows purged in a table, rows:<table>.
+    TableRows = 'rows:'
+
+
+INT_FIELDS = (
+    PurgeJobKey.Agents, PurgeJobKey.AgentsDone, PurgeJobKey.Rows,
+    PurgeJobKey.TablesDone, PurgeJobKey.TablesTotal,
+    PurgeJobKey.Created, PurgeJobKey.Started, PurgeJobKey.Finished,
+)
+
+
+def read_settings(config_file=CONFIG_FILE):
+    """Returns the purge settings, keyed by PurgeSettingKey."""
+    settings = {
+        PurgeSettingKey.AgentBatch: AGENT_BATCH,
+        PurgeSettingKey.RowBatch: ROW_BATCH,
+        PurgeSettingKey.RowsPerSecond: ROWS_PER_SECOND,
+    }
+    config = ConfigParser.RawConfigParser()
+    config.read(config_file)
+    if not config.has_section(SETTINGS_SECTION):
+        return(settings)
+
+    for key in settings.keys():
+        if config.has_option(SETTINGS_SECTION, key):
+            settings[key] = max(config.getint(SETTINGS_SECTION, key), 1)
+
+    return(settings)
+
+
+def batches(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class Throttle():
+    """Keeps the rows written under rate a second, wait sleeps as long
+    as the rows written so far are ahead of it.
+    """
+
+    def __init__(self, rate):
+        self.rate = float(rate)
+        self.started = time()
+        self.rows = 0
+
+    def wait(self, rows):
+        self.rows += rows
+        ahead = self.rows / self.rate - (time() - self.started)
+        if ahead > 0:
+            sleep(ahead)
+
+
+@db_create_close
+def customer_agent_ids(customer_name, agent_ids=None, tag_id=None,
+                       conn=None):
+    """The agents of agent_ids, or of tag_id, that exist and belong to
+    customer_name.
+    """
+    if tag_id:
+        agent_ids = list(
+            r
+            .table(TagsPerAgentCollection)
+            .get_all(tag_id, index=TagsPerAgentIndexes.TagId)
+            .filter({TagsPerAgentKey.CustomerName: customer_name})
+            .map(lambda x: x[TagsPerAgentKey.AgentId])
+            .run(conn)
+        )
+
+    if not agent_ids:
+        return([])
+
+    found = set(
+        r
+        .table(AgentsCollection)
+        .get_all(*list(set(agent_ids)))
+        .filter({AgentKey.CustomerName: customer_name})
+        .map(lambda x: x[AgentKey.AgentId])
+        .run(conn)
+    )
+
+    return([agent_id for agent_id in agent_ids if agent_id in found])
+
+
+@db_create_close
+def delete_agents(agent_ids, agent_batch=AGENT_BATCH, conn=None):
+    """Deletes the agents documents, agent_batch agents a query."""
+    deleted = 0
+    for batch in batches(agent_ids, agent_batch):
+        result = (
+            r
+            .table(AgentsCollection)
+            .get_all(*batch)
+            .delete()
+            .run(conn)
+        )
+        deleted += result.get('deleted', 0)
+
+    return(deleted)
+
+
+@db_create_close
+def delete_agent_tags(agent_ids, agent_batch=AGENT_BATCH, conn=None):
+    """Takes the agents out of all their tags, agent_batch agents a
+    query.
+    """
+    for batch in batches(agent_ids, agent_batch):
+        (
+            r
+            .table(TagsPerAgentCollection)
+            .get_all(*batch, index=TagsPerAgentIndexes.AgentId)
+            .delete()
+            .run(conn)
+        )
+
+
+@db_create_close
+def move_agents(agent_ids, customer_name, agent_batch=AGENT_BATCH,
+                conn=None):
+    """Moves the agents documents to customer_name and takes them out of
+    the tags of their old customer, agent_batch agents a query.
+    """
+    for batch in batches(agent_ids, agent_batch):
+        (
+            r
+            .table(AgentsCollection)
+            .get_all(*batch)
+            .update({AgentKey.CustomerName: customer_name})
+            .run(conn)
+        )
+
+    delete_agent_tags(agent_ids, agent_batch)
+
+
+def _redis():
+    return(redis.StrictRedis(connection_pool=pool))
+
+
+def start_purge(action, agent_ids, customer_name, username='system_user',
+                new_customer=None):
+    """Queues the purge of the rows of agent_ids, the agents documents
+    have to be deleted, or moved, already.
+
+    Returns:
+        The job id of the purge.
+    """
+    job_id = uuid4().hex
+    job = {
+        PurgeJobKey.JobId: job_id,
+        PurgeJobKey.Action: action,
+        PurgeJobKey.CustomerName: customer_name,
+        PurgeJobKey.NewCustomer: new_customer or '',
+        PurgeJobKey.Username: username,
+        PurgeJobKey.Agents: len(agent_ids),
+        PurgeJobKey.AgentsDone: 0,
+        PurgeJobKey.TablesDone: 0,
+        PurgeJobKey.Rows: 0,
+        PurgeJobKey.Status: PurgeStatus.Queued,
+        PurgeJobKey.Created: int(time()),
+    }
+    pipe = _redis().pipeline()
+    pipe.hmset(PurgeKey.Job % (job_id), job)
+    pipe.expire(PurgeKey.Job % (job_id), PROGRESS_TTL)
+    pipe.set(
+        PurgeKey.Agents % (job_id), json.dumps(agent_ids), ex=PROGRESS_TTL
+    )
+    pipe.execute()
+    fair_enqueue(
+        PURGE_QUEUES[action], run_purge, args=(job_id,), lane=Lane.Sync,
+        customer_name=new_customer or customer_name, timeout=PURGE_TIMEOUT
+    )
+
+    return(job_id)
+
+
+def purge_progress(job_id):
+    """Returns the progress of a purge keyed by PurgeJobKey, the rows
+    purged per table under tables, None when there is no such purge.
+    """
+    job = _redis().hgetall(PurgeKey.Job % (job_id))
+    if not job:
+        return(None)
+
+    tables = {}
+    for key in job.keys():
+        if key.startswith(PurgeJobKey.TableRows):
+            tables[key[len(PurgeJobKey.TableRows):]] = int(job.pop(key))
+
+    for key in INT_FIELDS:
+        if key in job:
+            job[key] = int(job[key])
+
+    job['tables'] = tables
+
+    return(job)
+
+
+class AgentPurge():
+    """Purges the rows of the agents of a purge job, see run_purge."""
+
+    def __init__(self, job_id, settings=None):
+        self.job_id = job_id
+        self.key = PurgeKey.Job % (job_id)
+        self.redis = _redis()
+        self.settings = settings or read_settings()
+        self.row_batch = self.settings[PurgeSettingKey.RowBatch]
+        self.throttle = Throttle(
+            self.settings[PurgeSettingKey.RowsPerSecond]
+        )
+
+    def _steps(self, action, agent_ids, new_customer):
+        """The (table, query of a batch of agents) of an action, each
+        query changes at most row_batch rows and stops matching the
+        rows it changed.
+        """
+        limit = self.row_batch
+        steps = []
+        if action == PurgeAction.Delete:
+            for table in APP_TABLES:
+                steps.append(
+                    (table, self._delete_query(table, 'agent_id', limit))
+                )
+
+            steps.append(
+                (
+                    TagsPerAgentCollection,
+                    self._delete_query(
+                        TagsPerAgentCollection, TagsPerAgentIndexes.AgentId,
+                        limit
+                    )
+                )
+            )
+            steps.append(
+                (
+                    HardwarePerAgentCollection,
+                    self._delete_query(
+                        HardwarePerAgentCollection,
+                        HardwarePerAgentIndexes.AgentId, limit
+                    )
+                )
+            )
+            steps.append(
+                (
+                    FilesCollection,
+                    lambda batch: (
+                        r
+                        .table(FilesCollection)
+                        .get_all(*batch, index=FilesIndexes.AgentIds)
+                        .limit(limit)
+                        .update(
+                            {
+                                FilesKey.AgentIds: (
+                                    r.row[FilesKey.AgentIds]
+                                    .difference(batch)
+                                )
+                            }
+                        )
+                    )
+                )
+            )
+
+        else:
+            for table in APP_TABLES:
+                steps.append(
+                    (
+                        table,
+                        lambda batch, table=table: (
+                            r
+                            .table(table)
+                            .get_all(*batch, index='agent_id')
+                            .filter(
+                                r.row[AgentKey.CustomerName] != new_customer
+                            )
+                            .limit(limit)
+                            .update({AgentKey.CustomerName: new_customer})
+                        )
+                    )
+                )
+
+        return(steps)
+
+    def _delete_query(self, table, index, limit):
+        return(
+            lambda batch: (
+                r
+                .table(table)
+                .get_all(*batch, index=index)
+                .limit(limit)
+                .delete()
+            )
+        )
+
+    def _purge_batch(self, table, query, batch, conn):
+        """Runs query on a batch of agents until it changes no more
+        rows.
+
+        get_all on the agent_ids multi index of the files returns a file
+        once per agent of the batch it holds, the limit counts every
+        copy and the file is replaced once, so fewer than row_batch
+        files replaced does not mean none are left. The files query runs
+        until it replaces none.
+        """
+        purged = 0
+        while True:
+            result = query(batch).run(conn)
+            rows = (
+                result.get('deleted', 0) + result.get('replaced', 0)
+            )
+            purged += rows
+            if rows:
+                self.redis.hincrby(
+                    self.key, PurgeJobKey.TableRows + table, rows
+                )
+                self.redis.hincrby(self.key, PurgeJobKey.Rows, rows)
+                self.throttle.wait(rows)
+
+            if not rows:
+                break
+
+            if rows < self.row_batch and table != FilesCollection:
+                break
+
+        return(purged)
+
+    @db_create_close
+    def run(self, conn=None):
+        job = self.redis.hgetall(self.key)
+        agents = self.redis.get(PurgeKey.Agents % (self.job_id))
+        if not job or not agents:
+            logger.error(
+                'agent purge %s expired before it ran' % (self.job_id)
+            )
+            return
+
+        agent_ids = json.loads(agents)
+        action = job[PurgeJobKey.Action]
+        agent_batch = self.settings[PurgeSettingKey.AgentBatch]
+        self.redis.hmset(
+            self.key,
+            {
+                PurgeJobKey.Status: PurgeStatus.Running,
+                PurgeJobKey.Started: int(time()),
+            }
+        )
+        purged = 0
+        try:
+            steps = self._steps(
+                action, agent_ids, job[PurgeJobKey.NewCustomer]
+            )
+            self.redis.hset(self.key, PurgeJobKey.TablesTotal, len(steps))
+            for done, (table, query) in enumerate(steps):
+                self.redis.hmset(
+                    self.key,
+                    {
+                        PurgeJobKey.Table: table,
+                        PurgeJobKey.TablesDone: done,
+                        PurgeJobKey.AgentsDone: 0,
+                    }
+                )
+                for batch in batches(agent_ids, agent_batch):
+                    purged += self._purge_batch(table, query, batch, conn)
+                    self.redis.hincrby(
+                        self.key, PurgeJobKey.AgentsDone, len(batch)
+                    )
+
+            if action == PurgeAction.Delete:
+                Hardware().forget(*agent_ids)
+
+        except Exception as e:
+            logger.exception(e)
+            self.redis.hmset(
+                self.key,
+                {
+                    PurgeJobKey.Status: PurgeStatus.Failed,
+                    PurgeJobKey.Error: str(e),
+                    PurgeJobKey.Finished: int(time()),
+                }
+            )
+            return
+
+        self.redis.hmset(
+            self.key,
+            {
+                PurgeJobKey.Status: PurgeStatus.Done,
+                PurgeJobKey.TablesDone: len(steps),
+                PurgeJobKey.Finished: int(time()),
+            }
+        )
+        logger.info(
+            'agent purge %s: %s of %d agents, %d rows'
+            % (self.job_id, action, len(agent_ids), purged)
+        )
+
+
+def run_purge(job_id):
+    """RQ job, purges the rows of the agents of a purge job."""
+    AgentPurge(job_id).run()
@@ -1,12 +1,13 @@
 import os
 import logging
-import logging.config
 import ConfigParser
 import types
 import rethinkdb as r
 import redis
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 pool = redis.ConnectionPool(host='localhost', port=6379, db=0)
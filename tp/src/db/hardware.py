@@ -1,14 +1,45 @@
 from copy import deepcopy
+import json
 import logging
 from hashlib import sha256
-from vFense.db.client import db_create_close, r
+
+import redis
+
+from vFense.agent import HardwarePerAgentCollection, HardwarePerAgentKey, \
+    HardwarePerAgentIndexes
+from vFense.db.client import db_create_close, r, pool
 from vFense.server.hierarchy import api
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
+class HardwareKey():
+    # Hash of agent_id:added_by to the fingerprint of the hardware last
+    # written.
+    Fingerprints = 'vfense:hardware:fingerprints'
+
+
+# The field that tells two components of the same type apart, the name
+# when the type has none.
+IDENTITY_KEYS = {
+    HardwarePerAgentKey.Nic: HardwarePerAgentKey.Mac,
+    'cpu': HardwarePerAgentKey.CpuId,
+}
+
+
 class Hardware():
+    """Writes the hardware agents report in hardware_per_agent.
+
+    Every component gets an id built from the agent, who added it, its
+    type and its name (or mac, cpu_id), so a report is compared with the
+    rows of the agent and only the components that changed are written,
+    in one insert, and the ones that went away deleted in one delete.
+    The fingerprint of the last report written is kept in Redis, an
+    agent that reports the same hardware at every startup costs no
+    database query at all.
+    """
 
     def _build_hw_id(self, agent_id, hw_name):
         hw_id_to_be_hashed = (
@@ -16,12 +47,39 @@ class Hardware():
         )
         return(sha256(hw_id_to_be_hashed).hexdigest())
 
+    def _set_hw_ids(self, agent_id, added_by, hwlist):
+        seen = {}
+        for hw in hwlist:
+            hwtype = hw.get(HardwarePerAgentKey.Type, '')
+            identity = (
+                hw.get(IDENTITY_KEYS.get(hwtype))
+                or hw.get(HardwarePerAgentKey.Name)
+                or ''
+            )
+            hw_name = u'%s:%s:%s' % (added_by, hwtype, identity)
+            seen[hw_name] = seen.get(hw_name, 0) + 1
+            if seen[hw_name] > 1:
+                hw_name = u'%s:%d' % (hw_name, seen[hw_name])
+            hw[HardwarePerAgentKey.Id] = self._build_hw_id(agent_id, hw_name)
+
+        return(hwlist)
+
+    def _fingerprint(self, hwlist):
+        return(
+            sha256(
+                json.dumps(
+                    sorted(hwlist, key=lambda hw: hw[HardwarePerAgentKey.Id]),
+                    sort_keys=True
+                )
+            ).hexdigest()
+        )
+
     def add(self, agent_id=None, hardware=None,
             created_by='system_user',
             added_by='agent'):
 
         added = False
-        print hardware
+        msg = ''
         if agent_id and hardware:
             hwlist = []
             if isinstance(hardware, dict):
@@ -44,23 +102,16 @@ class Hardware():
                         custominfo['name'] = hwtype
                         hwlist.append(custominfo)
 
-                if hwlist:
-                    added, msg = (
-                        self._insert_into_db(
-                            hwinfo=hwlist,
-                            added_by=added_by,
-                            agent_id=agent_id
-                        )
-                    )
-
             else:
                 hardware['agent_id'] = agent_id
                 hardware['created_by'] = created_by
                 hardware['added_by'] = added_by
                 hwlist.append(hardware)
+
+            if hwlist:
                 added, msg = (
                     self._insert_into_db(
-                        hwinfo=hardware,
+                        hwinfo=hwlist,
                         added_by=added_by,
                         agent_id=agent_id
                     )
@@ -74,46 +125,121 @@ class Hardware():
             }
         )
 
-    @db_create_close
     def _insert_into_db(self, hwinfo=None, added_by='agent',
-                        agent_id=None, conn=None):
-        table = 'hardware_per_agent'
+                        agent_id=None):
         added = True
         msg = ''
-        logger.info(hwinfo)
         if hwinfo:
+            hwinfo = self._set_hw_ids(agent_id, added_by, hwinfo)
+            fingerprint = self._fingerprint(hwinfo)
+            field = '%s:%s' % (agent_id, added_by)
             try:
-                if added_by == 'agent':
-                    (
-                        r
-                        .table(table)
-                        .get_all(agent_id, index='agent_id')
-                        .filter({'added_by': added_by})
-                        .delete()
-                        .run(conn)
-                    )
+                cache = redis.StrictRedis(connection_pool=pool)
+                if cache.hget(HardwareKey.Fingerprints, field) == fingerprint:
+                    msg = 'hardware of %s is unchanged' % (agent_id)
+                    logger.debug(msg)
+                    return(added, msg)
 
-                for hw in hwinfo:
+            except Exception as e:
+                cache = None
+                logger.error('unable to read the hardware fingerprint: %s' % e)
 
-                    (
-                        r
-                        .table(table)
-                        .insert(hw, upsert=True)
-                        .run(conn)
-                    )
-                msg = 'hardware added: %s' % (hwinfo)
+            try:
+                written, deleted = (
+                    self._write_changes(hwinfo, added_by, agent_id)
+                )
+                msg = (
+                    'hardware of %s: %d components, %d written, %d deleted'
+                    % (agent_id, len(hwinfo), written, deleted)
+                )
                 logger.info(msg)
 
             except Exception as e:
                 added = False
                 msg = (
-                    'Failed to add hardware: %s and %s' %
-                    (hwinfo, e)
+                    'Failed to add hardware of %s: %s' %
+                    (agent_id, e)
                 )
                 logger.exception(msg)
+                return(added, msg)
+
+            if cache:
+                try:
+                    cache.hset(HardwareKey.Fingerprints, field, fingerprint)
+
+                except Exception as e:
+                    logger.error(
+                        'unable to save the hardware fingerprint: %s' % e
+                    )
 
         return(added, msg)
 
+    @db_create_close
+    def _write_changes(self, hwinfo, added_by, agent_id, conn=None):
+        """Writes the components that differ from the rows of the agent
+        and, for the hardware the agent reports, deletes the rows of
+        components it no longer has.
+
+        Returns:
+            Tuple of the components written and the rows deleted.
+        """
+        current = dict(
+            [
+                (hw[HardwarePerAgentKey.Id], hw)
+                for hw in (
+                    r
+                    .table(HardwarePerAgentCollection)
+                    .get_all(agent_id, index=HardwarePerAgentIndexes.AgentId)
+                    .filter({HardwarePerAgentKey.AddedBy: added_by})
+                    .run(conn)
+                )
+            ]
+        )
+        changed = [
+            hw for hw in hwinfo
+            if current.get(hw[HardwarePerAgentKey.Id]) != hw
+        ]
+        removed = []
+        if added_by == 'agent':
+            ids = set([hw[HardwarePerAgentKey.Id] for hw in hwinfo])
+            removed = [hw_id for hw_id in current.keys() if hw_id not in ids]
+
+        if changed:
+            (
+                r
+                .table(HardwarePerAgentCollection)
+                .insert(changed, upsert=True)
+                .run(conn)
+            )
+
+        if removed:
+            (
+                r
+                .table(HardwarePerAgentCollection)
+                .get_all(*removed)
+                .delete()
+                .run(conn)
+            )
+
+        return(len(changed), len(removed))
+
+    def forget(self, *agent_ids):
+        """Drops the fingerprints of agents whose hardware rows were
+        deleted, their next report is written in full.
+        """
+        fields = [
+            '%s:%s' % (agent_id, added_by)
+            for agent_id in agent_ids for added_by in ('agent', 'user')
+        ]
+        try:
+            for batch in range(0, len(fields), 1000):
+                redis.StrictRedis(connection_pool=pool).hdel(
+                    HardwareKey.Fingerprints, *fields[batch:batch + 1000]
+                )
+
+        except Exception as e:
+            logger.error('unable to drop the hardware fingerprint: %s' % e)
+
     @db_create_close
     def delete(self, agent_id=None, name=None, conn=None):
         if agent_id and name:
@@ -139,4 +265,3 @@ class Hardware():
                 logger.exception(msg)
 
         return(added, msg)
-
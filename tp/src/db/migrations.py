@@ -0,0 +1,254 @@
+"""
+Versioned schema migrations.
+
+The version of the schema is kept in one document of the schema_version
+table. At startup migrate reads it, a single query, and only when it is
+behind SCHEMA_VERSION runs the migrations in between, in order, each
+recorded as soon as it is done. The tables and indexes are no longer
+checked at every boot, a change of the schema is a new Migration
+appended to MIGRATIONS:
+
+    Migration(2, 'index of the agents by production level', _add_index)
+
+where _add_index(conn) creates what it needs, without waiting for the
+indexes to be built.
+
+Only one process migrates at a time, the others wait for the
+MigrationKey.Lock Redis lock to go away and read the version again.
+RethinkDB builds the indexes a migration creates in the background, in
+parallel; wait_for_indexes logs their progress every few seconds and
+returns once all of them are ready.
+
+    python migrations.py --status
+"""
+import logging
+from time import time, sleep
+
+import redis
+
+from vFense.db.client import db_create_close, r, pool
+from vFense.scripts.create_indexes import \
+    initialize_indexes_and_create_tables
+from vFense.server.hierarchy import db as hierarchy_db
+from vFense.plugins.ra._db import ra_initialization
+from vFense.tunnels._db import tunnels_initialization
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+SchemaCollection = 'schema_version'
+SCHEMA_ID = 'vfense'
+# Seconds a process may hold the migration lock.
+LOCK_TTL = 3600
+# Seconds between two reports of the indexes being built.
+PROGRESS_INTERVAL = 5
+
+
+class SchemaKey():
+    Id = 'id'
+    Version = 'version'
+    Migrations = 'migrations'
+    Description = 'description'
+    AppliedAt = 'applied_at'
+    Seconds = 'seconds'
+
+
+class MigrationKey():
+    Lock = 'vfense:schema:migrate'
+
+
+class Migration():
+
+    def __init__(self, version, description, func):
+        self.version = version
+        self.description = description
+        self.func = func
+
+
+def _baseline(conn):
+    """The tables and indexes vFense had before migrations, created
+    when they do not exist yet.
+    """
+    initialize_indexes_and_create_tables()
+    hierarchy_db.init()
+    ra_initialization()
+    tunnels_initialization()
+
+
+MIGRATIONS = [
+    Migration(1, 'baseline tables and indexes', _baseline),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+@db_create_close
+def schema_document(conn=None):
+    """The schema_version document, None before the first migration."""
+    return(
+        r.branch(
+            r.table_list().contains(SchemaCollection),
+            r.table(SchemaCollection).get(SCHEMA_ID),
+            None
+        )
+        .run(conn)
+    )
+
+
+def schema_version():
+    document = schema_document()
+    if document:
+        return(document[SchemaKey.Version])
+
+    return(0)
+
+
+def _record(document, migration, seconds, conn):
+    if SchemaCollection not in r.table_list().run(conn):
+        r.table_create(SchemaCollection).run(conn)
+
+    document = document or {
+        SchemaKey.Id: SCHEMA_ID,
+        SchemaKey.Migrations: [],
+    }
+    document[SchemaKey.Version] = migration.version
+    document[SchemaKey.Migrations].append(
+        {
+            SchemaKey.Version: migration.version,
+            SchemaKey.Description: migration.description,
+            SchemaKey.AppliedAt: int(time()),
+            SchemaKey.Seconds: round(seconds, 3),
+        }
+    )
+    r.table(SchemaCollection).insert(document, upsert=True).run(conn)
+
+    return(document)
+
+
+def _building_indexes(tables, conn):
+    building = []
+    for table in tables:
+        for status in r.table(table).index_status().run(conn):
+            if not status.get('ready', True):
+                building.append((table, status))
+
+    return(building)
+
+
+def _progress(status):
+    total = status.get('blocks_total')
+    if total:
+        return(
+            ' %d%%' % (100 * status.get('blocks_processed', 0) / total)
+        )
+
+    return('')
+
+
+def wait_for_indexes(conn, interval=PROGRESS_INTERVAL):
+    """Waits for the indexes being built, logging their progress every
+    interval seconds.
+
+    Returns:
+        The number of indexes that were being built.
+    """
+    tables = r.table_list().run(conn)
+    building = _building_indexes(tables, conn)
+    waited = len(building)
+    while building:
+        logger.info(
+            'building %d indexes: %s' % (
+                len(building),
+                ', '.join(
+                    [
+                        '%s.%s%s' % (table, status['index'], _progress(status))
+                        for table, status in building
+                    ]
+                )
+            )
+        )
+        sleep(interval)
+        building = _building_indexes(
+            set([table for table, status in building]), conn
+        )
+
+    return(waited)
+
+
+@db_create_close
+def run_migrations(document=None, conn=None):
+    """Runs the migrations newer than document, in order.
+
+    Returns:
+        The schema version.
+    """
+    version = document[SchemaKey.Version] if document else 0
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+
+        logger.info(
+            'migrating the schema to version %d: %s'
+            % (migration.version, migration.description)
+        )
+        began = time()
+        migration.func(conn)
+        wait_for_indexes(conn)
+        document = _record(document, migration, time() - began, conn)
+        version = migration.version
+        logger.info(
+            'schema at version %d, migrated in %.1fs'
+            % (version, time() - began)
+        )
+
+    return(version)
+
+
+def migrate(lock_ttl=LOCK_TTL):
+    """Brings the schema up to SCHEMA_VERSION, a single query when it is
+    already there.
+
+    Returns:
+        The schema version.
+    """
+    document = schema_document()
+    if document and document[SchemaKey.Version] >= SCHEMA_VERSION:
+        return(document[SchemaKey.Version])
+
+    lock = redis.StrictRedis(connection_pool=pool)
+    while not lock.set(MigrationKey.Lock, int(time()), ex=lock_ttl, nx=True):
+        logger.info('waiting for the schema migration of another process')
+        sleep(1)
+        document = schema_document()
+        if document and document[SchemaKey.Version] >= SCHEMA_VERSION:
+            return(document[SchemaKey.Version])
+
+    try:
+        return(run_migrations(schema_document()))
+
+    finally:
+        lock.delete(MigrationKey.Lock)
+
+
+if __name__ == '__main__':
+    import tornado.options
+    from tornado.options import define, options
+
+    define("status", default=False,
+           help="print the schema version and exit", type=bool)
+    tornado.options.parse_command_line()
+    if options.status:
+        document = schema_document() or {}
+        print 'schema version %d of %d' % (
+            document.get(SchemaKey.Version, 0), SCHEMA_VERSION
+        )
+        for migration in document.get(SchemaKey.Migrations, []):
+            print '    %3d %-40s %8.1fs' % (
+                migration[SchemaKey.Version],
+                migration[SchemaKey.Description],
+                migration[SchemaKey.Seconds]
+            )
+
+    else:
+        print 'schema version %d' % (migrate())
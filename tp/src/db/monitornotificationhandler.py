@@ -1,8 +1,8 @@
 import logging
-import logging.config
 from vFense.db.client import db_create_close, r
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvnotifications')
 
 class MonitoringNotificationHandler():
@@ -1,18 +1,21 @@
 import logging
-import logging.config
 from vFense.db.client import db_create_close, r
 from vFense.db.notificationhandler import RvNotificationHandler, \
-    notification_rule_exists, translate_opercodes_to_notif_threshold
+    notification_rule_exists, translate_opercodes_to_notif_threshold, \
+    get_rule_index
 from vFense.operations import *
 from vFense.operations.operation_manager import get_oper_info
 from vFense.operations.retriever import OperationRetriever
 from vFense.notifications import *
 from vFense.errorz.error_messages import OperationCodes, GenericResults
+from vFense.notifications.digest import queue_result
 from emailer.mailer import MailClient
 
 from tornado.template import Loader
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
 logger = logging.getLogger('rvnotifications')
 TEMPLATE_DIR = ('/opt/TopPatch/tp/src/emailer/templates')
 
@@ -79,40 +82,101 @@ def parse_install_operation_data(oper_data, oper_type, oper_plugin, threshold):
     except Exception as e:
         logger.exception(e)
 
+def threshold_from_counts(oper_info):
+    """Returns the threshold of an operation that has not completed yet,
+    fail as soon as any agent failed, pass once any agent completed.
+    """
+    failed = (
+        oper_info.get(OperationKey.AgentsFailedCount, 0) +
+        oper_info.get(OperationKey.AgentsCompletedWithErrorsCount, 0)
+    )
+    if failed:
+        return('fail')
+
+    if oper_info.get(OperationKey.AgentsCompletedCount, 0):
+        return('pass')
+
+    return(None)
+
+
+def build_notification(username, customer_name, operation_id, agent_id=None,
+                       partial=False, agent_ids=None):
+    """Evaluates the notification rules for an operation.
+
+    Args:
+        partial: Evaluate an operation that has not completed yet, using
+            the results received so far.
+        agent_ids: The agents that reported, rules limited to other
+            agents or tags are skipped. None matches every rule.
+
+    Returns:
+        Tuple of (subject, msg_body, sender_addresses), None when no rule
+        matches or there is nobody to send to.
+    """
+    notif_handler = RvNotificationHandler(customer_name, operation_id, agent_id)
+    oper_info = get_oper_info(operation_id)
+    if not oper_info:
+        return(None)
+
+    oper_plugin = oper_info[OperationKey.Plugin]
+    oper_status = oper_info[OperationKey.OperationStatus]
+    threshold = translate_opercodes_to_notif_threshold(oper_status)
+    if not threshold and partial:
+        threshold = threshold_from_counts(oper_info)
+
+    oper_type = return_notif_type_from_operation(oper_info[OperationKey.Operation])
+    notif_rules = (
+        notification_rule_exists(
+            notif_handler, oper_plugin, oper_type, threshold, agent_ids
+        )
+    )
+
+    if notif_rules:
+        if oper_plugin == RV_PLUGIN or oper_plugin == CORE_PLUGIN:
+            sender_addresses = (
+                get_rule_index(customer_name).sending_emails(notif_rules)
+            )
+            if sender_addresses:
+                oper = OperationRetriever(username, customer_name, None, None)
+                oper_data = oper.get_install_operation_for_email_alert(operation_id)
+                subject, msg_body  = (
+                    parse_install_operation_data(
+                        oper_data, oper_type,
+                        oper_plugin, threshold
+                    )
+                )
+
+                return(subject, msg_body, sender_addresses)
+
+    return(None)
+
+
 def send_notifications(username, customer_name, operation_id, agent_id):
     try:
-        notif_handler = RvNotificationHandler(customer_name, operation_id, agent_id)
-        oper_info = get_oper_info(operation_id)
-        oper_plugin = oper_info[OperationKey.Plugin]
-        oper_status = oper_info[OperationKey.OperationStatus]
-        threshold = translate_opercodes_to_notif_threshold(oper_status)
-        oper_type = return_notif_type_from_operation(oper_info[OperationKey.Operation])
-        notif_rules = (
-            notification_rule_exists(
-                notif_handler, oper_plugin, oper_type, threshold
+        notification = (
+            build_notification(
+                username, customer_name, operation_id, agent_id,
+                agent_ids=[agent_id]
             )
         )
+        if notification:
+            subject, msg_body, sender_addresses = notification
+            send_data(
+                customer_name, subject,
+                msg_body, sender_addresses
+            )
 
-        if notif_rules:
-            if oper_plugin == RV_PLUGIN or oper_plugin == CORE_PLUGIN:
-                sender_addresses = (
-                    notif_handler.get_sending_emails(notif_rules)
-                )
-                oper = OperationRetriever(username, customer_name, None, None)
-                oper_data = oper.get_install_operation_for_email_alert(operation_id)
+    except Exception as e:
+        logger.exception(e)
 
-                if sender_addresses:
-                    subject, msg_body  = (
-                        parse_install_operation_data(
-                            oper_data, oper_type,
-                            oper_plugin, threshold
-                        )
-                    )
 
-                    send_data(
-                        customer_name, subject,
-                        msg_body, sender_addresses
-                    )
+def queue_notifications(username, customer_name, operation_id, agent_id):
+    """Hands a result to the notification daemon, which coalesces the
+    results of an operation into one digest email.
+    See notifications/digest.py.
+    """
+    try:
+        queue_result(username, customer_name, operation_id, agent_id)
 
     except Exception as e:
         logger.exception(e)
@@ -1,14 +1,39 @@
 import logging
-import logging.config
-from vFense.db.client import db_create_close, r
+from time import time
+
+import redis
+
+from vFense.db.client import db_create_close, r, pool
 from vFense.errorz.status_codes import OperationCodes
 from vFense.operations import *
 from vFense.notifications import *
+from vFense.tagging import TagsPerAgentCollection, TagsPerAgentKey, \
+    TagsPerAgentIndexes
 from vFense.server.hierarchy import Collection, GroupKey, UserKey, CustomerKey
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
+RULE_INDEX_VERSION = 'vfense:notifications:rules:version:%s'
+# How often an index checks Redis for rule changes made by other
+# processes, and how long resolved recipients are trusted.
+RULE_INDEX_CHECK_INTERVAL = 1
+RULE_INDEX_TTL = 300
+
+# notification type -> (operation plugin, rule key holding its threshold)
+RULE_TYPES = {
+    INSTALL: (RV_PLUGIN, NotificationKeys.AppThreshold),
+    UNINSTALL: (RV_PLUGIN, NotificationKeys.AppThreshold),
+    REBOOT: (CORE_PLUGIN, NotificationKeys.RebootThreshold),
+    SHUTDOWN: (CORE_PLUGIN, NotificationKeys.ShutdownThreshold),
+    CPU: (MONITORING_PLUGIN, NotificationKeys.CpuThreshold),
+    MEM: (MONITORING_PLUGIN, NotificationKeys.MemThreshold),
+    FS: (MONITORING_PLUGIN, NotificationKeys.FileSystemThreshold),
+}
+
+_RULE_INDEXES = {}
+
 
 def translate_opercodes_to_notif_threshold(oper_codes):
     threshold = None
@@ -24,26 +49,186 @@ def translate_opercodes_to_notif_threshold(oper_codes):
 
 def notification_rule_exists(
         notif_handler, oper_plugin,
-        oper_type, threshold
+        oper_type, threshold, agent_ids=None
         ):
 
     notif_rules = []
     if threshold:
-        if oper_plugin == RV_PLUGIN:
-            if oper_type == INSTALL:
-                notif_rules = notif_handler.rule_exist_for_install(threshold)
+        notif_rules = (
+            get_rule_index(notif_handler.customer_name)
+            .match(oper_plugin, oper_type, threshold, agent_ids)
+        )
 
-            elif oper_type == UNINSTALL:
-                notif_rules = notif_handler.rule_exist_for_uninstall(threshold)
+    return(notif_rules)
 
-        elif oper_plugin == CORE_PLUGIN:
-            if oper_type == REBOOT:
-                notif_rules = notif_handler.rule_exist_for_reboot(threshold)
 
-            elif oper_type == SHUTDOWN:
-                notif_rules = notif_handler.rule_exist_for_shutdown(threshold)
+def invalidate_rule_index(customer_name):
+    """Tells every process that the notification rules of a customer
+    changed, their indexes are rebuilt on the next match.
+    """
+    _RULE_INDEXES.pop(customer_name, None)
+    try:
+        (
+            redis.StrictRedis(connection_pool=pool)
+            .incr(RULE_INDEX_VERSION % (customer_name))
+        )
 
-    return(notif_rules)
+    except Exception as e:
+        logger.exception(e)
+
+
+def get_rule_index(customer_name):
+    index = _RULE_INDEXES.get(customer_name)
+    if not index:
+        index = NotificationRuleIndex(customer_name)
+        _RULE_INDEXES[customer_name] = index
+
+    index.refresh()
+
+    return(index)
+
+
+class NotificationRuleIndex():
+    """
+    The notification rules of one customer, compiled for matching
+    results without a query. Rules are keyed by (plugin, notification
+    type, threshold), the agents a rule covers (its agents plus the
+    agents of its tags) are kept as a set and its recipients are
+    resolved once when the index is built.
+
+    Monitoring thresholds are numbers, not pass/fail, so monitoring
+    rules are keyed with a threshold of None.
+    """
+
+    def __init__(self, customer_name):
+        self.customer_name = customer_name
+        self.redis = redis.StrictRedis(connection_pool=pool)
+        self.rules = {}
+        self.agents = {}
+        self.recipients = {}
+        self.version = None
+        self.built = 0
+        self.checked = 0
+
+    def refresh(self):
+        now = time()
+        if now - self.checked < RULE_INDEX_CHECK_INTERVAL and self.built:
+            return(False)
+
+        self.checked = now
+        try:
+            version = self.redis.get(RULE_INDEX_VERSION % (self.customer_name))
+        except Exception as e:
+            logger.exception(e)
+            version = self.version
+
+        if (version == self.version and self.built and
+                now - self.built < RULE_INDEX_TTL):
+            return(False)
+
+        self.build()
+        self.version = version
+
+        return(True)
+
+    @db_create_close
+    def _load(self, conn=None):
+        rules = list(
+            r
+            .table(NotificationCollections.Notifications)
+            .get_all(
+                self.customer_name, index=NotificationIndexes.CustomerName
+            )
+            .run(conn)
+        )
+        tag_ids = set()
+        for rule in rules:
+            tag_ids.update(rule.get(NotificationKeys.Tags) or [])
+
+        tag_agents = {}
+        if tag_ids:
+            members = (
+                r
+                .table(TagsPerAgentCollection)
+                .get_all(*list(tag_ids), index=TagsPerAgentIndexes.TagId)
+                .pluck(TagsPerAgentKey.TagId, TagsPerAgentKey.AgentId)
+                .run(conn)
+            )
+            for member in members:
+                tag_agents.setdefault(
+                    member[TagsPerAgentKey.TagId], set()
+                ).add(member[TagsPerAgentKey.AgentId])
+
+        return(rules, tag_agents)
+
+    def build(self):
+        rules, tag_agents = self._load()
+        handler = RvNotificationHandler(self.customer_name, None, None)
+        compiled = {}
+        agents = {}
+        recipients = {}
+        for rule in rules:
+            rule_type = rule.get(NotificationKeys.NotificationType)
+            if rule_type not in RULE_TYPES:
+                continue
+
+            plugin, threshold_key = RULE_TYPES[rule_type]
+            threshold = None
+            if plugin != MONITORING_PLUGIN:
+                threshold = rule.get(threshold_key)
+
+            compiled.setdefault((plugin, rule_type, threshold), []).append(rule)
+
+            rule_id = rule[NotificationKeys.NotificationId]
+            all_agents = str(rule.get(NotificationKeys.AllAgents)).lower()
+            if (all_agents != 'true' and (rule.get(NotificationKeys.Agents) or
+                                          rule.get(NotificationKeys.Tags))):
+                members = set(rule.get(NotificationKeys.Agents) or [])
+                for tag_id in rule.get(NotificationKeys.Tags) or []:
+                    members.update(tag_agents.get(tag_id, set()))
+                agents[rule_id] = members
+
+            recipients[rule_id] = handler.get_sending_emails([rule])
+
+        self.rules = compiled
+        self.agents = agents
+        self.recipients = recipients
+        self.built = time()
+        logger.info(
+            'notification rule index for %s built, %d rules'
+            % (self.customer_name, len(rules))
+        )
+
+    def match(self, plugin, notif_type, threshold=None, agent_ids=None):
+        """Returns the rules for a result.
+
+        Args:
+            agent_ids: Only return the rules that cover at least one of
+                these agents. Every rule is returned when it is None.
+        """
+        rules = self.rules.get((plugin, notif_type, threshold), [])
+        if agent_ids is None:
+            return(list(rules))
+
+        agent_ids = set(agent_ids)
+        return(
+            [
+                rule for rule in rules
+                if rule[NotificationKeys.NotificationId] not in self.agents
+                or self.agents[rule[NotificationKeys.NotificationId]] &
+                agent_ids
+            ]
+        )
+
+    def sending_emails(self, notif_rules):
+        emails = []
+        for rule in notif_rules:
+            for email in self.recipients.get(
+                    rule[NotificationKeys.NotificationId], []):
+                if email not in emails:
+                    emails.append(email)
+
+        return(emails)
 
 
 class RvNotificationHandler():
@@ -116,7 +301,7 @@ class RvNotificationHandler():
                             .run(conn)
                     )
                     if users_list:
-                        users = map(lambda x: x['name'], user_list[0])
+                        users = map(lambda x: x['name'], users_list[0])
                         email_sender_list += (
                             r
                             .expr(users)
@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 from json import loads
 import logging
-import logging.config
 from copy import deepcopy
 from datetime import datetime
 from time import mktime
@@ -23,8 +22,9 @@ from vFense.operations.operation_manager import Operation, \
 from vFense.operations.operation_manager import get_oper_info
 
 from vFense.plugins import ra
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
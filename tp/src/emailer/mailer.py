@@ -1,5 +1,6 @@
 import logging
 from datetime import datetime
+from time import time
 import smtplib
 
 from vFense.notifications import *
@@ -7,9 +8,10 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
 from vFense.db.client import db_create_close, r
+from vFense.logger.logsetup import configure_logging
 
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -197,17 +199,21 @@ def create_or_modify_mail_config(modifying_username=None, customer_name=None,
 
 
 class MailClient():
-    def __init__(self, customer_name):
+    def __init__(self, customer_name, config=None):
         self.CONFIG = None
         self.validated = False
         self.connected = False
+        self.logged_in = False
+        self.mail = None
         self.error = None
-        data = get_email_config(customer_name=customer_name)
         self.config_exists = False
-        if data['pass']:
-            config = data['data'][0]
-            self.config_exists = data['pass']
-        
+        if config:
+            self.config_exists = True
+        else:
+            data = get_email_config(customer_name=customer_name)
+            if data['pass']:
+                config = data['data'][0]
+                self.config_exists = data['pass']
 
         if self.config_exists:
             self.server = config['server']
@@ -272,7 +278,8 @@ class MailClient():
             try:
                 if self.is_tls:
                     mail.starttls()
-                mail.login(self.username, self.password)
+                if self.username:
+                    mail.login(self.username, self.password)
                 logged_in = True
 
             except Exception as e:
@@ -349,3 +356,132 @@ class MailClient():
 
 
         return(completed)
+
+
+class MailClientPool():
+    """
+    Keeps one logged in SMTP connection per customer, so sending a batch
+    of notifications does not connect and log in to the mail server for
+    every message. The customer's mail config is read again every
+    config_ttl seconds and the connection is replaced when it changed.
+    A connection that sat idle longer than idle_timeout is checked with
+    a NOOP before it is used.
+    """
+
+    def __init__(self, config_ttl=60, idle_timeout=120):
+        self.config_ttl = config_ttl
+        self.idle_timeout = idle_timeout
+        self.clients = {}
+
+    def _fingerprint(self, client):
+        return(
+            (
+                client.server, client.port, client.username,
+                client.password, client.is_tls, client.is_ssl
+            )
+        )
+
+    def _connect(self, customer_name, client):
+        client.connect()
+        if client.connected and client.logged_in:
+            self.clients[customer_name] = {
+                'client': client,
+                'fingerprint': self._fingerprint(client),
+                'checked': time(),
+                'used': time(),
+            }
+            logger.info(
+                'smtp connection to %s opened for customer %s'
+                % (client.server, customer_name)
+            )
+            return(client)
+
+        if client.mail:
+            client.disconnect()
+        self.clients.pop(customer_name, None)
+
+        return(None)
+
+    def _alive(self, client):
+        try:
+            return(client.mail.noop()[0] == 250)
+
+        except Exception:
+            return(False)
+
+    def get(self, customer_name, config=None):
+        """Returns a logged in MailClient for the customer, None if the
+        customer has no mail config or the server can not be reached.
+        """
+        entry = self.clients.get(customer_name)
+        now = time()
+        if entry and (config or now - entry['checked'] > self.config_ttl):
+            fresh = MailClient(customer_name, config)
+            if (not fresh.config_exists or
+                    self._fingerprint(fresh) != entry['fingerprint']):
+                self.close(customer_name)
+                entry = None
+                if fresh.config_exists:
+                    return(self._connect(customer_name, fresh))
+
+                return(None)
+
+            entry['client'].from_email = fresh.from_email
+            entry['client'].to_email = fresh.to_email
+            entry['checked'] = now
+
+        if not entry:
+            client = MailClient(customer_name, config)
+            if not client.config_exists:
+                return(None)
+
+            return(self._connect(customer_name, client))
+
+        client = entry['client']
+        if now - entry['used'] > self.idle_timeout and not self._alive(client):
+            self.close(customer_name)
+            return(
+                self._connect(
+                    customer_name, MailClient(customer_name, config)
+                )
+            )
+
+        return(client)
+
+    def send(self, customer_name, subject, msg_body, to_addresses=None,
+             body_type='html', config=None):
+        """Sends a message over the customer's pooled connection, the
+        connection is reopened and the message sent again once if it
+        fails.
+
+        Returns:
+            True if the message was sent, False otherwise.
+        """
+        client = self.get(customer_name, config)
+        if not client:
+            return(False)
+
+        completed = client.send(subject, msg_body, to_addresses, body_type)
+        if not completed:
+            self.close(customer_name)
+            client = self.get(customer_name, config)
+            if client:
+                completed = (
+                    client.send(subject, msg_body, to_addresses, body_type)
+                )
+
+        if completed:
+            self.clients[customer_name]['used'] = time()
+
+        return(completed)
+
+    def close(self, customer_name=None):
+        if customer_name:
+            customer_names = [customer_name]
+        else:
+            customer_names = self.clients.keys()
+
+        for name in customer_names:
+            entry = self.clients.pop(name, None)
+            if entry:
+                entry['client'].disconnect()
@@ -3,7 +3,6 @@
 from __future__ import division, print_function, unicode_literals
 import itertools
 import logging
-import logging.config
 import os
 import six
 import smtplib
@@ -12,6 +11,8 @@ import sys
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
+from vFense.logger.logsetup import configure_logging
+
 # TODO: we need some sort of SMTPConnection Lock here
 
 DEFAULT_WORKING_DIRECTORY = '/opt/TopPatch'
@@ -20,7 +21,7 @@ ABSOLUTE_LOGGING_CONFIG = os.path.join(DEFAULT_WORKING_DIRECTORY,
                                        RELATIVE_LOGGING_CONFIG)
 
 #logger = None
-logging.config.fileConfig(ABSOLUTE_LOGGING_CONFIG)
+configure_logging(ABSOLUTE_LOGGING_CONFIG)
 logger = logging.getLogger('rvnotifier')
 
 
@@ -264,7 +265,7 @@ def notify(from_address, to_addresses, subject, body,
     global logger
 
     if not log:
-        logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+        configure_logging()
         logger = logging.getLogger('rvapi')
     else:
         logging.basicConfig(level='DEBUG')
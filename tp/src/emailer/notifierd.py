@@ -15,6 +15,8 @@ import signal
 import sys
 from tornado.template import Loader
 
+from vFense.logger.logsetup import configure_logging
+
 DEFAULT_WORKING_DIRECTORY = '/opt/TopPatch'
 DEFAULT_UMASK = 0
 RELATIVE_PIDFILE = 'var/run/notifier.pid'
@@ -32,7 +34,7 @@ INVALID_NAME_REGEX = r'[^\w.-_]'
 # after receiving a SIGTERM
 email_connection = None
 
-logging.config.fileConfig(ABSOLUTE_LOGGING_CONFIG)
+configure_logging(ABSOLUTE_LOGGING_CONFIG)
 logger = logging.getLogger('rvnotifier')
 
 
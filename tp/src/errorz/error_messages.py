@@ -466,6 +466,50 @@ class TagResults(object):
             }
         )
 
+    def agents_added_to_tags(self, tag_ids, agent_ids, tag_data=None):
+        return(
+            {
+                status: 200,
+                code: TagCodes.AgentsAddedToTags,
+                uri: self.uri,
+                method: self.method,
+                message: (
+                    '%s - %d agents were added to %d tags'
+                    % (self.username, len(agent_ids), len(tag_ids))
+                ),
+                data: tag_data
+            }
+        )
+
+    def agents_removed_from_tags(self, tag_ids, agent_ids, tag_data=None):
+        return(
+            {
+                status: 200,
+                code: TagCodes.AgentsRemovedFromTags,
+                uri: self.uri,
+                method: self.method,
+                message: (
+                    '%s - %d agents were removed from %d tags'
+                    % (self.username, len(agent_ids), len(tag_ids))
+                ),
+                data: tag_data
+            }
+        )
+
+    def invalid_tag_expression(self, error):
+        return(
+            {
+                status: 400,
+                code: TagCodes.InvalidTagExpression,
+                uri: self.uri,
+                method: self.method,
+                message: (
+                    '%s - invalid tag expression: %s'
+                    % (self.username, error)
+                ),
+            }
+        )
+
 
 class PackageResults(object):
     def __init__(self, username, uri, method):
@@ -588,6 +632,53 @@ class PackageResults(object):
             }
         )
 
+    def chunk_received(self, upload_id, upload_data):
+        return(
+            {
+                status: 200,
+                code: PackageCodes.ChunkReceived,
+                uri: self.uri,
+                method: self.method,
+                message: (
+                    '%s - upload %s received %s of %s bytes'
+                    % (
+                        self.username, upload_id,
+                        upload_data['offset'], upload_data['size']
+                    )
+                ),
+                data: upload_data,
+            }
+        )
+
+    def chunk_offset_mismatch(self, upload_id, offset):
+        return(
+            {
+                status: 409,
+                code: PackageCodes.ChunkOffsetMismatch,
+                uri: self.uri,
+                method: self.method,
+                message: (
+                    '%s - upload %s expects the next chunk at offset %s'
+                    % (self.username, upload_id, offset)
+                ),
+                data: {'offset': offset},
+            }
+        )
+
+    def hash_not_verified(self, upload_id, error):
+        return(
+            {
+                status: 409,
+                code: PackageCodes.HashNotVerified,
+                uri: self.uri,
+                method: self.method,
+                message: (
+                    '%s - upload %s failed verification: %s'
+                    % (self.username, upload_id, error)
+                )
+            }
+        )
+
 
 class OperationResults(object):
     def __init__(self, username, uri, method):
@@ -42,6 +42,9 @@ class TagCodes(object):
     FailedToRemoveAllAgentsFromTag = 4004
     FailedToRemoveTag = 4005
     TagExistsAndAgentAdded = 4006
+    AgentsAddedToTags = 4007
+    AgentsRemovedFromTags = 4008
+    InvalidTagExpression = 4009
 
 
 class PackageCodes(object):
@@ -62,6 +65,8 @@ class PackageCodes(object):
     ThisIsAnUpdate = 5014
     ToggleHiddenSuccessful = 5015
     AgentWillDownloadFromVendor = 5016
+    ChunkReceived = 5017
+    ChunkOffsetMismatch = 5018
     PackageDeleted = 517
     PackagesDeletionFailed = 518
 
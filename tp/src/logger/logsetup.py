@@ -0,0 +1,368 @@
+"""
+Process wide logging setup.
+
+configure_logging() applies /opt/TopPatch/conf/logging.config once per
+process. The handlers the file defines are moved behind a QueueHandler,
+and one QueueListener thread formats the records and does the file,
+socket and syslog I/O, so a request never waits on the disk or on a
+remote log host. The listener also checks the config file every few
+seconds and applies it again when it changed, which is how the changes
+RvLogger.create_config makes reach every running process.
+
+Besides the standard fileConfig sections the file may have a [vfense]
+section:
+
+    [vfense]
+    max_message_length = 4096
+    sample_rates = rvlistener:10,rvapi:5
+
+Messages longer than max_message_length are truncated before they are
+queued. A sample rate of N keeps one in N INFO and DEBUG records of that
+logger (and its children), warnings and errors are always kept.
+"""
+import os
+import json
+import Queue
+import atexit
+import threading
+import logging
+import logging.config
+import ConfigParser
+from time import time
+
+CONFIG_FILE = '/opt/TopPatch/conf/logging.config'
+SETTINGS_SECTION = 'vfense'
+MAX_MESSAGE_LENGTH = 4096
+QUEUE_SIZE = 10000
+CONFIG_CHECK_INTERVAL = 5
+
+_SENTINEL = None
+_LOCK = threading.Lock()
+_LISTENER = {'listener': None}
+
+
+class LogSettingKey():
+    MaxMessageLength = 'max_message_length'
+    SampleRates = 'sample_rates'
+
+
+def truncate(message, max_length=MAX_MESSAGE_LENGTH):
+    if max_length and len(message) > max_length:
+        return(
+            '%s... (%d characters truncated)'
+            % (message[:max_length], len(message) - max_length)
+        )
+
+    return(message)
+
+
+def read_settings(config_file=CONFIG_FILE):
+    """Returns the [vfense] settings of a logging config file.
+
+    Returns:
+        Dictionary keyed by LogSettingKey, sample rates are a dictionary
+        of logger name to rate.
+    """
+    settings = {
+        LogSettingKey.MaxMessageLength: MAX_MESSAGE_LENGTH,
+        LogSettingKey.SampleRates: {},
+    }
+    config = ConfigParser.RawConfigParser()
+    config.read(config_file)
+    if not config.has_section(SETTINGS_SECTION):
+        return(settings)
+
+    if config.has_option(SETTINGS_SECTION, LogSettingKey.MaxMessageLength):
+        settings[LogSettingKey.MaxMessageLength] = (
+            config.getint(SETTINGS_SECTION, LogSettingKey.MaxMessageLength)
+        )
+
+    if config.has_option(SETTINGS_SECTION, LogSettingKey.SampleRates):
+        rates = config.get(SETTINGS_SECTION, LogSettingKey.SampleRates)
+        for rate in rates.split(','):
+            if ':' in rate:
+                name, value = rate.split(':', 1)
+                settings[LogSettingKey.SampleRates][name.strip()] = (
+                    max(int(value), 1)
+                )
+
+    return(settings)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as a single line JSON object. It can be used in
+    the logging config file as a formatter class:
+
+        [formatter_json]
+        class = vFense.logger.logsetup.JsonFormatter
+        datefmt = %Y-%m-%d %H:%M:%S
+    """
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, self.datefmt),
+            'logger': record.name,
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName,
+            'module': record.module,
+            'line': record.lineno,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+
+        return(json.dumps(entry))
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps one in every N INFO and DEBUG records of a logger."""
+
+    def __init__(self, rates):
+        logging.Filter.__init__(self)
+        self.rates = rates
+        self.counters = {}
+
+    def _rate(self, name):
+        while name:
+            if name in self.rates:
+                return(self.rates[name])
+            name = name.rpartition('.')[0]
+
+        return(1)
+
+    def filter(self, record):
+        if record.levelno > logging.INFO or not self.rates:
+            return(True)
+
+        rate = self._rate(record.name)
+        if rate <= 1:
+            return(True)
+
+        count = self.counters.get(record.name, 0)
+        self.counters[record.name] = count + 1
+
+        return(count % rate == 0)
+
+
+class QueueHandler(logging.Handler):
+    """Hands records to the QueueListener of the process.
+
+    The message is formatted and truncated here, the caller's arguments
+    may change before the listener gets to them. In a process forked
+    from the one that started the listener (an RQ work horse) there is
+    no listener thread, records are written synchronously there.
+    """
+
+    def __init__(self, listener, key, max_length=MAX_MESSAGE_LENGTH):
+        logging.Handler.__init__(self)
+        self.listener = listener
+        self.key = key
+        self.max_length = max_length
+
+    def prepare(self, record):
+        record.msg = truncate(record.getMessage(), self.max_length)
+        record.args = None
+        if record.exc_info:
+            record.exc_text = (
+                logging.Formatter().formatException(record.exc_info)
+            )
+            record.exc_info = None
+
+        return(record)
+
+    def emit(self, record):
+        try:
+            record = self.prepare(record)
+            if self.listener.pid != os.getpid():
+                self.listener.dispatch(self.key, record)
+                return
+
+            try:
+                self.listener.queue.put_nowait((self.key, record))
+            except Queue.Full:
+                self.listener.dropped[self.key] = (
+                    self.listener.dropped.get(self.key, 0) + 1
+                )
+
+        except (KeyboardInterrupt, SystemExit):
+            raise
+
+        except Exception:
+            self.handleError(record)
+
+
+class QueueListener(object):
+    """Writes queued records to the handlers of the logging config file
+    from a single background thread. The handlers are only written to and
+    replaced while holding the lock of the listener, so a reload from
+    another thread never closes a handler that is being written to.
+    """
+
+    def __init__(self, config_file=CONFIG_FILE, queue_size=QUEUE_SIZE):
+        self.config_file = config_file
+        self.queue = Queue.Queue(queue_size)
+        self.handlers = {}
+        self.dropped = {}
+        self.mtime = None
+        self.checked = 0
+        self.pid = os.getpid()
+        self.lock = threading.RLock()
+        self._thread = None
+
+    def apply_config(self):
+        """Applies the config file and moves the handlers of every logger
+        that has any behind a QueueHandler.
+        """
+        self.lock.acquire()
+        try:
+            self._apply_config()
+
+        finally:
+            self.lock.release()
+
+    def _apply_config(self):
+        self.mtime = os.path.getmtime(self.config_file)
+        logging.config.fileConfig(
+            self.config_file, disable_existing_loggers=False
+        )
+        settings = read_settings(self.config_file)
+        sampler = SamplingFilter(settings[LogSettingKey.SampleRates])
+
+        loggers = [logging.getLogger()]
+        loggers.extend(
+            [
+                log for log in logging.Logger.manager.loggerDict.values()
+                if isinstance(log, logging.Logger)
+            ]
+        )
+        handlers = {}
+        for log in loggers:
+            if not log.handlers:
+                continue
+
+            handlers[log.name] = list(log.handlers)
+            queue_handler = QueueHandler(
+                self, log.name, settings[LogSettingKey.MaxMessageLength]
+            )
+            queue_handler.addFilter(sampler)
+            log.handlers = [queue_handler]
+
+        self.handlers = handlers
+
+    def dispatch(self, key, record):
+        self.lock.acquire()
+        try:
+            for handler in self.handlers.get(key, []):
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+        finally:
+            self.lock.release()
+
+    def _check(self):
+        self.checked = time()
+        for key, count in self.dropped.items():
+            self.dropped[key] = 0
+            if count:
+                self.dispatch(
+                    key,
+                    logging.LogRecord(
+                        key, logging.WARNING, __file__, 0,
+                        'dropped %d log records, the log queue was full'
+                        % (count), None, None
+                    )
+                )
+
+        try:
+            if os.path.getmtime(self.config_file) != self.mtime:
+                self.apply_config()
+                logging.getLogger('rvapi').info(
+                    'logging config %s applied' % (self.config_file)
+                )
+
+        except Exception as e:
+            self.mtime = None
+            logging.getLogger('rvapi').error(
+                'failed to apply logging config %s: %s'
+                % (self.config_file, e)
+            )
+
+    def _monitor(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=1)
+            except Queue.Empty:
+                item = False
+
+            if item is _SENTINEL:
+                break
+
+            if item:
+                try:
+                    self.dispatch(*item)
+                except Exception:
+                    pass
+
+            if time() - self.checked > CONFIG_CHECK_INTERVAL:
+                self._check()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._monitor)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Writes out whatever is still queued and stops the thread."""
+        if self._thread and self.pid == os.getpid():
+            self.queue.put(_SENTINEL)
+            self._thread.join(5)
+            self._thread = None
+
+        for handlers in self.handlers.values():
+            for handler in handlers:
+                try:
+                    handler.flush()
+                except Exception:
+                    pass
+
+
+def configure_logging(config_file=CONFIG_FILE):
+    """Configures logging for this process. Only the first call does
+    anything, every module can call it at import.
+
+    Returns:
+        The QueueListener of the process.
+    """
+    _LOCK.acquire()
+    try:
+        if _LISTENER['listener']:
+            return(_LISTENER['listener'])
+
+        listener = QueueListener(config_file)
+        listener.apply_config()
+        listener.start()
+        atexit.register(listener.stop)
+        _LISTENER['listener'] = listener
+
+        return(listener)
+
+    finally:
+        _LOCK.release()
+
+
+def reload_logging():
+    """Applies the config file in this process right away, instead of
+    waiting for the listener to notice it changed. The listener keeps
+    running, QueueListener.apply_config waits for the record it is
+    writing.
+    """
+    listener = _LISTENER['listener']
+    if listener and listener.pid == os.getpid():
+        listener.apply_config()
+        return(listener)
+
+    return(configure_logging())
@@ -1,13 +1,13 @@
 import sys
 import os
-import struct
 import re
-from socket import socket, SOCK_DGRAM, SOCK_STREAM, AF_INET, SHUT_RDWR
+from socket import socket, SOCK_DGRAM, SOCK_STREAM, AF_INET
 from datetime import datetime
-import logging
-import logging.config
+import shutil
 import ConfigParser
-from time import sleep
+
+from vFense.logger.logsetup import configure_logging, reload_logging, \
+    LogSettingKey, SETTINGS_SECTION, MAX_MESSAGE_LENGTH
 
 class RvLogger():
     def __init__(self):
@@ -45,13 +45,13 @@ class RvLogger():
 
 
     def get_logging_config(self):
-        logging.config.fileConfig(self.CONFIG_FILE)
         logfiles = []
         syslog = {}
         level = None
-        handler_list = logging._handlerList
+        handler_list = []
+        for handlers in configure_logging(self.CONFIG_FILE).handlers.values():
+            handler_list.extend(handlers)
         for handler in handler_list:
-            handler = handler()
             if 'baseFilename' in dir(handler):
                 logfiles.append(handler.baseFilename)
                 level = self.numeric_levels[str(handler.level)]
@@ -73,7 +73,9 @@ class RvLogger():
 
 
     def create_config(self, loglevel='INFO', LOGDIR='/opt/TopPatch/var/log/',
-            initialize=True, loghost=None, logport=None, logproto=None):
+            initialize=True, loghost=None, logport=None, logproto=None,
+            logformat='text', max_message_length=MAX_MESSAGE_LENGTH,
+            sample_rates=None):
         try:
             self.loglevel = self.level[loglevel]
         except Exception as e:
@@ -92,12 +94,14 @@ class RvLogger():
         self.logdir = LOGDIR
         self.loggers = ['root', 'rvlistener', 'rvweb', 'rvapi', 'csrlistener']
         self.handlers = ['root', 'rvlist_file', 'rvweb_file', 'rvapi_file', 'csrlist_file']
-        self.formatters = ['default'] 
+        self.formatters = ['default']
+        if logformat == 'json':
+            self.formatters = ['json']
+        self.max_message_length = max_message_length
+        self.sample_rates = sample_rates or {}
         self.section_logger_name = 'loggers'
         self.section_handler_name = 'handlers'
         self.section_formatter_name = 'formatters'
-        self.LISTENER_PORT = 9004
-        self.LISTENER_HOST = 'localhost'
         self.syslog = None
         if loghost:
             self.syslog = 'syslog_'+loghost
@@ -121,15 +125,21 @@ class RvLogger():
         self._create_logger_settings()
         self._create_handler_settings()
         self._create_formatter_settings()
+        self._create_vfense_settings()
         if os.path.exists(self.CONFIG_FILE):
-            os.rename(self.CONFIG_FILE, self.BACKUP_CONFIG_FILE)
-        logfile = open(self.CONFIG_FILE, 'w')
+            shutil.copy2(self.CONFIG_FILE, self.BACKUP_CONFIG_FILE)
+        tmp_config_file = self.CONFIG_FILE + '.tmp'
+        logfile = open(tmp_config_file, 'w')
         self.Config.write(logfile)
         logfile.close()
-        self._start_listener()
-        config = open(self.CONFIG_FILE, 'r').read()
-        passed, message = self._send_config(config)
-        self._shutdown_listener()
+        os.rename(tmp_config_file, self.CONFIG_FILE)
+        try:
+            reload_logging()
+            passed = True
+            message = 'new config applied'
+        except Exception as e:
+            passed = False
+            message = 'new config failed to apply: %s' % (e)
         self.results = {
                 'pass': passed, 
                 'message': message
@@ -215,62 +225,21 @@ class RvLogger():
             app_name = default_name + name
             msg_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
             self.Config.add_section(app_name)
+            if name == 'json':
+                self.Config.set(app_name, 'class',
+                        'vFense.logger.logsetup.JsonFormatter')
             self.Config.set(app_name, 'format', msg_format)
             self.Config.set(app_name, 'datefmt', '%Y-%m-%d %H:%M:%S')
 
 
-    def _start_listener(self):
-        try:
-            print "starting listener"
-            self.listener = logging.config.listen(self.LISTENER_PORT)
-            self.listener.start()
-            print "listener started"
-        except Exception as e:
-            print e
-
+    def _create_vfense_settings(self):
+        self.Config.add_section(SETTINGS_SECTION)
+        self.Config.set(SETTINGS_SECTION, LogSettingKey.MaxMessageLength,
+                str(self.max_message_length))
+        self.Config.set(SETTINGS_SECTION, LogSettingKey.SampleRates,
+                ','.join(['%s:%s' % (name, rate)
+                    for name, rate in self.sample_rates.items()]))
 
-    def _shutdown_listener(self):
-        try:
-            print "shutting down listener"
-            logging.config.stopListening()
-            #self.listener.join()
-            print "listener is down"
-        except Exception as e:
-            print dir(e), e
-
-
-    def _send_config(self, msg):
-        sleep(1)
-        sender = socket(AF_INET, SOCK_STREAM)
-        passed = True
-        message = None
-        print "Im about to connect to the listener"
-        try:
-            print self.LISTENER_HOST, self.LISTENER_PORT
-            sender.connect((self.LISTENER_HOST, self.LISTENER_PORT))
-            print "I'm connected to the listener"
-            passed = True
-        except Exception as e:
-            print e, "BOOM I CANT CONNECT"
-            if self.count == 0:
-                self.count = self.count + 1
-                self._send_config(msg)
-            passed = False
-            message = e.message+' '+self.LISTENER_HOST+\
-                    ' '+ str(self.LISTENER_PORT)
-        if passed:
-            print "I'm sending the new config file over"
-            try:
-                sender.send(struct.pack('>L', len(msg)))
-                sender.send(msg)
-                print "new config sent"
-            except Exception as e:
-                print e
-            sender.shutdown(SHUT_RDWR)
-            sender.close()
-            passed = True
-            message = 'new config sent'
-        return(passed, message)
 
     def connect_to_loghost(self, loghost, logport, logproto):
         sender = socket(AF_INET, self.rproto_socket[logproto])
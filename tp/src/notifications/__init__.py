@@ -47,6 +47,7 @@ class NotificationKeys():
     MemThreshold = 'mem_threshold'
     FileSystemThreshold = 'filesystem_threshold'
     FileSystem = 'filesystem'
+    ThresholdDuration = 'threshold_duration'
 
 
 class NotificationIndexes():
@@ -13,8 +13,10 @@ from vFense.notifications import *
 from vFense.rv_exceptions.broken import *
 
 from vFense.server.hierarchy import Collection, GroupKey, UserKey, CustomerKey
+from vFense.db.notificationhandler import invalidate_rule_index
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -62,6 +64,10 @@ def get_all_notifications(username, customer_name,
             NotificationKeys.MemThreshold: r.row[NotificationKeys.MemThreshold],
             NotificationKeys.FileSystemThreshold: r.row[NotificationKeys.FileSystemThreshold],
             NotificationKeys.FileSystem: r.row[NotificationKeys.FileSystem],
+            NotificationKeys.ThresholdDuration: r.branch(
+                r.row.has_fields(NotificationKeys.ThresholdDuration),
+                r.row[NotificationKeys.ThresholdDuration], None
+            ),
         }
     )
     try:
@@ -186,6 +192,7 @@ class Notifier():
                 .run(conn)
             )
 
+            invalidate_rule_index(self.customer_name)
             results = (
                 GenericResults(
                     self.username, self.uri, self.method
@@ -249,6 +256,7 @@ class Notifier():
                     .run(conn)
                 )
                 if 'inserted' in added:
+                    invalidate_rule_index(self.customer_name)
                     notification_id = added.get('generated_keys')[0]
                     data_validated['data'][NotificationKeys.CreatedTime] = self.now
                     data_validated['data'][NotificationKeys.ModifiedTime] = self.now
@@ -360,6 +368,11 @@ class Notifier():
                     int(data[NotificationKeys.FileSystemThreshold])
                 )
 
+            if data[NotificationKeys.ThresholdDuration]:
+                data[NotificationKeys.ThresholdDuration] = (
+                    int(data[NotificationKeys.ThresholdDuration])
+                )
+
             if (not data[NotificationKeys.Plugin] in
                     VALID_NOTIFICATION_PLUGINS):
 
@@ -405,6 +418,7 @@ class Notifier():
                     .replace(data_validated['data'])
                     .run(conn)
                 )
+                invalidate_rule_index(self.customer_name)
 
                 data_validated['data'][NotificationKeys.CreatedTime] = self.now
                 data_validated['data'][NotificationKeys.ModifiedTime] = self.now
@@ -511,5 +525,6 @@ class Notifier():
                 NotificationKeys.MemThreshold: None,
                 NotificationKeys.FileSystemThreshold: None,
                 NotificationKeys.FileSystem: None,
+                NotificationKeys.ThresholdDuration: None,
             }
         )
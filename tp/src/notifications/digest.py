@@ -0,0 +1,149 @@
+"""
+Redis state of the notification digest pipeline.
+
+The agent result handlers only push a small event onto a Redis list with
+queue_result, they never look up rules or talk to a mail server. The
+notification daemon (notifications/notificationd.py) pops the events,
+records which agents reported for every operation, and sends one digest
+email per operation once the operation completes or the debounce window
+since its first result expires. Results that arrive after a digest was
+sent start a new one, sent as a follow-up the same way.
+"""
+import json
+from time import time
+
+import redis
+
+from vFense.db.client import pool
+
+DEBOUNCE_WINDOW = 300
+
+
+class DigestKey():
+    Incoming = 'vfense:notifications:incoming'
+    Pending = 'vfense:notifications:pending'
+    Digest = 'vfense:notifications:digest:%s'
+    Agents = 'vfense:notifications:digest:%s:agents'
+
+
+class DigestEventKey():
+    Username = 'username'
+    CustomerName = 'customer_name'
+    OperationId = 'operation_id'
+    AgentId = 'agent_id'
+    Received = 'received'
+
+
+def digest_redis():
+    return(redis.StrictRedis(connection_pool=pool))
+
+
+def queue_result(username, customer_name, operation_id, agent_id,
+                 connection=None):
+    """Pushes an agent result onto the notification queue."""
+    if not operation_id:
+        return(0)
+
+    connection = connection or digest_redis()
+    event = {
+        DigestEventKey.Username: username,
+        DigestEventKey.CustomerName: customer_name,
+        DigestEventKey.OperationId: operation_id,
+        DigestEventKey.AgentId: agent_id,
+        DigestEventKey.Received: time(),
+    }
+
+    return(connection.lpush(DigestKey.Incoming, json.dumps(event)))
+
+
+def pop_result(connection, timeout=1):
+    """Blocks up to timeout seconds for the next result, does not block
+    at all when timeout is 0.
+
+    Returns:
+        The event dictionary, None if nothing arrived.
+    """
+    if timeout:
+        item = connection.brpop(DigestKey.Incoming, timeout=timeout)
+        if item:
+            item = item[1]
+    else:
+        item = connection.rpop(DigestKey.Incoming)
+
+    if not item:
+        return(None)
+
+    try:
+        return(json.loads(item))
+
+    except ValueError:
+        return(None)
+
+
+def record_result(connection, event, window=DEBOUNCE_WINDOW):
+    """Adds a result to the digest of its operation, the debounce window
+    starts with the first result of the operation.
+    """
+    operation_id = event[DigestEventKey.OperationId]
+    digest_key = DigestKey.Digest % (operation_id)
+    first = connection.zscore(DigestKey.Pending, operation_id) is None
+
+    pipe = connection.pipeline()
+    pipe.hsetnx(
+        digest_key, DigestEventKey.Username, event[DigestEventKey.Username]
+    )
+    pipe.hsetnx(
+        digest_key, DigestEventKey.CustomerName,
+        event[DigestEventKey.CustomerName]
+    )
+    if event.get(DigestEventKey.AgentId):
+        pipe.sadd(
+            DigestKey.Agents % (operation_id), event[DigestEventKey.AgentId]
+        )
+    if first:
+        pipe.zadd(
+            DigestKey.Pending,
+            event[DigestEventKey.Received] + window, operation_id
+        )
+    pipe.execute()
+
+
+def due_operations(connection, now=None):
+    """Returns the ids of the operations whose debounce window expired."""
+    return(
+        connection.zrangebyscore(DigestKey.Pending, 0, now or time())
+    )
+
+
+def take_digest(connection, operation_id):
+    """Removes the digest of an operation in one transaction and returns
+    it, with the agents that reported under DigestEventKey.AgentId. Only
+    the first caller gets it, a result recorded after that starts the
+    next digest of the operation.
+
+    Returns:
+        The digest dictionary, None if the operation has no digest.
+    """
+    digest_key = DigestKey.Digest % (operation_id)
+    agents_key = DigestKey.Agents % (operation_id)
+    pipe = connection.pipeline()
+    pipe.zrem(DigestKey.Pending, operation_id)
+    pipe.hgetall(digest_key)
+    pipe.smembers(agents_key)
+    pipe.delete(digest_key, agents_key)
+    removed, digest, agents, _ = pipe.execute()
+    if not removed or not digest:
+        return(None)
+
+    digest[DigestEventKey.OperationId] = operation_id
+    digest[DigestEventKey.AgentId] = list(agents)
+
+    return(digest)
+
+
+def clear_digest(connection, operation_id):
+    pipe = connection.pipeline()
+    pipe.zrem(DigestKey.Pending, operation_id)
+    pipe.delete(DigestKey.Digest % (operation_id))
+    pipe.delete(DigestKey.Agents % (operation_id))
+    pipe.execute()
@@ -0,0 +1,151 @@
+"""
+Notification daemon.
+
+Pops the agent results the listener queued (see notifications/digest.py),
+coalesces them per operation and sends one digest email per operation
+once it completes, or once the debounce window since its first result
+expires. Results that arrive after that are sent in a follow-up digest
+the same way. Mail goes out over a pooled SMTP connection per customer.
+"""
+import signal
+import logging
+from time import time, sleep
+
+import tornado.options
+from tornado.options import define, options
+
+from vFense.db.notificationhandler import \
+    translate_opercodes_to_notif_threshold
+from vFense.db.notification_sender import build_notification
+from vFense.operations import OperationKey
+from vFense.operations.operation_manager import get_oper_info
+from vFense.notifications.digest import DigestEventKey, DEBOUNCE_WINDOW, \
+    digest_redis, pop_result, record_result, due_operations, take_digest, \
+    clear_digest
+from vFense.logger.logsetup import configure_logging
+from emailer.mailer import MailClientPool
+
+configure_logging()
+logger = logging.getLogger('rvnotifications')
+
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1
+
+define("window", default=DEBOUNCE_WINDOW,
+       help="seconds to wait for an operation to complete", type=int)
+
+
+class NotificationDaemon():
+
+    def __init__(self, window=DEBOUNCE_WINDOW):
+        self.redis = digest_redis()
+        self.mail_pool = MailClientPool()
+        self.window = window
+        self.flushed = 0
+        self.running = True
+
+    def _next_batch(self):
+        event = pop_result(self.redis)
+        if not event:
+            return([])
+
+        events = [event]
+        while len(events) < BATCH_SIZE:
+            event = pop_result(self.redis, timeout=0)
+            if not event:
+                break
+            events.append(event)
+
+        return(events)
+
+    def handle_results(self, events):
+        """Records a batch of results, then looks every operation in it up
+        once and sends the digest of the ones that completed.
+        """
+        operation_ids = []
+        for event in events:
+            operation_id = event[DigestEventKey.OperationId]
+            record_result(self.redis, event, self.window)
+            if operation_id not in operation_ids:
+                operation_ids.append(operation_id)
+
+        for operation_id in operation_ids:
+            oper_info = get_oper_info(operation_id)
+            if not oper_info:
+                clear_digest(self.redis, operation_id)
+                continue
+
+            threshold = (
+                translate_opercodes_to_notif_threshold(
+                    oper_info[OperationKey.OperationStatus]
+                )
+            )
+            if threshold:
+                self.send_digest(operation_id)
+
+    def send_digest(self, operation_id, partial=False):
+        digest = take_digest(self.redis, operation_id)
+        if not digest:
+            return
+
+        try:
+            notification = (
+                build_notification(
+                    digest[DigestEventKey.Username],
+                    digest[DigestEventKey.CustomerName],
+                    operation_id, partial=partial,
+                    agent_ids=digest[DigestEventKey.AgentId] or None
+                )
+            )
+            if notification:
+                subject, msg_body, sender_addresses = notification
+                sent = (
+                    self.mail_pool.send(
+                        digest[DigestEventKey.CustomerName], subject,
+                        msg_body, sender_addresses
+                    )
+                )
+                logger.info(
+                    'digest for operation %s with %d agent results %s to %s'
+                    % (
+                        operation_id, len(digest[DigestEventKey.AgentId]),
+                        'sent' if sent else 'failed to send',
+                        ','.join(sender_addresses)
+                    )
+                )
+
+        except Exception as e:
+            logger.exception(e)
+
+    def flush_due(self):
+        self.flushed = time()
+        for operation_id in due_operations(self.redis, self.flushed):
+            self.send_digest(operation_id, partial=True)
+
+    def stop(self, *args):
+        self.running = False
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        logger.info('Notification daemon started')
+        while self.running:
+            try:
+                events = self._next_batch()
+                if events:
+                    self.handle_results(events)
+
+                if time() - self.flushed >= FLUSH_INTERVAL:
+                    self.flush_due()
+
+            except Exception as e:
+                logger.exception(e)
+                sleep(1)
+
+        self.mail_pool.close()
+        logger.info('Notification daemon has shutdown')
+
+
+if __name__ == '__main__':
+    tornado.options.parse_command_line()
+    NotificationDaemon(window=options.window).run()
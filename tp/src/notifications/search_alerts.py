@@ -1,7 +1,6 @@
 from time import mktime
 from datetime import datetime
 import logging
-import logging.config
 from vFense.agent import *
 from vFense.tagging import *
 from vFense.db.client import db_create_close, r
@@ -9,9 +8,10 @@ from vFense.errorz.error_messages import GenericResults, NotificationResults
 from vFense.operations import *
 from vFense.notifications import *
 from vFense.rv_exceptions.broken import *
+from vFense.logger.logsetup import configure_logging
 
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
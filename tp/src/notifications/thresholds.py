@@ -0,0 +1,438 @@
+"""
+Evaluation of the monitoring notification rules (cpu, mem and
+filesystem thresholds) against the samples agents report.
+
+ThresholdEvaluator keeps the compiled rules of every customer in memory
+and a small state per (rule, agent, file system): when the value went
+over the threshold and when the last alert was raised. Every sample is
+an O(1) update of that state, a rule fires once its value stayed over
+the threshold for the duration of the rule ("mem over 90 for 300
+seconds"), a missing sample breaks the run.
+
+To keep flapping agents from causing storms a rule fires once per
+breach and re-arms only after the value dropped CLEAR_MARGIN below the
+threshold, it does not fire again for the same agent within
+ALERT_COOLDOWN, and a customer gets at most CUSTOMER_ALERT_LIMIT alerts
+per CUSTOMER_ALERT_WINDOW, the ones over the limit are counted as
+suppressed.
+
+The evaluator does no I/O, so it can be fed synthetic samples, see
+scripts/benchmark_threshold_alerts.py. ThresholdAlerter wires it to the
+notification rule index, the agents table and the customer mail servers
+for the monit daemon.
+"""
+import logging
+from time import time
+from datetime import datetime
+
+import redis
+
+from vFense.db.client import db_create_close, r, pool
+from vFense.agent import AgentsCollection, AgentKey
+from vFense.notifications import *
+from vFense.db.notificationhandler import get_rule_index
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvnotifications')
+
+# Samples arrive every minute, a run of breaching samples is broken when
+# one is missing for longer than this.
+MAX_SAMPLE_GAP = 180
+CLEAR_MARGIN = 5
+ALERT_COOLDOWN = 3600
+CUSTOMER_ALERT_LIMIT = 50
+CUSTOMER_ALERT_WINDOW = 300
+AGENT_CUSTOMER_TTL = 600
+
+THRESHOLD_KEYS = {
+    CPU: NotificationKeys.CpuThreshold,
+    MEM: NotificationKeys.MemThreshold,
+    FS: NotificationKeys.FileSystemThreshold,
+}
+
+
+class ThresholdAlertKey():
+    Claimed = 'vfense:notifications:threshold:%s:%s:%s'
+
+
+class ThresholdRule(object):
+    __slots__ = (
+        'rule_id', 'rule_type', 'threshold', 'duration', 'file_systems',
+        'agents', 'rule'
+    )
+
+    def __init__(self, rule, agents=None):
+        """
+        Args:
+            rule: The notification rule document.
+
+        Kwargs:
+            agents: Set of the agent ids the rule covers, None when it
+                covers every agent of the customer.
+        """
+        self.rule = rule
+        self.rule_id = rule[NotificationKeys.NotificationId]
+        self.rule_type = rule[NotificationKeys.NotificationType]
+        self.threshold = float(rule[THRESHOLD_KEYS[self.rule_type]])
+        self.duration = int(rule.get(NotificationKeys.ThresholdDuration) or 0)
+        file_systems = rule.get(NotificationKeys.FileSystem) or []
+        if not isinstance(file_systems, list):
+            file_systems = [
+                fs.strip() for fs in file_systems.split(',') if fs.strip()
+            ]
+        self.file_systems = set(file_systems)
+        self.agents = agents
+
+    def covers(self, agent_id):
+        return(self.agents is None or agent_id in self.agents)
+
+
+class _BreachState(object):
+    __slots__ = ('since', 'last_seen', 'alerted', 'last_alert')
+
+    def __init__(self):
+        self.since = None
+        self.last_seen = None
+        self.alerted = False
+        self.last_alert = None
+
+
+class ThresholdAlert(object):
+    __slots__ = (
+        'customer_name', 'rule', 'agent_id', 'file_system', 'value',
+        'since', 'timestamp'
+    )
+
+    def __init__(self, customer_name, rule, agent_id, file_system, value,
+                 since, timestamp):
+        self.customer_name = customer_name
+        self.rule = rule
+        self.agent_id = agent_id
+        self.file_system = file_system
+        self.value = value
+        self.since = since
+        self.timestamp = timestamp
+
+
+def cpu_value(cpu):
+    if 'idle' in cpu:
+        return(100.0 - float(cpu['idle']))
+
+    return(float(cpu.get('user', 0)) + float(cpu.get('system', 0)))
+
+
+def mem_value(memory):
+    if 'used_percent' in memory:
+        return(float(memory['used_percent']))
+
+    total = float(memory.get('total') or 0)
+    if not total:
+        total = float(memory.get('used', 0)) + float(memory.get('free', 0))
+
+    return(float(memory.get('used', 0)) * 100 / total if total else 0.0)
+
+
+class ThresholdEvaluator(object):
+
+    def __init__(self, cooldown=ALERT_COOLDOWN,
+                 customer_limit=CUSTOMER_ALERT_LIMIT,
+                 customer_window=CUSTOMER_ALERT_WINDOW):
+        self.cooldown = cooldown
+        self.customer_limit = customer_limit
+        self.customer_window = customer_window
+        self.rules = {}
+        self.states = {}
+        self.sent = {}
+        self.suppressed = {}
+
+    def set_rules(self, customer_name, rules):
+        """Replaces the compiled rules of a customer.
+
+        Args:
+            rules: List of ThresholdRule.
+        """
+        compiled = {CPU: [], MEM: [], FS: []}
+        for rule in rules:
+            compiled[rule.rule_type].append(rule)
+
+        rule_ids = set([rule.rule_id for rule in rules])
+        for old in self.rules.get(customer_name, {}).values():
+            for rule in old:
+                if rule.rule_id not in rule_ids:
+                    self._forget(rule.rule_id)
+
+        self.rules[customer_name] = compiled
+
+    def _forget(self, rule_id):
+        for key in [key for key in self.states if key[0] == rule_id]:
+            del self.states[key]
+
+    def has_rules(self, customer_name):
+        rules = self.rules.get(customer_name)
+        return(bool(rules and (rules[CPU] or rules[MEM] or rules[FS])))
+
+    def _allow(self, customer_name, now):
+        window_start, count = self.sent.get(customer_name, (now, 0))
+        if now - window_start >= self.customer_window:
+            window_start, count = now, 0
+
+        if count >= self.customer_limit:
+            self.suppressed[customer_name] = (
+                self.suppressed.get(customer_name, 0) + 1
+            )
+            return(False)
+
+        self.sent[customer_name] = (window_start, count + 1)
+        return(True)
+
+    def _check(self, customer_name, rule, agent_id, file_system, value,
+               timestamp, alerts):
+        key = (rule.rule_id, agent_id, file_system)
+        state = self.states.get(key)
+        if state is None:
+            if value <= rule.threshold:
+                return
+            state = _BreachState()
+            self.states[key] = state
+
+        gap = state.last_seen is not None and (
+            timestamp - state.last_seen > MAX_SAMPLE_GAP
+        )
+        state.last_seen = timestamp
+
+        if value <= rule.threshold:
+            if value <= rule.threshold - CLEAR_MARGIN or gap:
+                state.alerted = False
+                state.since = None
+                if (state.last_alert is None or
+                        timestamp - state.last_alert >= self.cooldown):
+                    del self.states[key]
+            elif not state.alerted:
+                state.since = None
+            return
+
+        if state.since is None or gap:
+            state.since = timestamp
+
+        if (state.alerted or timestamp - state.since < rule.duration or
+                (state.last_alert is not None and
+                 timestamp - state.last_alert < self.cooldown)):
+            return
+
+        state.alerted = True
+        state.last_alert = timestamp
+        if self._allow(customer_name, timestamp):
+            alerts.append(
+                ThresholdAlert(
+                    customer_name, rule, agent_id, file_system, value,
+                    state.since, timestamp
+                )
+            )
+
+    def update(self, customer_name, agent_id, timestamp, memory=None,
+               cpu=None, file_system=None):
+        """Evaluates the sample of an agent.
+
+        Returns:
+            List of the ThresholdAlert it raised.
+        """
+        alerts = []
+        rules = self.rules.get(customer_name)
+        if not rules:
+            return(alerts)
+
+        if memory and rules[MEM]:
+            value = mem_value(memory)
+            for rule in rules[MEM]:
+                if rule.covers(agent_id):
+                    self._check(
+                        customer_name, rule, agent_id, None, value,
+                        timestamp, alerts
+                    )
+
+        if cpu and rules[CPU]:
+            value = cpu_value(cpu)
+            for rule in rules[CPU]:
+                if rule.covers(agent_id):
+                    self._check(
+                        customer_name, rule, agent_id, None, value,
+                        timestamp, alerts
+                    )
+
+        if file_system and rules[FS]:
+            for fs in file_system:
+                names = set([fs.get('name'), fs.get('mount')])
+                value = float(fs.get('used_percent', 0))
+                for rule in rules[FS]:
+                    if rule.covers(agent_id) and names & rule.file_systems:
+                        self._check(
+                            customer_name, rule, agent_id,
+                            fs.get('mount') or fs.get('name'), value,
+                            timestamp, alerts
+                        )
+
+        return(alerts)
+
+    def pop_suppressed(self, customer_name):
+        return(self.suppressed.pop(customer_name, 0))
+
+
+def compile_rules(index):
+    """Returns the ThresholdRule of the monitoring rules of a
+    NotificationRuleIndex.
+    """
+    rules = []
+    for rule_type in THRESHOLD_KEYS.keys():
+        for rule in index.match(MONITORING_PLUGIN, rule_type):
+            try:
+                rules.append(
+                    ThresholdRule(
+                        rule,
+                        index.agents.get(rule[NotificationKeys.NotificationId])
+                    )
+                )
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warn(
+                    'skipping monitoring rule %s: %s'
+                    % (rule.get(NotificationKeys.NotificationId), e)
+                )
+
+    return(rules)
+
+
+class ThresholdAlerter(object):
+    """Feeds the samples the monit daemon writes to a ThresholdEvaluator
+    and mails the alerts it raises, one email per customer and batch.
+    """
+
+    def __init__(self, mail_pool, evaluator=None):
+        self.mail_pool = mail_pool
+        self.evaluator = evaluator or ThresholdEvaluator()
+        self.redis = redis.StrictRedis(connection_pool=pool)
+        self.customers = {}
+        self.resolved = {}
+        self.built = {}
+
+    @db_create_close
+    def _resolve_customers(self, agent_ids, conn=None):
+        now = time()
+        missing = [
+            agent_id for agent_id in agent_ids
+            if now - self.resolved.get(agent_id, 0) > AGENT_CUSTOMER_TTL
+        ]
+        if not missing:
+            return
+
+        agents = (
+            r
+            .table(AgentsCollection)
+            .get_all(*missing)
+            .pluck(AgentKey.AgentId, AgentKey.CustomerName)
+            .run(conn)
+        )
+        for agent in agents:
+            self.customers[agent[AgentKey.AgentId]] = (
+                agent[AgentKey.CustomerName]
+            )
+        for agent_id in missing:
+            self.resolved[agent_id] = now
+
+    def _refresh_rules(self, customer_name):
+        index = get_rule_index(customer_name)
+        if self.built.get(customer_name) != index.built:
+            self.evaluator.set_rules(customer_name, compile_rules(index))
+            self.built[customer_name] = index.built
+
+        return(index)
+
+    def _claim(self, alert):
+        return(
+            bool(
+                self.redis.set(
+                    ThresholdAlertKey.Claimed % (
+                        alert.rule.rule_id, alert.agent_id,
+                        alert.file_system or ''
+                    ),
+                    alert.timestamp, ex=self.evaluator.cooldown, nx=True
+                )
+            )
+        )
+
+    def process(self, samples):
+        """Evaluates a batch of samples.
+
+        Args:
+            samples: List of (agent_id, memory, cpu, file_system,
+                timestamp) tuples.
+        """
+        self._resolve_customers(list(set([s[0] for s in samples])))
+        indexes = {}
+        alerts = []
+        for agent_id, memory, cpu, file_system, timestamp in samples:
+            customer_name = self.customers.get(agent_id)
+            if not customer_name:
+                continue
+
+            if customer_name not in indexes:
+                indexes[customer_name] = self._refresh_rules(customer_name)
+
+            if self.evaluator.has_rules(customer_name):
+                alerts.extend(
+                    self.evaluator.update(
+                        customer_name, agent_id, timestamp,
+                        memory, cpu, file_system
+                    )
+                )
+
+        per_customer = {}
+        for alert in alerts:
+            if self._claim(alert):
+                per_customer.setdefault(alert.customer_name, []).append(alert)
+
+        for customer_name, customer_alerts in per_customer.items():
+            self.send(indexes[customer_name], customer_alerts)
+
+        return(alerts)
+
+    def send(self, index, alerts):
+        customer_name = index.customer_name
+        recipients = index.sending_emails([alert.rule.rule for alert in alerts])
+        suppressed = self.evaluator.pop_suppressed(customer_name)
+        if not recipients:
+            return
+
+        lines = []
+        for alert in alerts:
+            rule = alert.rule
+            lines.append(
+                '%s: agent %s%s at %.1f%%, over %d%% since %s' % (
+                    rule.rule[NotificationKeys.RuleName], alert.agent_id,
+                    ' %s' % (alert.file_system) if alert.file_system else '',
+                    alert.value, rule.threshold,
+                    datetime.fromtimestamp(alert.since).strftime(
+                        '%Y-%m-%d %H:%M:%S'
+                    )
+                )
+            )
+        if suppressed:
+            lines.append(
+                '%d more alerts were suppressed by the rate limit'
+                % (suppressed)
+            )
+
+        subject = (
+            'vFense monitoring alert: %d threshold%s exceeded'
+            % (len(alerts), '' if len(alerts) == 1 else 's')
+        )
+        sent = (
+            self.mail_pool.send(
+                customer_name, subject, '\n'.join(lines), recipients,
+                body_type='plain'
+            )
+        )
+        logger.info(
+            '%s %d threshold alerts to %s'
+            % ('sent' if sent else 'failed to send', len(alerts),
+               ','.join(recipients))
+        )
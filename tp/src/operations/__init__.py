@@ -1,6 +1,7 @@
 OperationsCollection = 'operations'
 OperationsPerAgentCollection = 'operation_per_agent'
 OperationsPerAppCollection = 'operation_per_app'
+OperationsArchiveCollection = 'operations_archive'
 
 CHECKIN = 'checkin'
 PICKEDUP = 'picked_up'
@@ -71,6 +72,17 @@ class OperationIndexes():
     OperationAndCustomer = 'operation_and_customer'
     PluginAndCustomer = 'plugin_and_customer'
     CreatedByAndCustomer = 'createdby_and_customer'
+    StatusAndCompletedTime = 'status_and_completedtime'
+
+
+class OperationArchiveKey():
+    ArchivedTime = 'archived_time'
+    Segment = 'segment'
+    FailedAgents = 'failed_agents'
+
+
+class OperationArchiveIndexes():
+    CustomerName = 'customer_name'
 
 
 class OperationPerAgentKey():
@@ -95,6 +107,7 @@ class OperationPerAgentIndexes():
     OperationIdAndAgentId = 'operationid_and_agentid'
     TagIdAndCustomer = 'tagid_and_customer'
     StatusAndCustomer = 'status_and_customer'
+    OperationIdAndStatus = 'operationid_and_status'
 
 
 class OperationPerAppKey():
@@ -0,0 +1,96 @@
+"""
+Operation progress events.
+
+Operation publishes a small event on EventKey.Channel every time an
+operation changes: created, picked up by an agent, results of an agent
+or of one of its applications received, and the new counters and
+status code of the operation. The web server fans them out to the
+websockets watching the operation (see server/event_hub.py), so the UI
+does not have to poll the operation while it runs.
+
+An event only carries what changed:
+
+    {
+        "event": "agent_results",
+        "operation_id": "...",
+        "customer_name": "default",
+        "agent_id": "...",
+        "data": {"status": 6002}
+    }
+"""
+import json
+import logging
+
+import redis
+
+from vFense.db.client import pool
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+
+class EventKey():
+    Channel = 'vfense:operations:events'
+    Event = 'event'
+    OperationId = 'operation_id'
+    CustomerName = 'customer_name'
+    AgentId = 'agent_id'
+    AppId = 'app_id'
+    Data = 'data'
+
+
+class OperationEvent():
+    Created = 'created'
+    PickedUp = 'picked_up'
+    AgentResults = 'agent_results'
+    AppResults = 'app_results'
+    Status = 'status'
+    # Sent by the web server to a client that missed events, the client
+    # reloads the operation.
+    Resync = 'resync'
+
+
+def publish_event(event, operation_id, customer_name, data=None,
+                  agent_id=None, app_id=None):
+    """Publishes an operation event. Never raises, a lost event only
+    delays the UI until its next reload.
+
+    Args:
+        event (str): One of OperationEvent.
+        operation_id (str): 36 character UUID of the operation.
+        customer_name (str): Customer the operation belongs to.
+
+    Kwargs:
+        data (dict): The fields of the operation that changed.
+        agent_id (str): The agent the event is about.
+        app_id (str): The application the event is about.
+
+    Returns:
+        The number of web servers that received the event.
+    """
+    message = {
+        EventKey.Event: event,
+        EventKey.OperationId: operation_id,
+        EventKey.CustomerName: customer_name,
+        EventKey.Data: data or {},
+    }
+    if agent_id:
+        message[EventKey.AgentId] = agent_id
+
+    if app_id:
+        message[EventKey.AppId] = app_id
+
+    try:
+        return(
+            redis.StrictRedis(connection_pool=pool)
+            .publish(EventKey.Channel, json.dumps(message))
+        )
+
+    except Exception as e:
+        logger.error(
+            'Unable to publish the %s event of operation %s: %s'
+            % (event, operation_id, e)
+        )
+
+    return(0)
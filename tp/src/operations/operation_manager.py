@@ -1,17 +1,18 @@
 #!/usr/bin/env python
 
 import logging
-import logging.config
 from datetime import datetime
 from time import mktime
 from vFense.db.client import db_create_close, r, db_connect
 from vFense.operations import *
 from vFense.errorz.error_messages import GenericResults, OperationResults
 from vFense.errorz.status_codes import OperationCodes
+from vFense.operations.events import OperationEvent, publish_event
 
 from vFense.plugins import ra
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -118,6 +119,14 @@ class Operation(object):
                 keys_to_insert[OperationKey.UpdatedTime] = self.now
                 keys_to_insert[OperationKey.CompletedTime] = self.now
                 keys_to_insert[OperationKey.OperationId] = operation_id
+                publish_event(
+                    OperationEvent.Created, operation_id, self.customer_name,
+                    {
+                        OperationKey.Operation: operation,
+                        OperationKey.CreatedBy: self.username,
+                        OperationKey.AgentsTotalCount: len(agent_ids),
+                    }
+                )
                 results = (
                     OperationResults(
                         self.username, self.uri, self.method
@@ -326,6 +335,10 @@ class Operation(object):
                 )
                 .run(conn)
             )
+            publish_event(
+                OperationEvent.PickedUp, operation_id, self.customer_name,
+                {OperationPerAgentKey.Status: PICKEDUP}, agent_id=agent_id
+            )
 
             results = (
                 OperationResults(
@@ -367,6 +380,14 @@ class Operation(object):
                 .update(keys_to_update)
                 .run(conn)
             )
+            publish_event(
+                OperationEvent.AgentResults, operation_id, self.customer_name,
+                {
+                    OperationPerAgentKey.Status: status,
+                    OperationPerAgentKey.Errors: errors
+                },
+                agent_id=agent_id
+            )
 
             self._update_agent_stats(operation_id, agent_id)
             self._update_operation_status_code(operation_id)
@@ -409,6 +430,14 @@ class Operation(object):
                 .update(keys_to_update)
                 .run(conn)
             )
+            publish_event(
+                OperationEvent.AppResults, operation_id, self.customer_name,
+                {
+                    OperationPerAppKey.Results: results,
+                    OperationPerAppKey.Errors: errors
+                },
+                agent_id=agent_id, app_id=app_id
+            )
 
             self._update_app_stats(operation_id, agent_id, app_id, results)
 
@@ -692,66 +721,51 @@ class Operation(object):
                 .get(operation_id)
                 .run(conn)
             )
+            completed = True
             if (operation[OperationKey.AgentsTotalCount] == 
                     operation[OperationKey.AgentsCompletedCount]):
-                (
-                    r
-                    .table(OperationsCollection)
-                    .get(operation_id)
-                    .update(
-                        {
-                            OperationKey.OperationStatus: OperationCodes.ResultsCompleted,
-                            OperationKey.CompletedTime: self.db_time
-                        }
-                    )
-                    .run(conn)
-                )
+                status = OperationCodes.ResultsCompleted
 
             elif (operation[OperationKey.AgentsTotalCount] == 
                     operation[OperationKey.AgentsFailedCount]):
-                (
-                    r
-                    .table(OperationsCollection)
-                    .get(operation_id)
-                    .update(
-                        {
-                            OperationKey.OperationStatus: OperationCodes.ResultsCompletedFailed,
-                            OperationKey.CompletedTime: self.db_time
-                        }
-                    )
-                    .run(conn)
-                )
+                status = OperationCodes.ResultsCompletedFailed
 
             elif (operation[OperationKey.AgentsTotalCount] == 
                     (
                         operation[OperationKey.AgentsFailedCount] +
                         operation[OperationKey.AgentsCompletedWithErrorsCount]
                     )):
-                (
-                    r
-                    .table(OperationsCollection)
-                    .get(operation_id)
-                    .update(
-                        {
-                            OperationKey.OperationStatus: OperationCodes.ResultsCompletedWithErrors,
-                            OperationKey.CompletedTime: self.db_time
-                        }
-                    )
-                    .run(conn)
-                )
+                status = OperationCodes.ResultsCompletedWithErrors
+
             else:
-                (
-                    r
-                    .table(OperationsCollection)
-                    .get(operation_id)
-                    .update(
-                        {
-                            OperationKey.OperationStatus: OperationCodes.ResultsIncomplete
-                        }
-                    )
-                    .run(conn)
-                )
+                status = OperationCodes.ResultsIncomplete
+                completed = False
+
+            keys_to_update = {OperationKey.OperationStatus: status}
+            if completed:
+                keys_to_update[OperationKey.CompletedTime] = self.db_time
+
+            (
+                r
+                .table(OperationsCollection)
+                .get(operation_id)
+                .update(keys_to_update)
+                .run(conn)
+            )
             conn.close()
 
+            publish_event(
+                OperationEvent.Status, operation_id, self.customer_name,
+                {
+                    OperationKey.OperationStatus: status,
+                    OperationKey.AgentsTotalCount: operation[OperationKey.AgentsTotalCount],
+                    OperationKey.AgentsPendingResultsCount: operation[OperationKey.AgentsPendingResultsCount],
+                    OperationKey.AgentsPendingPickUpCount: operation[OperationKey.AgentsPendingPickUpCount],
+                    OperationKey.AgentsFailedCount: operation[OperationKey.AgentsFailedCount],
+                    OperationKey.AgentsCompletedCount: operation[OperationKey.AgentsCompletedCount],
+                    OperationKey.AgentsCompletedWithErrorsCount: operation[OperationKey.AgentsCompletedWithErrorsCount],
+                }
+            )
+
         except Exception as e:
             logger.exception(e)
@@ -0,0 +1,406 @@
+"""
+Retention of the operations history.
+
+Completed operations older than max_age_days are moved out of the
+operations, operation_per_agent and operation_per_app tables:
+
+    * every row of the operation is appended, one JSON object per line,
+      to the gzip segment of the day under ARCHIVE_DIR
+      (operations-YYYYMMDD.ndjson.gz, each line has a "type" of
+      operation, agent or app).
+    * a summary row is saved in the operations_archive table, the
+      operation counters, the agents that failed and the segment that
+      holds the details, it stays queryable by customer.
+    * the rows are deleted, the app and agent rows first, the operation
+      last, so an interrupted run picks the operation up again.
+
+run_retention is a periodic task of the scheduler daemon (see
+vFense.scheduler.periodic). A run archives at most max_batches batches
+of batch_size operations and stops, the next period continues where it
+stopped. Progress is counted in the RetentionKey.Metrics Redis hash,
+see retention_metrics.
+
+The settings can be changed in /opt/TopPatch/conf/retention.conf:
+
+    [retention]
+    max_age_days = 90
+    batch_size = 100
+    max_batches = 20
+"""
+import os
+import gzip
+import json
+import time
+import logging
+import calendar
+import datetime
+import ConfigParser
+
+import redis
+
+from vFense.db.client import db_create_close, r, pool
+from vFense.operations import *
+from vFense.errorz.status_codes import OperationCodes
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+CONFIG_FILE = '/opt/TopPatch/conf/retention.conf'
+SETTINGS_SECTION = 'retention'
+ARCHIVE_DIR = '/opt/TopPatch/var/archive/operations'
+SEGMENT_NAME = 'operations-%Y%m%d.ndjson.gz'
+
+MAX_AGE_DAYS = 90
+BATCH_SIZE = 100
+MAX_BATCHES = 20
+# Rows deleted per query, an install on every agent has an app row per
+# agent and application.
+DELETE_BATCH = 5000
+
+COMPLETED_STATUSES = (
+    OperationCodes.ResultsCompleted,
+    OperationCodes.ResultsCompletedWithErrors,
+    OperationCodes.ResultsCompletedFailed,
+)
+
+SUMMARY_KEYS = (
+    OperationKey.OperationId,
+    OperationKey.Operation,
+    OperationKey.OperationStatus,
+    OperationKey.Plugin,
+    OperationKey.TagId,
+    OperationKey.CreatedBy,
+    OperationKey.CustomerName,
+    OperationKey.CreatedTime,
+    OperationKey.UpdatedTime,
+    OperationKey.CompletedTime,
+    OperationKey.AgentsTotalCount,
+    OperationKey.AgentsPendingResultsCount,
+    OperationKey.AgentsPendingPickUpCount,
+    OperationKey.AgentsFailedCount,
+    OperationKey.AgentsCompletedCount,
+    OperationKey.AgentsCompletedWithErrorsCount,
+)
+
+
+class RetentionSettingKey():
+    MaxAgeDays = 'max_age_days'
+    BatchSize = 'batch_size'
+    MaxBatches = 'max_batches'
+
+
+class RetentionKey():
+    Metrics = 'vfense:operations:retention'
+    Operations = 'archived_operations'
+    AgentRows = 'deleted_agent_rows'
+    AppRows = 'deleted_app_rows'
+    Runs = 'runs'
+    LastRun = 'last_run'
+    LastCutoff = 'last_cutoff'
+    LastArchived = 'last_archived'
+    LastDuration = 'last_duration'
+    Backlog = 'backlog'
+
+
+class SegmentKey():
+    Type = 'type'
+    Operation = 'operation'
+    Agent = 'agent'
+    App = 'app'
+
+
+def read_settings(config_file=CONFIG_FILE):
+    """Returns the retention settings, keyed by RetentionSettingKey."""
+    settings = {
+        RetentionSettingKey.MaxAgeDays: MAX_AGE_DAYS,
+        RetentionSettingKey.BatchSize: BATCH_SIZE,
+        RetentionSettingKey.MaxBatches: MAX_BATCHES,
+    }
+    config = ConfigParser.RawConfigParser()
+    config.read(config_file)
+    if not config.has_section(SETTINGS_SECTION):
+        return(settings)
+
+    for key in settings.keys():
+        if config.has_option(SETTINGS_SECTION, key):
+            settings[key] = max(config.getint(SETTINGS_SECTION, key), 1)
+
+    return(settings)
+
+
+def create_archive_table(conn):
+    """Creates the archive table and the indexes retention needs that do
+    not exist yet.
+    """
+    if OperationsArchiveCollection not in r.table_list().run(conn):
+        r.table_create(
+            OperationsArchiveCollection, primary_key=OperationKey.OperationId
+        ).run(conn)
+
+    indexes = r.table(OperationsArchiveCollection).index_list().run(conn)
+    if OperationArchiveIndexes.CustomerName not in indexes:
+        r.table(OperationsArchiveCollection).index_create(
+            OperationArchiveIndexes.CustomerName
+        ).run(conn)
+
+    indexes = r.table(OperationsCollection).index_list().run(conn)
+    if OperationIndexes.StatusAndCompletedTime not in indexes:
+        r.table(OperationsCollection).index_create(
+            OperationIndexes.StatusAndCompletedTime, lambda x: [
+                x[OperationKey.OperationStatus],
+                x[OperationKey.CompletedTime]]
+        ).run(conn)
+
+
+def _encode(value):
+    """json default, times are saved as epoch seconds like the API
+    returns them.
+    """
+    if isinstance(value, datetime.datetime):
+        return(calendar.timegm(value.utctimetuple()))
+
+    raise TypeError(repr(value))
+
+
+def _expired_operations(cutoff, limit, conn):
+    operations = []
+    for status in COMPLETED_STATUSES:
+        operations.extend(
+            r
+            .table(OperationsCollection)
+            .between(
+                [status, r.epoch_time(0)], [status, r.epoch_time(cutoff)],
+                index=OperationIndexes.StatusAndCompletedTime
+            )
+            .limit(limit - len(operations))
+            .run(conn)
+        )
+        if len(operations) >= limit:
+            break
+
+    return(operations)
+
+
+def _delete_rows(table, index, oper_ids, conn):
+    deleted = 0
+    while True:
+        result = (
+            r
+            .table(table)
+            .get_all(*oper_ids, index=index)
+            .limit(DELETE_BATCH)
+            .delete()
+            .run(conn)
+        )
+        deleted += result.get('deleted', 0)
+        if result.get('deleted', 0) < DELETE_BATCH:
+            break
+
+    return(deleted)
+
+
+def _write_lines(segment, rows, row_type, on_row=None):
+    written = 0
+    for row in rows:
+        row[SegmentKey.Type] = row_type
+        segment.write(json.dumps(row, default=_encode) + '\n')
+        if on_row:
+            on_row(row)
+        written += 1
+
+    return(written)
+
+
+@db_create_close
+def archive_batch(cutoff, limit=BATCH_SIZE, archive_dir=ARCHIVE_DIR,
+                  conn=None):
+    """Archives up to limit operations that completed before cutoff.
+
+    Args:
+        cutoff (int): Unix timestamp, operations that completed before it
+            are archived.
+
+    Kwargs:
+        limit (int): Operations archived.
+        archive_dir (str): Directory of the segments.
+
+    Returns:
+        Tuple of the operations archived, the agent rows and the app rows
+        deleted.
+    """
+    operations = _expired_operations(cutoff, limit, conn)
+    if not operations:
+        return(0, 0, 0)
+
+    if not os.path.exists(archive_dir):
+        os.makedirs(archive_dir)
+
+    oper_ids = [oper[OperationKey.OperationId] for oper in operations]
+    segment_name = time.strftime(SEGMENT_NAME, time.gmtime())
+    failed_agents = dict([(oper_id, []) for oper_id in oper_ids])
+
+    def failed(row):
+        if (row.get(OperationPerAgentKey.Status) ==
+                OperationCodes.ResultsReceivedWithErrors):
+            failed_agents[row[OperationPerAgentKey.OperationId]].append(
+                row[OperationPerAgentKey.AgentId]
+            )
+
+    segment = gzip.open(os.path.join(archive_dir, segment_name), 'ab')
+    try:
+        _write_lines(segment, operations, SegmentKey.Operation)
+        _write_lines(
+            segment,
+            r
+            .table(OperationsPerAgentCollection)
+            .get_all(*oper_ids, index=OperationPerAgentIndexes.OperationId)
+            .run(conn),
+            SegmentKey.Agent, failed
+        )
+        _write_lines(
+            segment,
+            r
+            .table(OperationsPerAppCollection)
+            .get_all(*oper_ids, index=OperationPerAppIndexes.OperationId)
+            .run(conn),
+            SegmentKey.App
+        )
+
+    finally:
+        segment.close()
+
+    summaries = []
+    for oper in operations:
+        summary = dict(
+            [(key, oper.get(key)) for key in SUMMARY_KEYS]
+        )
+        summary[OperationArchiveKey.ArchivedTime] = r.now()
+        summary[OperationArchiveKey.Segment] = segment_name
+        summary[OperationArchiveKey.FailedAgents] = (
+            failed_agents[oper[OperationKey.OperationId]]
+        )
+        summaries.append(summary)
+
+    (
+        r
+        .table(OperationsArchiveCollection)
+        .insert(summaries, upsert=True)
+        .run(conn)
+    )
+
+    app_rows = _delete_rows(
+        OperationsPerAppCollection, OperationPerAppIndexes.OperationId,
+        oper_ids, conn
+    )
+    agent_rows = _delete_rows(
+        OperationsPerAgentCollection, OperationPerAgentIndexes.OperationId,
+        oper_ids, conn
+    )
+    (
+        r
+        .table(OperationsCollection)
+        .get_all(*oper_ids)
+        .delete()
+        .run(conn)
+    )
+
+    return(len(operations), agent_rows, app_rows)
+
+
+@db_create_close
+def _expired_backlog(cutoff, conn=None):
+    return(
+        sum(
+            [
+                r
+                .table(OperationsCollection)
+                .between(
+                    [status, r.epoch_time(0)],
+                    [status, r.epoch_time(cutoff)],
+                    index=OperationIndexes.StatusAndCompletedTime
+                )
+                .count()
+                .run(conn)
+                for status in COMPLETED_STATUSES
+            ]
+        )
+    )
+
+
+def run_retention(period_start=None, settings=None):
+    """Periodic task, archives the completed operations older than the
+    configured age, at most max_batches batches of batch_size.
+
+    Returns:
+        The number of operations archived.
+    """
+    settings = settings or read_settings()
+    now = int(period_start or time.time())
+    cutoff = now - settings[RetentionSettingKey.MaxAgeDays] * 86400
+    began = time.time()
+    archived = agent_rows = app_rows = 0
+    for batch in range(settings[RetentionSettingKey.MaxBatches]):
+        try:
+            count, agents, apps = archive_batch(
+                cutoff, settings[RetentionSettingKey.BatchSize]
+            )
+
+        except Exception as e:
+            logger.exception(e)
+            break
+
+        archived += count
+        agent_rows += agents
+        app_rows += apps
+        if count < settings[RetentionSettingKey.BatchSize]:
+            break
+
+    duration = round(time.time() - began, 3)
+    logger.info(
+        'archived %d operations, %d agent rows and %d app rows in %.1fs'
+        % (archived, agent_rows, app_rows, duration)
+    )
+    try:
+        backlog = _expired_backlog(cutoff)
+        pipe = redis.StrictRedis(connection_pool=pool).pipeline()
+        pipe.hincrby(RetentionKey.Metrics, RetentionKey.Operations, archived)
+        pipe.hincrby(RetentionKey.Metrics, RetentionKey.AgentRows, agent_rows)
+        pipe.hincrby(RetentionKey.Metrics, RetentionKey.AppRows, app_rows)
+        pipe.hincrby(RetentionKey.Metrics, RetentionKey.Runs, 1)
+        pipe.hmset(
+            RetentionKey.Metrics,
+            {
+                RetentionKey.LastRun: now,
+                RetentionKey.LastCutoff: cutoff,
+                RetentionKey.LastArchived: archived,
+                RetentionKey.LastDuration: duration,
+                RetentionKey.Backlog: backlog,
+            }
+        )
+        pipe.execute()
+
+    except Exception as e:
+        logger.exception(e)
+
+    return(archived)
+
+
+def retention_metrics():
+    """Returns the retention counters and the results of the last run."""
+    metrics = (
+        redis.StrictRedis(connection_pool=pool).hgetall(RetentionKey.Metrics)
+    )
+    results = dict([(key, 0) for key in (
+        RetentionKey.Operations, RetentionKey.AgentRows,
+        RetentionKey.AppRows, RetentionKey.Runs
+    )])
+    for key, value in metrics.items():
+        try:
+            results[key] = int(value)
+        except ValueError:
+            results[key] = float(value)
+
+    results.update(read_settings())
+
+    return(results)
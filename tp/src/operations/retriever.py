@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 
 import logging
-import logging.config
 from vFense.db.client import db_create_close, r
 from vFense.operations import *
 from vFense.agent import *
@@ -9,10 +8,19 @@ from vFense.errorz.error_messages import GenericResults, OperationResults, Opera
 from vFense.plugins.patching import *
 from vFense.plugins.patching.rv_db_calls import *
 from vFense.utils.common import *
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
+# Values of the status filter of the per agent pages and the per agent
+# statuses each one matches.
+AGENT_STATUS_FILTERS = {
+    'pending': [PENDINGPICKUP, PICKEDUP],
+    'failed': [OperationCodes.ResultsReceivedWithErrors],
+    'completed': [OperationCodes.ResultsReceived],
+}
+
 @db_create_close
 def oper_exists(oper_id, conn=None):
     try:
@@ -427,6 +435,262 @@ class OperationRetriever(object):
 
         return(results)
 
+    @db_create_close
+    def get_archived_operations(self, conn=None):
+        """Retrieve the summaries of the operations retention archived,
+            see vFense.operations.retention.
+
+        Basic Usage:
+            >>> from vFense.operations.retriever import OperationRetriever
+            >>> operations = OperationRetriever('admin', 'default', '/', 'GET')
+            >>> operations.get_archived_operations()
+        """
+        base = (
+            r
+            .table(OperationsArchiveCollection)
+            .get_all(
+                self.customer_name,
+                index=OperationArchiveIndexes.CustomerName
+            )
+        )
+        try:
+            count = base.count().run(conn)
+            operations = list(
+                base
+                .order_by(self.sort(self.sort_key))
+                .skip(self.offset)
+                .limit(self.count)
+                .map(lambda x:
+                    x.merge(
+                        {
+                            OperationKey.CreatedTime: x[OperationKey.CreatedTime].to_epoch_time(),
+                            OperationKey.UpdatedTime: x[OperationKey.UpdatedTime].to_epoch_time(),
+                            OperationKey.CompletedTime: x[OperationKey.CompletedTime].to_epoch_time(),
+                            OperationArchiveKey.ArchivedTime: x[OperationArchiveKey.ArchivedTime].to_epoch_time(),
+                        }
+                    )
+                )
+                .run(conn)
+            )
+
+            results = (
+                GenericResults(
+                    self.username, self.uri, self.method
+                ).information_retrieved(operations, count)
+            )
+            logger.info(results)
+
+        except Exception as e:
+            results = (
+                GenericResults(
+                    self.username, self.uri, self.method
+                ).something_broke('Operations Query', 'Archived Operations', e)
+            )
+            logger.exception(results)
+
+        return(results)
+
+    @db_create_close
+    def get_operation_summary(self, oper_id, conn=None):
+        """Retrieve the counters of an operation, without its agents.
+            The agents are paged with get_operation_agents.
+
+        Args:
+            oper_id (str): 36 character UUID of the operation.
+
+        Basic Usage:
+            >>> from vFense.operations.retriever import OperationRetriever
+            >>> operations = OperationRetriever('admin', 'default', '/', 'GET')
+            >>> operations.get_operation_summary(oper_id)
+        """
+        try:
+            operation = list(
+                r
+                .table(OperationsCollection)
+                .get_all(oper_id, index=OperationIndexes.OperationId)
+                .filter({OperationKey.CustomerName: self.customer_name})
+                .pluck(self.pluck_list)
+                .map(self.map_hash)
+                .run(conn)
+            )
+            if operation:
+                results = (
+                    GenericResults(
+                        self.username, self.uri, self.method
+                    ).information_retrieved(operation[0], 1)
+                )
+                logger.info(results)
+
+            else:
+                results = (
+                    GenericResults(
+                        self.username, self.uri, self.method
+                    ).invalid_id(oper_id, 'operation')
+                )
+                logger.warn(results)
+
+        except Exception as e:
+            results = (
+                GenericResults(
+                    self.username, self.uri, self.method
+                ).something_broke('Operations Query', 'Operations', e)
+            )
+            logger.exception(results)
+
+        return(results)
+
+    @db_create_close
+    def get_operation_agents(self, oper_id, status=None, conn=None):
+        """Retrieve a page of the agents of an operation, count agents
+            from offset ordered by agent id. The applications of an
+            agent are retrieved with get_operation_agent_apps.
+
+        Args:
+            oper_id (str): 36 character UUID of the operation.
+
+        Kwargs:
+            status (str): Only the agents in this state, one of
+                AGENT_STATUS_FILTERS (pending, failed or completed).
+
+        Basic Usage:
+            >>> from vFense.operations.retriever import OperationRetriever
+            >>> operations = OperationRetriever('admin', 'default', '/', 'GET')
+            >>> operations.get_operation_agents(oper_id, status='failed')
+        """
+        if status and status not in AGENT_STATUS_FILTERS:
+            results = (
+                GenericResults(
+                    self.username, self.uri, self.method
+                ).invalid_filter(status)
+            )
+            logger.warn(results)
+            return(results)
+
+        if status:
+            base = (
+                r
+                .table(OperationsPerAgentCollection)
+                .get_all(
+                    *[
+                        [oper_id, agent_status]
+                        for agent_status in AGENT_STATUS_FILTERS[status]
+                    ],
+                    index=OperationPerAgentIndexes.OperationIdAndStatus
+                )
+            )
+        else:
+            base = (
+                r
+                .table(OperationsPerAgentCollection)
+                .get_all(oper_id, index=OperationPerAgentIndexes.OperationId)
+            )
+
+        base = base.filter(
+            {OperationPerAgentKey.CustomerName: self.customer_name}
+        )
+        try:
+            count = base.count().run(conn)
+            agents = list(
+                base
+                .order_by(self.sort(OperationPerAgentKey.AgentId))
+                .skip(self.offset)
+                .limit(self.count)
+                .eq_join(OperationPerAgentKey.AgentId, r.table(AgentsCollection))
+                .zip()
+                .map(lambda x:
+                    {
+                        OperationPerAgentKey.PickedUpTime: x[OperationPerAgentKey.PickedUpTime].to_epoch_time(),
+                        OperationPerAgentKey.CompletedTime: x[OperationPerAgentKey.CompletedTime].to_epoch_time(),
+                        OperationPerAgentKey.AppsTotalCount: x[OperationPerAgentKey.AppsTotalCount].default(0),
+                        OperationPerAgentKey.AppsPendingCount: x[OperationPerAgentKey.AppsPendingCount].default(0),
+                        OperationPerAgentKey.AppsFailedCount: x[OperationPerAgentKey.AppsFailedCount].default(0),
+                        OperationPerAgentKey.AppsCompletedCount: x[OperationPerAgentKey.AppsCompletedCount].default(0),
+                        OperationPerAgentKey.Errors: x[OperationPerAgentKey.Errors],
+                        OperationPerAgentKey.Status: x[OperationPerAgentKey.Status],
+                        OperationPerAgentKey.AgentId: x[OperationPerAgentKey.AgentId],
+                        AgentKey.ComputerName: x[AgentKey.ComputerName],
+                        AgentKey.DisplayName: x[AgentKey.DisplayName],
+                    }
+                )
+                .run(conn)
+            )
+
+            results = (
+                GenericResults(
+                    self.username, self.uri, self.method
+                ).information_retrieved(agents, count)
+            )
+            logger.info(results)
+
+        except Exception as e:
+            results = (
+                GenericResults(
+                    self.username, self.uri, self.method
+                ).something_broke('Operations Query', 'Operations', e)
+            )
+            logger.exception(results)
+
+        return(results)
+
+    @db_create_close
+    def get_operation_agent_apps(self, oper_id, agent_id, conn=None):
+        """Retrieve a page of the application results of one agent of
+            an operation, count applications from offset.
+
+        Args:
+            oper_id (str): 36 character UUID of the operation.
+            agent_id (str): 36 character UUID of the agent.
+
+        Basic Usage:
+            >>> from vFense.operations.retriever import OperationRetriever
+            >>> operations = OperationRetriever('admin', 'default', '/', 'GET')
+            >>> operations.get_operation_agent_apps(oper_id, agent_id)
+        """
+        base = (
+            r
+            .table(OperationsPerAppCollection)
+            .get_all(
+                [oper_id, agent_id],
+                index=OperationPerAppIndexes.OperationIdAndAgentId
+            )
+            .filter({OperationPerAppKey.CustomerName: self.customer_name})
+        )
+        try:
+            count = base.count().run(conn)
+            apps = list(
+                base
+                .order_by(self.sort(OperationPerAppKey.AppName))
+                .skip(self.offset)
+                .limit(self.count)
+                .map(lambda y:
+                    {
+                        OperationPerAppKey.AppId: y[OperationPerAppKey.AppId],
+                        OperationPerAppKey.AppName: y[OperationPerAppKey.AppName],
+                        OperationPerAppKey.Results: y[OperationPerAppKey.Results],
+                        OperationPerAppKey.Errors: y[OperationPerAppKey.Errors],
+                        OperationPerAppKey.ResultsReceivedTime: y[OperationPerAppKey.ResultsReceivedTime].to_epoch_time()
+                    }
+                )
+                .run(conn)
+            )
+
+            results = (
+                GenericResults(
+                    self.username, self.uri, self.method
+                ).information_retrieved(apps, count)
+            )
+            logger.info(results)
+
+        except Exception as e:
+            results = (
+                GenericResults(
+                    self.username, self.uri, self.method
+                ).something_broke('Operations Query', 'Operations', e)
+            )
+            logger.exception(results)
+
+        return(results)
+
     @db_create_close
     def get_operation_by_id(self, oper_id, conn=None):
         pluck_list = (
@@ -2,7 +2,6 @@ import os
 import re
 import sys
 import logging
-import logging.config
 from datetime import datetime
 from hashlib import sha256
 from re import sub
@@ -14,8 +13,9 @@ from vFense.plugins.cve.cve_constants import *
 from vFense.plugins.cve.cve_db import insert_into_bulletin_collection_for_windows
 from vFense.plugins.cve.downloader import download_latest_xls_from_msft
 from vFense.db.client import r
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('cve')
 
 def build_bulletin_id(data):
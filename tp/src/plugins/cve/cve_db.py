@@ -1,12 +1,12 @@
 import sys
 import logging
-import logging.config
 from vFense.db.client import db_create_close, r, db_connect
 from vFense.plugins.cve import *
 from vFense.plugins.patching import *
 from vFense.plugins.cve.cve_constants import *
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('cve')
 
 
@@ -3,7 +3,6 @@ import sys
 import gc
 import re
 import logging
-import logging.config
 from lxml import etree
 from re import sub
 from vFense.plugins.cve import *
@@ -12,8 +11,9 @@ from vFense.plugins.cve.cve_db import insert_into_cve_collection, update_cve_cat
 from vFense.plugins.cve.downloader import start_nvd_xml_download
 from vFense.utils.common import date_parser, timestamp_verifier
 from vFense.db.client import r
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('cve')
 
 class NvdParser(object):
@@ -4,10 +4,10 @@ import re
 from datetime import date
 import requests
 import logging
-import logging.config
 from vFense.plugins.cve.cve_constants import *
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('cve')
 
 tmp_path = os.path.join\
@@ -1,11 +1,8 @@
 import tornado.httpserver
 import tornado.web
 
-import simplejson as json
-
 from vFense.server.handlers import BaseHandler
 import logging
-import logging.config
 
 from vFense.agent import *
 from vFense.agent.agent_searcher import AgentSearcher
@@ -23,11 +20,12 @@ from vFense.server.hierarchy.decorators import authenticated_request, permission
 from vFense.server.hierarchy.decorators import convert_json_to_arguments
 
 from vFense.scheduler.jobManager import job_scheduler
+from vFense.logger.logsetup import configure_logging
 
 
 #from server.handlers import *
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 class RelayServersHandler(BaseHandler):
@@ -43,8 +41,7 @@ class RelayServersHandler(BaseHandler):
                     username, uri, method
                 )
             )
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -54,8 +51,7 @@ class RelayServersHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
     @authenticated_request
     def delete(self):
@@ -69,8 +65,7 @@ class RelayServersHandler(BaseHandler):
             for mouse in mouse_names:
                 results = mm.remove(mouse_name)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -80,8 +75,7 @@ class RelayServersHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
     @authenticated_request
     @convert_json_to_arguments
@@ -97,8 +91,7 @@ class RelayServersHandler(BaseHandler):
             mm = MightyMouse(username, customer_name, uri, method)
             results = mm.add(mouse_name, address, customers)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -108,8 +101,7 @@ class RelayServersHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class RelayServerHandler(BaseHandler):
@@ -128,8 +120,7 @@ class RelayServerHandler(BaseHandler):
                 ).information_retrieved(mouse, len(mouse))
             )
 
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -139,8 +130,7 @@ class RelayServerHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
     @authenticated_request
     @convert_json_to_arguments
@@ -155,8 +145,7 @@ class RelayServerHandler(BaseHandler):
             mm = MightyMouse(username, customer_name, uri, method)
             results = mm.update(mouse_name, customers, address)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -166,8 +155,7 @@ class RelayServerHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
     @authenticated_request
     def delete(self, mouse_name):
@@ -179,8 +167,7 @@ class RelayServerHandler(BaseHandler):
             mm = MightyMouse(username, customer_name, uri, method)
             results = mm.remove(mouse_name)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -190,5 +177,4 @@ class RelayServerHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
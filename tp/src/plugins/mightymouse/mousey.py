@@ -1,5 +1,4 @@
 import logging
-import logging.config
 from time import mktime
 from datetime import datetime
 from vFense.db.client import db_create_close, r, db_connect
@@ -7,8 +6,9 @@ from vFense.errorz.error_messages import GenericResults, MightyMouseResults
 from vFense.errorz.status_codes import MightyMouseCodes
 from vFense.plugins.mightymouse.mouse_db import mouse_exists, \
     add_mouse, update_mouse, delete_mouse
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -4,7 +4,8 @@ import time
 from vFense.db.client import *
 
 import _db
-from _db import Collection, Master, monit_initialization
+import timeseries
+from _db import Collection, Master
 
 AgentStatsKey = 'monit_stats'
 AgentCollection = 'agents'
@@ -42,8 +43,9 @@ class Monitor():
 
         data = Monitor._totalfy(data)
 
-        result = _db._save_data_point(agent=agent, collection=Collection.Memory,
-                                      data=data)
+        result = timeseries.save_points(
+            Collection.Memory, [(agent, time.time(), data)]
+        ) > 0
 
         return result
 
@@ -62,8 +64,9 @@ class Monitor():
 
             return None
 
-        result = _db._save_data_point(agent=agent, collection=Collection.Cpu,
-                                      data=data)
+        result = timeseries.save_points(
+            Collection.Cpu, [(agent, time.time(), data)]
+        ) > 0
 
         return result
 
@@ -82,9 +85,9 @@ class Monitor():
 
             new_data.append(Monitor._totalfy(fs))
 
-        result = _db._save_data_point(agent=agent,
-                                      collection=Collection.FileSystem,
-                                      data=new_data)
+        result = timeseries.save_points(
+            Collection.FileSystem, [(agent, time.time(), new_data)]
+        ) > 0
 
         return result
 
@@ -111,11 +114,9 @@ class Monitor():
 
             return None
 
-        timestamp = date_time.strftime('%s')
+        timestamp = int(date_time.strftime('%s'))
 
-        return _db._get_data_points_since(agent=agent,
-                                          collection=Collection.Memory,
-                                          timestamp=timestamp)
+        return timeseries.get_points(Collection.Memory, agent, timestamp)
 
     @staticmethod
     def get_cpu_data_since(agent=None, date_time=None):
@@ -140,11 +141,9 @@ class Monitor():
 
             return None
 
-        timestamp = date_time.strftime('%s')
+        timestamp = int(date_time.strftime('%s'))
 
-        return _db._get_data_points_since(agent=agent,
-                                          collection=Collection.Cpu,
-                                          timestamp=timestamp)
+        return timeseries.get_points(Collection.Cpu, agent, timestamp)
 
     @staticmethod
     def get_file_system_data_since(agent=None, date_time=None):
@@ -169,11 +168,9 @@ class Monitor():
 
             return None
 
-        timestamp = date_time.strftime('%s')
+        timestamp = int(date_time.strftime('%s'))
 
-        return _db._get_data_points_since(agent=agent,
-                                          collection=Collection.FileSystem,
-                                          timestamp=timestamp)
+        return timeseries.get_points(Collection.FileSystem, agent, timestamp)
 
     @staticmethod
     def _totalfy(data):
@@ -388,21 +385,33 @@ def get_monitor_data_since(agent=None, timestamp=None):
     return data
 
 @db_create_close
-def update_agent_monit_stats(agent=None, **kwargs):
+def monit_initialization(conn=None):
+    _db.monit_initialization()
+    timeseries.create_series_tables(conn)
 
-    memory = kwargs.get(MonitorKey.Memory)
-    cpu = kwargs.get(MonitorKey.Cpu)
-    fs = kwargs.get(MonitorKey.FileSystem)
 
-    conn = kwargs.get('conn')
+def valid_sample(memory, cpu, fs):
+    """True if a sample has the shape monit_samples expects, memory and
+    cpu dictionaries and fs a list of dictionaries.
+    """
+    return(
+        isinstance(memory, dict)
+        and isinstance(cpu, dict)
+        and isinstance(fs, list)
+        and all(isinstance(_fs, dict) for _fs in fs)
+    )
 
-    agent_stats = {}
+
+def monit_samples(agent, memory, cpu, fs, timestamp=None):
+    """Returns the latest stats document of an agent and the points of
+    the sample, keyed by Collection.
+    """
     stats = {}
 
     stats['memory'] = Monitor._totalfy(memory)
     stats['cpu'] = cpu
 
-    stats['timestamp'] = int(time.time())
+    stats['timestamp'] = int(timestamp or time.time())
 
     fs_list = []
 
@@ -412,10 +421,82 @@ def update_agent_monit_stats(agent=None, **kwargs):
 
     stats['file_system'] = fs_list
 
+    points = {
+        Collection.Memory: (agent, stats['timestamp'], stats['memory']),
+        Collection.Cpu: (agent, stats['timestamp'], cpu),
+        Collection.FileSystem: (agent, stats['timestamp'], fs_list),
+    }
+
+    return(stats, points)
+
+
+@db_create_close
+def update_agent_monit_stats(agent=None, **kwargs):
+    """Keeps the latest sample on the agent document and adds it to the
+    time series of the agent.
+    """
+
+    memory = kwargs.get(MonitorKey.Memory)
+    cpu = kwargs.get(MonitorKey.Cpu)
+    fs = kwargs.get(MonitorKey.FileSystem)
+
+    conn = kwargs.get('conn')
+
+    stats, points = monit_samples(agent, memory, cpu, fs)
+
+    agent_stats = {}
     agent_stats[AgentStatsKey] = stats
 
     r.table(AgentCollection).get(agent).update(agent_stats).run(conn, no_reply=True)
 
+    timeseries.save_samples(
+        dict([(collection, [point]) for collection, point in points.items()])
+    )
+
+
+@db_create_close
+def save_agent_samples(samples, conn=None):
+    """Writes the samples of many agents, the latest stats of every agent
+    with one update and the points with one insert per collection.
+
+    Args:
+        samples: List of (agent_id, memory, cpu, file_system, timestamp)
+            tuples, see valid_sample.
+
+    Returns:
+        The number of points written.
+    """
+    latest = {}
+    series = {}
+    for agent, memory, cpu, fs, timestamp in samples:
+        stats, points = monit_samples(agent, memory, cpu, fs, timestamp)
+        for collection, point in points.items():
+            series.setdefault(collection, []).append(point)
+
+        if (
+            agent not in latest
+            or latest[agent]['timestamp'] <= stats['timestamp']
+        ):
+            latest[agent] = stats
+
+    if latest:
+        (
+            r
+            .expr(
+                [
+                    {'id': agent, AgentStatsKey: stats}
+                    for agent, stats in latest.items()
+                ]
+            )
+            .for_each(
+                lambda x:
+                r
+                .table(AgentCollection)
+                .get(x['id'])
+                .update({AgentStatsKey: x[AgentStatsKey]})
+            )
+            .run(conn, no_reply=True)
+        )
+
+    return(timeseries.save_samples(series))
 
-# Monitoring initialization.
-#_db.monit_initialization()
@@ -1,5 +1,3 @@
-import time
-
 from vFense.db.client import *
 # import rethinkdb as r
 #
@@ -55,82 +53,6 @@ def _get_data_point(agent=None, collection=None, timestamp=None, conn=None):
     pass
 
 
-@db_create_close
-def _get_data_points_since(agent=None, collection=None, timestamp=None,
-                           conn=None):
-    """Gets all data points since specified time.
-
-    Args:
-
-        agent: The agent id the data belongs to.
-
-        collection: A monit.Collection type of the data wanted.
-
-        timestamp: The unix timestamp at which to get data at.
-
-    Returns:
-
-        The data points asked for, None otherwise.
-    """
-
-    result = list(
-        r.table(collection)
-        .filter(
-            r.js(
-                '(function (row) { return row.{} == {} '
-                '&& row.{} > {}; })'.format(
-                    CollectionKeys.AgentId,
-                    agent,
-                    CollectionKeys.Timestamp,
-                    timestamp
-                ))
-        )
-        .run(conn)
-    )
-
-    return result
-
-
-@db_create_close
-def _save_data_point(agent=None, collection=None, data=None, conn=None):
-    """Save a data point.
-
-     Args:
-
-        agent: The agent id the data belongs to.
-
-        collection: A monit.Collection type of the data to save.
-
-        data: Basic data type (str, int, list, dict, etc) to save as is.
-
-    Returns:
-
-        True if saved successfully, False otherwise.
-    """
-
-    if (
-        not agent
-        or not collection
-        or not data
-    ):
-        return None
-
-    timestamp = long(time.time())
-
-    point = {}
-    point[CollectionKeys.AgentId] = agent
-    point[CollectionKeys.Timestamp] = timestamp
-    point[CollectionKeys.Data] = data
-
-    result = r.table(collection).insert(point).run(conn)
-
-    if result.get('inserted') and result.get('inserted') > 0:
-
-        return True
-
-    return False
-
-
 @db_create_close
 def monit_initialization(conn=None):
 
@@ -0,0 +1,232 @@
+"""
+Ingestion buffer of the monit plugin.
+
+The listener does not write the samples agents report, queue_sample
+pushes them onto a bounded Redis list and the request returns. The monit
+daemon (plugins/monit/monitd.py) pops them and writes them in batches,
+once FLUSH_SIZE samples are buffered or FLUSH_INTERVAL seconds after the
+first one arrived.
+
+When the list is full the overflow policy decides what is lost:
+
+    drop_newest: the new sample is dropped.
+    drop_oldest: the oldest queued sample is dropped to make room.
+    sample: from SAMPLE_START of the capacity on, new samples are
+        dropped with a probability that grows to 1 at full capacity,
+        above it they are dropped.
+
+An agent reports every minute, so a lost sample leaves a one minute gap
+in its series and the next sample replaces its latest stats.
+
+The counters of the buffer are kept in a Redis hash, ingest_metrics
+returns them with the current depth of the list. lost counts the queued
+samples that were never written, the invalid ones and those of the
+batches that failed to write.
+"""
+import json
+import random
+from time import time
+
+import redis
+
+from vFense.db.client import pool
+
+MAX_QUEUED = 100000
+SAMPLE_START = 0.75
+FLUSH_SIZE = 2000
+FLUSH_INTERVAL = 5
+
+
+class IngestKey():
+    Incoming = 'vfense:monit:incoming'
+    Metrics = 'vfense:monit:metrics'
+
+
+class IngestMetricKey():
+    Depth = 'depth'
+    Capacity = 'capacity'
+    Policy = 'policy'
+    Accepted = 'accepted'
+    Dropped = 'dropped'
+    Sampled = 'sampled'
+    Flushed = 'flushed'
+    Flushes = 'flushes'
+    FlushErrors = 'flush_errors'
+    Invalid = 'invalid'
+    Lost = 'lost'
+    LastFlush = 'last_flush'
+    LastFlushSize = 'last_flush_size'
+    LastFlushSeconds = 'last_flush_seconds'
+
+
+class OverflowPolicy():
+    DropNewest = 'drop_newest'
+    DropOldest = 'drop_oldest'
+    Sample = 'sample'
+
+
+OVERFLOW_POLICY = OverflowPolicy.Sample
+
+
+class SampleKey():
+    AgentId = 'agent_id'
+    Memory = 'memory'
+    Cpu = 'cpu'
+    FileSystem = 'file_system'
+    Timestamp = 'timestamp'
+
+
+# Samples are pushed on the left and popped from the right, the right
+# end holds the oldest one.
+_QUEUE_SCRIPT = """
+local depth = redis.call('llen', KEYS[1])
+local capacity = tonumber(ARGV[2])
+local policy = ARGV[3]
+if depth >= capacity then
+    if policy ~= 'drop_oldest' then
+        redis.call('hincrby', KEYS[2], 'dropped', 1)
+        return 0
+    end
+    redis.call('rpop', KEYS[1])
+    redis.call('hincrby', KEYS[2], 'dropped', 1)
+
+elseif policy == 'sample' then
+    local start = tonumber(ARGV[4])
+    if depth >= start and
+            tonumber(ARGV[5]) * (capacity - start) < depth - start then
+        redis.call('hincrby', KEYS[2], 'sampled', 1)
+        return 0
+    end
+end
+redis.call('lpush', KEYS[1], ARGV[1])
+redis.call('hincrby', KEYS[2], 'accepted', 1)
+return 1
+"""
+
+
+def ingest_redis():
+    return(redis.StrictRedis(connection_pool=pool))
+
+
+class IngestQueue(object):
+
+    def __init__(self, connection=None, capacity=MAX_QUEUED,
+                 policy=OVERFLOW_POLICY):
+        self.redis = connection or ingest_redis()
+        self.capacity = capacity
+        self.policy = policy
+        self._queue = self.redis.register_script(_QUEUE_SCRIPT)
+
+    def push(self, agent_id, memory, cpu, file_system, timestamp=None):
+        """Queues the sample of an agent.
+
+        Returns:
+            True if the sample was queued, False if the overflow policy
+            dropped it.
+        """
+        sample = {
+            SampleKey.AgentId: agent_id,
+            SampleKey.Memory: memory,
+            SampleKey.Cpu: cpu,
+            SampleKey.FileSystem: file_system,
+            SampleKey.Timestamp: int(timestamp or time()),
+        }
+
+        return(
+            bool(
+                self._queue(
+                    keys=[IngestKey.Incoming, IngestKey.Metrics],
+                    args=[
+                        json.dumps(sample), self.capacity, self.policy,
+                        int(self.capacity * SAMPLE_START), random.random()
+                    ]
+                )
+            )
+        )
+
+    def pop(self, count, timeout=1):
+        """Pops up to count samples, oldest first. Blocks up to timeout
+        seconds while the queue is empty.
+        """
+        samples = []
+        item = self.redis.brpop(IngestKey.Incoming, timeout=timeout)
+        if not item:
+            return(samples)
+
+        items = [item[1]]
+        if count > 1:
+            pipe = self.redis.pipeline()
+            pipe.lrange(IngestKey.Incoming, -(count - 1), -1)
+            pipe.ltrim(IngestKey.Incoming, 0, -count)
+            items.extend(reversed(pipe.execute()[0]))
+
+        for item in items:
+            try:
+                samples.append(json.loads(item))
+            except ValueError:
+                pass
+
+        return(samples)
+
+    def depth(self):
+        return(self.redis.llen(IngestKey.Incoming))
+
+    def record_flush(self, size, seconds, failed=False):
+        pipe = self.redis.pipeline(transaction=False)
+        if failed:
+            pipe.hincrby(IngestKey.Metrics, IngestMetricKey.FlushErrors, 1)
+            pipe.hincrby(IngestKey.Metrics, IngestMetricKey.Lost, size)
+        else:
+            pipe.hincrby(IngestKey.Metrics, IngestMetricKey.Flushed, size)
+            pipe.hincrby(IngestKey.Metrics, IngestMetricKey.Flushes, 1)
+            pipe.hmset(
+                IngestKey.Metrics,
+                {
+                    IngestMetricKey.LastFlush: int(time()),
+                    IngestMetricKey.LastFlushSize: size,
+                    IngestMetricKey.LastFlushSeconds: round(seconds, 3),
+                }
+            )
+        pipe.execute()
+
+    def record_invalid(self, count):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hincrby(IngestKey.Metrics, IngestMetricKey.Invalid, count)
+        pipe.hincrby(IngestKey.Metrics, IngestMetricKey.Lost, count)
+        pipe.execute()
+
+
+_queue = None
+
+
+def queue_sample(agent_id, memory, cpu, file_system, timestamp=None):
+    """Queues the sample an agent reported, see IngestQueue.push."""
+    global _queue
+    if not _queue:
+        _queue = IngestQueue()
+
+    return(_queue.push(agent_id, memory, cpu, file_system, timestamp))
+
+
+def ingest_metrics(connection=None):
+    """Returns the counters of the ingestion buffer with its current
+    depth and capacity.
+    """
+    connection = connection or ingest_redis()
+    pipe = connection.pipeline(transaction=False)
+    pipe.llen(IngestKey.Incoming)
+    pipe.hgetall(IngestKey.Metrics)
+    depth, counters = pipe.execute()
+
+    metrics = {
+        IngestMetricKey.Depth: depth,
+        IngestMetricKey.Capacity: MAX_QUEUED,
+        IngestMetricKey.Policy: OVERFLOW_POLICY,
+    }
+    for key, value in counters.items():
+        try:
+            metrics[key] = int(value)
+        except ValueError:
+            metrics[key] = float(value)
+
+    return(metrics)
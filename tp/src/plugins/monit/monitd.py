@@ -0,0 +1,140 @@
+"""
+Monit ingestion daemon.
+
+Pops the samples the listener queued (see plugins/monit/ingest.py) and
+writes them with save_agent_samples, once FLUSH_SIZE samples are
+buffered or FLUSH_INTERVAL seconds after the first buffered sample
+arrived. Samples that are not shaped like valid_sample expects are
+skipped one by one, a batch that fails to write is retried once and then
+dropped, both are counted as lost in the ingest metrics. Every batch is
+evaluated against the monitoring notification rules, see
+notifications/thresholds.py.
+"""
+import signal
+import logging
+from time import time, sleep
+
+import tornado.options
+from tornado.options import define, options
+
+from vFense.plugins.monit import save_agent_samples, valid_sample
+from vFense.plugins.monit.ingest import IngestQueue, SampleKey, \
+    FLUSH_SIZE, FLUSH_INTERVAL
+from vFense.notifications.thresholds import ThresholdAlerter
+from vFense.logger.logsetup import configure_logging
+from emailer.mailer import MailClientPool
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+define("flush_size", default=FLUSH_SIZE,
+       help="samples written per batch", type=int)
+define("flush_interval", default=FLUSH_INTERVAL,
+       help="seconds a sample waits for its batch to fill", type=int)
+
+
+class MonitDaemon():
+
+    def __init__(self, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.queue = IngestQueue()
+        self.mail_pool = MailClientPool()
+        self.alerter = ThresholdAlerter(self.mail_pool)
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.first_buffered = None
+        self.running = True
+
+    def _samples(self):
+        samples = []
+        invalid = 0
+        for sample in self.buffer:
+            try:
+                sample = (
+                    sample[SampleKey.AgentId], sample[SampleKey.Memory],
+                    sample[SampleKey.Cpu], sample[SampleKey.FileSystem],
+                    int(sample[SampleKey.Timestamp])
+                )
+            except (KeyError, TypeError, ValueError):
+                invalid += 1
+                continue
+
+            if valid_sample(*sample[1:4]):
+                samples.append(sample)
+            else:
+                invalid += 1
+
+        if invalid:
+            logger.warn('skipped %d invalid monit samples' % (invalid))
+            self.queue.record_invalid(invalid)
+
+        return(samples)
+
+    def flush(self):
+        samples = self._samples()
+        self.buffer = []
+        self.first_buffered = None
+        if not samples:
+            return
+
+        try:
+            self.alerter.process(samples)
+
+        except Exception as e:
+            logger.exception(e)
+
+        for attempt in range(2):
+            began = time()
+            try:
+                save_agent_samples(samples)
+                self.queue.record_flush(len(samples), time() - began)
+                return
+
+            except Exception as e:
+                logger.exception(e)
+
+        logger.error('dropped a batch of %d monit samples' % (len(samples)))
+        self.queue.record_flush(len(samples), 0, failed=True)
+
+    def _flush_due(self):
+        return(
+            len(self.buffer) >= self.flush_size
+            or (
+                self.first_buffered
+                and time() - self.first_buffered >= self.flush_interval
+            )
+        )
+
+    def stop(self, *args):
+        self.running = False
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        logger.info('Monit daemon started')
+        while self.running:
+            try:
+                samples = (
+                    self.queue.pop(self.flush_size - len(self.buffer))
+                )
+                if samples and not self.buffer:
+                    self.first_buffered = time()
+                self.buffer.extend(samples)
+
+                if self._flush_due():
+                    self.flush()
+
+            except Exception as e:
+                logger.exception(e)
+                sleep(1)
+
+        self.flush()
+        self.mail_pool.close()
+        logger.info('Monit daemon has shutdown')
+
+
+if __name__ == '__main__':
+    tornado.options.parse_command_line()
+    MonitDaemon(
+        flush_size=options.flush_size, flush_interval=options.flush_interval
+    ).run()
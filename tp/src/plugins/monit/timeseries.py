@@ -0,0 +1,397 @@
+"""
+Time series storage of the monit plugin.
+
+Every collection (monit_mem, monit_cpu, monit_fs) holds the samples the
+agents report every minute, next to it there are rollup tables with one
+point per agent every 15 minutes (monit_mem_15m) and every hour
+(monit_mem_1h). A rollup point has the min, avg and max of every numeric
+field of the points it covers.
+
+Retention is a ring buffer per agent: the id of a point is the agent id
+and the slot (bucket % RETENTION) it falls in, so a new point replaces
+the one written RETENTION buckets ago, nothing ever has to be deleted.
+Points are written with one insert per table for any number of agents,
+and range queries use between on the (agent id, timestamp) index.
+
+run_rollups is a periodic task of the scheduler daemon, see
+vFense.scheduler.periodic.
+"""
+import time
+import logging
+
+from vFense.db.client import db_create_close, r
+from vFense.plugins.monit._db import Collection, CollectionKeys, Master
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+
+class Resolution():
+    Minute = 60
+    FifteenMinutes = 900
+    Hour = 3600
+
+
+class SeriesKey():
+    Id = CollectionKeys.Id
+    AgentId = CollectionKeys.AgentId
+    Timestamp = CollectionKeys.Timestamp
+    Data = CollectionKeys.Data
+    Count = 'n'
+    Min = 'min'
+    Avg = 'avg'
+    Max = 'max'
+
+
+class SeriesIndexes():
+    AgentIdAndTimestamp = 'aid_and_ts'
+    Timestamp = 'ts'
+
+
+COLLECTIONS = (Collection.Memory, Collection.Cpu, Collection.FileSystem)
+
+# Points kept per agent: two days of minutes, a month of 15 minutes and
+# a year of hours.
+RETENTION = {
+    Resolution.Minute: int(Master.MaxEntriesValue),
+    Resolution.FifteenMinutes: 2880,
+    Resolution.Hour: 8760,
+}
+
+# Source and target resolution of every rollup.
+ROLLUPS = (
+    (Resolution.Minute, Resolution.FifteenMinutes),
+    (Resolution.FifteenMinutes, Resolution.Hour),
+)
+
+TABLE_SUFFIX = {
+    Resolution.Minute: '',
+    Resolution.FifteenMinutes: '_15m',
+    Resolution.Hour: '_1h',
+}
+
+WRITE_BATCH = 1000
+
+
+def series_table(collection, resolution=Resolution.Minute):
+    return(collection + TABLE_SUFFIX[resolution])
+
+
+def slot_id(agent_id, timestamp, resolution=Resolution.Minute):
+    bucket = int(timestamp) // resolution
+
+    return('%s:%d' % (agent_id, bucket % RETENTION[resolution]))
+
+
+def make_point(agent_id, timestamp, data, resolution=Resolution.Minute):
+    timestamp = int(timestamp) // resolution * resolution
+
+    return(
+        {
+            SeriesKey.Id: slot_id(agent_id, timestamp, resolution),
+            SeriesKey.AgentId: agent_id,
+            SeriesKey.Timestamp: timestamp,
+            SeriesKey.Data: data,
+        }
+    )
+
+
+def create_series_tables(conn):
+    """Creates the tables and indexes of every collection and
+    resolution that do not exist yet.
+    """
+    tables = r.table_list().run(conn)
+    for collection in COLLECTIONS:
+        for resolution in RETENTION.keys():
+            table = series_table(collection, resolution)
+            if table not in tables:
+                r.table_create(table).run(conn)
+
+            indexes = r.table(table).index_list().run(conn)
+            if SeriesIndexes.AgentIdAndTimestamp not in indexes:
+                r.table(table).index_create(
+                    SeriesIndexes.AgentIdAndTimestamp, lambda x: [
+                        x[SeriesKey.AgentId], x[SeriesKey.Timestamp]]
+                ).run(conn)
+
+            if SeriesIndexes.Timestamp not in indexes:
+                r.table(table).index_create(
+                    SeriesIndexes.Timestamp
+                ).run(conn)
+
+
+def _write_points(table, points, conn):
+    written = 0
+    for start in xrange(0, len(points), WRITE_BATCH):
+        result = (
+            r
+            .table(table)
+            .insert(points[start:start + WRITE_BATCH], upsert=True)
+            .run(conn)
+        )
+        written += result.get('inserted', 0) + result.get('replaced', 0)
+
+    return(written)
+
+
+@db_create_close
+def save_points(collection, points, resolution=Resolution.Minute,
+                conn=None):
+    """Writes the points of any number of agents.
+
+    Args:
+        collection: A monit Collection.
+        points: List of (agent_id, timestamp, data) tuples.
+
+    Returns:
+        The number of points written.
+    """
+    if not points:
+        return(0)
+
+    return(
+        _write_points(
+            series_table(collection, resolution),
+            [make_point(*point, resolution=resolution) for point in points],
+            conn
+        )
+    )
+
+
+@db_create_close
+def save_samples(samples, conn=None):
+    """Writes the points of several collections over one connection.
+
+    Args:
+        samples: Dictionary of monit Collection to a list of
+            (agent_id, timestamp, data) tuples.
+
+    Returns:
+        The number of points written.
+    """
+    written = 0
+    for collection, points in samples.items():
+        if points:
+            written += _write_points(
+                series_table(collection),
+                [make_point(*point) for point in points],
+                conn
+            )
+
+    return(written)
+
+
+def pick_resolution(start, end):
+    """Returns the finest resolution that still holds all of start to
+    end.
+    """
+    span = int(end) - int(start)
+    for resolution in sorted(RETENTION.keys()):
+        if span <= resolution * RETENTION[resolution]:
+            return(resolution)
+
+    return(Resolution.Hour)
+
+
+@db_create_close
+def get_points(collection, agent_id, start, end=None, resolution=None,
+               conn=None):
+    """Returns the points of an agent from start to end, oldest first.
+
+    Args:
+        collection: A monit Collection.
+        agent_id: The agent id the points belong to.
+        start: Unix timestamp.
+
+    Kwargs:
+        end: Unix timestamp, now when None.
+        resolution: A Resolution, the finest that holds the whole range
+            when None.
+    """
+    end = int(end or time.time())
+    start = int(start)
+    if not resolution:
+        resolution = pick_resolution(start, end)
+
+    points = list(
+        r
+        .table(series_table(collection, resolution))
+        .between(
+            [agent_id, start], [agent_id, end + 1],
+            index=SeriesIndexes.AgentIdAndTimestamp
+        )
+        .run(conn)
+    )
+    points.sort(key=lambda point: point[SeriesKey.Timestamp])
+
+    return(points)
+
+
+def _numeric_values(data, path=()):
+    """Yields (path, float) for every numeric value of a sample. File
+    systems are lists, their entries are keyed by name.
+    """
+    if isinstance(data, dict):
+        items = data.items()
+
+    elif isinstance(data, list):
+        items = []
+        for i, value in enumerate(data):
+            key = i
+            if isinstance(value, dict):
+                key = value.get('name', value.get('mount', i))
+            items.append((key, value))
+
+    else:
+        try:
+            yield (path, float(data))
+        except (TypeError, ValueError):
+            pass
+        return
+
+    for key, value in items:
+        for item in _numeric_values(value, path + (unicode(key),)):
+            yield item
+
+
+def _is_summary(value):
+    return(
+        isinstance(value, dict)
+        and set(value.keys()) == set([SeriesKey.Min, SeriesKey.Avg,
+                                      SeriesKey.Max])
+    )
+
+
+def _summaries(data, path=()):
+    """Yields (path, summary) for every summary of a rollup point."""
+    for key, value in data.items():
+        if _is_summary(value):
+            yield (path + (key,), value)
+        elif isinstance(value, dict):
+            for item in _summaries(value, path + (key,)):
+                yield item
+
+
+class _Aggregate(object):
+    __slots__ = ('minimum', 'maximum', 'total', 'count')
+
+    def __init__(self):
+        self.minimum = None
+        self.maximum = None
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, minimum, average, maximum, count=1):
+        if self.minimum is None or minimum < self.minimum:
+            self.minimum = minimum
+        if self.maximum is None or maximum > self.maximum:
+            self.maximum = maximum
+        self.total += average * count
+        self.count += count
+
+    def summary(self):
+        return(
+            {
+                SeriesKey.Min: self.minimum,
+                SeriesKey.Avg: self.total / self.count,
+                SeriesKey.Max: self.maximum,
+            }
+        )
+
+
+class RollupBuilder(object):
+    """Summarizes the points of many agents into one point per agent."""
+
+    def __init__(self):
+        self.agents = {}
+        self.counts = {}
+
+    def add(self, point, source_resolution=Resolution.Minute):
+        agent_id = point[SeriesKey.AgentId]
+        fields = self.agents.setdefault(agent_id, {})
+        if source_resolution == Resolution.Minute:
+            count = 1
+            for path, value in _numeric_values(point[SeriesKey.Data]):
+                fields.setdefault(path, _Aggregate()).add(value, value, value)
+        else:
+            count = point.get(SeriesKey.Count, 1)
+            for path, summary in _summaries(point[SeriesKey.Data]):
+                fields.setdefault(path, _Aggregate()).add(
+                    summary[SeriesKey.Min], summary[SeriesKey.Avg],
+                    summary[SeriesKey.Max], count
+                )
+
+        self.counts[agent_id] = self.counts.get(agent_id, 0) + count
+
+    def points(self, timestamp, resolution):
+        for agent_id, fields in self.agents.iteritems():
+            data = {}
+            for path, aggregate in fields.iteritems():
+                node = data
+                for key in path[:-1]:
+                    node = node.setdefault(key, {})
+                node[path[-1]] = aggregate.summary()
+
+            point = make_point(agent_id, timestamp, data, resolution)
+            point[SeriesKey.Count] = self.counts[agent_id]
+            yield point
+
+
+@db_create_close
+def rollup(collection, source_resolution, target_resolution, bucket_start,
+           conn=None):
+    """Rolls the source points of one target bucket up, for every agent.
+
+    Returns:
+        The number of rollup points written.
+    """
+    bucket_start = int(bucket_start) // target_resolution * target_resolution
+    builder = RollupBuilder()
+    source = (
+        r
+        .table(series_table(collection, source_resolution))
+        .between(
+            bucket_start, bucket_start + target_resolution,
+            index=SeriesIndexes.Timestamp
+        )
+        .run(conn)
+    )
+    for point in source:
+        builder.add(point, source_resolution)
+
+    return(
+        _write_points(
+            series_table(collection, target_resolution),
+            list(builder.points(bucket_start, target_resolution)),
+            conn
+        )
+    )
+
+
+def run_rollups(period_start):
+    """Periodic task, runs every 15 minutes with the start of the period
+    that just began. Rolls the minutes of the previous 15 minutes up, and
+    the previous hour as well once an hour.
+    """
+    period_start = int(period_start)
+    for source_resolution, target_resolution in ROLLUPS:
+        if period_start % target_resolution:
+            continue
+
+        bucket_start = period_start - target_resolution
+        for collection in COLLECTIONS:
+            try:
+                written = (
+                    rollup(
+                        collection, source_resolution,
+                        target_resolution, bucket_start
+                    )
+                )
+                logger.info(
+                    '%s rolled up to %d second points at %d for %d agents'
+                    % (collection, target_resolution, bucket_start, written)
+                )
+
+            except Exception as e:
+                logger.exception(e)
@@ -5,7 +5,6 @@ import simplejson as json
 
 from vFense.server.handlers import BaseHandler
 import logging
-import logging.config
 
 from vFense.errorz.error_messages import GenericResults, PackageResults
 
@@ -23,8 +22,9 @@ from vFense.plugins.patching.search.search_by_agentid import RetrieveAgentAppsBy
 from vFense.plugins.patching.search.search_by_tagid import RetrieveAgentAppsByTagId
 from vFense.plugins.patching.search.search_by_appid import RetrieveAgentAppsByAppId, \
     RetrieveAgentsByAgentAppId
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -95,8 +95,7 @@ class AgentIdAgentAppsHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
 
     @authenticated_request
@@ -128,8 +127,7 @@ class AgentIdAgentAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and app_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -163,8 +161,7 @@ class AgentIdAgentAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
     @authenticated_request
     @permission_check(permission=Permission.Install)
@@ -195,8 +192,7 @@ class AgentIdAgentAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and app_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -228,8 +224,7 @@ class AgentIdAgentAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class TagIdAgentAppsHandler(BaseHandler):
@@ -294,8 +289,7 @@ class TagIdAgentAppsHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
 
     @authenticated_request
@@ -327,8 +321,7 @@ class TagIdAgentAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and app_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -361,8 +354,7 @@ class TagIdAgentAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
     @authenticated_request
     @permission_check(permission=Permission.Install)
@@ -393,8 +385,7 @@ class TagIdAgentAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and app_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -426,8 +417,7 @@ class TagIdAgentAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class AppIdAgentAppsHandler(BaseHandler):
@@ -445,8 +435,7 @@ class AppIdAgentAppsHandler(BaseHandler):
         )
         results = patches.get_by_app_id(stats=True)
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
     @authenticated_request
     @convert_json_to_arguments
@@ -472,8 +461,7 @@ class AppIdAgentAppsHandler(BaseHandler):
                     ).object_updated(app_id, 'app severity', [sev_data])
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             else:
                 results = (
@@ -482,8 +470,7 @@ class AppIdAgentAppsHandler(BaseHandler):
                     ).invalid_severity(severity)
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
         except Exception as e:
             results = (
@@ -493,8 +480,7 @@ class AppIdAgentAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
     @authenticated_request
@@ -526,8 +512,7 @@ class AppIdAgentAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and agent_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -561,8 +546,7 @@ class AppIdAgentAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
     @authenticated_request
@@ -594,8 +578,7 @@ class AppIdAgentAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and agent_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -627,8 +610,7 @@ class AppIdAgentAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class GetAgentsByAgentAppIdHandler(BaseHandler):
@@ -671,8 +653,7 @@ class GetAgentsByAgentAppIdHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
 
     @authenticated_request
@@ -704,8 +685,7 @@ class GetAgentsByAgentAppIdHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and agent_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -738,8 +718,7 @@ class GetAgentsByAgentAppIdHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
     @authenticated_request
@@ -771,8 +750,7 @@ class GetAgentsByAgentAppIdHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and agent_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -805,8 +783,7 @@ class GetAgentsByAgentAppIdHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class AgentAppsHandler(BaseHandler):
@@ -883,8 +860,7 @@ class AgentAppsHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
     @authenticated_request
     @convert_json_to_arguments
@@ -905,8 +881,7 @@ class AgentAppsHandler(BaseHandler):
             )
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             logger.exception(e)
@@ -917,5 +892,4 @@ class AgentAppsHandler(BaseHandler):
             )
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
@@ -1,11 +1,8 @@
 import tornado.httpserver
 import tornado.web
 
-import simplejson as json
-
 from vFense.server.handlers import BaseHandler
 import logging
-import logging.config
 
 from vFense.plugins.patching import *
 from vFense.errorz.error_messages import GenericResults, PackageResults
@@ -15,8 +12,9 @@ from vFense.server.hierarchy.manager import get_current_customer_name
 from vFense.server.hierarchy.decorators import authenticated_request, permission_check
 from vFense.server.hierarchy.decorators import convert_json_to_arguments
 from vFense.server.hierarchy.permissions import Permission
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -29,8 +27,7 @@ class FileInfoHandler(BaseHandler):
         method = self.request.method
         try:
             results = get_all_file_data()
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -40,6 +37,5 @@ class FileInfoHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
@@ -5,7 +5,6 @@ import simplejson as json
 
 from vFense.server.handlers import BaseHandler
 import logging
-import logging.config
 
 from vFense.errorz.error_messages import GenericResults, PackageResults
 
@@ -25,8 +24,12 @@ from vFense.plugins.patching.search.search_by_appid import RetrieveCustomAppsByA
     RetrieveAgentsByCustomAppId
 from vFense.plugins.patching.custom_apps.uploaded.uploader import gen_uuid, \
     move_packages, store_package_info_in_db
+from vFense.plugins.patching.custom_apps.uploaded.chunked import \
+    ChunkedUpload, UploadOffsetMismatch, UploadHashMismatch, UploadError, \
+    parse_content_range, MAX_CHUNK_SIZE
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -43,8 +46,7 @@ class GetThirdPartyUuidHandler(BaseHandler):
                 username, uri, method
             ).information_retrieved(data, 0)
         )
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
 
 class ThirdPartyPackageUploadHandler(BaseHandler):
@@ -70,8 +72,7 @@ class ThirdPartyPackageUploadHandler(BaseHandler):
                 )
             )
 
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class ThirdPartyUploadHandler(BaseHandler):
@@ -108,8 +109,134 @@ class ThirdPartyUploadHandler(BaseHandler):
             )
         )
 
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
+
+
+@tornado.web.stream_request_body
+class ThirdPartyChunkUploadHandler(BaseHandler):
+    """
+    PUT /api/v1/apps/custom/upload/chunk/<uuid>?name=<file name>[&md5=]
+    with a "Content-Range: bytes start-end/total" header per chunk.
+    GET returns the offset to resume from.
+    """
+
+    def prepare(self):
+        self.upload = None
+        if self.request.method != 'PUT':
+            return
+
+        if not self.current_user:
+            raise tornado.web.HTTPError(403)
+
+        username = self.get_current_user()
+        uri = self.request.uri
+        method = self.request.method
+        uuid = self.path_args[0]
+        content_range = (
+            parse_content_range(self.request.headers.get('Content-Range'))
+        )
+        upload = (
+            ChunkedUpload(
+                uuid, name=self.get_argument('name', None),
+                size=content_range[2] if content_range else None,
+                md5=self.get_argument('md5', None)
+            )
+        )
+        if not content_range or not upload.name:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).incorrect_arguments()
+            )
+            self._write_results(results)
+            return
+
+        try:
+            upload.begin(content_range[0], content_range[1])
+            self.request.connection.set_max_body_size(MAX_CHUNK_SIZE)
+            self.upload = upload
+
+        except UploadOffsetMismatch as e:
+            results = (
+                PackageResults(
+                    username, uri, method
+                ).chunk_offset_mismatch(uuid, e.offset)
+            )
+            self._write_results(results)
+
+    def data_received(self, chunk):
+        if self.upload:
+            self.upload.write(chunk)
+
+    def _write_results(self, results):
+        self.set_status(results['http_status'])
+        self.write_json(results)
+        self.finish()
+
+    def on_connection_close(self):
+        if self.upload:
+            self.upload.close()
+
+    @authenticated_request
+    def get(self, uuid):
+        username = self.get_current_user()
+        uri = self.request.uri
+        method = self.request.method
+        upload = ChunkedUpload(uuid).status()
+        results = (
+            PackageResults(
+                username, uri, method
+            ).chunk_received(uuid, upload)
+        )
+        self._write_results(results)
+
+    @authenticated_request
+    def put(self, uuid):
+        username = self.get_current_user()
+        uri = self.request.uri
+        method = self.request.method
+        try:
+            upload = self.upload.end()
+            if upload['completed']:
+                results = (
+                    GenericResults(
+                        username, uri, method
+                    ).file_uploaded(upload['name'], [upload])
+                )
+
+            else:
+                results = (
+                    PackageResults(
+                        username, uri, method
+                    ).chunk_received(uuid, upload)
+                )
+
+        except UploadHashMismatch as e:
+            results = (
+                PackageResults(
+                    username, uri, method
+                ).hash_not_verified(uuid, e)
+            )
+            logger.error(results['message'])
+
+        except UploadError as e:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).file_failed_to_upload(uuid, e)
+            )
+            logger.error(results['message'])
+
+        except Exception as e:
+            self.upload.abort()
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).file_failed_to_upload(uuid, e)
+            )
+            logger.exception(e)
+
+        self._write_results(results)
 
 
 class AgentIdCustomAppsHandler(BaseHandler):
@@ -179,8 +306,7 @@ class AgentIdCustomAppsHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
 
     @authenticated_request
@@ -212,8 +338,7 @@ class AgentIdCustomAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and app_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -247,8 +372,7 @@ class AgentIdCustomAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
     @authenticated_request
     @permission_check(permission=Permission.Install)
@@ -279,8 +403,7 @@ class AgentIdCustomAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and app_ids:
                 sched = self.application.scheduler
@@ -312,8 +435,7 @@ class AgentIdCustomAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class TagIdCustomAppsHandler(BaseHandler):
@@ -378,8 +500,7 @@ class TagIdCustomAppsHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
 
     @authenticated_request
@@ -411,8 +532,7 @@ class TagIdCustomAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and app_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -446,8 +566,7 @@ class TagIdCustomAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
     @authenticated_request
     @permission_check(permission=Permission.Install)
@@ -478,8 +597,7 @@ class TagIdCustomAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and app_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -511,8 +629,7 @@ class TagIdCustomAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class AppIdCustomAppsHandler(BaseHandler):
@@ -530,8 +647,7 @@ class AppIdCustomAppsHandler(BaseHandler):
         )
         results = patches.get_by_app_id(stats=True)
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
     @authenticated_request
     @convert_json_to_arguments
@@ -560,8 +676,7 @@ class AppIdCustomAppsHandler(BaseHandler):
                         ).object_updated(app_id, 'app severity', [sev_data])
                     )
                     self.set_status(results['http_status'])
-                    self.set_header('Content-Type', 'application/json')
-                    self.write(json.dumps(results, indent=4))
+                    self.write_json(results)
 
                 else:
                     results = (
@@ -570,8 +685,7 @@ class AppIdCustomAppsHandler(BaseHandler):
                         ).invalid_severity(severity)
                     )
                     self.set_status(results['http_status'])
-                    self.set_header('Content-Type', 'application/json')
-                    self.write(json.dumps(results, indent=4))
+                    self.write_json(results)
 
             elif install_options:
                 install_options_hash = (
@@ -589,8 +703,7 @@ class AppIdCustomAppsHandler(BaseHandler):
                 )
 
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
 
         except Exception as e:
@@ -601,8 +714,7 @@ class AppIdCustomAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
     @authenticated_request
@@ -634,8 +746,7 @@ class AppIdCustomAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and agent_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -669,8 +780,7 @@ class AppIdCustomAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
     @authenticated_request
@@ -702,8 +812,7 @@ class AppIdCustomAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and agent_ids:
                 sched = self.application.scheduler
@@ -735,8 +844,7 @@ class AppIdCustomAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class GetAgentsByCustomAppIdHandler(BaseHandler):
@@ -779,8 +887,7 @@ class GetAgentsByCustomAppIdHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
 
     @authenticated_request
@@ -812,8 +919,7 @@ class GetAgentsByCustomAppIdHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and agent_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -847,8 +953,7 @@ class GetAgentsByCustomAppIdHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
     @authenticated_request
@@ -880,8 +985,7 @@ class GetAgentsByCustomAppIdHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and agent_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -913,8 +1017,7 @@ class GetAgentsByCustomAppIdHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 
@@ -993,8 +1096,7 @@ class CustomAppsHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
     @authenticated_request
     @convert_json_to_arguments
@@ -1015,8 +1117,7 @@ class CustomAppsHandler(BaseHandler):
             )
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             logger.exception(e)
@@ -1027,8 +1128,7 @@ class CustomAppsHandler(BaseHandler):
             )
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
     @authenticated_request
     @convert_json_to_arguments
@@ -1061,8 +1161,7 @@ class CustomAppsHandler(BaseHandler):
             )
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             logger.exception(e)
@@ -1073,5 +1172,4 @@ class CustomAppsHandler(BaseHandler):
             )
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
@@ -1,15 +1,13 @@
 import tornado.httpserver
 import tornado.web
 
-import simplejson as json
-
 from vFense.server.handlers import BaseHandler
 import logging
-import logging.config
 
 from vFense.agent import *
 from vFense.agent.agent_searcher import AgentSearcher
-from vFense.agent.agent_handler import AgentManager
+from vFense.agent.agent_handler import AgentManager, BulkAgentManager
+from vFense.agent.bulk import purge_progress, PurgeJobKey
 from vFense.errorz.error_messages import GenericResults
 
 from vFense.plugins.patching.store_operations import StoreOperation
@@ -22,11 +20,12 @@ from vFense.server.hierarchy.decorators import authenticated_request, permission
 from vFense.server.hierarchy.decorators import convert_json_to_arguments
 
 from vFense.scheduler.jobManager import job_scheduler
+from vFense.logger.logsetup import configure_logging
 
 
 #from server.handlers import *
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -44,8 +43,7 @@ class FetchValidProductionLevels(BaseHandler):
                 ).information_retrieved(data, len(data))
             )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -55,8 +53,7 @@ class FetchValidProductionLevels(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class FetchSupportedOperatingSystems(BaseHandler):
@@ -80,8 +77,7 @@ class FetchSupportedOperatingSystems(BaseHandler):
                 ).information_retrieved(data, len(data))
             )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -91,8 +87,7 @@ class FetchSupportedOperatingSystems(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class AgentsHandler(BaseHandler):
@@ -154,8 +149,7 @@ class AgentsHandler(BaseHandler):
                 results = agent.query_agents_by_mac_and_filter(mac, filter_key, filter_val)
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -165,8 +159,7 @@ class AgentsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
     @authenticated_request
     @convert_json_to_arguments
@@ -177,25 +170,23 @@ class AgentsHandler(BaseHandler):
         method = self.request.method
         try:
             agent_ids = self.arguments.get('agent_ids')
+            tag_id = self.arguments.get('tag_id')
             new_customer = self.arguments.get('customer_name')
-            if not isinstance(agent_ids, list):
+            if agent_ids and not isinstance(agent_ids, list):
                 agent_ids = agent_ids.split()
-            agentids_moved =[]
-            agentids_not_moved =[]
-            for agent_id in agent_ids:
-                agent = AgentManager(agent_id, customer_name=customer_name)
-                results = agent.change_customer(new_customer, uri, method)
-                if results['http_status'] == 200:
-                    agentids_moved.append(agent_id)
-                else:
-                    agentids_not_moved.append(agent_id)
-            results['data'] = {
-                'agentids_moved': agentids_moved,
-                'agentids_not_moved': agentids_not_moved
-            }
+            agents = (
+                BulkAgentManager(
+                    customer_name=customer_name, username=username
+                )
+            )
+            results = (
+                agents.change_customer(
+                    new_customer, agent_ids=agent_ids, tag_id=tag_id,
+                    uri=uri, method=method
+                )
+            )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -205,8 +196,7 @@ class AgentsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
     @authenticated_request
@@ -218,30 +208,29 @@ class AgentsHandler(BaseHandler):
         method = self.request.method
         try:
             agent_ids = self.arguments.get('agent_ids')
-            if not isinstance(agent_ids, list):
+            tag_id = self.arguments.get('tag_id')
+            if agent_ids and not isinstance(agent_ids, list):
                 agent_ids = agent_ids.split()
-            agentids_deleted =[]
-            agentids_not_deleted =[]
-            for agent_id in agent_ids:
-                agent = AgentManager(agent_id, customer_name=customer_name)
-                results = agent.delete_agent(uri, method)
-                if results['http_status'] == 200:
-                    delete_oper = (
-                        StoreOperation(
-                            username, customer_name, uri, method
-                        )
+            agents = (
+                BulkAgentManager(
+                    customer_name=customer_name, username=username
+                )
+            )
+            results = (
+                agents.delete_agents(
+                    agent_ids=agent_ids, tag_id=tag_id, uri=uri, method=method
+                )
+            )
+            if results['http_status'] == 200:
+                delete_oper = (
+                    StoreOperation(
+                        username, customer_name, uri, method
                     )
+                )
+                for agent_id in results['data']['agentids_deleted']:
                     delete_oper.uninstall_agent(agent_id)
-                    agentids_deleted.append(agent_id)
-                else:
-                    agentids_not_deleted.append(agent_id)
-            results['data'] = {
-                'agentids_deleted': agentids_deleted,
-                'agentids_not_deleted': agentids_not_deleted
-            }
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -251,8 +240,44 @@ class AgentsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
+
+
+class AgentPurgeHandler(BaseHandler):
+    @authenticated_request
+    def get(self, job_id):
+        username = self.get_current_user()
+        customer_name = get_current_customer_name(username)
+        uri = self.request.uri
+        method = self.request.method
+        try:
+            progress = purge_progress(job_id)
+            if (progress and customer_name in (
+                    progress[PurgeJobKey.CustomerName],
+                    progress[PurgeJobKey.NewCustomer])):
+                results = (
+                    GenericResults(
+                        username, uri, method
+                    ).information_retrieved(progress, 1)
+                )
+
+            else:
+                results = (
+                    GenericResults(
+                        username, uri, method
+                    ).does_not_exists(job_id, 'agent purge')
+                )
+
+        except Exception as e:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).something_broke(job_id, 'agent purge', e)
+            )
+            logger.exception(e)
+
+        self.set_status(results['http_status'])
+        self.write_json(results)
 
 
 class AgentHandler(BaseHandler):
@@ -265,8 +290,7 @@ class AgentHandler(BaseHandler):
         try:
             agent = AgentManager(agent_id, customer_name=customer_name)
             results = agent.get_data(uri=uri, method=method)
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -276,8 +300,7 @@ class AgentHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
     @authenticated_request
     @convert_json_to_arguments
@@ -325,8 +348,7 @@ class AgentHandler(BaseHandler):
                 )
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -336,8 +358,7 @@ class AgentHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
     @authenticated_request
     def delete(self, agent_id):
@@ -351,8 +372,7 @@ class AgentHandler(BaseHandler):
             delete_oper.uninstall_agent(agent_id)
             results = agent.delete_agent(uri, method)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -362,8 +382,7 @@ class AgentHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
     @authenticated_request
     @convert_json_to_arguments
@@ -402,8 +421,7 @@ class AgentHandler(BaseHandler):
                 )
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -413,8 +431,7 @@ class AgentHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 
@@ -438,6 +455,5 @@ class NodeWolHandler(BaseHandler):
                     ('Arguments needed are: nodeid')
                 }
         self.session.close()
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 '''
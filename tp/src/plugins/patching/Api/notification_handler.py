@@ -1,12 +1,10 @@
 import logging
-import logging.config
 
 import tornado.httpserver
 import tornado.web
 
 from vFense.errorz.error_messages import GenericResults, NotificationResults
 from vFense.notifications import *
-import simplejson as json
 
 from vFense.server.handlers import BaseHandler
 
@@ -17,8 +15,9 @@ from vFense.server.hierarchy.decorators import authenticated_request, permission
 from vFense.server.hierarchy.decorators import convert_json_to_arguments
 from vFense.notifications.search_alerts import AlertSearcher
 from vFense.notifications.alerts import Notifier, get_valid_fields, get_all_notifications
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 class GetAllValidFieldsForNotifications(BaseHandler):
@@ -31,8 +30,7 @@ class GetAllValidFieldsForNotifications(BaseHandler):
                 customer_name=customer_name
             )
         )
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class NotificationsHandler(BaseHandler):
@@ -50,8 +48,7 @@ class NotificationsHandler(BaseHandler):
                 )
             )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -61,8 +58,7 @@ class NotificationsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
     @convert_json_to_arguments
@@ -87,6 +83,9 @@ class NotificationsHandler(BaseHandler):
                 self.arguments.get('monitoring_threshold', None)
             )
             file_systems = self.arguments.get('file_system', [])
+            threshold_duration = (
+                self.arguments.get('threshold_duration', None)
+            )
             notification = (
                 Notifier(
                     username, customer_name,
@@ -114,6 +113,7 @@ class NotificationsHandler(BaseHandler):
                     NotificationKeys.MemThreshold: None,
                     NotificationKeys.FileSystemThreshold: None,
                     NotificationKeys.FileSystem: file_systems,
+                    NotificationKeys.ThresholdDuration: threshold_duration,
                 }
             )
             if rv_threshold:
@@ -171,8 +171,7 @@ class NotificationsHandler(BaseHandler):
                 )
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -182,8 +181,7 @@ class NotificationsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class NotificationHandler(BaseHandler):
@@ -197,8 +195,7 @@ class NotificationHandler(BaseHandler):
             alert = AlertSearcher(username, customer_name, uri, method)
             results = alert.get_notification(notification_id)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -208,8 +205,7 @@ class NotificationHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
     @authenticated_request
@@ -230,8 +226,7 @@ class NotificationHandler(BaseHandler):
                 notification.delete_alerting_rule(notification_id)
             )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -241,8 +236,7 @@ class NotificationHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
     @convert_json_to_arguments
@@ -267,6 +261,9 @@ class NotificationHandler(BaseHandler):
                 self.arguments.get('monitoring_threshold', None)
             )
             file_systems = self.arguments.get('file_system', [])
+            threshold_duration = (
+                self.arguments.get('threshold_duration', None)
+            )
             notification = (
                 Notifier(
                     username, customer_name,
@@ -295,6 +292,7 @@ class NotificationHandler(BaseHandler):
                     NotificationKeys.MemThreshold: None,
                     NotificationKeys.FileSystemThreshold: None,
                     NotificationKeys.FileSystem: file_systems,
+                    NotificationKeys.ThresholdDuration: threshold_duration,
                 }
             )
             if rv_threshold:
@@ -350,8 +348,7 @@ class NotificationHandler(BaseHandler):
                 )
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -361,5 +358,4 @@ class NotificationHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
@@ -6,7 +6,6 @@ import simplejson as json
 
 from vFense.server.handlers import BaseHandler
 import logging
-import logging.config
 
 from vFense.scheduler.jobManager import schedule_once
 
@@ -34,8 +33,9 @@ from vFense.server.hierarchy.manager import get_current_customer_name
 from vFense.server.hierarchy.decorators import authenticated_request, permission_check
 from vFense.server.hierarchy.decorators import convert_json_to_arguments
 from vFense.server.hierarchy.permissions import Permission
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -106,8 +106,7 @@ class AgentIdOsAppsHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
     @authenticated_request
     @permission_check(permission=Permission.Install)
@@ -138,8 +137,7 @@ class AgentIdOsAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and app_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -173,8 +171,7 @@ class AgentIdOsAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
     @authenticated_request
@@ -206,8 +203,7 @@ class AgentIdOsAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and app_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -241,8 +237,7 @@ class AgentIdOsAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class TagIdOsAppsHandler(BaseHandler):
@@ -312,8 +307,7 @@ class TagIdOsAppsHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
 
     @authenticated_request
@@ -345,8 +339,7 @@ class TagIdOsAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and app_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -380,8 +373,7 @@ class TagIdOsAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
     @authenticated_request
     @permission_check(permission=Permission.Install)
@@ -412,8 +404,7 @@ class TagIdOsAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and app_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -445,8 +436,7 @@ class TagIdOsAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class AppIdOsAppsHandler(BaseHandler):
@@ -464,8 +454,7 @@ class AppIdOsAppsHandler(BaseHandler):
         )
         results = patches.get_by_app_id(stats=True)
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
 
     @authenticated_request
@@ -492,8 +481,7 @@ class AppIdOsAppsHandler(BaseHandler):
                     ).object_updated(app_id, 'app severity', [sev_data])
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             else:
                 results = (
@@ -502,8 +490,7 @@ class AppIdOsAppsHandler(BaseHandler):
                     ).invalid_severity(severity)
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
         except Exception as e:
             results = (
@@ -513,8 +500,7 @@ class AppIdOsAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
     @authenticated_request
     @permission_check(permission=Permission.Install)
@@ -545,8 +531,7 @@ class AppIdOsAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and agent_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -580,8 +565,7 @@ class AppIdOsAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
     @authenticated_request
     @permission_check(permission=Permission.Install)
@@ -612,8 +596,7 @@ class AppIdOsAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and agent_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -645,8 +628,7 @@ class AppIdOsAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class GetAgentsByAppIdHandler(BaseHandler):
@@ -689,8 +671,7 @@ class GetAgentsByAppIdHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
 
     @authenticated_request
@@ -722,8 +703,7 @@ class GetAgentsByAppIdHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and agent_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -757,8 +737,7 @@ class GetAgentsByAppIdHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
     @authenticated_request
     @permission_check(permission=Permission.Install)
@@ -789,8 +768,7 @@ class GetAgentsByAppIdHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and agent_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -822,8 +800,7 @@ class GetAgentsByAppIdHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class OsAppsHandler(BaseHandler):
@@ -903,8 +880,7 @@ class OsAppsHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
     @authenticated_request
     @convert_json_to_arguments
@@ -924,8 +900,7 @@ class OsAppsHandler(BaseHandler):
             )
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             logger.exception(e)
@@ -936,5 +911,4 @@ class OsAppsHandler(BaseHandler):
             )
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
@@ -1,11 +1,8 @@
 import tornado.httpserver
 import tornado.web
 
-import simplejson as json
-
 from vFense.server.handlers import BaseHandler
 import logging
-import logging.config
 from vFense.db.client import *
 from vFense.utils.common import *
 from jsonpickle import encode
@@ -15,8 +12,9 @@ from vFense.plugins.patching.rv_db_calls import *
 from vFense.plugins.patching.stats import *
 from vFense.server.hierarchy.manager import get_current_customer_name
 from vFense.server.hierarchy.decorators import authenticated_request
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -36,8 +34,7 @@ class CustomerStatsByOsHandler(BaseHandler):
                 )
             )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
         except Exception as e:
             results = (
                 GenericResults(
@@ -46,8 +43,7 @@ class CustomerStatsByOsHandler(BaseHandler):
             )
             logger.exception(results)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class TagStatsByOsHandler(BaseHandler):
@@ -66,8 +62,7 @@ class TagStatsByOsHandler(BaseHandler):
                 )
             )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
         except Exception as e:
             results = (
                 GenericResults(
@@ -76,8 +71,7 @@ class TagStatsByOsHandler(BaseHandler):
             )
             logger.exception(results)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class WidgetHandler(BaseHandler):
@@ -95,8 +89,7 @@ class WidgetHandler(BaseHandler):
                 )
             )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
         except Exception as e:
             results = (
                 GenericResults(
@@ -105,8 +98,7 @@ class WidgetHandler(BaseHandler):
             )
             logger.exception(results)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class BarChartByAppIdByStatusHandler(BaseHandler):
@@ -116,8 +108,7 @@ class BarChartByAppIdByStatusHandler(BaseHandler):
         appid = self.get_argument('id', None)
         result = bar_chart_for_appid_by_status(app_id=appid,
                                               customer_name=customer_name)
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class OsAppsOverTimeHandler(BaseHandler):
@@ -144,8 +135,7 @@ class OsAppsOverTimeHandler(BaseHandler):
                 )
             )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -155,8 +145,7 @@ class OsAppsOverTimeHandler(BaseHandler):
             )
             logger.exception(results)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class AgentOsAppsOverTimeHandler(BaseHandler):
@@ -183,8 +172,7 @@ class AgentOsAppsOverTimeHandler(BaseHandler):
                 )
             )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -194,8 +182,7 @@ class AgentOsAppsOverTimeHandler(BaseHandler):
             )
             logger.exception(results)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class TagOsAppsOverTimeHandler(BaseHandler):
@@ -222,8 +209,7 @@ class TagOsAppsOverTimeHandler(BaseHandler):
                 )
             )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -233,8 +219,7 @@ class TagOsAppsOverTimeHandler(BaseHandler):
             )
             logger.exception(results)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 
@@ -254,8 +239,7 @@ class AgentPackageSeverityOverTimeHandler(BaseHandler):
                 customer_name=customer_name
             )
         )
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
 class TagPackageSeverityOverTimeHandler(BaseHandler):
     @authenticated_request
@@ -272,8 +256,7 @@ class TagPackageSeverityOverTimeHandler(BaseHandler):
                 customer_name=customer_name
             )
         )
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
 
 class TopAppsNeededHandler(BaseHandler):
@@ -292,8 +275,7 @@ class TopAppsNeededHandler(BaseHandler):
                 )
             )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -303,8 +285,7 @@ class TopAppsNeededHandler(BaseHandler):
             )
             logger.exception(results)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class RecentlyReleasedHandler(BaseHandler):
@@ -323,8 +304,7 @@ class RecentlyReleasedHandler(BaseHandler):
                 )
             )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -334,8 +314,7 @@ class RecentlyReleasedHandler(BaseHandler):
             )
             logger.exception(results)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class CustomerSeverityHandler(BaseHandler):
@@ -353,8 +332,7 @@ class CustomerSeverityHandler(BaseHandler):
                 )
             )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -364,8 +342,7 @@ class CustomerSeverityHandler(BaseHandler):
             )
             logger.exception(results)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class AgentSeverityHandler(BaseHandler):
@@ -383,8 +360,7 @@ class AgentSeverityHandler(BaseHandler):
                 )
             )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -394,8 +370,7 @@ class AgentSeverityHandler(BaseHandler):
             )
             logger.exception(results)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class TagSeverityHandler(BaseHandler):
@@ -413,8 +388,7 @@ class TagSeverityHandler(BaseHandler):
                 )
             )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -424,6 +398,5 @@ class TagSeverityHandler(BaseHandler):
             )
             logger.exception(results)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
@@ -5,7 +5,6 @@ import simplejson as json
 
 from vFense.server.handlers import BaseHandler
 import logging
-import logging.config
 
 from vFense.errorz.error_messages import GenericResults, PackageResults
 
@@ -23,8 +22,9 @@ from vFense.plugins.patching.search.search_by_agentid import RetrieveSupportedAp
 from vFense.plugins.patching.search.search_by_tagid import RetrieveSupportedAppsByTagId
 from vFense.plugins.patching.search.search_by_appid import RetrieveSupportedAppsByAppId, \
     RetrieveAgentsBySupportedAppId
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -95,8 +95,7 @@ class AgentIdSupportedAppsHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
 
     @authenticated_request
@@ -128,8 +127,7 @@ class AgentIdSupportedAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and app_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -163,8 +161,7 @@ class AgentIdSupportedAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
     @authenticated_request
@@ -196,8 +193,7 @@ class AgentIdSupportedAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and app_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -229,8 +225,7 @@ class AgentIdSupportedAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class TagIdSupportedAppsHandler(BaseHandler):
@@ -295,8 +290,7 @@ class TagIdSupportedAppsHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
 
     @authenticated_request
@@ -328,8 +322,7 @@ class TagIdSupportedAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and app_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -363,8 +356,7 @@ class TagIdSupportedAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
     @authenticated_request
     @permission_check(permission=Permission.Install)
@@ -395,8 +387,7 @@ class TagIdSupportedAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and app_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -428,8 +419,7 @@ class TagIdSupportedAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class AppIdSupportedAppsHandler(BaseHandler):
@@ -447,8 +437,7 @@ class AppIdSupportedAppsHandler(BaseHandler):
         )
         results = patches.get_by_app_id(stats=True)
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
     @authenticated_request
     @convert_json_to_arguments
@@ -474,8 +463,7 @@ class AppIdSupportedAppsHandler(BaseHandler):
                     ).object_updated(app_id, 'app severity', [sev_data])
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             else:
                 results = (
@@ -484,8 +472,7 @@ class AppIdSupportedAppsHandler(BaseHandler):
                     ).invalid_severity(severity)
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
         except Exception as e:
             results = (
@@ -495,8 +482,7 @@ class AppIdSupportedAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
     @authenticated_request
@@ -528,8 +514,7 @@ class AppIdSupportedAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and agent_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -564,8 +549,7 @@ class AppIdSupportedAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
     @authenticated_request
@@ -597,8 +581,7 @@ class AppIdSupportedAppsHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and agent_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -630,8 +613,7 @@ class AppIdSupportedAppsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 
@@ -675,8 +657,7 @@ class GetAgentsBySupportedAppIdHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
 
     @authenticated_request
@@ -708,8 +689,7 @@ class GetAgentsBySupportedAppIdHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and agent_ids:
                 sched = self.application.scheduler
@@ -742,8 +722,7 @@ class GetAgentsBySupportedAppIdHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
     @authenticated_request
@@ -775,8 +754,7 @@ class GetAgentsBySupportedAppIdHandler(BaseHandler):
                     )
                 )
                 self.set_status(results['http_status'])
-                self.set_header('Content-Type', 'application/json')
-                self.write(json.dumps(results, indent=4))
+                self.write_json(results)
 
             elif epoch_time and label and agent_ids:
                 date_time = datetime.fromtimestamp(int(epoch_time))
@@ -808,8 +786,7 @@ class GetAgentsBySupportedAppIdHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class SupportedAppsHandler(BaseHandler):
@@ -886,8 +863,7 @@ class SupportedAppsHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
     @authenticated_request
     @convert_json_to_arguments
@@ -908,8 +884,7 @@ class SupportedAppsHandler(BaseHandler):
             )
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             logger.exception(e)
@@ -920,5 +895,4 @@ class SupportedAppsHandler(BaseHandler):
             )
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
@@ -66,6 +66,7 @@ class FilesKey():
 
 class FilesIndexes():
     AppId = 'app_id'
+    AgentIds = 'agent_ids'
     FilesDownloadStatus = 'files_download_status'
 
 
@@ -0,0 +1,269 @@
+"""
+Content addressed storage for package files.
+
+Every file is stored once under BLOB_DIR, keyed by its hash, and the
+per app paths that agents download from (packages/<app_id>/<name> and
+packages/tmp/<app_id>/<name>) are hard links into the store. The link
+count of a blob is its reference count, collect_garbage drops the app
+views the files table no longer references and then every blob nothing
+links to anymore. The dependencies directory of the old downloader
+and the app views of uploads that are not finished being added yet are
+never collected.
+"""
+import os
+import logging
+from time import time
+
+import redis
+
+from vFense.db.client import db_create_close, r, pool
+from vFense.plugins.patching import FilesCollection, FilesKey
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+PACKAGES_DIR = '/opt/TopPatch/var/packages/'
+BLOB_DIR = PACKAGES_DIR + 'blobs/'
+INCOMING_DIR = BLOB_DIR + 'incoming/'
+# Files the downloader stored before the blob store, the app directories
+# may still have symlinks to them.
+DEPENDENCIES_DIR = PACKAGES_DIR + 'dependencies/'
+TMP_VIEW_DIR = 'tmp'
+
+# Blobs and views changed more recently than this are never collected,
+# they may have been stored a moment ago and not linked to their app or
+# added to the files table yet. A hard link changes the ctime of the
+# inode, not its mtime, so the ctime is what is compared.
+GC_GRACE_PERIOD = 3600
+
+for directory in (BLOB_DIR, INCOMING_DIR):
+    if not os.path.exists(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            pass
+
+
+class GarbageStatKey():
+    ViewsRemoved = 'views_removed'
+    BlobsRemoved = 'blobs_removed'
+    BytesFreed = 'bytes_freed'
+    BlobsKept = 'blobs_kept'
+
+
+def blob_key(file_hash):
+    if file_hash:
+        return(str(file_hash).strip().lower())
+
+    return(None)
+
+
+def blob_path(file_hash):
+    file_hash = blob_key(file_hash)
+    return(BLOB_DIR + file_hash[:2] + '/' + file_hash)
+
+
+def blob_exists(file_hash):
+    return(os.path.exists(blob_path(file_hash)))
+
+
+def blob_refcount(file_hash):
+    """Returns the number of app views that link to a blob."""
+    try:
+        return(os.stat(blob_path(file_hash)).st_nlink - 1)
+
+    except OSError:
+        return(0)
+
+
+def incoming_path(name):
+    """Returns a unique path to download a file to before it is verified
+    and stored, on the same file system as the store.
+    """
+    return('%s%d.%f.%s' % (INCOMING_DIR, os.getpid(), time(), name))
+
+
+def store_blob(src_path, file_hash):
+    """Atomically moves a fully written and verified file into the store.
+
+    Args:
+        src_path: Path of the file, it must live on the same file system
+            as BLOB_DIR.
+        file_hash: The hex digest the blob is keyed by.
+
+    Returns:
+        The path of the blob. If the blob was already stored, src_path is
+        removed and the existing blob is reused.
+    """
+    dest = blob_path(file_hash)
+    blob_dir = os.path.dirname(dest)
+    if not os.path.exists(blob_dir):
+        try:
+            os.makedirs(blob_dir)
+        except OSError:
+            if not os.path.isdir(blob_dir):
+                raise
+
+    if os.path.exists(dest):
+        os.remove(src_path)
+        logger.info('blob %s already stored, reusing it' % (file_hash))
+
+    else:
+        os.rename(src_path, dest)
+        logger.info('blob %s stored' % (file_hash))
+
+    return(dest)
+
+
+def link_blob(file_hash, dest_path):
+    """Hard links a stored blob to dest_path, replacing whatever was
+    there before in one rename.
+    """
+    dest_dir = os.path.dirname(dest_path)
+    if not os.path.exists(dest_dir):
+        os.makedirs(dest_dir)
+
+    src = blob_path(file_hash)
+    if os.path.exists(dest_path) and os.path.samefile(src, dest_path):
+        return(dest_path)
+
+    tmp_path = '%s.%d.tmp' % (dest_path, os.getpid())
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+
+    os.link(src, tmp_path)
+    os.rename(tmp_path, dest_path)
+
+    return(dest_path)
+
+
+def view_paths(app_id, file_name):
+    """Returns the paths an app's file can be served from."""
+    return(
+        (
+            PACKAGES_DIR + app_id + '/' + file_name,
+            PACKAGES_DIR + TMP_VIEW_DIR + '/' + app_id + '/' + file_name,
+        )
+    )
+
+
+def _blob_inodes():
+    inodes = {}
+    for prefix in os.listdir(BLOB_DIR):
+        prefix_dir = BLOB_DIR + prefix
+        if prefix_dir + '/' == INCOMING_DIR or not os.path.isdir(prefix_dir):
+            continue
+
+        for name in os.listdir(prefix_dir):
+            path = prefix_dir + '/' + name
+            stat = os.stat(path)
+            inodes[(stat.st_dev, stat.st_ino)] = path
+
+    return(inodes)
+
+
+@db_create_close
+def _referenced_views(conn=None):
+    views = set()
+    files = (
+        r
+        .table(FilesCollection)
+        .pluck(FilesKey.FileName, FilesKey.AppIds)
+        .run(conn)
+    )
+    for file_data in files:
+        for app_id in file_data.get(FilesKey.AppIds, []):
+            views.update(view_paths(app_id, file_data[FilesKey.FileName]))
+
+    return(views)
+
+
+def _recent(stat, now):
+    return(now - max(stat.st_mtime, stat.st_ctime) < GC_GRACE_PERIOD)
+
+
+def _uploading(path, cache):
+    """True for the views of a chunked upload, tmp/<uuid>/<name>, while
+    its upload record exists.
+    """
+    from vFense.plugins.patching.custom_apps.uploaded.chunked import \
+        UPLOAD_KEY
+
+    parts = os.path.relpath(path, PACKAGES_DIR).split(os.sep)
+    if len(parts) != 3 or parts[0] != TMP_VIEW_DIR:
+        return(False)
+
+    return(bool(cache.exists(UPLOAD_KEY % (parts[1]))))
+
+
+def collect_garbage(dry_run=False):
+    """Removes app views the files table no longer references, then
+    removes every blob that has no views left.
+
+    Only views that are hard links into the store are touched, files put
+    in the app directories some other way are left alone, and so are
+    views changed within GC_GRACE_PERIOD and the views of uploads that
+    still have an upload record.
+
+    Args:
+        dry_run: Only report what would be removed.
+
+    Returns:
+        Dictionary keyed by GarbageStatKey.
+    """
+    stats = {
+        GarbageStatKey.ViewsRemoved: 0,
+        GarbageStatKey.BlobsRemoved: 0,
+        GarbageStatKey.BytesFreed: 0,
+        GarbageStatKey.BlobsKept: 0,
+    }
+    now = time()
+    cache = redis.StrictRedis(connection_pool=pool)
+    inodes = _blob_inodes()
+    referenced = _referenced_views()
+    skip = set([BLOB_DIR.rstrip('/'), DEPENDENCIES_DIR.rstrip('/')])
+
+    for root, dirs, files in os.walk(PACKAGES_DIR):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) not in skip]
+        for name in files:
+            path = os.path.join(root, name)
+            if path in referenced or os.path.islink(path):
+                continue
+
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            if (stat.st_dev, stat.st_ino) not in inodes:
+                continue
+
+            if _recent(stat, now) or _uploading(path, cache):
+                continue
+
+            stats[GarbageStatKey.ViewsRemoved] += 1
+            if not dry_run:
+                os.remove(path)
+
+    for path in inodes.values():
+        stat = os.stat(path)
+        if stat.st_nlink > 1 or _recent(stat, now):
+            stats[GarbageStatKey.BlobsKept] += 1
+            continue
+
+        stats[GarbageStatKey.BlobsRemoved] += 1
+        stats[GarbageStatKey.BytesFreed] += stat.st_size
+        if not dry_run:
+            os.remove(path)
+
+    logger.info('package store garbage collection: %s' % (stats))
+
+    return(stats)
+
+
+def run_garbage_collection(period_start=None):
+    """Periodic task, collects the garbage of the package store once a
+    day.
+    """
+    return(collect_garbage())
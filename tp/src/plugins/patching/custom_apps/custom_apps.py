@@ -8,8 +8,9 @@ from vFense.tagging.tagManager import get_tag_ids_by_agent_id
 from vFense.plugins.patching.rv_db_calls import \
     apps_to_insert_per_agent, get_apps_data, get_app_data,\
     apps_to_insert_per_tag, update_file_data, get_file_data
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
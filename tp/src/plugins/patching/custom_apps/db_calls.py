@@ -4,9 +4,10 @@ from vFense.agent import *
 from vFense.errorz.error_messages import GenericResults, PackageResults
 
 import logging
-import logging.config
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -0,0 +1,323 @@
+"""
+Chunked, resumable uploads of custom packages.
+
+A client PUTs the file in any number of chunks, each one carrying a
+Content-Range header. Chunks are appended to a partial file and hashed
+as they stream in, so the finished file is never read back into memory
+or hashed a second time. Once the last byte arrives the file is moved
+into the blob store and hard linked to the usual
+/packages/tmp/<uuid>/<name> path.
+
+A chunk holds an exclusive flock on the partial file from its first
+byte until it is finished, a second chunk of the same upload that
+arrives meanwhile, on any process, is turned away with the offset to
+retry from.
+"""
+import os
+import re
+import fcntl
+import hashlib
+import logging
+
+import redis
+
+from vFense.db.client import pool
+from vFense.plugins.patching.blob_store import store_blob, link_blob, \
+    PACKAGES_DIR
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+TMP_DIR = PACKAGES_DIR + 'tmp/'
+UPLOAD_DIR = TMP_DIR + 'uploads/'
+UPLOAD_KEY = 'vfense:upload:%s'
+UPLOAD_EXPIRE = 86400 * 7
+HASH_BLOCK_SIZE = 1024 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024 * 1024
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+if not os.path.exists(UPLOAD_DIR):
+    os.mkdir(UPLOAD_DIR)
+
+# Hash state of the uploads this process is receiving. hashlib objects
+# can not be stored in Redis, so a chunk that lands on another process
+# rehashes the partial file once and carries on from there.
+_HASHERS = {}
+
+
+class UploadKey():
+    Uuid = 'uuid'
+    Name = 'name'
+    Size = 'size'
+    Offset = 'offset'
+    Md5 = 'md5'
+    Sha256 = 'sha256'
+    FilePath = 'file_path'
+    Completed = 'completed'
+
+
+class UploadError(Exception):
+    pass
+
+
+class UploadOffsetMismatch(UploadError):
+    def __init__(self, offset):
+        self.offset = offset
+        UploadError.__init__(
+            self, 'chunk does not start at offset %d' % (offset)
+        )
+
+
+class UploadInProgress(UploadOffsetMismatch):
+    def __init__(self, offset):
+        UploadOffsetMismatch.__init__(self, offset)
+        self.args = (
+            'another chunk is being written at offset %d' % (offset),
+        )
+
+
+class UploadHashMismatch(UploadError):
+    pass
+
+
+def parse_content_range(header):
+    """Parses a "bytes start-end/total" Content-Range header.
+
+    Returns:
+        Tuple of (start, end, total), None if the header is invalid.
+    """
+    if not header:
+        return(None)
+
+    match = CONTENT_RANGE.match(header.strip())
+    if not match:
+        return(None)
+
+    start, end, total = map(int, match.groups())
+    if total == 0:
+        # "bytes 0-0/0" would claim a byte the file does not have, and an
+        # empty package is never a valid upload.
+        return(None)
+
+    if start > end or end >= total:
+        return(None)
+
+    return(start, end, total)
+
+
+def get_upload_record(uuid):
+    """Returns the server side size and hashes of a finished upload.
+    None if the upload does not exist or is not finished.
+    """
+    record = (
+        redis.StrictRedis(connection_pool=pool)
+        .hgetall(UPLOAD_KEY % (uuid))
+    )
+    if not record or record.get(UploadKey.Completed) != '1':
+        return(None)
+
+    record[UploadKey.Size] = int(record[UploadKey.Size])
+    record[UploadKey.Offset] = int(record[UploadKey.Offset])
+
+    return(record)
+
+
+class ChunkedUpload(object):
+
+    def __init__(self, uuid, name=None, size=None, md5=None):
+        self.uuid = uuid
+        self.redis = redis.StrictRedis(connection_pool=pool)
+        self.key = UPLOAD_KEY % (uuid)
+        self.part_path = UPLOAD_DIR + uuid + '.part'
+        self.fd = None
+        self.start = None
+        self.chunk_end = None
+
+        record = self.redis.hgetall(self.key)
+        self.name = name or record.get(UploadKey.Name)
+        if self.name:
+            self.name = os.path.basename(self.name)
+        self.size = size
+        if self.size is None and record.get(UploadKey.Size):
+            self.size = int(record[UploadKey.Size])
+
+        self.expected_md5 = md5 or record.get(UploadKey.Md5)
+        self.completed = record.get(UploadKey.Completed) == '1'
+
+    @property
+    def offset(self):
+        if os.path.exists(self.part_path):
+            return(os.path.getsize(self.part_path))
+
+        return(0)
+
+    def status(self):
+        return(
+            {
+                UploadKey.Uuid: self.uuid,
+                UploadKey.Name: self.name,
+                UploadKey.Size: self.size,
+                UploadKey.Offset: self.offset,
+                UploadKey.Completed: self.completed,
+            }
+        )
+
+    def _hashers(self, offset):
+        state = _HASHERS.get(self.uuid)
+        if state and state[0] == offset:
+            return(state)
+
+        md5 = hashlib.md5()
+        sha256 = hashlib.sha256()
+        if offset:
+            logger.info(
+                'upload %s resumed on a new process, rehashing %d bytes'
+                % (self.uuid, offset)
+            )
+            part = open(self.part_path, 'rb')
+            try:
+                block = part.read(HASH_BLOCK_SIZE)
+                while block:
+                    md5.update(block)
+                    sha256.update(block)
+                    block = part.read(HASH_BLOCK_SIZE)
+            finally:
+                part.close()
+
+        state = [offset, md5, sha256]
+        _HASHERS[self.uuid] = state
+
+        return(state)
+
+    def begin(self, start, end):
+        """Locks and opens the partial file for the chunk start-end. The
+        offset is checked once the lock is held, so a chunk that raced
+        another one for the same bytes is turned away.
+
+        Raises:
+            UploadInProgress: When another chunk holds the lock.
+            UploadOffsetMismatch: When start is not the current offset.
+        """
+        fd = open(self.part_path, 'ab')
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError:
+            fd.close()
+            raise UploadInProgress(self.offset)
+
+        offset = os.fstat(fd.fileno()).st_size
+        if start != offset:
+            fd.close()
+            raise UploadOffsetMismatch(offset)
+
+        self.fd = fd
+        self.start = start
+        self.chunk_end = end
+        self.state = self._hashers(offset)
+        self.redis.hmset(
+            self.key,
+            {
+                UploadKey.Uuid: self.uuid,
+                UploadKey.Name: self.name,
+                UploadKey.Size: self.size,
+                UploadKey.Offset: offset,
+                UploadKey.Completed: 0,
+            }
+        )
+        if self.expected_md5:
+            self.redis.hset(self.key, UploadKey.Md5, self.expected_md5)
+        self.redis.expire(self.key, UPLOAD_EXPIRE)
+
+    def write(self, chunk):
+        self.fd.write(chunk)
+        self.state[0] += len(chunk)
+        self.state[1].update(chunk)
+        self.state[2].update(chunk)
+
+    def end(self):
+        """Closes the chunk and finishes the upload if it was the last one.
+        The lock is held until then, so no chunk lands on a file that is
+        being moved into the store.
+
+        Returns:
+            The upload status, see ChunkedUpload.status.
+
+        Raises:
+            UploadError: When the body was not as long as its
+                Content-Range, the chunk is dropped and the upload can
+                resume from its start.
+        """
+        try:
+            self.fd.flush()
+            received = self.state[0] - self.start
+            expected = self.chunk_end - self.start + 1
+            if received != expected:
+                self.fd.truncate(self.start)
+                _HASHERS.pop(self.uuid, None)
+                raise UploadError(
+                    'received %d bytes, the chunk has %d'
+                    % (received, expected)
+                )
+
+            offset = self.state[0]
+            self.redis.hset(self.key, UploadKey.Offset, offset)
+            if offset == self.size:
+                return(self.finish())
+
+            return(self.status())
+
+        finally:
+            self.close()
+
+    def close(self):
+        """Closes the partial file, releasing its lock."""
+        if self.fd:
+            self.fd.close()
+            self.fd = None
+
+    def finish(self):
+        md5 = self.state[1].hexdigest()
+        sha256 = self.state[2].hexdigest()
+        _HASHERS.pop(self.uuid, None)
+
+        if self.expected_md5 and self.expected_md5.lower() != md5:
+            self.abort()
+            raise UploadHashMismatch(
+                'md5 %s does not match the uploaded file %s'
+                % (self.expected_md5, md5)
+            )
+
+        store_blob(self.part_path, sha256)
+        file_path = link_blob(sha256, TMP_DIR + self.uuid + '/' + self.name)
+        self.completed = True
+        self.redis.hmset(
+            self.key,
+            {
+                UploadKey.Md5: md5,
+                UploadKey.Sha256: sha256,
+                UploadKey.FilePath: file_path,
+                UploadKey.Completed: 1,
+            }
+        )
+        logger.info(
+            'upload %s of %s finished, %d bytes sha256 %s'
+            % (self.uuid, self.name, self.size, sha256)
+        )
+
+        status = self.status()
+        status[UploadKey.Offset] = self.size
+        status[UploadKey.Md5] = md5
+        status[UploadKey.Sha256] = sha256
+        status[UploadKey.FilePath] = file_path
+
+        return(status)
+
+    def abort(self):
+        self.close()
+        _HASHERS.pop(self.uuid, None)
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+        self.redis.delete(self.key)
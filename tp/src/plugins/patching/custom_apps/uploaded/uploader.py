@@ -8,9 +8,12 @@ from vFense.errorz.status_codes import PackageCodes
 from vFense.utils.common import date_parser, timestamp_verifier
 from vFense.plugins.patching import *
 from vFense.plugins.patching.custom_apps.custom_apps import add_custom_app_to_agents
+from vFense.plugins.patching.custom_apps.uploaded.chunked import \
+    get_upload_record, UploadKey
+from vFense.logger.logsetup import configure_logging
 
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 TMP_DIR = '/opt/TopPatch/var/packages/tmp/'
@@ -84,6 +87,13 @@ def store_package_info_in_db(
     URL_PATH = 'https://localhost/packages/tmp/' + uuid + '/'
     url = URL_PATH + name
 
+    # Files sent through the chunked upload API were sized and hashed
+    # on the server, those values win over what the client sent.
+    upload = get_upload_record(uuid)
+    if upload and upload[UploadKey.Name] == name:
+        size = upload[UploadKey.Size]
+        md5 = upload[UploadKey.Md5]
+
     if os.path.exists(PKG_FILE):
         if (isinstance(release_date, str) or
             isinstance(release_date, unicode)):
@@ -1,5 +1,4 @@
 import logging
-import logging.config
 import os
 import re
 from time import time, mktime
@@ -14,11 +13,15 @@ from vFense.errorz.status_codes import PackageCodes
 from vFense.agent import *
 from urlgrabber import urlgrab
 from vFense.utils.common import hash_verifier
+from vFense.plugins.patching.blob_store import PACKAGES_DIR, \
+    DEPENDENCIES_DIR, blob_key, blob_exists, store_blob, link_blob, \
+    incoming_path
+from vFense.logger.logsetup import configure_logging
 
-packages_directory = '/opt/TopPatch/var/packages/'
-dependencies_directory = '/opt/TopPatch/var/packages/dependencies/'
+packages_directory = PACKAGES_DIR
+dependencies_directory = DEPENDENCIES_DIR
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -31,8 +34,6 @@ def download_all_files_in_app(
     app_path = packages_directory + str(app_id)
     if not os.path.exists(packages_directory):
         os.mkdir(packages_directory)
-    if not os.path.exists(dependencies_directory):
-        os.mkdir(dependencies_directory)
     if not os.path.exists(app_path):
         os.mkdir(app_path)
 
@@ -61,53 +62,51 @@ def download_all_files_in_app(
             lhash = str(file_info[PKG_HASH])
             fname = str(file_info[PKG_NAME])
             fsize = file_info[PKG_SIZE]
-            if os_code == 'linux':
-                file_path = dependencies_directory + fname
-
-            else:
-                file_path = app_path + '/' + fname
+            file_path = app_path + '/' + fname
+            file_hash = blob_key(lhash)
 
             if throttle != 0:
                 throttle *= 1024
 
-            symlink_path = app_path + '/' + fname 
-            cmd = 'ln -s %s %s' % (file_path, symlink_path)
-
             try:
-                if uri and not os.path.exists(file_path):
-                    urlgrab(uri, filename=file_path, throttle=throttle)
-                    if os.path.exists(file_path):
+                if file_hash and blob_exists(file_hash):
+                    link_blob(file_hash, file_path)
+                    num_of_files_downloaded += 1
+
+                elif uri and not os.path.exists(file_path):
+                    tmp_path = incoming_path(fname)
+                    legacy_path = dependencies_directory + fname
+                    if file_hash and os.path.isfile(legacy_path):
+                        os.link(legacy_path, tmp_path)
+                    else:
+                        urlgrab(uri, filename=tmp_path, throttle=throttle)
+                    if os.path.exists(tmp_path):
                         if lhash:
                             hash_match = (
                                 hash_verifier(
                                     orig_hash=lhash,
-                                    file_path=file_path
+                                    file_path=tmp_path
                                 )
                             )
                             if hash_match['pass']:
+                                store_blob(tmp_path, file_hash)
+                                link_blob(file_hash, file_path)
                                 num_of_files_downloaded += 1
-                                if os_code == 'linux':
-                                    if not os.path.islink(file_path):
-                                        os.system(cmd)
                             else:
+                                os.remove(tmp_path)
                                 num_of_files_mismatch += 1
 
                         elif fsize and not lhash:
-                            if os.path.getsize(file_path) == fsize:
+                            if os.path.getsize(tmp_path) == fsize:
+                                os.rename(tmp_path, file_path)
                                 num_of_files_downloaded += 1
                             else:
+                                os.remove(tmp_path)
                                 num_of_files_mismatch += 1
                     else:
                         num_of_files_failed += 1
 
-                elif os.path.exists(file_path) and os_code == 'linux':
-
-                    if not os.path.islink(symlink_path):
-                        os.system(cmd)
-
-                    num_of_files_downloaded += 1
-
-                elif os.path.exists(file_path) and os_code != 'linux':
+                elif os.path.exists(file_path):
                     num_of_files_downloaded += 1
 
                 elif uri:
@@ -1,6 +1,5 @@
 import os
 import logging
-import logging.config
 import sys
 import time
 from vFense.Queue import Queue, Empty, Full
@@ -8,11 +7,12 @@ from urlgrabber import urlgrab
 import threading
 
 from vFense.utils.common import hash_verifier
+from vFense.logger.logsetup import configure_logging
 
 packages_directory = '/opt/TopPatch/var/packages/'
 dependencies_directory = '/opt/TopPatch/var/packages/dependencies/'
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 # Create packages directory if it doesn't exist.
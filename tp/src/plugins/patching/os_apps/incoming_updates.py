@@ -1,6 +1,5 @@
 import os
 import logging
-import logging.config
 from hashlib import sha256
 
 from vFense.db.client import db_create_close, r
@@ -10,21 +9,16 @@ from vFense.plugins.patching import *
 from vFense.plugins.cve import *
 from vFense.plugins.patching.downloader.downloader import download_all_files_in_app
 from vFense.utils.common import date_parser, hash_verifier, timestamp_verifier
+from vFense.receiver.staging import iter_staged
 from datetime import datetime
 import re
 
-import redis
-from rq import Connection, Queue
+from vFense.receiver.fairqueue import fair_enqueue, Lane
+from vFense.logger.logsetup import configure_logging
 
-rq_host = 'localhost'
-rq_port = 6379
-rq_db = 0
-
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
-rq_pkg_pool = redis.StrictRedis(host=rq_host, port=rq_port, db=rq_db)
-
 
 class IncomingApplicationsFromAgent():
 
@@ -37,36 +31,37 @@ class IncomingApplicationsFromAgent():
         self.os_string = os_string
 
     def add_or_update_packages(self, app_list, delete_afterwards=True):
-        rv_q = Queue('downloader', connection=rq_pkg_pool)
-        index_with_no_name = list()
+        """Adds the apps of an agent. app_list is a list of apps, or the
+        reference the listener returns when it stages an uploaded
+        inventory in Redis (see vFense.receiver.staging).
+        """
         good_app_list = list()
         #start_time = datetime.now()
         #print start_time, 'add all apps to app_table'
-        for i in range(len(app_list)):
-            if not app_list[i][AppsKey.Name]:
-                index_with_no_name.append(i)
+        for app in iter_staged(app_list):
+            if not app[AppsKey.Name]:
                 continue
 
-            if len(app_list[i][AppsKey.Name]) < 1:
-                index_with_no_name.append(i)
+            if len(app[AppsKey.Name]) < 1:
                 continue
 
-            app_list[i] = self.set_app_per_node_parameters(app_list[i])
-            app_list[i][AppsKey.AppId] = self.build_app_id(app_list[i])
-            agent_app = self.set_specific_keys_for_app_agent(app_list[i])
+            app = self.set_app_per_node_parameters(app)
+            app[AppsKey.AppId] = self.build_app_id(app)
+            agent_app = self.set_specific_keys_for_app_agent(app)
             unique_app, file_data = (
                 unique_application_updater(
-                    self.customer_name, app_list[i], self.os_string
+                    self.customer_name, app, self.os_string
                 )
             )
             if agent_app[AppsPerAgentKey.Status] == 'available':
-                rv_q.enqueue_call(
-                    func=download_all_files_in_app,
+                fair_enqueue(
+                    'downloader', download_all_files_in_app,
                     args=(
-                        app_list[i][AppsKey.AppId],
+                        app[AppsKey.AppId],
                         self.os_code, self.os_string,
                         file_data,
                     ),
+                    lane=Lane.Download, customer_name=self.customer_name,
                     timeout=86400
                 )
             good_app_list.append(agent_app)
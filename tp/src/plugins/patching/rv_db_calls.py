@@ -1,5 +1,4 @@
 import logging
-import logging.config
 from hashlib import sha256
 from time import mktime
 from datetime import datetime
@@ -20,8 +19,9 @@ from vFense.tagging.tagManager import *
 
 from vFense.server.hierarchy import CoreProperty
 from vFense.server.hierarchy.manager import Hierarchy
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -0,0 +1,245 @@
+"""
+Integrity scrubber of the package store.
+
+Re-hashes the files under /opt/TopPatch/var/packages and checks them
+against the hash they are known by:
+
+    * a blob is named after its hash (see blob_store).
+    * any other file, one that was put in an app directory without
+      going through the store, is checked against the file_hash of its
+      name in the files table. Views of a blob are the blob itself and
+      are not hashed again.
+
+A file that verified is cached in the VERIFIED Redis hash with its
+device, inode, size and mtime, it is not read again until one of them
+changes, so after the first scrub only new or modified files are
+hashed. Files are hashed in a process pool of SCRUB_WORKERS, together
+they read at most SCRUB_RATE bytes per second so agents downloading
+packages are not starved. Files that fail are logged and listed in the
+CORRUPT Redis hash, nothing is removed. Files that disappear or can not
+be read while they are scrubbed are counted as missing or unreadable,
+not as corrupt.
+
+scrub_packages runs once a day as the packages_scrub periodic task of
+the scheduler daemon, on the package_maintenance queue after the
+packages_gc garbage collection.
+"""
+import os
+import errno
+import logging
+from time import time
+from multiprocessing import Pool
+
+import redis
+
+from vFense.db.client import db_create_close, r, pool
+from vFense.plugins.patching import FilesCollection, FilesKey
+from vFense.plugins.patching.blob_store import PACKAGES_DIR, BLOB_DIR, \
+    INCOMING_DIR, blob_key
+from vFense.utils.common import file_digests, hash_algorithms
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+SCRUB_WORKERS = 2
+# Bytes per second, shared by the workers.
+SCRUB_RATE = 50 * 1024 * 1024
+
+
+class ScrubKey():
+    Verified = 'vfense:packages:verified'
+    Corrupt = 'vfense:packages:corrupt'
+    Metrics = 'vfense:packages:scrub'
+
+
+class ScrubStatKey():
+    Files = 'files'
+    Cached = 'cached'
+    Verified = 'verified'
+    Corrupt = 'corrupt'
+    Missing = 'missing'
+    Unreadable = 'unreadable'
+    Unknown = 'unknown'
+    BytesRead = 'bytes_read'
+    Duration = 'duration'
+    LastRun = 'last_run'
+
+
+def _fingerprint(stat):
+    return(
+        '%d:%d:%d:%d'
+        % (stat.st_dev, stat.st_ino, stat.st_size, int(stat.st_mtime))
+    )
+
+
+def _verify(job):
+    """Pool worker, hashes one file.
+
+    Returns:
+        Tuple of the path, the algorithm that matched or None, the bytes
+        read and the errno of the error the file could not be read with,
+        None if it was read.
+    """
+    path, expected, size, rate = job
+    try:
+        digests = file_digests(path, hash_algorithms(expected), rate=rate)
+
+    except (IOError, OSError) as e:
+        logger.error('unable to read %s: %s' % (path, e))
+        return(path, None, 0, e.errno)
+
+    for name, digest in digests.items():
+        if digest == expected:
+            return(path, name, size, None)
+
+    return(path, None, size, None)
+
+
+@db_create_close
+def _known_hashes(conn=None):
+    files = (
+        r
+        .table(FilesCollection)
+        .pluck(FilesKey.FileName, FilesKey.FileHash)
+        .run(conn)
+    )
+
+    return(
+        dict(
+            [
+                (
+                    file_data[FilesKey.FileName],
+                    blob_key(file_data.get(FilesKey.FileHash))
+                )
+                for file_data in files
+                if file_data.get(FilesKey.FileHash)
+            ]
+        )
+    )
+
+
+def _blob_files():
+    for prefix in os.listdir(BLOB_DIR):
+        prefix_dir = BLOB_DIR + prefix
+        if prefix_dir + '/' == INCOMING_DIR or not os.path.isdir(prefix_dir):
+            continue
+
+        for name in os.listdir(prefix_dir):
+            yield(prefix_dir + '/' + name, name)
+
+
+def _view_files(known):
+    skip = set([BLOB_DIR.rstrip('/')])
+    for root, dirs, files in os.walk(PACKAGES_DIR):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) not in skip]
+        for name in files:
+            yield(os.path.join(root, name), known.get(name))
+
+
+def scrub_packages(workers=SCRUB_WORKERS, rate=SCRUB_RATE):
+    """Verifies the package files that changed since they last verified.
+
+    Kwargs:
+        workers: Processes hashing files.
+        rate: Bytes per second the workers read at most, together.
+
+    Returns:
+        Dictionary keyed by ScrubStatKey.
+    """
+    began = time()
+    stats = dict(
+        [
+            (key, 0) for key in (
+                ScrubStatKey.Files, ScrubStatKey.Cached,
+                ScrubStatKey.Verified, ScrubStatKey.Corrupt,
+                ScrubStatKey.Missing, ScrubStatKey.Unreadable,
+                ScrubStatKey.Unknown, ScrubStatKey.BytesRead
+            )
+        ]
+    )
+    cache = redis.StrictRedis(connection_pool=pool)
+    verified = cache.hgetall(ScrubKey.Verified)
+    blob_inodes = set()
+    jobs = []
+    fingerprints = {}
+
+    def add(path, expected):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stats[ScrubStatKey.Missing] += 1
+            return
+
+        inode = (stat.st_dev, stat.st_ino)
+        if expected is None:
+            if inode not in blob_inodes:
+                stats[ScrubStatKey.Unknown] += 1
+            return
+
+        if path.startswith(BLOB_DIR):
+            blob_inodes.add(inode)
+        elif inode in blob_inodes:
+            return
+
+        stats[ScrubStatKey.Files] += 1
+        fingerprint = _fingerprint(stat) + ':' + expected
+        fingerprints[path] = fingerprint
+        if verified.get(path) == fingerprint:
+            stats[ScrubStatKey.Cached] += 1
+            return
+
+        jobs.append((path, expected, stat.st_size, rate / max(workers, 1)))
+
+    for path, expected in _blob_files():
+        add(path, blob_key(expected))
+
+    known = _known_hashes()
+    for path, expected in _view_files(known):
+        add(path, expected)
+
+    stale = [path for path in verified.keys() if path not in fingerprints]
+    if stale:
+        cache.hdel(ScrubKey.Verified, *stale)
+
+    if jobs:
+        workers_pool = Pool(max(min(workers, len(jobs)), 1))
+        try:
+            for path, algorithm, size, error in workers_pool.imap_unordered(
+                    _verify, jobs):
+                stats[ScrubStatKey.BytesRead] += size
+                if error == errno.ENOENT:
+                    stats[ScrubStatKey.Missing] += 1
+
+                elif error is not None:
+                    stats[ScrubStatKey.Unreadable] += 1
+
+                elif algorithm:
+                    stats[ScrubStatKey.Verified] += 1
+                    pipe = cache.pipeline()
+                    pipe.hset(ScrubKey.Verified, path, fingerprints[path])
+                    pipe.hdel(ScrubKey.Corrupt, path)
+                    pipe.execute()
+
+                else:
+                    stats[ScrubStatKey.Corrupt] += 1
+                    cache.hset(ScrubKey.Corrupt, path, int(time()))
+                    logger.error(
+                        'package file %s does not match its hash' % (path)
+                    )
+
+        finally:
+            workers_pool.close()
+            workers_pool.join()
+
+    stats[ScrubStatKey.Duration] = round(time() - began, 3)
+    stats[ScrubStatKey.LastRun] = int(began)
+    cache.hmset(ScrubKey.Metrics, stats)
+    logger.info('package store scrub: %s' % (stats))
+
+    return(stats)
+
+
+def run_scrub(period_start=None):
+    """Periodic task, scrubs the package store once a day."""
+    return(scrub_packages())
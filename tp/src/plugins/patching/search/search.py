@@ -1,12 +1,12 @@
 import logging
-import logging.config
 
 from vFense.db.client import db_create_close, r
 from vFense.plugins.patching import *
 from vFense.agent import *
 from vFense.errorz.error_messages import GenericResults, PackageResults
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
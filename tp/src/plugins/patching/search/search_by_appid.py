@@ -1,5 +1,4 @@
 import logging
-import logging.config
 
 from vFense.db.client import db_create_close, r
 from vFense.plugins.patching import *
@@ -7,8 +6,9 @@ from vFense.plugins.patching.os_apps.db_calls import get_all_stats_by_appid
 from vFense.plugins.patching.rv_db_calls import get_file_data
 from vFense.agent import *
 from vFense.errorz.error_messages import GenericResults, PackageResults
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
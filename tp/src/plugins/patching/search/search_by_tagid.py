@@ -1,5 +1,4 @@
 import logging
-import logging.config
 
 from datetime import datetime
 from vFense.db.client import db_create_close, r
@@ -8,8 +7,9 @@ from vFense.agent import *
 from vFense.tagging import *
 from vFense.tagging.tagManager import tag_exists
 from vFense.errorz.error_messages import GenericResults, PackageResults
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 class RetrieveAppsByTagId(object):
@@ -8,7 +8,8 @@ from vFense.agent import *
 from vFense.plugins.patching import *
 from vFense.plugins.patching.rv_db_calls import get_all_app_stats_by_customer
 from vFense.errorz.error_messages import GenericResults
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+from vFense.logger.logsetup import configure_logging
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -1,5 +1,4 @@
 import logging
-import logging.config
 from vFense.utils.common import *
 from vFense.operations.operation_manager import Operation
 from vFense.receiver.rqueuemanager import QueueWorker
@@ -9,8 +8,9 @@ from vFense.plugins.patching.rv_db_calls import *
 from vFense.plugins.patching import *
 from vFense.plugins.mightymouse.mouse_db import get_mouse_addresses
 from vFense.tagging.tagManager import *
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -58,10 +58,9 @@ class StoreOperation(object):
 
     def reboot(self, agentids=None, tag_id=None):
         if tag_id:
-            if not agentids:
-                agentids = get_agent_ids_from_tag(tag_id)
-            elif agentids:
-                agentids += get_agent_ids_from_tag(tag_id)
+            agentids = (
+                list(set((agentids or []) + get_agent_ids_from_tag(tag_id)))
+            )
 
         results = (
             self.generic_operation(REBOOT, CORE_PLUGIN, agentids, tag_id)
@@ -71,10 +70,9 @@ class StoreOperation(object):
 
     def shutdown(self, agentids=None, tag_id=None):
         if tag_id:
-            if not agentids:
-                agentids = get_agent_ids_from_tag(tag_id)
-            elif agentids:
-                agentids += get_agent_ids_from_tag(tag_id)
+            agentids = (
+                list(set((agentids or []) + get_agent_ids_from_tag(tag_id)))
+            )
 
         results = (
             self.generic_operation(SHUTDOWN, CORE_PLUGIN, agentids, tag_id)
@@ -84,10 +82,9 @@ class StoreOperation(object):
 
     def apps_refresh(self, agentids=None, tag_id=None):
         if tag_id:
-            if not agentids:
-                agentids = get_agent_ids_from_tag(tag_id)
-            elif agentids:
-                agentids += get_agent_ids_from_tag(tag_id)
+            agentids = (
+                list(set((agentids or []) + get_agent_ids_from_tag(tag_id)))
+            )
 
         results = (
             self.generic_operation(UPDATES_APPLICATIONS, RV_PLUGIN, agentids, tag_id)
@@ -211,10 +208,9 @@ class StoreOperation(object):
             CurrentAppsPerAgentKey = AgentAppsPerAgentKey
 
         if tag_id:
-            if not agentids:
-                agentids = get_agent_ids_from_tag(tag_id)
-            else:
-                agentids += get_agent_ids_from_tag(tag_id)
+            agentids = (
+                list(set((agentids or []) + get_agent_ids_from_tag(tag_id)))
+            )
 
         operation = (
             Operation(
@@ -8,9 +8,10 @@ from vFense.plugins.patching.rv_db_calls import \
     apps_to_insert_per_tag, update_file_data, get_file_data
 
 import logging
-import logging.config
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -13,20 +13,15 @@ from vFense.plugins.patching.downloader.downloader import \
     download_all_files_in_app
 from vFense.db.client import db_connect, r, db_create_close
 from vFense.server.hierarchy import Collection, CustomerKey
+from vFense.receiver.fairqueue import fair_enqueue, Lane
 
-import redis
-from rq import Connection, Queue
-
-rq_host = 'localhost'
-rq_port = 6379
-rq_db = 0
-rq_pkg_pool = redis.StrictRedis(host=rq_host, port=rq_port, db=rq_db)
+from vFense.logger.logsetup import configure_logging
 
 BASE_URL = 'http://updater2.toppatch.com'
 GET_AGENT_UPDATES = '/api/new_updater/rvpkglist'
 GET_SUPPORTED_UPDATES = '/api/new_updater/pkglist'
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -273,7 +268,6 @@ def update_supported_and_agent_apps(json_data, table=SupportedAppsCollection):
         LatestDownloadedCollection = LatestDownloadedAgentCollection
         AppType = 'agent_apps'
     try:
-        rv_q = Queue('downloader', connection=rq_pkg_pool)
         conn = db_connect()
         inserted_count = 0
         all_customers = (
@@ -320,15 +314,15 @@ def update_supported_and_agent_apps(json_data, table=SupportedAppsCollection):
                     .run(conn)
                 )
             
-            rv_q.enqueue_call(
-                func=download_all_files_in_app,
+            fair_enqueue(
+                'downloader', download_all_files_in_app,
                 args=(
                     json_data[i][CurrentAppsKey.AppId],
                     json_data[i][CurrentAppsKey.OsCode],
                     None,
                     file_data, 0, AppType
                 ),
-                timeout=86400
+                lane=Lane.Sync, timeout=86400
             )
 
             inserted_count += updated['inserted']
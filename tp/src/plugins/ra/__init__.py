@@ -14,8 +14,6 @@ EndPort = 11000
 
 PortRange = range(StartPort, EndPort)
 
-db.ra_initialization()
-
 
 def session_exist(agent_id):
 
@@ -1,11 +1,11 @@
 import time
 import logging
-import logging.config
 
 import vFense.settings as settings
 from vFense.db.client import *
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -13,6 +13,11 @@ class Collection():
     KnownConnections = 'ra_known_connections'
 
 
+class CollectionIndexes():
+    WebPort = 'web_port'
+    HostPort = 'host_port'
+
+
 class CollectionKeys():
 
     HostPort = 'host_port'
@@ -40,6 +45,28 @@ def ra_initialization(conn=None):
         logger.error('Unable to create RA tables.')
         logger.error(str(e))
 
+    try:
+
+        indexes = (
+            r.db('toppatch_server')
+            .table(Collection.KnownConnections)
+            .index_list()
+            .run(conn)
+        )
+        for index in (CollectionIndexes.WebPort, CollectionIndexes.HostPort):
+            if index not in indexes:
+                (
+                    r.db('toppatch_server')
+                    .table(Collection.KnownConnections)
+                    .index_create(index)
+                    .run(conn)
+                )
+
+    except Exception as e:
+
+        logger.error('Unable to create RA indexes.')
+        logger.error(str(e))
+
 
 @db_create_close
 def connection_exist(
@@ -312,32 +339,61 @@ def port_available(port=None, conn=None):
 
     try:
 
+        # Ports are saved as strings, older connections may hold ints.
+        ports = [str(port)]
+        if str(port).isdigit():
+            ports.append(int(port))
 
-        result = list(
-            r.table(Collection.KnownConnections)
-            .filter({
-                CollectionKeys.WebPort: port,
-            })
-            .run(conn)
-        )
+        for index in (CollectionIndexes.WebPort, CollectionIndexes.HostPort):
+            used = (
+                r.table(Collection.KnownConnections)
+                .get_all(*ports, index=index)
+                .count()
+                .run(conn)
+            )
+
+            if used:
+                return False
 
-        if len(result) != 0:
-            return False
+        return True
+
+    except Exception as e:
 
-        result = list(
+        logger.error('Unable to verify port.')
+        logger.error(str(e))
+
+    return False
+
+
+@db_create_close
+def ports_in_use(conn=None):
+    """Gets the ports held by known connections.
+
+    Returns:
+
+        A set of ports as strings.
+
+    """
+
+    ports = set()
+
+    try:
+
+        connections = (
             r.table(Collection.KnownConnections)
-            .filter({
-                CollectionKeys.HostPort: port,
-            })
+            .pluck(CollectionKeys.WebPort, CollectionKeys.HostPort)
             .run(conn)
         )
 
-        if len(result) != 0:
-            return False
+        for connection in connections:
 
-        return True
+            for key in (CollectionKeys.WebPort, CollectionKeys.HostPort):
+                if connection.get(key):
+                    ports.add(str(connection[key]))
 
     except Exception as e:
 
-        logger.error('Unable to verify port.')
+        logger.error('Unable to get the ports in use.')
         logger.error(str(e))
+
+    return ports
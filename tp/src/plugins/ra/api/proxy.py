@@ -0,0 +1,18 @@
+from vFense.server.handlers import BaseHandler
+from vFense.server.hierarchy.decorators import authenticated_request
+
+from vFense.plugins.ra.novnc import proxy_metrics
+
+
+class ProxyMetrics(BaseHandler):
+
+    @authenticated_request
+    def get(self):
+
+        results = {
+            'pass': True,
+            'message': 'Remote desktop proxy metrics.',
+            'data': proxy_metrics()
+        }
+
+        self.write_json(results)
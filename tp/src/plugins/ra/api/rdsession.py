@@ -1,5 +1,3 @@
-import json
-
 from vFense.server.handlers import BaseHandler
 
 from vFense.plugins.ra import creator
@@ -18,8 +16,7 @@ class RDSession(BaseHandler):
             user=current_user
         )
 
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
     def delete(self, agent_id=None):
 
@@ -32,5 +29,4 @@ class RDSession(BaseHandler):
             user=current_user
         )
 
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
@@ -19,5 +19,4 @@ class RDPassword(BaseHandler):
             user=current_user
         )
 
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
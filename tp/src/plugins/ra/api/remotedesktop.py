@@ -22,8 +22,7 @@ class RDSession(BaseHandler):
             user=current_user
         )
 
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
     @permission_check(permission=Permission.RemoteAssistance)
     def delete(self):
@@ -37,5 +36,4 @@ class RDSession(BaseHandler):
             user=current_user
         )
 
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
@@ -21,5 +21,4 @@ class SetPassword(BaseHandler):
             customer=current_customer
         )
 
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
@@ -1,5 +1,3 @@
-import json
-
 import tornado.httpserver
 import tornado.web
 import tornado.websocket
@@ -33,8 +31,7 @@ class RDStatusQueue(tornado.websocket.WebSocketHandler):
 
             }
 
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(result, indent=4))
+            self.write_json(result)
 
     @tornado.gen.engine
     def _listen(self):
@@ -1,18 +1,20 @@
 import threading
 import time
 import logging
-import logging.config
 
 from vFense.settings import Default
-from vFense.tunnels import TunnelKey, reverse_tunnel_params
+from vFense.tunnels import ssh_port
 
 from vFense.plugins import ra
 from vFense.plugins.ra.raoperation import store_in_agent_queue, save_operation
 from vFense.plugins.ra.raoperation import RaOperation
 from vFense.plugins.ra.novnc import stop_novnc
+from vFense.plugins.ra.ports import claim_port, renew_ports, release_ports, \
+    SESSION_LEASE, CLOSE_GRACE
+from vFense.logger.logsetup import configure_logging
 
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -63,6 +65,7 @@ def new_rd_session(
                 agent_id=agent_id,
                 status=ra.Status.Ready
             )
+            renew_ports(agent_id, SESSION_LEASE)
 
             return {
                 'pass': False,
@@ -100,24 +103,11 @@ def new_rd_session(
 
     if tunnel_needed:
 
-        params = None
-        port_range = list(ra.PortRange)
-        for p in ra.PortRange:
+        port = claim_port(agent_id)
 
-            params = reverse_tunnel_params(port_range)
-            if ra.db.port_available(
-                port=params[TunnelKey.HostPort]
-            ):
-                break
+        if port:
 
-            port_range.remove(p)
-            params = None
-
-        if params:
-
-            port = params[TunnelKey.HostPort]
-            ssh_port = params[TunnelKey.SSHPort]
-            operation.set_tunnel(host_port=port, ssh_port=ssh_port)
+            operation.set_tunnel(host_port=port, ssh_port=ssh_port())
 
         else:
 
@@ -148,6 +138,8 @@ def new_rd_session(
 
         else:
 
+            release_ports(agent_id, port)
+
             return {
                 'pass': False,
                 'message': msg
@@ -155,6 +147,8 @@ def new_rd_session(
 
     else:
 
+        release_ports(agent_id, port)
+
         return {
             'pass': False,
             'message': "Unable to save operation. Invalid operation ID."
@@ -268,6 +262,9 @@ def set_session_to_timeout(agent_id, user, timeout=120):
             status=ra.Status.Timeout
         ):
 
+            # The ports are freed even if the close thread never runs.
+            renew_ports(agent_id, timeout + CLOSE_GRACE)
+
             threading.Thread(
                 target=grace_close_timeout,
                 args=(agent_id, user, timeout)
@@ -309,6 +306,8 @@ def remove_session(
     if session_msg:
         logger.info(session_msg)
 
+    release_ports(agent_id)
+
     operation = RaOperation(
         ra.RaValue.StopRemoteDesktop,
         agent_id,
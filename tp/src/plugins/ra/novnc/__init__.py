@@ -1,12 +1,16 @@
 import os
+import json
 import subprocess
 import time
 import signal
 
 import logging
-import logging.config
+import redis
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+from vFense.db.client import pool
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 websockify_path = os.path.join(os.path.dirname(__file__), 'websockify')
@@ -16,6 +20,95 @@ web_dir = '/opt/TopPatch/tp/wwwstatic/js/libs/vnc'
 
 _open_processes = {}
 
+# Seconds launch_novnc waits for the RA proxy daemon to listen.
+OPEN_TIMEOUT = 5
+
+
+class ProxyMode():
+
+    # A websockify process per session.
+    Process = 'process'
+    # Every session in the RA proxy daemon (plugins/ra/proxy.py).
+    IOLoop = 'ioloop'
+
+
+ProxyModeValue = ProxyMode.Process
+
+# Process id saved on connections served by the RA proxy daemon.
+ProxyProcessId = 'ra_proxy'
+
+
+class ProxyKey():
+
+    Control = 'vfense:ra:proxy:control'
+    Metrics = 'vfense:ra:proxy:metrics'
+    Reply = 'vfense:ra:proxy:reply:%s'
+
+
+class ProxyAction():
+
+    Open = 'open'
+    Close = 'close'
+
+
+def _proxy_control(action, agent_id, web_port=None, host_port=None,
+                   reply=None):
+
+    return redis.StrictRedis(connection_pool=pool).publish(
+        ProxyKey.Control,
+        json.dumps({
+            'action': action,
+            'agent_id': agent_id,
+            'web_port': web_port,
+            'host_port': host_port,
+            'reply': reply,
+        })
+    )
+
+
+def _proxy_open(agent_id, web_port, host_port):
+    """Asks the RA proxy daemon to open a session and waits up to
+    OPEN_TIMEOUT seconds for it to answer whether it listens.
+    """
+
+    reply = ProxyKey.Reply % (
+        '%s:%d:%f' % (agent_id, os.getpid(), time.time())
+    )
+
+    if not _proxy_control(
+        ProxyAction.Open, agent_id, web_port, host_port, reply
+    ):
+        logger.error('The RA proxy daemon is not running.')
+        return False
+
+    answer = redis.StrictRedis(connection_pool=pool).blpop(
+        reply, timeout=OPEN_TIMEOUT
+    )
+
+    if not answer:
+        logger.error(
+            'The RA proxy did not answer for agent %s' % agent_id
+        )
+        return False
+
+    return json.loads(answer[1])
+
+
+def proxy_metrics():
+    """Gets the metrics of the sessions the RA proxy daemon serves.
+
+    Returns:
+
+        A dict of agent id to the metrics of its session.
+
+    """
+
+    metrics = redis.StrictRedis(connection_pool=pool).hgetall(ProxyKey.Metrics)
+
+    return dict(
+        [(agent_id, json.loads(value)) for agent_id, value in metrics.items()]
+    )
+
 
 def _add_process(process, agent_id):
 
@@ -43,6 +136,11 @@ def stop_novnc(agent_id, pid=None):
 
     try:
 
+        if pid == ProxyProcessId:
+
+            _proxy_control(ProxyAction.Close, agent_id)
+            return True
+
         if pid:
 
             os.kill(pid, signal.SIGKILL)
@@ -65,7 +163,8 @@ def launch_novnc(agent_id=None, web_port=None, host_port=None):
     which is then used by JS.
 
     *Does not check for port usage. If either port is in use, it will fail
-    silently.*
+    silently.* The RA proxy daemon (ProxyMode.IOLoop) does answer whether
+    it could listen on the web port.
 
     Args:
 
@@ -94,6 +193,22 @@ def launch_novnc(agent_id=None, web_port=None, host_port=None):
     result = False
     process_id = None
 
+    if ProxyModeValue == ProxyMode.IOLoop:
+
+        try:
+
+            if _proxy_open(agent_id, web_port, host_port):
+                return True, ProxyProcessId
+
+        except Exception as e:
+
+            logger.error(
+                'Unable to reach the RA proxy for agent %s' % agent_id
+            )
+            logger.error('Exception: %s' % str(e))
+
+        return False, None
+
     cmd = [
         websockify_path,
         '--web',
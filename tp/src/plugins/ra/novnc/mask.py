@@ -0,0 +1,35 @@
+"""
+Unmasking of WebSocket frame payloads without numpy.
+
+Every fourth byte of a payload is XORed with the same mask byte, so the
+payload is split in four strides and each one is translated with the
+XOR table of its mask byte. Slicing and str.translate run in C, no
+Python code runs per byte.
+"""
+
+_XOR_TABLES = [
+    ''.join([chr(i ^ key) for i in range(256)]) for key in range(256)
+]
+
+
+def websocket_mask(mask, data):
+    """XORs data with the 4 byte mask, repeated over its length.
+
+    Args:
+        mask: The 4 byte masking key.
+        data: The payload, a string, buffer or memoryview.
+
+    Returns:
+        The unmasked payload as a string.
+    """
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    elif not isinstance(data, str):
+        data = str(data)
+
+    mask = bytearray(mask)
+    unmasked = bytearray(data)
+    for i in range(min(4, len(data))):
+        unmasked[i::4] = data[i::4].translate(_XOR_TABLES[mask[i]])
+
+    return(str(unmasked))
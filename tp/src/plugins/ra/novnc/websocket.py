@@ -17,8 +17,10 @@ as taken from http://docs.python.org/dev/library/ssl.html#certificates
 '''
 
 import os, sys, time, errno, signal, socket, traceback, select
-import array, struct
+import struct
+from collections import deque
 from vFense.base64 import b64encode, b64decode
+from vFense.plugins.ra.novnc.mask import websocket_mask
 
 # Imports that vary by python version
 
@@ -263,14 +265,7 @@ Sec-WebSocket-Accept: %s\r
                 c = numpy.bitwise_xor(data, mask).tostring()
             return b + c
         else:
-            # Slower fallback
-            mask = buf[hlen:hlen+4]
-            data = array.array('B')
-            mask = s2a(mask)
-            data.fromstring(buf[pstart:pend])
-            for i in range(len(data)):
-                data[i] ^= mask[i % 4]
-            return data.tostring()
+            return websocket_mask(buf[hlen:hlen+4], buf[pstart:pend])
 
     @staticmethod
     def encode_hybi(buf, opcode, base64=False):
@@ -464,14 +459,14 @@ Sec-WebSocket-Accept: %s\r
 
         while self.send_parts:
             # Send pending frames
-            buf = self.send_parts.pop(0)
+            buf = self.send_parts.popleft()
             sent = self.client.send(buf)
 
             if sent == len(buf):
                 self.traffic("<")
             else:
                 self.traffic("<.")
-                self.send_parts.insert(0, buf[sent:])
+                self.send_parts.appendleft(buf[sent:])
                 break
 
         return len(self.send_parts)
@@ -770,7 +765,7 @@ Sec-WebSocket-Accept: %s\r
     def top_new_client(self, startsock, address):
         """ Do something with a WebSockets client connection. """
         # Initialize per client settings
-        self.send_parts = []
+        self.send_parts = deque()
         self.recv_part  = None
         self.base64     = False
         self.rec        = None
@@ -0,0 +1,255 @@
+"""
+Allocation of the ports remote desktop sessions use for their reverse
+tunnel (host port) and their noVNC proxy (web port).
+
+The free ports of ra.PortRange are kept in a Redis set, a port is
+claimed with SPOP and released with SADD, both atomic and O(1), instead
+of scanning the connection table for every port of the range. A claimed
+port is leased to its agent: the lease is renewed while the session
+lives (see plugins/ra/creator.py) and the port goes back to the free set
+once the session is removed, or once the lease expired if the server
+died before it could release it.
+
+The set is seeded once from the port range minus the ports the
+connection table holds, by the one process holding the PortKey.Seeding
+lock. The free set and the PortKey.Seeded flag are written in one
+transaction, a claim that sees the flag sees the whole set, and claims
+made while another process seeds wait for it. A claimed port is checked
+against the ports the system listens on and the connection table
+(indexed lookups), ports in use are held back for a lease and another
+one is claimed.
+"""
+import time
+import logging
+
+import redis
+
+from vFense.db.client import pool
+from vFense.plugins import ra
+from vFense.plugins.ra import _db as db
+from vFense.tunnels import system_ports_used
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+# The agent has this long to open the tunnel, a session that is up keeps
+# its ports for SESSION_LEASE unless it is closed first.
+WAITING_LEASE = 600
+SESSION_LEASE = 86400
+CLOSE_GRACE = 60
+CLAIM_ATTEMPTS = 10
+# Seconds a process may hold the seeding lock, and seconds a claim waits
+# for another process to seed.
+SEED_LOCK_TTL = 60
+SEED_WAIT = 30
+
+
+class PortKey():
+    Free = 'vfense:ra:ports:free'
+    Leases = 'vfense:ra:ports:leases'
+    Owners = 'vfense:ra:ports:owners'
+    Agent = 'vfense:ra:ports:agent:%s'
+    Seeded = 'vfense:ra:ports:seeded'
+    Seeding = 'vfense:ra:ports:seeding'
+    InUse = 'in_use'
+
+
+# Returns the ports whose lease expired to the free set.
+_RECLAIM = """
+local expired = redis.call('zrangebyscore', KEYS[2], '-inf', ARGV[1])
+for i, port in ipairs(expired) do
+    local owner = redis.call('hget', KEYS[3], port)
+    if owner then
+        redis.call('srem', ARGV[2] .. owner, port)
+    end
+    redis.call('hdel', KEYS[3], port)
+    redis.call('zrem', KEYS[2], port)
+    redis.call('sadd', KEYS[1], port)
+end
+"""
+
+_CLAIM_SCRIPT = _RECLAIM + """
+local port = redis.call('spop', KEYS[1])
+if not port then
+    return false
+end
+redis.call('zadd', KEYS[2], ARGV[3], port)
+redis.call('hset', KEYS[3], port, ARGV[4])
+redis.call('sadd', ARGV[2] .. ARGV[4], port)
+return port
+"""
+
+_RENEW_SCRIPT = """
+local ports = redis.call('smembers', KEYS[4])
+for i, port in ipairs(ports) do
+    if redis.call('hget', KEYS[3], port) == ARGV[2] then
+        redis.call('zadd', KEYS[2], ARGV[1], port)
+    else
+        redis.call('srem', KEYS[4], port)
+    end
+end
+return #ports
+"""
+
+_RELEASE_SCRIPT = """
+local ports = {}
+if #ARGV == 1 then
+    ports = redis.call('smembers', KEYS[4])
+else
+    for i = 2, #ARGV do
+        ports[#ports + 1] = ARGV[i]
+    end
+end
+local released = 0
+for i, port in ipairs(ports) do
+    if redis.call('hget', KEYS[3], port) == ARGV[1] then
+        redis.call('hdel', KEYS[3], port)
+        redis.call('zrem', KEYS[2], port)
+        redis.call('sadd', KEYS[1], port)
+        released = released + 1
+    end
+    redis.call('srem', KEYS[4], port)
+end
+return released
+"""
+
+
+class PortAllocator(object):
+
+    def __init__(self, port_range, connection=None):
+        self.port_range = port_range
+        self.redis = connection or redis.StrictRedis(connection_pool=pool)
+        self._claim = self.redis.register_script(_CLAIM_SCRIPT)
+        self._renew = self.redis.register_script(_RENEW_SCRIPT)
+        self._release = self.redis.register_script(_RELEASE_SCRIPT)
+
+    def _keys(self, agent_id=''):
+        return(
+            [
+                PortKey.Free, PortKey.Leases, PortKey.Owners,
+                PortKey.Agent % (agent_id)
+            ]
+        )
+
+    def _fill(self):
+        used = db.ports_in_use()
+        free = [port for port in self.port_range if str(port) not in used]
+        pipe = self.redis.pipeline()
+        pipe.delete(PortKey.Free)
+        for start in xrange(0, len(free), 1000):
+            pipe.sadd(PortKey.Free, *free[start:start + 1000])
+        pipe.set(PortKey.Seeded, int(time.time()))
+        pipe.execute()
+        logger.info('seeded %d free remote assistance ports' % (len(free)))
+
+    def seed(self, wait=SEED_WAIT):
+        """Fills the free set the first time, with the ports of the range
+        no known connection holds. While another process seeds it waits
+        up to wait seconds for it to be done.
+
+        Returns:
+            True if this call seeded the free set.
+        """
+        deadline = time.time() + wait
+        while not self.redis.exists(PortKey.Seeded):
+            locked = self.redis.set(
+                PortKey.Seeding, int(time.time()), ex=SEED_LOCK_TTL, nx=True
+            )
+            if locked:
+                try:
+                    if not self.redis.exists(PortKey.Seeded):
+                        self._fill()
+                        return(True)
+
+                finally:
+                    self.redis.delete(PortKey.Seeding)
+
+            elif time.time() > deadline:
+                logger.warn('remote assistance ports are not seeded yet')
+                return(False)
+
+            else:
+                time.sleep(0.1)
+
+        return(False)
+
+    def claim(self, agent_id, lease=WAITING_LEASE):
+        """Claims a free port for an agent.
+
+        Returns:
+            The port as a string, the way ports are stored on the
+            connection, None if the range is exhausted.
+        """
+        self.seed()
+        system_ports = None
+        for attempt in range(CLAIM_ATTEMPTS):
+            now = time.time()
+            port = (
+                self._claim(
+                    keys=self._keys()[:3],
+                    args=[now, PortKey.Agent % (''), now + lease, agent_id]
+                )
+            )
+            if not port:
+                return(None)
+
+            if system_ports is None:
+                system_ports = set(system_ports_used())
+
+            if int(port) not in system_ports and db.port_available(port):
+                return(str(port))
+
+            # Somebody else uses it, hold it back until the lease expires.
+            pipe = self.redis.pipeline()
+            pipe.hset(PortKey.Owners, port, PortKey.InUse)
+            pipe.srem(PortKey.Agent % (agent_id), port)
+            pipe.execute()
+            logger.warn('remote assistance port %s is in use' % (port))
+
+        return(None)
+
+    def renew(self, agent_id, lease):
+        """Extends the leases of the ports an agent holds to lease seconds
+        from now.
+        """
+        return(
+            self._renew(
+                keys=self._keys(agent_id),
+                args=[time.time() + lease, agent_id]
+            )
+        )
+
+    def release(self, agent_id, *ports):
+        """Returns ports to the free set, all the ports an agent holds
+        when none are given.
+        """
+        return(
+            self._release(
+                keys=self._keys(agent_id),
+                args=[agent_id] + [str(port) for port in ports]
+            )
+        )
+
+
+_allocator = None
+
+
+def allocator():
+    global _allocator
+    if not _allocator:
+        _allocator = PortAllocator(ra.PortRange)
+
+    return(_allocator)
+
+
+def claim_port(agent_id, lease=WAITING_LEASE):
+    return(allocator().claim(agent_id, lease))
+
+
+def renew_ports(agent_id, lease=SESSION_LEASE):
+    return(allocator().renew(agent_id, lease))
+
+
+def release_ports(agent_id, *ports):
+    return(allocator().release(agent_id, *ports))
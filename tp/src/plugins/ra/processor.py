@@ -1,19 +1,18 @@
-import time
 import logging
-import logging.config
 import redis
 
 import settings
 
-from vFense.tunnels import get_available_port
-
 from vFense.plugins import ra
 from vFense.plugins.ra import RaValue
 from vFense.plugins.ra import novnc
 from vFense.plugins.ra.raoperation import save_result
+from vFense.plugins.ra.ports import claim_port, renew_ports, release_ports, \
+    SESSION_LEASE
+from vFense.logger.logsetup import configure_logging
 
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 rq_pool = redis.StrictRedis(
@@ -136,22 +135,7 @@ def _ra_magic(json_operation):
 
         try:
 
-            web_port = None
-            offset = 0
-            while True:
-
-                # Get a port available system level.
-                web_port = get_available_port(ra.PortRange, offset)
-                # Checks if a port is reserved for a connection.
-                if ra.db.port_available(port=web_port):
-                    break
-
-                offset += 1
-
-                if offset == 5000:
-                    web_port = None
-                    break
-                time.sleep(0.3)
+            web_port = claim_port(agent_id, SESSION_LEASE)
 
             if web_port is None:
                 raise Exception("No web port available.")
@@ -185,6 +169,7 @@ def _ra_magic(json_operation):
             )
 
             ra.db.remove_connection(agent_id=agent_id)
+            release_ports(agent_id)
 
             return
 
@@ -208,6 +193,7 @@ def _ra_magic(json_operation):
                 status=ra.Status.Ready,
                 process_id=pid
             )
+            renew_ports(agent_id, SESSION_LEASE)
             save_result(
                 agent_id,
                 operation_id,
@@ -231,6 +217,7 @@ def _ra_magic(json_operation):
             )
 
             ra.db.remove_connection(agent_id=agent_id)
+            release_ports(agent_id)
 
             save_result(
                 agent_id,
@@ -251,6 +238,7 @@ def _ra_magic(json_operation):
         )
 
         ra.db.remove_connection(agent_id=agent_id)
+        release_ports(agent_id)
 
         logger.error(
             '%s - Unable to create remote desktop for agent: %s. '
@@ -0,0 +1,377 @@
+"""
+Remote desktop proxy daemon.
+
+Serves the remote desktop sessions from one process on the tornado
+IOLoop instead of a websockify process per session (see
+novnc.ProxyMode). launch_novnc publishes an open command on
+novnc.ProxyKey.Control, the daemon starts listening on the web port of
+the session, serves the noVNC files and proxies /websockify to the
+reverse tunnel on the host port. Whether it could listen is pushed to
+the reply key of the command, launch_novnc waits for it. stop_novnc
+publishes a close command.
+Sessions are reloaded from the connection table on start.
+
+Each direction of a connection is an event driven pump: client frames
+are written to the VNC stream as they arrive and the VNC stream is read
+with partial reads and forwarded as binary frames, the next read waits
+until the frame is flushed, so a slow browser slows the VNC server down
+instead of growing a buffer. Frames are unmasked with
+novnc.mask.websocket_mask when tornado has no C speedups.
+
+Every METRICS_INTERVAL seconds the clients are pinged and the bytes,
+bandwidth and ping round trip of every session are written to
+novnc.ProxyKey.Metrics, see novnc.proxy_metrics.
+
+    python proxy.py
+"""
+import json
+import base64
+import signal
+import socket
+import logging
+import threading
+from time import time
+from collections import deque
+
+import redis
+import tornado.gen
+import tornado.web
+import tornado.ioloop
+import tornado.netutil
+import tornado.options
+import tornado.iostream
+import tornado.websocket
+import tornado.httpserver
+
+from vFense.db.client import db_create_close, r, pool
+from vFense.plugins.ra import _db
+from vFense.plugins.ra.novnc import web_dir, ProxyKey, ProxyAction, \
+    ProxyProcessId, OPEN_TIMEOUT
+from vFense.plugins.ra.novnc.mask import websocket_mask
+from vFense.logger.logsetup import configure_logging
+
+try:
+    import tornado.speedups
+except ImportError:
+    # tornado's own fallback XORs one byte at a time.
+    tornado.websocket._websocket_mask = websocket_mask
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+READ_SIZE = 65536
+METRICS_INTERVAL = 5
+LATENCY_SAMPLES = 12
+
+
+class ProxySession(object):
+
+    def __init__(self, agent_id, web_port, host_port):
+        self.agent_id = agent_id
+        self.web_port = int(web_port)
+        self.host_port = int(host_port)
+        self.server = None
+        self.clients = set()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.frames_in = 0
+        self.frames_out = 0
+        self.latency = deque(maxlen=LATENCY_SAMPLES)
+        self.started = time()
+        self._last = (self.started, 0, 0)
+
+    def start(self):
+        app = tornado.web.Application(
+            [
+                (r"/websockify/?", ProxyWebSocket, {'session': self}),
+                (r"/(.*)", tornado.web.StaticFileHandler,
+                 {'path': web_dir, 'default_filename': 'vnc.html'}),
+            ]
+        )
+        self.server = tornado.httpserver.HTTPServer(app)
+        self.server.add_sockets(tornado.netutil.bind_sockets(self.web_port))
+
+    def stop(self):
+        if self.server:
+            self.server.stop()
+            self.server = None
+
+        for client in list(self.clients):
+            client.close()
+
+    def ping(self):
+        for client in self.clients:
+            try:
+                client.ping(repr(time()))
+            except tornado.websocket.WebSocketClosedError:
+                pass
+
+    def metrics(self, now):
+        last, bytes_in, bytes_out = self._last
+        elapsed = max(now - last, 0.001)
+        self._last = (now, self.bytes_in, self.bytes_out)
+        latency = None
+        if self.latency:
+            latency = round(sum(self.latency) / len(self.latency) * 1000, 2)
+
+        return(
+            {
+                'web_port': self.web_port,
+                'host_port': self.host_port,
+                'clients': len(self.clients),
+                'uptime': int(now - self.started),
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'frames_in': self.frames_in,
+                'frames_out': self.frames_out,
+                'in_bps': int((self.bytes_in - bytes_in) * 8 / elapsed),
+                'out_bps': int((self.bytes_out - bytes_out) * 8 / elapsed),
+                'latency_ms': latency,
+            }
+        )
+
+
+class ProxyWebSocket(tornado.websocket.WebSocketHandler):
+
+    def initialize(self, session):
+        self.session = session
+        self.target = None
+        self.pending = deque()
+        self.base64 = False
+
+    def check_origin(self, origin):
+        # Requests come through nginx, like they did to websockify.
+        return True
+
+    def select_subprotocol(self, subprotocols):
+        if 'binary' in subprotocols:
+            return 'binary'
+
+        if 'base64' in subprotocols:
+            self.base64 = True
+            return 'base64'
+
+        return None
+
+    def open(self):
+        self.session.clients.add(self)
+        self.set_nodelay(True)
+        self._connect()
+
+    @tornado.gen.coroutine
+    def _connect(self):
+        target = tornado.iostream.IOStream(
+            socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        )
+        try:
+            target.set_nodelay(True)
+            yield target.connect(('127.0.0.1', self.session.host_port))
+
+        except Exception as e:
+            logger.error(
+                'RA proxy could not reach port %d for agent %s: %s'
+                % (self.session.host_port, self.session.agent_id, e)
+            )
+            target.close()
+            self.close()
+            return
+
+        if not self.ws_connection:
+            target.close()
+            return
+
+        self.target = target
+        self.target.set_close_callback(self._target_closed)
+        while self.pending:
+            self.target.write(self.pending.popleft())
+
+        yield self._pump()
+
+    @tornado.gen.coroutine
+    def _pump(self):
+        try:
+            while self.ws_connection:
+                data = yield self.target.read_bytes(READ_SIZE, partial=True)
+                self.session.bytes_out += len(data)
+                self.session.frames_out += 1
+                if self.base64:
+                    flushed = self.write_message(base64.b64encode(data))
+                else:
+                    flushed = self.write_message(data, binary=True)
+
+                if flushed is not None:
+                    yield flushed
+
+        except (tornado.iostream.StreamClosedError,
+                tornado.websocket.WebSocketClosedError):
+            pass
+
+    def _target_closed(self):
+        self.close()
+
+    def on_message(self, message):
+        if self.base64:
+            message = base64.b64decode(message)
+
+        self.session.bytes_in += len(message)
+        self.session.frames_in += 1
+        if self.target:
+            self.target.write(message)
+        else:
+            self.pending.append(message)
+
+    def on_pong(self, data):
+        try:
+            self.session.latency.append(time() - float(data))
+        except ValueError:
+            pass
+
+    def on_close(self):
+        self.session.clients.discard(self)
+        if self.target:
+            self.target.close()
+
+
+@db_create_close
+def _proxy_connections(conn=None):
+    return(
+        list(
+            r
+            .table(_db.Collection.KnownConnections)
+            .filter({_db.CollectionKeys.ProcessId: ProxyProcessId})
+            .run(conn)
+        )
+    )
+
+
+class RaProxy():
+
+    def __init__(self):
+        self.ioloop = tornado.ioloop.IOLoop.instance()
+        self.redis = redis.StrictRedis(connection_pool=pool)
+        self.sessions = {}
+
+    def open_session(self, agent_id, web_port, host_port):
+        """Returns True if the session is served, False if the web port
+        could not be listened on.
+        """
+        session = self.sessions.get(agent_id)
+        if session:
+            if (session.web_port == int(web_port) and
+                    session.host_port == int(host_port)):
+                return True
+
+            self.close_session(agent_id)
+
+        session = ProxySession(agent_id, web_port, host_port)
+        try:
+            session.start()
+            self.sessions[agent_id] = session
+            logger.info(
+                'RA proxy serving agent %s on port %s'
+                % (agent_id, web_port)
+            )
+            return True
+
+        except Exception as e:
+            logger.error(
+                'RA proxy could not listen on port %s for agent %s: %s'
+                % (web_port, agent_id, e)
+            )
+            return False
+
+    def close_session(self, agent_id):
+        session = self.sessions.pop(agent_id, None)
+        if session:
+            session.stop()
+            self.redis.hdel(ProxyKey.Metrics, agent_id)
+            logger.info('RA proxy closed the session of agent %s' % agent_id)
+
+    def handle(self, command):
+        action = command.get('action')
+        if action == ProxyAction.Open:
+            serving = self.open_session(
+                command['agent_id'], command['web_port'],
+                command['host_port']
+            )
+            if command.get('reply'):
+                self._reply(command['reply'], serving)
+
+        elif action == ProxyAction.Close:
+            self.close_session(command['agent_id'])
+
+    def _reply(self, key, serving):
+        try:
+            pipe = self.redis.pipeline()
+            pipe.lpush(key, json.dumps(serving))
+            pipe.expire(key, OPEN_TIMEOUT * 2)
+            pipe.execute()
+
+        except Exception as e:
+            logger.exception(e)
+
+    def _listen(self):
+        pubsub = self.redis.pubsub()
+        pubsub.subscribe(ProxyKey.Control)
+        for message in pubsub.listen():
+            if message['type'] != 'message':
+                continue
+
+            try:
+                self.ioloop.add_callback(
+                    self.handle, json.loads(message['data'])
+                )
+            except ValueError:
+                logger.error('RA proxy got an invalid command')
+
+    def report(self):
+        now = time()
+        metrics = {}
+        for agent_id, session in self.sessions.items():
+            session.ping()
+            metrics[agent_id] = json.dumps(session.metrics(now))
+
+        try:
+            pipe = self.redis.pipeline()
+            pipe.delete(ProxyKey.Metrics)
+            if metrics:
+                pipe.hmset(ProxyKey.Metrics, metrics)
+            pipe.execute()
+
+        except Exception as e:
+            logger.exception(e)
+
+    def reload(self):
+        for connection in _proxy_connections():
+            if (connection.get(_db.CollectionKeys.WebPort) and
+                    connection.get(_db.CollectionKeys.HostPort)):
+                self.open_session(
+                    connection[_db.CollectionKeys.AgentId],
+                    connection[_db.CollectionKeys.WebPort],
+                    connection[_db.CollectionKeys.HostPort]
+                )
+
+    def stop(self, *args):
+        self.ioloop.add_callback_from_signal(self.ioloop.stop)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        listener = threading.Thread(target=self._listen)
+        listener.daemon = True
+        listener.start()
+        self.reload()
+        tornado.ioloop.PeriodicCallback(
+            self.report, METRICS_INTERVAL * 1000, io_loop=self.ioloop
+        ).start()
+        logger.info('RA proxy started, %d sessions' % (len(self.sessions)))
+        self.ioloop.start()
+
+        for agent_id in self.sessions.keys():
+            self.close_session(agent_id)
+        logger.info('RA proxy has shutdown')
+
+
+if __name__ == '__main__':
+    tornado.options.parse_command_line()
+    RaProxy().run()
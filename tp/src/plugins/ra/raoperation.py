@@ -1,5 +1,4 @@
 import logging
-import logging.config
 
 from vFense.receiver.rqueuemanager import QueueWorker
 from vFense.settings import Default
@@ -9,8 +8,9 @@ from vFense.errorz.error_messages import OperationCodes
 
 from vFense.plugins import ra
 from vFense.plugins.ra import DesktopProtocol
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('raapi')
 
 
@@ -10,8 +10,9 @@ from vFense.server.hierarchy.manager import get_current_customer_name
 
 from vFense.receiver.corehandler import process_queue_data
 from vFense.receiver.rqueuemanager import QueueWorker
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvlistener')
 
 
@@ -3,28 +3,28 @@ import sys
 import tornado.httpserver
 import tornado.web
 
-from json import dumps
-
 from vFense.server.handlers import BaseHandler
 
 from vFense.server.hierarchy.decorators import agent_authenticated_request
-from vFense.server.hierarchy.decorators import convert_json_to_arguments
+from vFense.server.hierarchy.decorators import stream_json_to_arguments
 from vFense.agent import *
 from vFense.operations import *
 from vFense.agent.agents import add_agent
 from vFense.errorz.error_messages import GenericResults
 from vFense.receiver.rvhandler import RvHandOff
+from vFense.receiver.staging import StagedList, staged_count
+from vFense.logger.logsetup import configure_logging
 
 import plugins.ra.handoff as RaHandoff
 #from server.handlers import *
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvlistener')
 
 
 class NewAgentV1(BaseHandler):
     @agent_authenticated_request
-    @convert_json_to_arguments
+    @stream_json_to_arguments(StagedList, 'plugins.rv.data')
     def post(self):
         username = self.get_current_user()
         customer_name = self.arguments.get(AgentKey.CustomerName)
@@ -34,7 +34,11 @@ class NewAgentV1(BaseHandler):
         hardware = self.arguments.get(AgentKey.Hardware)
         uri = self.request.uri
         method = self.request.method
-        logger.info('data received on newagent: %s' % (self.request.body))
+        rv_apps = (plugins or {}).get('rv', {}).get('data')
+        logger.info(
+            '%s - newagent request received, %d bytes, %d apps'
+            % (username, len(self.request.body), staged_count(rv_apps))
+        )
 
         try:
             new_agent = (
@@ -67,11 +71,10 @@ class NewAgentV1(BaseHandler):
 
                 except Exception as e:
                     logger.exception(e)
-                self.write(dumps(new_agent, indent=4))
+                self.write_json(new_agent)
 
             else:
-                self.set_header('Content-Type', 'application/json')
-                self.write(dumps(new_agent, indent=4))
+                self.write_json(new_agent)
 
         except Exception as e:
             status = (
@@ -80,4 +83,4 @@ class NewAgentV1(BaseHandler):
                 ).something_broke('agent', 'new_agent', e)
             )
             logger.exception(e)
-            self.write(dumps(status, indent=4))
+            self.write_json(status)
@@ -2,22 +2,20 @@ import logging
 import tornado.httpserver
 import tornado.web
 
-import simplejson as json
-from json import dumps
-
 from vFense.server.handlers import BaseHandler
 from vFense.server.hierarchy.manager import get_current_customer_name
 from vFense.server.hierarchy.decorators import agent_authenticated_request
 from vFense.server.hierarchy.decorators import convert_json_to_arguments
 
 from vFense.db.update_table import AddResults
-from vFense.db.notification_sender import send_notifications
+from vFense.db.notification_sender import queue_notifications
 from vFense.errorz.error_messages import GenericResults
 from vFense.errorz.status_codes import OperationCodes
+from vFense.logger.logsetup import configure_logging
 
 #from server.handlers import *
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvlistener')
 
 
@@ -41,9 +39,8 @@ class RebootResultsV1(BaseHandler):
             )
             results_data = results.reboot()
             self.set_status(results_data['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(dumps(results_data, indent=4))
-            send_notifications(username, customer_name, oper_id, agent_id)
+            self.write_json(results_data)
+            queue_notifications(username, customer_name, oper_id, agent_id)
         except Exception as e:
             results = (
                 GenericResults(
@@ -53,8 +50,7 @@ class RebootResultsV1(BaseHandler):
             logger.exception(results)
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(dumps(results, indent=4))
+            self.write_json(results)
             
 
 class ShutdownResultsV1(BaseHandler):
@@ -77,9 +73,8 @@ class ShutdownResultsV1(BaseHandler):
             )
             results_data = results.shutdown()
             self.set_status(results_data['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(dumps(results_data, indent=4))
-            send_notifications(username, customer_name, oper_id, agent_id)
+            self.write_json(results_data)
+            queue_notifications(username, customer_name, oper_id, agent_id)
         except Exception as e:
             results = (
                 GenericResults(
@@ -89,6 +84,5 @@ class ShutdownResultsV1(BaseHandler):
             logger.exception(results)
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(dumps(results, indent=4))
+            self.write_json(results)
             
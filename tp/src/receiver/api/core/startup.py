@@ -2,12 +2,10 @@ import logging
 import tornado.httpserver
 import tornado.web
 
-from json import dumps
-
 from vFense.server.handlers import BaseHandler
 from vFense.server.hierarchy.manager import get_current_customer_name
 from vFense.server.hierarchy.decorators import agent_authenticated_request
-from vFense.server.hierarchy.decorators import convert_json_to_arguments
+from vFense.server.hierarchy.decorators import stream_json_to_arguments
 
 from vFense.agent import *
 from vFense.errorz.error_messages import GenericResults
@@ -17,16 +15,19 @@ from vFense.receiver.corehandler import process_queue_data
 from vFense.receiver.rqueuemanager import QueueWorker
 
 from vFense.receiver.rvhandler import RvHandOff
+from vFense.receiver.staging import StagedList, staged_count
 import plugins.ra.handoff as RaHandoff
+
+from vFense.logger.logsetup import configure_logging
 #from server.handlers import *
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvlistener')
 
 
 class StartUpV1(BaseHandler):
     @agent_authenticated_request
-    @convert_json_to_arguments
+    @stream_json_to_arguments(StagedList, 'plugins.rv.data')
     def put(self, agent_id):
         try:
             username = self.get_current_user()
@@ -37,8 +38,13 @@ class StartUpV1(BaseHandler):
             plugins = self.arguments.get(AgentKey.Plugins)
             system_info = self.arguments.get(AgentKey.SystemInfo)
             hardware = self.arguments.get(AgentKey.Hardware)
+            rv_apps = (plugins or {}).get('rv', {}).get('data')
             logger.info(
-                'data received on startup: %s' % self.request.body
+                '%s - startup received from %s, %d bytes, %d apps'
+                % (
+                    username, agent_id, len(self.request.body),
+                    staged_count(rv_apps)
+                )
             )
             agent_data = (
                 update_agent(
@@ -64,8 +70,7 @@ class StartUpV1(BaseHandler):
                 if 'ra' in plugins:
                     RaHandoff.startup(agent_id, plugins['ra'])
 
-            self.set_header('Content-Type', 'application/json')
-            self.write(dumps(agent_data))
+            self.write_json(agent_data)
 
         except Exception as e:
             status = (
@@ -75,4 +80,4 @@ class StartUpV1(BaseHandler):
             )
 
             logger.exception(status['message'])
-            self.write(dumps(status))
+            self.write_json(status)
@@ -3,9 +3,6 @@ import tornado.httpserver
 import tornado.web
 from datetime import datetime
 
-import simplejson as json
-from json import dumps
-
 from vFense.errorz.error_messages import GenericResults
 from vFense.server.handlers import BaseHandler, LoginHandler
 from vFense.server.hierarchy.manager import get_current_customer_name
@@ -17,11 +14,12 @@ from vFense.receiver.corehandler import process_queue_data
 from vFense.receiver.rqueuemanager import QueueWorker
 from vFense.receiver.rvhandler import RvHandOff
 
-from vFense.plugins.monit import update_agent_monit_stats
+from vFense.plugins.monit.ingest import queue_sample
+from vFense.logger.logsetup import configure_logging
 
 #from server.handlers import *
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvlistener')
 
 
@@ -38,20 +36,14 @@ class UpdateMonitoringStatsV1(BaseHandler):
             cpu = data['cpu']
             file_system = data['file_system']
 
-            update_agent_monit_stats(
-                agent=agent_id,
-                memory=mem,
-                cpu=cpu,
-                file_system=file_system
-            )
+            queue_sample(agent_id, mem, cpu, file_system)
             results = (
                 GenericResults(
                     username, uri, method
                 ).object_updated(agent_id, 'monitoring data')
             )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(dumps(results, indent=4))
+            self.write_json(results)
 
 
         except Exception as e:
@@ -63,5 +55,4 @@ class UpdateMonitoringStatsV1(BaseHandler):
             logger.exception(results)
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(dumps(results, indent=4))
+            self.write_json(results)
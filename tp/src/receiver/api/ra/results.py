@@ -14,8 +14,9 @@ from vFense.db.update_table import AddResults
 from vFense.errorz.error_messages import AgentResults
 
 from vFense.plugins.ra.processor import Processor
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvlistener')
 
 
@@ -33,8 +34,8 @@ class RemoteDesktopResults(BaseHandler):
         error = self.arguments.get('error', None)
 
         logger.info(
-            'Data received on remote desktop results: %s' %
-            (self.request.body)
+            'remote desktop results received from %s, operation %s: %s'
+            % (agent_id, operation_id, operation_type)
         )
 
         processor = Processor()
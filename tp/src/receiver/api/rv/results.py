@@ -2,9 +2,6 @@ import logging
 import tornado.httpserver
 import tornado.web
 
-import simplejson as json
-from json import dumps
-
 from vFense.receiver.rvhandler import RvHandOff
 from vFense.server.handlers import BaseHandler
 from vFense.server.hierarchy.manager import get_current_customer_name
@@ -12,12 +9,13 @@ from vFense.server.hierarchy.decorators import agent_authenticated_request
 from vFense.server.hierarchy.decorators import convert_json_to_arguments
 
 from vFense.db.update_table import AddAppResults
-from vFense.db.notification_sender import send_notifications
+from vFense.db.notification_sender import queue_notifications
 from vFense.errorz.error_messages import GenericResults
 from vFense.errorz.status_codes import OperationCodes
+from vFense.logger.logsetup import configure_logging
 
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvlistener')
 
 
@@ -30,7 +28,10 @@ class InstallOsAppsResults(BaseHandler):
         uri = self.request.uri
         method = self.request.method
         try:
-            logger.info(self.request.body)
+            logger.info(
+                '%s - install_os_apps results received from %s, %d bytes'
+                % (username, agent_id, len(self.request.body))
+            )
             oper_id = self.arguments.get('operation_id')
             data = self.arguments.get('data')
             apps_to_delete = self.arguments.get('apps_to_delete', [])
@@ -49,9 +50,8 @@ class InstallOsAppsResults(BaseHandler):
             )
             results_data = results.install_os_apps(data)
             self.set_status(results_data['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(dumps(results_data, indent=4))
-            send_notifications(username, customer_name, oper_id, agent_id)
+            self.write_json(results_data)
+            queue_notifications(username, customer_name, oper_id, agent_id)
         except Exception as e:
             results = (
                 GenericResults(
@@ -61,8 +61,7 @@ class InstallOsAppsResults(BaseHandler):
             logger.exception(results)
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(dumps(results, indent=4))
+            self.write_json(results)
 
 
 class InstallCustomAppsResults(BaseHandler):
@@ -74,7 +73,10 @@ class InstallCustomAppsResults(BaseHandler):
         uri = self.request.uri
         method = self.request.method
         try:
-            logger.info(self.request.body)
+            logger.info(
+                '%s - install_custom_apps results received from %s, %d bytes'
+                % (username, agent_id, len(self.request.body))
+            )
             oper_id = self.arguments.get('operation_id')
             data = self.arguments.get('data')
             apps_to_delete = self.arguments.get('apps_to_delete', [])
@@ -95,9 +97,8 @@ class InstallCustomAppsResults(BaseHandler):
             data = results.install_custom_apps(data)
 
             self.set_status(data['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(dumps(data, indent=4))
-            send_notifications(username, customer_name, oper_id, agent_id)
+            self.write_json(data)
+            queue_notifications(username, customer_name, oper_id, agent_id)
         except Exception as e:
             results = (
                 GenericResults(
@@ -107,8 +108,7 @@ class InstallCustomAppsResults(BaseHandler):
             logger.exception(results)
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(dumps(results, indent=4))
+            self.write_json(results)
 
 
 class InstallSupportedAppsResults(BaseHandler):
@@ -141,9 +141,8 @@ class InstallSupportedAppsResults(BaseHandler):
 
             self.set_status(data['http_status'])
             self.set_header('Content-Type', 'application/json')
-            self.set_header('Content-Type', 'application/json')
-            self.write(dumps(data, indent=4))
-            send_notifications(username, customer_name, oper_id, agent_id)
+            self.write_json(data)
+            queue_notifications(username, customer_name, oper_id, agent_id)
         except Exception as e:
             results = (
                 GenericResults(
@@ -153,8 +152,7 @@ class InstallSupportedAppsResults(BaseHandler):
             logger.exception(results)
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(dumps(results, indent=4))
+            self.write_json(results)
 
 
 class InstallAgentAppsResults(BaseHandler):
@@ -166,7 +164,10 @@ class InstallAgentAppsResults(BaseHandler):
         uri = self.request.uri
         method = self.request.method
         try:
-            logger.info(self.request.body)
+            logger.info(
+                '%s - install_agent_apps results received from %s, %d bytes'
+                % (username, agent_id, len(self.request.body))
+            )
             oper_id = self.arguments.get('operation_id')
             data = self.arguments.get('data')
             apps_to_delete = self.arguments.get('apps_to_delete', [])
@@ -188,9 +189,8 @@ class InstallAgentAppsResults(BaseHandler):
 
             self.set_status(data['http_status'])
             self.set_header('Content-Type', 'application/json')
-            self.set_header('Content-Type', 'application/json')
-            self.write(dumps(data, indent=4))
-            send_notifications(username, customer_name, oper_id, agent_id)
+            self.write_json(data)
+            queue_notifications(username, customer_name, oper_id, agent_id)
         except Exception as e:
             results = (
                 GenericResults(
@@ -200,8 +200,7 @@ class InstallAgentAppsResults(BaseHandler):
             logger.exception(results)
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(dumps(results, indent=4))
+            self.write_json(results)
 
 
 class UnInstallAppsResults(BaseHandler):
@@ -213,7 +212,10 @@ class UnInstallAppsResults(BaseHandler):
         uri = self.request.uri
         method = self.request.method
         try:
-            logger.info(self.request.body)
+            logger.info(
+                '%s - uninstall_apps results received from %s, %d bytes'
+                % (username, agent_id, len(self.request.body))
+            )
             oper_id = self.arguments.get('operation_id')
             data = self.arguments.get('data')
             apps_to_delete = self.arguments.get('apps_to_delete', [])
@@ -232,9 +234,8 @@ class UnInstallAppsResults(BaseHandler):
             )
             results_data = results.install_os_apps(data)
             self.set_status(results_data['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(dumps(results_data, indent=4))
-            send_notifications(username, customer_name, oper_id, agent_id)
+            self.write_json(results_data)
+            queue_notifications(username, customer_name, oper_id, agent_id)
         except Exception as e:
             results = (
                 GenericResults(
@@ -244,5 +245,4 @@ class UnInstallAppsResults(BaseHandler):
             logger.exception(results)
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(dumps(results, indent=4))
+            self.write_json(results)
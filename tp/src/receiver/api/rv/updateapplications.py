@@ -9,19 +9,21 @@ from vFense.errorz.error_messages import GenericResults, UpdateApplicationsResul
 from vFense.server.handlers import BaseHandler
 from vFense.server.hierarchy.manager import get_current_customer_name
 from vFense.server.hierarchy.decorators import agent_authenticated_request
-from vFense.server.hierarchy.decorators import convert_json_to_arguments
+from vFense.server.hierarchy.decorators import stream_json_to_arguments
 
 from vFense.receiver.rvhandler import RvHandOff
+from vFense.receiver.staging import StagedList
+from vFense.logger.logsetup import configure_logging
 
 #from server.handlers import *
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvlistener')
 
 
 class UpdateApplicationsV1(BaseHandler):
     @agent_authenticated_request
-    @convert_json_to_arguments
+    @stream_json_to_arguments(StagedList, 'data')
     def put(self, agent_id):
         username = self.get_current_user()
         customer_name = get_current_customer_name(username)
@@ -2,8 +2,9 @@ import logging
 
 from vFense.operations.operation_manager import Operation
 from vFense.operations import *
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 #process that data!!
@@ -0,0 +1,478 @@
+"""
+Priority lanes and per customer fair scheduling in front of the RQ
+queues.
+
+The RQ queues are FIFO, so one customer refreshing thousands of agents
+delays the single new agent of another customer, and a user deleting an
+agent waits behind the background syncs. Producers call fair_enqueue
+instead of enqueuing on the RQ queue. The job is kept in Redis in a
+list per (queue, lane, customer), and the fair queue daemon
+(receiver/fairqueued.py) moves jobs onto the RQ queue only while it
+holds fewer than READY_PER_WORKER jobs per worker listening on it, and
+at least READY_DEPTH, so the order the workers see is the order
+FairPolicy picks:
+
+    * the lane is picked by smooth weighted round robin, LANE_WEIGHTS,
+      among the lanes that hold jobs. Interactive work goes first but a
+      busy interactive lane does not starve the others.
+    * within the lane the customer is picked by start time fair
+      queuing, every job charges its customer 1 / weight of virtual
+      time and the customer that used the least goes next. Weights are
+      1 unless set with set_customer_weight.
+
+While the daemon is not running (its heartbeat expired) fair_enqueue
+enqueues on the RQ queue directly, like before.
+
+The depth, the wait time of the dispatched jobs and the age of the
+oldest pending job of every queue and lane are returned by
+queue_metrics.
+"""
+import json
+import logging
+from time import time
+from uuid import uuid4
+
+import redis
+from rq import Queue
+
+from vFense.db.client import pool
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+# Jobs the daemon keeps on each RQ queue for every worker listening on
+# it, enough that a worker never waits on the daemon, and the least it
+# keeps on a queue no worker listens on yet.
+READY_PER_WORKER = 2
+READY_DEPTH = 2
+HEARTBEAT_TTL = 15
+SYSTEM_CUSTOMER = '_system'
+
+
+class Lane():
+    Interactive = 'interactive'
+    Ingest = 'ingest'
+    Sync = 'sync'
+    Download = 'download'
+
+
+LANES = (Lane.Interactive, Lane.Ingest, Lane.Sync, Lane.Download)
+
+LANE_WEIGHTS = {
+    Lane.Interactive: 8,
+    Lane.Ingest: 4,
+    Lane.Sync: 2,
+    Lane.Download: 1,
+}
+
+# RQ queues behind the fair queue, the others are enqueued directly.
+FAIR_QUEUES = (
+    'incoming_updates', 'downloader', 'delete_agent', 'move_agent'
+)
+
+
+class FairKey():
+    Jobs = 'vfense:fairq:jobs:%s:%s:%s'
+    Customers = 'vfense:fairq:customers:%s:%s'
+    Metrics = 'vfense:fairq:metrics'
+    Weights = 'vfense:fairq:weights'
+    Wakeup = 'vfense:fairq:wakeup'
+    Heartbeat = 'vfense:fairq:dispatcher'
+
+
+class FairJobKey():
+    JobId = 'job_id'
+    Queue = 'queue'
+    Lane = 'lane'
+    CustomerName = 'customer_name'
+    Func = 'func'
+    Args = 'args'
+    Timeout = 'timeout'
+    Enqueued = 'enqueued'
+
+
+class FairMetricKey():
+    Depth = 'depth'
+    Enqueued = 'enqueued'
+    Dispatched = 'dispatched'
+    WaitTotal = 'wait_total'
+    WaitMax = 'wait_max'
+    LastWait = 'last_wait'
+    AverageWait = 'average_wait'
+    OldestAge = 'oldest_age'
+    Customers = 'customers'
+    Ready = 'ready'
+    Lanes = 'lanes'
+    DispatcherRunning = 'dispatcher_running'
+
+
+# Counters of a lane are fields "<queue>:<lane>:<counter>" of the
+# metrics hash.
+def lane_metric(queue, lane, counter):
+    return('%s:%s:%s' % (queue, lane, counter))
+
+
+_ENQUEUE_SCRIPT = """
+if redis.call('exists', KEYS[5]) == 0 then
+    return 0
+end
+redis.call('rpush', KEYS[1], ARGV[1])
+redis.call('sadd', KEYS[2], ARGV[2])
+redis.call('hincrby', KEYS[3], ARGV[3] .. ':depth', 1)
+redis.call('hincrby', KEYS[3], ARGV[3] .. ':enqueued', 1)
+if redis.call('llen', KEYS[4]) == 0 then
+    redis.call('rpush', KEYS[4], 1)
+end
+return 1
+"""
+
+_POP_SCRIPT = """
+local job = redis.call('lpop', KEYS[1])
+if redis.call('llen', KEYS[1]) == 0 then
+    redis.call('srem', KEYS[2], ARGV[1])
+end
+if job then
+    redis.call('hincrby', KEYS[3], ARGV[2] .. ':depth', -1)
+end
+return job
+"""
+
+
+def fair_redis():
+    return(redis.StrictRedis(connection_pool=pool))
+
+
+def func_path(func):
+    """Returns the import path RQ runs a function by."""
+    if isinstance(func, basestring):
+        return(func)
+
+    return('%s.%s' % (func.__module__, func.__name__))
+
+
+class FairPolicy(object):
+    """Picks the lane and the customer of the next job of a queue.
+
+    The policy only keeps the virtual times, the caller tells it which
+    lanes and customers hold jobs, so the daemon and the load simulator
+    share it.
+
+    Kwargs:
+        lane_weights (dict): Weight of each lane.
+        customer_weights (dict): Weight of each customer, 1 if missing.
+    """
+
+    def __init__(self, lane_weights=None, customer_weights=None):
+        self.lane_weights = lane_weights or LANE_WEIGHTS
+        self.customer_weights = customer_weights or {}
+        self.lane_credits = {}
+        self.start_tags = {}
+        self.clocks = {}
+
+    def pick_lane(self, queue, lanes):
+        """Smooth weighted round robin over the lanes that hold jobs.
+
+        Args:
+            queue (str): The RQ queue.
+            lanes (list): Lanes holding jobs.
+        """
+        credits = self.lane_credits.setdefault(queue, {})
+        for lane in credits.keys():
+            if lane not in lanes:
+                del credits[lane]
+
+        best = None
+        total = 0
+        for lane in LANES:
+            if lane not in lanes:
+                continue
+
+            weight = self.lane_weights.get(lane, 1)
+            credits[lane] = credits.get(lane, 0) + weight
+            total += weight
+            if best is None or credits[lane] > credits[best]:
+                best = lane
+
+        if best is not None:
+            credits[best] -= total
+
+        return(best)
+
+    def pick_customer(self, queue, lane, customers):
+        """Returns the customer with the lowest start time.
+
+        A customer that was idle starts at the virtual time of the lane,
+        it gets no credit for the time it did not use.
+
+        Args:
+            queue (str): The RQ queue.
+            lane (str): The lane picked.
+            customers (list): Customers holding jobs in the lane.
+        """
+        tags = self.start_tags.setdefault((queue, lane), {})
+        clock = self.clocks.get((queue, lane), 0.0)
+        for customer in tags.keys():
+            if customer not in customers and tags[customer] <= clock:
+                del tags[customer]
+
+        best = None
+        for customer in sorted(customers):
+            tags[customer] = max(tags.get(customer, 0.0), clock)
+            if best is None or tags[customer] < tags[best]:
+                best = customer
+
+        return(best)
+
+    def charge(self, queue, lane, customer):
+        """Charges the customer for the job that was dispatched."""
+        tags = self.start_tags.setdefault((queue, lane), {})
+        start = tags.get(customer, self.clocks.get((queue, lane), 0.0))
+        self.clocks[(queue, lane)] = start
+        tags[customer] = (
+            start + 1.0 / max(self.customer_weights.get(customer, 1), 0.01)
+        )
+
+
+class FairQueue(object):
+    """The Redis side of the fair queue, used by the producers and the
+    daemon.
+    """
+
+    def __init__(self, connection=None):
+        self.redis = connection or fair_redis()
+        self._enqueue = self.redis.register_script(_ENQUEUE_SCRIPT)
+        self._pop = self.redis.register_script(_POP_SCRIPT)
+
+    def enqueue(self, queue, func, args=(), lane=Lane.Ingest,
+                customer_name=None, timeout=3600):
+        """Queues a job behind the RQ queue.
+
+        Returns:
+            The id of the fair queue job, None if it was enqueued on the
+            RQ queue directly.
+        """
+        customer_name = customer_name or SYSTEM_CUSTOMER
+        if queue in FAIR_QUEUES and lane in LANE_WEIGHTS:
+            job = {
+                FairJobKey.JobId: str(uuid4()),
+                FairJobKey.Queue: queue,
+                FairJobKey.Lane: lane,
+                FairJobKey.CustomerName: customer_name,
+                FairJobKey.Func: func_path(func),
+                FairJobKey.Args: list(args),
+                FairJobKey.Timeout: timeout,
+                FairJobKey.Enqueued: time(),
+            }
+            try:
+                queued = self._enqueue(
+                    keys=[
+                        FairKey.Jobs % (queue, lane, customer_name),
+                        FairKey.Customers % (queue, lane),
+                        FairKey.Metrics, FairKey.Wakeup, FairKey.Heartbeat
+                    ],
+                    args=[
+                        json.dumps(job), customer_name,
+                        '%s:%s' % (queue, lane)
+                    ]
+                )
+                if queued:
+                    return(job[FairJobKey.JobId])
+
+            except (TypeError, ValueError) as e:
+                logger.error(
+                    'job %s can not be fair queued: %s' % (func_path(func), e)
+                )
+
+        Queue(queue, connection=self.redis).enqueue_call(
+            func=func, args=args, timeout=timeout
+        )
+
+        return(None)
+
+    def pending(self, queue):
+        """Returns the customers holding jobs, keyed by lane."""
+        pipe = self.redis.pipeline(transaction=False)
+        for lane in LANES:
+            pipe.smembers(FairKey.Customers % (queue, lane))
+
+        return(
+            dict(
+                [
+                    (lane, customers)
+                    for lane, customers in zip(LANES, pipe.execute())
+                    if customers
+                ]
+            )
+        )
+
+    def pop(self, queue, lane, customer_name):
+        job = self._pop(
+            keys=[
+                FairKey.Jobs % (queue, lane, customer_name),
+                FairKey.Customers % (queue, lane),
+                FairKey.Metrics
+            ],
+            args=[customer_name, '%s:%s' % (queue, lane)]
+        )
+        if job:
+            return(json.loads(job))
+
+    def customer_weights(self):
+        weights = {}
+        for customer, weight in self.redis.hgetall(FairKey.Weights).items():
+            try:
+                weights[customer] = float(weight)
+            except ValueError:
+                pass
+
+        return(weights)
+
+
+_queue = None
+
+
+def fair_enqueue(queue, func, args=(), lane=Lane.Ingest,
+                 customer_name=None, timeout=3600):
+    """Queues a job for an RQ queue, see FairQueue.enqueue.
+
+    Args:
+        queue (str): Name of the RQ queue.
+        func: The function, or its import path. Its arguments have to be
+            JSON serializable.
+
+    Kwargs:
+        args (tuple): Arguments of the function.
+        lane (str): One of Lane.
+        customer_name (str): The customer the job is done for, jobs of
+            the system share SYSTEM_CUSTOMER.
+        timeout (int): RQ timeout of the job.
+    """
+    global _queue
+    if not _queue:
+        _queue = FairQueue()
+
+    return(
+        _queue.enqueue(
+            queue, func, args, lane=lane, customer_name=customer_name,
+            timeout=timeout
+        )
+    )
+
+
+def set_customer_weight(customer_name, weight, connection=None):
+    """Sets the share of a customer, a customer of weight 2 gets twice
+    the jobs of a customer of weight 1 when both have jobs waiting.
+    """
+    connection = connection or fair_redis()
+    if weight == 1:
+        connection.hdel(FairKey.Weights, customer_name)
+    else:
+        connection.hset(FairKey.Weights, customer_name, weight)
+
+
+def _oldest_ages(connection, queue, lane, customers, now):
+    pipe = connection.pipeline(transaction=False)
+    for customer in customers:
+        pipe.lindex(FairKey.Jobs % (queue, lane, customer), 0)
+        pipe.llen(FairKey.Jobs % (queue, lane, customer))
+
+    results = pipe.execute()
+    depths = {}
+    oldest = 0
+    for customer, head, depth in zip(customers, results[::2], results[1::2]):
+        depths[customer] = depth
+        if head:
+            enqueued = json.loads(head)[FairJobKey.Enqueued]
+            oldest = max(oldest, now - enqueued)
+
+    return(round(oldest, 3), depths)
+
+
+def queue_backlog(queue, connection=None):
+    """Returns the jobs of queue waiting in the fair queue and the age
+    in seconds of the oldest one.
+    """
+    connection = connection or fair_redis()
+    now = time()
+    pipe = connection.pipeline(transaction=False)
+    for lane in LANES:
+        pipe.smembers(FairKey.Customers % (queue, lane))
+
+    depth = 0
+    oldest = 0
+    for lane, customers in zip(LANES, pipe.execute()):
+        if not customers:
+            continue
+
+        age, depths = _oldest_ages(
+            connection, queue, lane, sorted(customers), now
+        )
+        depth += sum(depths.values())
+        oldest = max(oldest, age)
+
+    return(depth, oldest)
+
+
+def queue_metrics(connection=None):
+    """Returns the metrics of every fair queue.
+
+    Returns:
+        Dictionary keyed by queue, each one has the jobs ready on the
+        RQ queue and a dictionary of its lanes, with their depth, the
+        jobs enqueued and dispatched, the average, maximum and last
+        wait in seconds, the age of their oldest job and the depth of
+        each customer.
+    """
+    connection = connection or fair_redis()
+    now = time()
+    pipe = connection.pipeline(transaction=False)
+    pipe.hgetall(FairKey.Metrics)
+    pipe.exists(FairKey.Heartbeat)
+    for queue in FAIR_QUEUES:
+        pipe.llen(Queue(queue, connection=connection).key)
+        for lane in LANES:
+            pipe.smembers(FairKey.Customers % (queue, lane))
+
+    results = pipe.execute()
+    counters, running = results[0], results[1]
+    results = results[2:]
+
+    metrics = {FairMetricKey.DispatcherRunning: bool(running)}
+    for queue in FAIR_QUEUES:
+        ready = results.pop(0)
+        lanes = {}
+        for lane in LANES:
+            customers = sorted(results.pop(0))
+            oldest, depths = (
+                _oldest_ages(connection, queue, lane, customers, now)
+            )
+            values = {}
+            for counter in (FairMetricKey.Depth, FairMetricKey.Enqueued,
+                            FairMetricKey.Dispatched):
+                values[counter] = (
+                    int(counters.get(lane_metric(queue, lane, counter), 0))
+                )
+
+            for counter in (FairMetricKey.WaitTotal, FairMetricKey.WaitMax,
+                            FairMetricKey.LastWait):
+                value = counters.get(lane_metric(queue, lane, counter), 0)
+                values[counter] = round(float(value), 3)
+
+            values[FairMetricKey.AverageWait] = (
+                round(
+                    values[FairMetricKey.WaitTotal]
+                    / values[FairMetricKey.Dispatched], 3
+                )
+                if values[FairMetricKey.Dispatched] else 0
+            )
+            values[FairMetricKey.OldestAge] = oldest
+            values[FairMetricKey.Customers] = depths
+            lanes[lane] = values
+
+        metrics[queue] = {
+            FairMetricKey.Ready: ready,
+            FairMetricKey.Lanes: lanes,
+        }
+
+    return(metrics)
@@ -0,0 +1,209 @@
+"""
+Fair queue daemon.
+
+Moves the jobs producers queued with fair_enqueue (see
+receiver/fairqueue.py) onto their RQ queue, one at a time in the order
+FairPolicy picks, while the RQ queue holds fewer than its ready depth,
+READY_PER_WORKER jobs for every worker listening on it and at least
+READY_DEPTH. The pools of the RQ supervisor grow and shrink, so the
+workers are counted again with the heartbeat, every few seconds.
+Without the heartbeat the producers enqueue on the RQ queues directly.
+The customer weights are reloaded with the heartbeat as well.
+
+Only one fair queue daemon runs, like the scheduler daemon leader, the
+virtual times of the customers are kept in process and start over when
+it restarts.
+"""
+import signal
+import logging
+from time import time, sleep
+
+import tornado.options
+from tornado.options import define, options
+from rq import Queue, Worker
+
+from vFense.receiver.fairqueue import FairQueue, FairPolicy, FairKey, \
+    FairJobKey, FairMetricKey, FAIR_QUEUES, READY_DEPTH, READY_PER_WORKER, \
+    HEARTBEAT_TTL, lane_metric
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+# Seconds between two looks at the RQ queues while they are full.
+POLL_INTERVAL = 0.1
+
+define("ready_depth", default=READY_DEPTH,
+       help="least jobs kept on each RQ queue", type=int)
+
+
+class FairQueueDaemon():
+
+    def __init__(self, ready_depth=READY_DEPTH):
+        self.queue = FairQueue()
+        self.redis = self.queue.redis
+        self.policy = FairPolicy()
+        self.ready_depth = ready_depth
+        self.depths = dict([(name, ready_depth) for name in FAIR_QUEUES])
+        self.rq_queues = dict(
+            [
+                (name, Queue(name, connection=self.redis))
+                for name in FAIR_QUEUES
+            ]
+        )
+        self.wait_max = {}
+        self.last_beat = 0
+        self.running = True
+
+    def heartbeat(self):
+        now = time()
+        if now - self.last_beat < HEARTBEAT_TTL / 3:
+            return
+
+        self.redis.set(FairKey.Heartbeat, int(now), ex=HEARTBEAT_TTL)
+        self.policy.customer_weights = self.queue.customer_weights()
+        self.refresh_depths()
+        if not self.last_beat:
+            counters = self.redis.hgetall(FairKey.Metrics)
+            for field, value in counters.items():
+                if field.endswith(':' + FairMetricKey.WaitMax):
+                    self.wait_max[field] = float(value)
+        self.last_beat = now
+
+    def refresh_depths(self):
+        """Sizes the ready depth of every RQ queue to the workers
+        listening on it.
+        """
+        workers = {}
+        for worker in Worker.all(connection=self.redis):
+            for name in worker.queue_names():
+                workers[name] = workers.get(name, 0) + 1
+
+        self.depths = dict(
+            [
+                (
+                    name,
+                    max(
+                        self.ready_depth,
+                        READY_PER_WORKER * workers.get(name, 0)
+                    )
+                )
+                for name in FAIR_QUEUES
+            ]
+        )
+
+    def next_job(self, queue):
+        """Pops the job of queue FairPolicy picks, None if there is
+        none.
+        """
+        pending = self.queue.pending(queue)
+        while pending:
+            lane = self.policy.pick_lane(queue, pending.keys())
+            customer = self.policy.pick_customer(queue, lane, pending[lane])
+            job = self.queue.pop(queue, lane, customer)
+            if job:
+                self.policy.charge(queue, lane, customer)
+                return(job)
+
+            pending[lane].discard(customer)
+            if not pending[lane]:
+                del pending[lane]
+
+    def submit(self, job):
+        queue = job[FairJobKey.Queue]
+        lane = job[FairJobKey.Lane]
+        try:
+            self.rq_queues[queue].enqueue_call(
+                func=job[FairJobKey.Func], args=tuple(job[FairJobKey.Args]),
+                timeout=job[FairJobKey.Timeout]
+            )
+
+        except Exception as e:
+            logger.exception(e)
+            logger.error('lost fair queue job %s' % (job))
+            return
+
+        wait = round(time() - job[FairJobKey.Enqueued], 3)
+        max_field = lane_metric(queue, lane, FairMetricKey.WaitMax)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hincrby(
+            FairKey.Metrics,
+            lane_metric(queue, lane, FairMetricKey.Dispatched), 1
+        )
+        pipe.hincrbyfloat(
+            FairKey.Metrics,
+            lane_metric(queue, lane, FairMetricKey.WaitTotal), wait
+        )
+        pipe.hset(
+            FairKey.Metrics,
+            lane_metric(queue, lane, FairMetricKey.LastWait), wait
+        )
+        if wait > self.wait_max.get(max_field, 0):
+            self.wait_max[max_field] = wait
+            pipe.hset(FairKey.Metrics, max_field, wait)
+        pipe.execute()
+
+    def dispatch(self):
+        """Fills the RQ queues up to their ready depth.
+
+        Returns:
+            Tuple of the jobs dispatched and whether jobs wait on a full
+            RQ queue.
+        """
+        dispatched = 0
+        blocked = False
+        for name, rq_queue in self.rq_queues.items():
+            room = self.depths[name] - rq_queue.count
+            if room <= 0:
+                blocked = blocked or bool(self.queue.pending(name))
+                continue
+
+            while room > 0:
+                job = self.next_job(name)
+                if not job:
+                    break
+
+                self.submit(job)
+                dispatched += 1
+                room -= 1
+
+            if room <= 0:
+                blocked = blocked or bool(self.queue.pending(name))
+
+        return(dispatched, blocked)
+
+    def stop(self, *args):
+        self.running = False
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        logger.info('Fair queue daemon started')
+        while self.running:
+            try:
+                self.heartbeat()
+                dispatched, blocked = self.dispatch()
+                if dispatched:
+                    continue
+
+                if blocked:
+                    sleep(POLL_INTERVAL)
+                else:
+                    self.redis.blpop(FairKey.Wakeup, timeout=1)
+
+            except Exception as e:
+                logger.exception(e)
+                sleep(1)
+
+        try:
+            self.redis.delete(FairKey.Heartbeat)
+
+        except Exception as e:
+            logger.exception(e)
+
+        logger.info('Fair queue daemon has shutdown')
+
+
+if __name__ == '__main__':
+    tornado.options.parse_command_line()
+    FairQueueDaemon(ready_depth=options.ready_depth).run()
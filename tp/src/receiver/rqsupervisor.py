@@ -0,0 +1,631 @@
+"""
+Supervisor of the RQ workers.
+
+Instead of one rqworker per queue the supervisor runs a pool of worker
+processes per group of queues, WORKER_GROUPS, and sizes every pool to
+its backlog. Every INTERVAL seconds it looks at the jobs waiting on the
+queues of a group, on the RQ queue and, for the queues behind the fair
+queue (see receiver/fairqueue.py), in the fair queue, and at the age
+of the oldest one:
+
+    * the pool wants one worker per jobs_per_worker jobs waiting, one
+      more when the oldest job waited longer than max_wait, between
+      min_workers and max_workers.
+    * it grows at once, as long as the machine has room: fewer than
+      max_workers processes in all, a load average per CPU under
+      max_load and more than min_free_mb of memory available.
+    * it shrinks by one idle worker at a time, once it wanted fewer
+      workers for SCALE_DOWN_DELAY seconds.
+
+A worker stops after max_jobs jobs, or is stopped while idle once it
+uses more than max_rss_mb, and is replaced by a new process, so memory
+leaked by a job does not pile up. Workers are stopped with SIGTERM,
+RQ finishes the job it is running first.
+
+Workers count the jobs and the seconds they spent on every queue in
+Redis, the supervisor turns them into the jobs per minute of every
+queue and saves its report in SupervisorKey.Report, see
+supervisor_report.
+
+The groups and limits can be changed in
+/opt/TopPatch/conf/rqsupervisor.conf:
+
+    [supervisor]
+    max_workers = 16
+    max_load = 1.5
+    min_free_mb = 256
+
+    [group:downloads]
+    queues = downloader
+    min_workers = 1
+    max_workers = 4
+"""
+import os
+import copy
+import json
+import math
+import signal
+import socket
+import logging
+import calendar
+import ConfigParser
+from collections import deque
+from multiprocessing import Process, cpu_count
+from time import time, sleep, strptime
+
+import redis
+from rq import Queue, Worker
+from rq.job import Job
+
+from vFense.db.client import pool
+from vFense.receiver.fairqueue import FAIR_QUEUES, queue_backlog
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+CONFIG_FILE = '/opt/TopPatch/conf/rqsupervisor.conf'
+SUPERVISOR_SECTION = 'supervisor'
+GROUP_SECTION = 'group:'
+
+INTERVAL = 5
+SCALE_DOWN_DELAY = 60
+# Seconds of history the jobs per minute are computed over.
+THROUGHPUT_WINDOW = 60
+STOP_TIMEOUT = 30
+
+
+class SupervisorKey():
+    Processed = 'vfense:rq:supervisor:processed'
+    BusySeconds = 'vfense:rq:supervisor:busy'
+    Report = 'vfense:rq:supervisor:report'
+
+
+class StopReason():
+    Scale = 'scale'
+    Recycle = 'recycle'
+
+
+class SupervisorSettingKey():
+    MaxWorkers = 'max_workers'
+    MaxLoad = 'max_load'
+    MinFreeMb = 'min_free_mb'
+
+
+class GroupSettingKey():
+    Queues = 'queues'
+    MinWorkers = 'min_workers'
+    MaxWorkers = 'max_workers'
+    MaxJobs = 'max_jobs'
+    MaxRssMb = 'max_rss_mb'
+    JobsPerWorker = 'jobs_per_worker'
+    MaxWait = 'max_wait'
+
+
+class ReportKey():
+    Time = 'time'
+    Workers = 'workers'
+    Groups = 'groups'
+    Queues = 'queues'
+    Desired = 'desired'
+    Depth = 'depth'
+    OldestAge = 'oldest_age'
+    Started = 'started'
+    Recycled = 'recycled'
+    Stopped = 'stopped'
+    Processed = 'processed'
+    JobsPerMinute = 'jobs_per_minute'
+    BusySeconds = 'busy_seconds'
+    Load = 'load'
+    FreeMb = 'free_mb'
+    Limited = 'limited'
+
+
+SUPERVISOR_SETTINGS = {
+    SupervisorSettingKey.MaxWorkers: cpu_count() * 2,
+    SupervisorSettingKey.MaxLoad: 1.5,
+    SupervisorSettingKey.MinFreeMb: 256,
+}
+
+
+class WorkerGroup(object):
+    """A pool of workers listening on the same queues, in order.
+
+    Args:
+        name (str): Name of the group.
+        queues (list): RQ queues the workers listen on, the first one
+            has priority.
+
+    Kwargs:
+        min_workers (int): Workers always running.
+        max_workers (int): Workers the pool grows to at most.
+        max_jobs (int): Jobs a worker runs before it is replaced.
+        max_rss_mb (int): Memory an idle worker is replaced above.
+        jobs_per_worker (int): Jobs waiting per worker wanted.
+        max_wait (int): Seconds the oldest job may wait before the pool
+            wants one more worker.
+    """
+
+    def __init__(self, name, queues, min_workers=1, max_workers=4,
+                 max_jobs=500, max_rss_mb=512, jobs_per_worker=10,
+                 max_wait=30):
+        self.name = name
+        self.queues = list(queues)
+        self.min_workers = min_workers
+        self.max_workers = max(max_workers, min_workers)
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.jobs_per_worker = max(jobs_per_worker, 1)
+        self.max_wait = max_wait
+
+    def desired(self, depth, oldest_age):
+        """Returns the workers the pool wants for its backlog."""
+        wanted = int(math.ceil(float(depth) / self.jobs_per_worker))
+        if depth and oldest_age > self.max_wait:
+            wanted += 1
+
+        return(max(self.min_workers, min(wanted, self.max_workers)))
+
+
+WORKER_GROUPS = [
+    WorkerGroup(
+        'agents', ['agent_status'], min_workers=1, max_workers=2
+    ),
+    # Purges of deleted or moved agents run for hours, they get their
+    # own workers so they never hold up agent_status.
+    WorkerGroup(
+        'purges', ['delete_agent', 'move_agent'], min_workers=0,
+        max_workers=2, jobs_per_worker=1, max_wait=60
+    ),
+    WorkerGroup(
+        'ingest',
+        [
+            'incoming_updates', 'post_store_operation',
+            'create_secondary_indexes'
+        ],
+        min_workers=1, max_workers=6
+    ),
+    WorkerGroup(
+        'downloads', ['downloader'], min_workers=1, max_workers=4,
+        max_jobs=100, jobs_per_worker=5, max_wait=120
+    ),
+    WorkerGroup(
+        'system', ['scheduled_jobs', 'stats', 'updater'],
+        min_workers=1, max_workers=2
+    ),
+    WorkerGroup(
+        'reports', ['reports'], min_workers=0, max_workers=2,
+        max_jobs=20, jobs_per_worker=1, max_wait=60
+    ),
+    # The package store garbage collection and scrub, one at a time so
+    # the scrub runs after the collection it is scheduled behind.
+    WorkerGroup(
+        'maintenance', ['package_maintenance'], min_workers=0,
+        max_workers=1, max_jobs=1, jobs_per_worker=1, max_wait=60
+    ),
+]
+
+
+def read_settings(config_file=CONFIG_FILE):
+    """Returns the supervisor settings, keyed by SupervisorSettingKey,
+    and the worker groups.
+    """
+    settings = dict(SUPERVISOR_SETTINGS)
+    groups = dict(
+        [(group.name, copy.copy(group)) for group in WORKER_GROUPS]
+    )
+    config = ConfigParser.RawConfigParser()
+    config.read(config_file)
+    if config.has_section(SUPERVISOR_SECTION):
+        for key in settings.keys():
+            if config.has_option(SUPERVISOR_SECTION, key):
+                settings[key] = config.getfloat(SUPERVISOR_SECTION, key)
+
+    for section in config.sections():
+        if not section.startswith(GROUP_SECTION):
+            continue
+
+        name = section[len(GROUP_SECTION):]
+        options = {}
+        for key, value in config.items(section):
+            if key == GroupSettingKey.Queues:
+                options[key] = [
+                    queue.strip() for queue in value.split(',')
+                    if queue.strip()
+                ]
+            else:
+                options[key] = int(value)
+
+        if name in groups:
+            group = groups[name]
+            for key, value in options.items():
+                setattr(group, key, value)
+            group.max_workers = max(group.max_workers, group.min_workers)
+
+        elif options.get(GroupSettingKey.Queues):
+            groups[name] = WorkerGroup(name, **options)
+
+    return(settings, groups.values())
+
+
+def worker_name(group_name, pid):
+    return('%s.%s.%d' % (socket.gethostname(), group_name, pid))
+
+
+_execute_job = getattr(Worker, 'execute_job', Worker.fork_and_perform_job)
+
+
+class RecyclingWorker(Worker):
+    """RQ worker that stops after max_jobs jobs and counts the jobs and
+    the busy seconds of every queue.
+    """
+    max_jobs = 0
+
+    def _job_done(self, job, began):
+        self.jobs_done = getattr(self, 'jobs_done', 0) + 1
+        try:
+            pipe = self.connection.pipeline(transaction=False)
+            pipe.hincrby(SupervisorKey.Processed, job.origin, 1)
+            pipe.hincrbyfloat(
+                SupervisorKey.BusySeconds, job.origin,
+                round(time() - began, 3)
+            )
+            pipe.execute()
+
+        except Exception as e:
+            logger.exception(e)
+
+        if self.max_jobs and self.jobs_done >= self.max_jobs:
+            # The flag the work loop checks differs between RQ releases.
+            self._stopped = True
+            self._stop_requested = True
+
+    def execute_job(self, job, *args, **kwargs):
+        """The outer entry point of a job, counted once. In the RQ
+        releases that have it, it calls fork_and_perform_job, which is
+        not counted again.
+        """
+        began = time()
+        _execute_job(self, job, *args, **kwargs)
+        self._job_done(job, began)
+
+    # RQ releases before execute_job have the work loop call
+    # fork_and_perform_job itself.
+    if not hasattr(Worker, 'execute_job'):
+        fork_and_perform_job = execute_job
+
+
+def run_worker(group_name, queues, max_jobs):
+    """Entry point of a worker process."""
+    connection = redis.StrictRedis(host='localhost', port=6379, db=0)
+    worker = RecyclingWorker(
+        [Queue(queue, connection=connection) for queue in queues],
+        name=worker_name(group_name, os.getpid()), connection=connection
+    )
+    worker.max_jobs = max_jobs
+    worker.work()
+
+
+def _job_age(connection, queue, now):
+    job_id = connection.lindex(Queue(queue, connection=connection).key, 0)
+    if not job_id:
+        return(0)
+
+    enqueued = connection.hget(Job.key_for(job_id), 'enqueued_at')
+    if not enqueued:
+        return(0)
+
+    try:
+        enqueued = calendar.timegm(
+            strptime(enqueued[:19], '%Y-%m-%dT%H:%M:%S')
+        )
+
+    except ValueError:
+        return(0)
+
+    return(max(now - enqueued, 0))
+
+
+def group_backlog(connection, group, now=None):
+    """Returns the jobs waiting on the queues of a group and the age in
+    seconds of the oldest one.
+    """
+    now = now or time()
+    depth = 0
+    oldest = 0
+    for queue in group.queues:
+        depth += Queue(queue, connection=connection).count
+        oldest = max(oldest, _job_age(connection, queue, now))
+        if queue in FAIR_QUEUES:
+            fair_depth, fair_age = queue_backlog(queue, connection)
+            depth += fair_depth
+            oldest = max(oldest, fair_age)
+
+    return(depth, round(oldest, 3))
+
+
+def free_memory_mb():
+    """Returns the memory available in MB, None if it is unknown."""
+    try:
+        meminfo = {}
+        for line in open('/proc/meminfo'):
+            key, value = line.split(':', 1)
+            meminfo[key] = int(value.split()[0])
+
+    except (IOError, ValueError):
+        return(None)
+
+    if 'MemAvailable' in meminfo:
+        return(meminfo['MemAvailable'] / 1024)
+
+    return(
+        (
+            meminfo.get('MemFree', 0) + meminfo.get('Buffers', 0)
+            + meminfo.get('Cached', 0)
+        ) / 1024
+    )
+
+
+def rss_mb(pid):
+    try:
+        for line in open('/proc/%d/status' % (pid)):
+            if line.startswith('VmRSS:'):
+                return(int(line.split()[1]) / 1024)
+
+    except (IOError, ValueError):
+        pass
+
+    return(0)
+
+
+class WorkerPool(object):
+
+    def __init__(self, group):
+        self.group = group
+        self.workers = []
+        self.desired = group.min_workers
+        self.shrink_since = None
+        self.started = 0
+        self.recycled = 0
+        self.stopped = 0
+
+    def reap(self):
+        alive = []
+        for worker in self.workers:
+            if worker.is_alive():
+                alive.append(worker)
+                continue
+
+            worker.join()
+            if getattr(worker, 'stop_reason', None) == StopReason.Scale:
+                self.stopped += 1
+            else:
+                self.recycled += 1
+
+        self.workers = alive
+
+    def running(self):
+        return(
+            [
+                worker for worker in self.workers
+                if not getattr(worker, 'stop_reason', None)
+            ]
+        )
+
+    def start_worker(self):
+        worker = Process(
+            target=run_worker,
+            args=(self.group.name, self.group.queues, self.group.max_jobs)
+        )
+        worker.start()
+        self.workers.append(worker)
+        self.started += 1
+
+    def stop_worker(self, worker, reason=None):
+        worker.stop_reason = reason or StopReason.Scale
+        try:
+            os.kill(worker.pid, signal.SIGTERM)
+
+        except OSError:
+            pass
+
+    def idle_workers(self, connection):
+        running = self.running()
+        pipe = connection.pipeline(transaction=False)
+        for worker in running:
+            pipe.hget(
+                Worker.redis_worker_namespace_prefix
+                + worker_name(self.group.name, worker.pid), 'state'
+            )
+
+        return(
+            [
+                worker for worker, state in zip(running, pipe.execute())
+                if state == 'idle'
+            ]
+        )
+
+
+class Supervisor():
+
+    def __init__(self, config_file=CONFIG_FILE, interval=INTERVAL):
+        self.settings, groups = read_settings(config_file)
+        self.pools = [WorkerPool(group) for group in groups]
+        self.redis = redis.StrictRedis(connection_pool=pool)
+        self.interval = interval
+        self.history = deque()
+        self.running = True
+
+    def room(self):
+        """Returns why the machine has no room for one more worker, None
+        if it has.
+        """
+        workers = sum(
+            [len(worker_pool.running()) for worker_pool in self.pools]
+        )
+        if workers >= self.settings[SupervisorSettingKey.MaxWorkers]:
+            return(SupervisorSettingKey.MaxWorkers)
+
+        if (os.getloadavg()[0] / cpu_count()
+                >= self.settings[SupervisorSettingKey.MaxLoad]):
+            return(SupervisorSettingKey.MaxLoad)
+
+        free = free_memory_mb()
+        if (free is not None
+                and free < self.settings[SupervisorSettingKey.MinFreeMb]):
+            return(SupervisorSettingKey.MinFreeMb)
+
+    def scale(self, worker_pool, now):
+        """Starts or stops the workers of a pool.
+
+        Returns:
+            The depth and the oldest age of the backlog of the pool and
+            the limit that kept it from growing, if any.
+        """
+        worker_pool.reap()
+        depth, oldest = group_backlog(self.redis, worker_pool.group, now)
+        worker_pool.desired = worker_pool.group.desired(depth, oldest)
+        limited = None
+
+        idle = worker_pool.idle_workers(self.redis)
+        for worker in idle:
+            if rss_mb(worker.pid) > worker_pool.group.max_rss_mb:
+                logger.info(
+                    'recycling worker %d of %s, it uses more than %dMB'
+                    % (
+                        worker.pid, worker_pool.group.name,
+                        worker_pool.group.max_rss_mb
+                    )
+                )
+                worker_pool.stop_worker(worker, StopReason.Recycle)
+
+        running = len(worker_pool.running())
+        while running < worker_pool.desired:
+            if running >= worker_pool.group.min_workers:
+                limited = self.room()
+                if limited:
+                    break
+
+            worker_pool.start_worker()
+            running += 1
+
+        if running > worker_pool.desired:
+            worker_pool.shrink_since = worker_pool.shrink_since or now
+            idle = worker_pool.idle_workers(self.redis)
+            if now - worker_pool.shrink_since >= SCALE_DOWN_DELAY and idle:
+                worker_pool.stop_worker(idle[0])
+                worker_pool.shrink_since = now
+        else:
+            worker_pool.shrink_since = None
+
+        return(depth, oldest, limited)
+
+    def throughput(self, now):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(SupervisorKey.Processed)
+        pipe.hgetall(SupervisorKey.BusySeconds)
+        processed, busy = pipe.execute()
+        processed = dict([(k, int(v)) for k, v in processed.items()])
+        self.history.append((now, processed))
+        while (len(self.history) > 2
+               and now - self.history[1][0] >= THROUGHPUT_WINDOW):
+            self.history.popleft()
+
+        first_time, first = self.history[0]
+        elapsed = now - first_time
+        queues = {}
+        for queue, count in processed.items():
+            queues[queue] = {
+                ReportKey.Processed: count,
+                ReportKey.JobsPerMinute: (
+                    round((count - first.get(queue, 0)) * 60.0 / elapsed, 1)
+                    if elapsed else 0
+                ),
+                ReportKey.BusySeconds: round(float(busy.get(queue, 0)), 1),
+            }
+
+        return(queues)
+
+    def tick(self):
+        now = time()
+        groups = {}
+        for worker_pool in self.pools:
+            try:
+                depth, oldest, limited = self.scale(worker_pool, now)
+
+            except Exception as e:
+                logger.exception(e)
+                continue
+
+            groups[worker_pool.group.name] = {
+                GroupSettingKey.Queues: worker_pool.group.queues,
+                ReportKey.Workers: len(worker_pool.running()),
+                ReportKey.Desired: worker_pool.desired,
+                ReportKey.Depth: depth,
+                ReportKey.OldestAge: oldest,
+                ReportKey.Started: worker_pool.started,
+                ReportKey.Recycled: worker_pool.recycled,
+                ReportKey.Stopped: worker_pool.stopped,
+                ReportKey.Limited: limited,
+            }
+
+        free = free_memory_mb()
+        report = {
+            ReportKey.Time: int(now),
+            ReportKey.Groups: groups,
+            ReportKey.Queues: self.throughput(now),
+            ReportKey.Load: round(os.getloadavg()[0], 2),
+            ReportKey.FreeMb: free,
+        }
+        self.redis.set(
+            SupervisorKey.Report, json.dumps(report), ex=self.interval * 6
+        )
+
+    def stop(self, *args):
+        self.running = False
+
+    def shutdown(self):
+        workers = []
+        for worker_pool in self.pools:
+            for worker in worker_pool.workers:
+                worker_pool.stop_worker(worker)
+                workers.append(worker)
+
+        deadline = time() + STOP_TIMEOUT
+        for worker in workers:
+            worker.join(max(deadline - time(), 0.1))
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        logger.info('RQ supervisor started')
+        while self.running:
+            began = time()
+            try:
+                self.tick()
+
+            except Exception as e:
+                logger.exception(e)
+
+            sleep(max(self.interval - (time() - began), 0.1))
+
+        self.shutdown()
+        logger.info('RQ supervisor has shutdown')
+
+
+def supervisor_report(connection=None):
+    """Returns the last report of the supervisor, the workers, backlog
+    and limits of every group and the throughput of every queue, None
+    while the supervisor is not running.
+    """
+    connection = connection or redis.StrictRedis(connection_pool=pool)
+    report = connection.get(SupervisorKey.Report)
+    if report:
+        return(json.loads(report))
+
+
+if __name__ == '__main__':
+    Supervisor().run()
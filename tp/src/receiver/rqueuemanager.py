@@ -1,5 +1,4 @@
 import logging
-import logging.config
 import ast
 
 from vFense.db.client import *
@@ -9,7 +8,9 @@ from vFense.receiver.corehandler import process_queue_data
 from json import dumps
 import redis
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -66,9 +67,10 @@ class QueueWorker():
             message = self.data
         pushed = self.redis.lpush(self.agent_id, message)
         if pushed > 0:
-            msg = '%s - %s added to the beginning of the redis queue %s' % \
-                  (self.username, dumps(message), self.agent_id)
-            logger.info(msg)
+            logger.debug(
+                '%s - %s added to the beginning of the redis queue %s',
+                self.username, message, self.agent_id
+            )
         else:
             msg = ('%s - %s failed to add into the \
                     begining of the redis queue %s' %
@@ -80,9 +82,10 @@ class QueueWorker():
             message = self.data
         pushed = self.redis.rpush(self.agent_id, message)
         if pushed > 0:
-            msg = '%s - %s added to the tail of the redis queue %s' % \
-                  (self.username, dumps(message), self.agent_id)
-            logger.info(msg)
+            logger.debug(
+                '%s - %s added to the tail of the redis queue %s',
+                self.username, message, self.agent_id
+            )
         else:
             msg = ('%s - %s failed to add into the tail \
                     of the redis queue %s' %
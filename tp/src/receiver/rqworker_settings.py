@@ -16,7 +16,8 @@ QUEUES = [
     'agent_status',
     'create_secondary_indexes',
     'delete_agent',
-    'move_agent'
+    'move_agent',
+    'scheduled_jobs'
 ]
 
 # If you're using Sentry to collect your runtime exceptions, you can use this
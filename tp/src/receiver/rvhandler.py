@@ -1,9 +1,7 @@
 import logging
 
-import redis
-from rq import Connection, Queue
-
 from vFense.agent.agents import get_agent_info
+from vFense.receiver.fairqueue import fair_enqueue, Lane
 from vFense.plugins.patching.os_apps.incoming_updates import \
    incoming_packages_from_agent 
 from vFense.plugins.patching.custom_apps.custom_apps import \
@@ -11,12 +9,9 @@ from vFense.plugins.patching.custom_apps.custom_apps import \
 
 from vFense.plugins.patching.supported_apps.syncer import \
     get_all_supported_apps_for_agent, get_all_agent_apps_for_agent
+from vFense.logger.logsetup import configure_logging
 
-rq_host = 'localhost'
-rq_port = 6379
-rq_db = 0
-rq_pool = redis.StrictRedis(host=rq_host, port=rq_port, db=rq_db)
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -52,46 +47,46 @@ class RvHandOff():
 
     def add_custom_apps(self, username, customer_name,
                         uri, method, agentid):
-        rv_q = Queue('incoming_updates', connection=rq_pool)
-        rv_q.enqueue_call(
-            func=add_custom_app_to_agents,
+        fair_enqueue(
+            'incoming_updates', add_custom_app_to_agents,
             args=(
                 username, customer_name,
                 uri, method, None, agentid
             ),
+            lane=Lane.Sync, customer_name=self.customer_name,
             timeout=3600
         )
 
     def add_supported_apps(self, agentid):
-        rv_q = Queue('incoming_updates', connection=rq_pool)
-        rv_q.enqueue_call(
-            func=get_all_supported_apps_for_agent,
+        fair_enqueue(
+            'incoming_updates', get_all_supported_apps_for_agent,
             args=(
                 agentid,
             ),
+            lane=Lane.Sync, customer_name=self.customer_name,
             timeout=3600
         )
 
     def add_agent_apps(self, agentid):
-        rv_q = Queue('incoming_updates', connection=rq_pool)
-        rv_q.enqueue_call(
-            func=get_all_agent_apps_for_agent,
+        fair_enqueue(
+            'incoming_updates', get_all_agent_apps_for_agent,
             args=(
                 agentid,
             ),
+            lane=Lane.Sync, customer_name=self.customer_name,
             timeout=3600
         )
 
 
     def add_packages_from_agent(self, username, agent_id, agent_data, apps):
-        rv_q = Queue('incoming_updates', connection=rq_pool)
-        rv_q.enqueue_call(
-            func=incoming_packages_from_agent,
+        fair_enqueue(
+            'incoming_updates', incoming_packages_from_agent,
             args=(
                 username, agent_id,
                 self.customer_name,
                 agent_data['os_code'], agent_data['os_string'],
                 apps, self.delete_afterwards
             ),
+            lane=Lane.Ingest, customer_name=self.customer_name,
             timeout=3600
         )
@@ -0,0 +1,87 @@
+"""
+Staging of the application inventories agents upload.
+
+The listener pushes the apps of an inventory to a Redis list while it
+parses the request body (see server/request.py), and only a reference
+to that list goes into the incoming_updates job. The job reads the apps
+back in batches and deletes the list.
+"""
+import json
+import uuid
+
+import redis
+
+from vFense.db.client import pool
+
+STAGE_EXPIRE = 86400
+READ_BATCH = 500
+
+
+class StagedListKey():
+    Items = 'vfense:incoming:staged:%s'
+    Key = 'staged_list'
+    Count = 'count'
+
+
+def staging_redis():
+    return(redis.StrictRedis(connection_pool=pool))
+
+
+class StagedList(object):
+    """Consumer of server.request.parse_json that pushes the items of a
+    list to Redis.
+    """
+
+    def __init__(self, connection=None):
+        self.connection = connection or staging_redis()
+        self.key = StagedListKey.Items % (uuid.uuid4())
+        self.count = 0
+
+    def add(self, items):
+        pipe = self.connection.pipeline()
+        pipe.rpush(self.key, *[json.dumps(item) for item in items])
+        pipe.expire(self.key, STAGE_EXPIRE)
+        pipe.execute()
+        self.count += len(items)
+
+    def close(self):
+        return(
+            {
+                StagedListKey.Key: self.key,
+                StagedListKey.Count: self.count,
+            }
+        )
+
+
+def is_staged(value):
+    return(isinstance(value, dict) and StagedListKey.Key in value)
+
+
+def staged_count(value):
+    """Returns the number of items of a list or of a staged list."""
+    if is_staged(value):
+        return(value[StagedListKey.Count])
+
+    return(len(value or []))
+
+
+def iter_staged(value, delete_afterwards=True, connection=None):
+    """Yields the items of a staged list, or of a plain list, so callers
+    work with either.
+    """
+    if not is_staged(value):
+        for item in value or []:
+            yield item
+        return
+
+    connection = connection or staging_redis()
+    key = value[StagedListKey.Key]
+    try:
+        for start in xrange(0, value[StagedListKey.Count], READ_BATCH):
+            items = connection.lrange(key, start, start + READ_BATCH - 1)
+            for item in items:
+                yield json.loads(item)
+
+    finally:
+        if delete_afterwards:
+            connection.delete(key)
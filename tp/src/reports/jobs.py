@@ -0,0 +1,212 @@
+"""
+Background report jobs.
+
+A report too large to stream while the user waits is queued on the
+reports RQ queue with start_report_job. The worker writes it, gzipped,
+to REPORTS_DIR and keeps the state of the job in a Redis hash the API
+polls; once done the artifact is downloaded from the reports API until
+remove_expired_artifacts, a periodic task, deletes it ARTIFACT_TTL
+seconds later.
+"""
+import os
+import gzip
+import logging
+from time import time
+from uuid import uuid4
+
+import redis
+from rq import Queue
+
+from vFense.reports.stats import REPORTS, ReportFormat, encode_header, \
+    encode_rows, iter_report_batches
+from vFense.db.client import pool
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+REPORTS_DIR = '/opt/TopPatch/var/reports/'
+REPORT_QUEUE = 'reports'
+REPORT_TIMEOUT = 3600
+# Seconds a job and its artifact are kept after the job is queued.
+ARTIFACT_TTL = 86400
+
+
+class ReportJobKey():
+    Key = 'vfense:reports:job:%s'
+    JobId = 'job_id'
+    Report = 'report'
+    Format = 'format'
+    CustomerName = 'customer_name'
+    Username = 'username'
+    OsCode = 'os_code'
+    TagId = 'tag_id'
+    Status = 'status'
+    Rows = 'rows'
+    Size = 'size'
+    Created = 'created'
+    Finished = 'finished'
+    Error = 'error'
+
+
+class ReportJobStatus():
+    Queued = 'queued'
+    Running = 'running'
+    Done = 'done'
+    Failed = 'failed'
+
+
+def _redis():
+    return(redis.StrictRedis(connection_pool=pool))
+
+
+def artifact_path(job_id, report_format):
+    return(
+        os.path.join(REPORTS_DIR, '%s.%s.gz' % (job_id, report_format))
+    )
+
+
+def start_report_job(username, customer_name, report_type,
+                     report_format=ReportFormat.Csv, os_code=None,
+                     tag_id=None):
+    """Queues a report job.
+
+    Returns:
+        Dictionary of the job, keyed by ReportJobKey.
+    """
+    if report_type not in REPORTS:
+        raise ValueError('unknown report %s' % (report_type))
+
+    job = {
+        ReportJobKey.JobId: uuid4().hex,
+        ReportJobKey.Report: report_type,
+        ReportJobKey.Format: report_format,
+        ReportJobKey.CustomerName: customer_name,
+        ReportJobKey.Username: username,
+        ReportJobKey.OsCode: os_code or '',
+        ReportJobKey.TagId: tag_id or '',
+        ReportJobKey.Status: ReportJobStatus.Queued,
+        ReportJobKey.Created: int(time()),
+    }
+    key = ReportJobKey.Key % (job[ReportJobKey.JobId])
+    conn = _redis()
+    pipe = conn.pipeline()
+    pipe.hmset(key, job)
+    pipe.expire(key, ARTIFACT_TTL)
+    pipe.execute()
+    Queue(REPORT_QUEUE, connection=conn).enqueue_call(
+        func=run_report_job, args=(job[ReportJobKey.JobId],),
+        timeout=REPORT_TIMEOUT
+    )
+
+    return(job)
+
+
+def report_job(job_id):
+    """Returns the job keyed by ReportJobKey, None when it does not
+    exist or expired.
+    """
+    job = _redis().hgetall(ReportJobKey.Key % (job_id))
+    if not job:
+        return(None)
+
+    for key in (ReportJobKey.Rows, ReportJobKey.Size,
+                ReportJobKey.Created, ReportJobKey.Finished):
+        if key in job:
+            job[key] = int(job[key])
+
+    return(job)
+
+
+def run_report_job(job_id):
+    """RQ job, writes the artifact of a queued report job."""
+    conn = _redis()
+    key = ReportJobKey.Key % (job_id)
+    job = report_job(job_id)
+    if not job:
+        logger.error('report job %s expired before it ran' % (job_id))
+        return
+
+    conn.hset(key, ReportJobKey.Status, ReportJobStatus.Running)
+    report_format = job[ReportJobKey.Format]
+    path = artifact_path(job_id, report_format)
+    partial = path + '.part'
+    rows = 0
+    try:
+        if not os.path.isdir(REPORTS_DIR):
+            os.makedirs(REPORTS_DIR)
+
+        report_type = job[ReportJobKey.Report]
+        artifact = gzip.open(partial, 'wb')
+        try:
+            artifact.write(encode_header(report_type, report_format))
+            for batch in iter_report_batches(
+                    report_type, job[ReportJobKey.CustomerName],
+                    os_code=job[ReportJobKey.OsCode] or None,
+                    tag_id=job[ReportJobKey.TagId] or None):
+                artifact.write(
+                    encode_rows(report_type, batch, report_format)
+                )
+                rows += len(batch)
+
+        finally:
+            artifact.close()
+
+        os.rename(partial, path)
+
+    except Exception as e:
+        logger.exception(e)
+        if os.path.exists(partial):
+            os.remove(partial)
+
+        conn.hmset(
+            key,
+            {
+                ReportJobKey.Status: ReportJobStatus.Failed,
+                ReportJobKey.Error: str(e),
+                ReportJobKey.Finished: int(time()),
+            }
+        )
+        return
+
+    conn.hmset(
+        key,
+        {
+            ReportJobKey.Status: ReportJobStatus.Done,
+            ReportJobKey.Rows: rows,
+            ReportJobKey.Size: os.path.getsize(path),
+            ReportJobKey.Finished: int(time()),
+        }
+    )
+    logger.info(
+        'report job %s: %s report of %s, %d rows'
+        % (job_id, job[ReportJobKey.Report],
+           job[ReportJobKey.CustomerName], rows)
+    )
+
+
+def remove_expired_artifacts(period_start=None):
+    """Periodic task, deletes the artifacts older than ARTIFACT_TTL.
+
+    Returns:
+        The number of artifacts deleted.
+    """
+    if not os.path.isdir(REPORTS_DIR):
+        return(0)
+
+    cutoff = int(period_start or time()) - ARTIFACT_TTL
+    removed = 0
+    for name in os.listdir(REPORTS_DIR):
+        path = os.path.join(REPORTS_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+
+        except OSError as e:
+            logger.error('unable to remove report %s: %s' % (path, e))
+
+    if removed:
+        logger.info('removed %d expired reports' % (removed))
+
+    return(removed)
@@ -1,244 +1,392 @@
-from vFense.agent import *
+"""
+Fleet reports.
+
+A report is one query on the agents of a customer, get_all on the
+customer_name index (or on the tag_id index of tag_per_agent joined with
+the agents when a tag is given), plucked to the fields the report needs
+and read lazily off the cursor, one row per agent. REPORTS describes
+every report, the fields it plucks, the columns of its rows and the
+function that builds a row out of an agent.
+
+The rows are returned as a list by the systems_* functions the reports
+API always used, or encoded as CSV or NDJSON, a batch of rows at a time,
+for the export handler and the background report jobs (reports/jobs.py).
+"""
+import csv
 import logging
-import logging.config
-from vFense.utils.common import *
-from vFense.agent.agents import *
-from vFense.plugins.patching import * 
 from time import ctime
-from vFense.tagging.tagManager import get_agent_ids_from_tag
+from cStringIO import StringIO
+
+import simplejson as json
+
+from vFense.agent import AgentsCollection, AgentKey, AgentIndexes
+from vFense.tagging import TagsPerAgentCollection, TagsPerAgentKey, \
+    TagsPerAgentIndexes
+from vFense.plugins.monit import AgentStatsKey
+from vFense.db.client import db_connect, r
+from vFense.errorz.error_messages import GenericResults
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+# Rows encoded in one chunk of an export.
+CHUNK_ROWS = 200
+
+
+class ReportType():
+    Os = 'os'
+    Hardware = 'hardware'
+    Cpu = 'cpu'
+    Memory = 'memory'
+    Disk = 'disk'
+    Network = 'network'
+
+
+class ReportFormat():
+    Csv = 'csv'
+    Ndjson = 'ndjson'
+
+
+CONTENT_TYPES = {
+    ReportFormat.Csv: 'text/csv; charset=utf-8',
+    ReportFormat.Ndjson: 'application/x-ndjson',
+}
+
+
+def _monit_stats(agent_info):
+    return(agent_info.get(AgentStatsKey) or {})
+
+
+def _updated_at(monit_stats):
+    timestamp = monit_stats.get('timestamp')
+    if timestamp:
+        return(ctime(timestamp))
 
 
 def system_os_details(agent_info):
-    data={
-            "computer-name":agent_info.get(AgentKey.ComputerName),
-            "os-type":agent_info.get(AgentKey.OsCode), 
-            "os-name":agent_info.get(AgentKey.OsString),
-            "system-arch":agent_info.get('bit_type'),
-            "machine-type":agent_info.get(AgentKey.MachineType),
-            }
+    data = {
+        "computer-name": agent_info.get(AgentKey.ComputerName),
+        "os-type": agent_info.get(AgentKey.OsCode),
+        "os-name": agent_info.get(AgentKey.OsString),
+        "system-arch": agent_info.get('bit_type'),
+        "machine-type": agent_info.get(AgentKey.MachineType),
+    }
     return(data)
 
 
 def system_hardware_details(agent_info):
-    hardware_info=agent_info.get(AgentKey.Hardware)
-    data={
-            "computer-name":agent_info.get(AgentKey.ComputerName),  
-            "cpu":hardware_info.get('cpu'), 
-            "disk":hardware_info.get('storage'), 
-            "display":hardware_info.get('display'), 
-            "ram":hardware_info.get('memory'), 
-            } 
+    hardware_info = agent_info.get(AgentKey.Hardware) or {}
+    data = {
+        "computer-name": agent_info.get(AgentKey.ComputerName),
+        "cpu": hardware_info.get('cpu'),
+        "disk": hardware_info.get('storage'),
+        "display": hardware_info.get('display'),
+        "ram": hardware_info.get('memory'),
+    }
     return(data)
 
+
 def system_network_details(agent_info):
-    hardware_info=agent_info.get(AgentKey.Hardware)
-    data={
-            "computer-name":agent_info.get(AgentKey.ComputerName),
-            "network":hardware_info.get('nic'),
-            }
+    hardware_info = agent_info.get(AgentKey.Hardware) or {}
+    data = {
+        "computer-name": agent_info.get(AgentKey.ComputerName),
+        "network": hardware_info.get('nic'),
+    }
     return(data)
 
+
 def system_cpu_stats(agent_info):
-    monit_stats=agent_info.get('monit_stats')
-    cpu_stats=monit_stats.get('cpu')
+    monit_stats = _monit_stats(agent_info)
+    cpu_stats = monit_stats.get('cpu') or {}
     data = {
-            "computer-name": agent_info.get(AgentKey.ComputerName),
-            "last-updated-at":time.ctime(monit_stats['timestamp']),
-            "idle":cpu_stats.get('idle'),
-            "user":cpu_stats.get('user'),
-            "system":cpu_stats.get('system'),
-            }
+        "computer-name": agent_info.get(AgentKey.ComputerName),
+        "last-updated-at": _updated_at(monit_stats),
+        "idle": cpu_stats.get('idle'),
+        "user": cpu_stats.get('user'),
+        "system": cpu_stats.get('system'),
+    }
     return(data)
 
 
 def system_memory_stats(agent_info):
-    monit_stats=agent_info.get('monit_stats')
-    memory_stats=monit_stats.get('memory')
+    monit_stats = _monit_stats(agent_info)
+    memory_stats = monit_stats.get('memory') or {}
     data = {
-            "computer-name": agent_info.get(AgentKey.ComputerName),
-            "last-updated-at":time.ctime(monit_stats['timestamp']),
-            "total":memory_stats.get('total'),
-            "used":memory_stats.get('used'),
-            "used-percentage":memory_stats.get('used_percent'),
-            "free":memory_stats.get('free'),
-            "free-percent":memory_stats.get('free_percent'),
-            }
+        "computer-name": agent_info.get(AgentKey.ComputerName),
+        "last-updated-at": _updated_at(monit_stats),
+        "total": memory_stats.get('total'),
+        "used": memory_stats.get('used'),
+        "used-percentage": memory_stats.get('used_percent'),
+        "free": memory_stats.get('free'),
+        "free-percent": memory_stats.get('free_percent'),
+    }
     return(data)
 
 
 def system_disk_stats(agent_info):
-    monit_stats=agent_info.get('monit_stats')
-    file_system=monit_stats.get('file_system')
-    data ={
-            "computer-name": agent_info.get(AgentKey.ComputerName),
-            "disk-usage":file_system,
-            }
+    monit_stats = _monit_stats(agent_info)
+    data = {
+        "computer-name": agent_info.get(AgentKey.ComputerName),
+        "disk-usage": monit_stats.get('file_system'),
+    }
     return(data)
 
 
-def get_agentids(os_code=None, customer_name=None, tag_id=None):
-    agentids=[]
-    agent_ids_for_tag_id= get_agent_ids_from_tag(tag_id=tag_id)
-    agent_ids_for_os_customer=get_all_agent_ids(agent_os=os_code,customer_name=customer_name)
-    agentids=list(set(agent_ids_for_tag_id + agent_ids_for_os_customer))
-    return(agentids)
+class Report():
 
+    def __init__(self, name, fields, columns, row):
+        self.name = name
+        self.fields = fields
+        self.columns = columns
+        self.row = row
 
-def systems_os_details(username, customer_name, os_code=None, 
-        tag_id=None, uri=None, method=None):
-    systems_os_details=[]
-    agentids=get_agentids(os_code=os_code, customer_name=customer_name, tag_id=tag_id)
-    for agentid in agentids:
-        agent_info=get_agent_info(agentid=agentid)
-        system_detail=system_os_details(agent_info=agent_info)
-        systems_os_details.append(system_detail)
 
-    try:
-        data = systems_os_details
-        results = (
-                GenericResults(
-                    username, uri, method,
-                    ).information_retrieved(data, len(data))
-                )
-    
-    except Exception as e:
-        logger.exception(e)
-        results = (
-                GenericResults(
-                    username, uri, method
-                    ).something_broke('Systems_os_details', 'failed to retrieve data', e)
-                )
-    return(results)
+REPORTS = {
+    ReportType.Os: Report(
+        ReportType.Os,
+        [
+            AgentKey.ComputerName, AgentKey.OsCode, AgentKey.OsString,
+            'bit_type', AgentKey.MachineType
+        ],
+        [
+            'computer-name', 'os-type', 'os-name', 'system-arch',
+            'machine-type'
+        ],
+        system_os_details
+    ),
+    ReportType.Hardware: Report(
+        ReportType.Hardware,
+        [AgentKey.ComputerName, AgentKey.Hardware],
+        ['computer-name', 'cpu', 'disk', 'display', 'ram'],
+        system_hardware_details
+    ),
+    ReportType.Network: Report(
+        ReportType.Network,
+        [AgentKey.ComputerName, AgentKey.Hardware],
+        ['computer-name', 'network'],
+        system_network_details
+    ),
+    ReportType.Cpu: Report(
+        ReportType.Cpu,
+        [AgentKey.ComputerName, AgentStatsKey],
+        ['computer-name', 'last-updated-at', 'idle', 'user', 'system'],
+        system_cpu_stats
+    ),
+    ReportType.Memory: Report(
+        ReportType.Memory,
+        [AgentKey.ComputerName, AgentStatsKey],
+        [
+            'computer-name', 'last-updated-at', 'total', 'used',
+            'used-percentage', 'free', 'free-percent'
+        ],
+        system_memory_stats
+    ),
+    ReportType.Disk: Report(
+        ReportType.Disk,
+        [AgentKey.ComputerName, AgentStatsKey],
+        ['computer-name', 'disk-usage'],
+        system_disk_stats
+    ),
+}
 
 
-def systems_hardware_details (username, customer_name, os_code=None, 
-        tag_id=None, uri=None, method=None):
-    systems_hardware_details=[]
-    agentids=get_agentids(os_code=os_code, customer_name=customer_name, tag_id=tag_id)
-    for agentid in agentids:
-        agent_info=get_agent_info(agentid=agentid)
-        hardware_detail=system_hardware_details(agent_info=agent_info)
-        systems_hardware_details.append(hardware_detail)
+def agents_query(customer_name, os_code=None, tag_id=None):
+    """The agents of customer_name, of os_code and in tag_id when given.
 
-    try:
-        data = systems_hardware_details
-        results = (
-                GenericResults(
-                    username, uri, method,
-                    ).information_retrieved(data, len(data))
-                )
-    
-    except Exception as e:
-        logger.exception(e)
-        results = (
-                GenericResults(
-                    username, uri, method
-                    ).something_broke('Systems_hardware_details', 'failed to retrieve data', e)
-                )
-    return(results)
+    Returns:
+        RethinkDB query.
+    """
+    if tag_id:
+        query = (
+            r
+            .table(TagsPerAgentCollection)
+            .get_all(tag_id, index=TagsPerAgentIndexes.TagId)
+            .eq_join(TagsPerAgentKey.AgentId, r.table(AgentsCollection))
+            .map(lambda x: x['right'])
+            .filter({AgentKey.CustomerName: customer_name})
+        )
 
+    else:
+        query = (
+            r
+            .table(AgentsCollection)
+            .get_all(customer_name, index=AgentIndexes.CustomerName)
+        )
 
-def systems_cpu_details (username, customer_name, os_code=None, 
-        tag_id=None, uri=None, method=None):
-    systems_cpu_details=[]
-    agentids=get_agentids(os_code=os_code, customer_name=customer_name, tag_id=tag_id)
-    for agentid in agentids:
-        agent_info=get_agent_info(agentid=agentid)
-        cpu_stats=system_cpu_stats(agent_info)
-        systems_cpu_details.append(cpu_stats)
-    
-    try:
-        data = systems_cpu_details
-        results = (
-                GenericResults(
-                    username, uri, method,
-                    ).information_retrieved(data, len(data))
-                )
-    
-    except Exception as e:
-        logger.exception(e)
-        results = (
-                GenericResults(
-                    username, uri, method
-                    ).something_broke('Systems_cpu_details', 'failed to retrieve data', e)
-                )
-    return(results)
+    if os_code:
+        query = query.filter({AgentKey.OsCode: os_code})
 
-def systems_memory_stats(username, customer_name, os_code=None, 
-        tag_id=None, uri=None, method=None):
-    systems_memory_details=[]
-    agentids=get_agentids(os_code=os_code, customer_name=customer_name, tag_id=tag_id)
-    for agentid in agentids:
-        agent_info=get_agent_info(agentid=agentid)
-        memory_stats=system_memory_stats(agent_info)
-        systems_memory_details.append(memory_stats)
-    
-    try:
-        data = systems_memory_details
-        results = (
-                GenericResults(
-                    username, uri, method,
-                    ).information_retrieved(data, len(data))
-                )
-    
-    except Exception as e:
-        logger.exception(e)
-        results = (
-                GenericResults(
-                    username, uri, method
-                    ).something_broke('Systems_os_details', 'failed to retrieve data', e)
-                )
-    return(results)
+    return(query)
 
 
-def systems_disk_stats(username, customer_name, os_code=None, 
-        tag_id=None, uri=None, method=None):
-    systems_disk_details=[]
-    agentids=get_agentids(os_code=os_code, customer_name=customer_name, tag_id=tag_id)
-    for agentid in agentids:
-        agent_info=get_agent_info(agentid=agentid)
-        disk_stats=system_disk_stats(agent_info)
-        systems_disk_details.append(disk_stats)
-    
+def iter_report(report_type, customer_name, os_code=None, tag_id=None):
+    """Yields the rows of a report, one per agent, as the cursor reads
+    them. The connection stays open until the generator is exhausted
+    or closed.
+    """
+    report = REPORTS[report_type]
+    conn = db_connect()
     try:
-        data = systems_disk_details
-        results = (
-                GenericResults(
-                    username, uri, method,
-                    ).information_retrieved(data, len(data))
-                )
-    
-    except Exception as e:
-        logger.exception(e)
-        results = (
-                GenericResults(
-                    username, uri, method
-                    ).something_broke('Systems_os_details', 'failed to retrieve data', e)
-                )
-    return(results)
+        cursor = (
+            agents_query(customer_name, os_code, tag_id)
+            .pluck(*report.fields)
+            .run(conn)
+        )
+        for agent_info in cursor:
+            yield report.row(agent_info)
+
+    finally:
+        conn.close()
+
+
+def _csv_value(value):
+    if value is None:
+        return('')
+
+    if isinstance(value, (dict, list)):
+        return(json.dumps(value))
+
+    if isinstance(value, unicode):
+        return(value.encode('utf-8'))
+
+    return(str(value))
+
+
+def encode_rows(report_type, rows, report_format):
+    """Encodes rows of report_type as CSV lines or NDJSON lines."""
+    if report_format == ReportFormat.Ndjson:
+        return(''.join([json.dumps(row) + '\n' for row in rows]))
+
+    columns = REPORTS[report_type].columns
+    output = StringIO()
+    writer = csv.writer(output)
+    for row in rows:
+        writer.writerow([_csv_value(row.get(column)) for column in columns])
+
+    return(output.getvalue())
+
+
+def iter_report_batches(report_type, customer_name, os_code=None,
+                        tag_id=None, chunk_rows=CHUNK_ROWS):
+    """Yields the rows of a report in lists of chunk_rows rows."""
+    rows = []
+    for row in iter_report(report_type, customer_name, os_code, tag_id):
+        rows.append(row)
+        if len(rows) >= chunk_rows:
+            yield rows
+            rows = []
+
+    if rows:
+        yield rows
 
-def systems_network_details(username, customer_name, os_code=None, 
-        tag_id=None, uri=None, method=None):
-    systems_network_infos=[]
-    agentids=get_agentids(os_code=os_code, customer_name=customer_name, tag_id=tag_id)
-    for agentid in agentids:
-        agent_info=get_agent_info(agentid=agentid)
-        network_details=system_network_details(agent_info)
-        systems_network_infos.append(network_details)
-    
+
+def encode_header(report_type, report_format):
+    """The CSV header line of report_type, nothing for NDJSON."""
+    if report_format != ReportFormat.Csv:
+        return('')
+
+    output = StringIO()
+    csv.writer(output).writerow(REPORTS[report_type].columns)
+    return(output.getvalue())
+
+
+def iter_report_chunks(report_type, customer_name, os_code=None,
+                       tag_id=None, report_format=ReportFormat.Csv,
+                       chunk_rows=CHUNK_ROWS):
+    """Yields a report encoded in report_format, chunk_rows rows at a
+    time, the CSV header first.
+    """
+    header = encode_header(report_type, report_format)
+    if header:
+        yield header
+
+    for rows in iter_report_batches(report_type, customer_name, os_code,
+                                    tag_id, chunk_rows):
+        yield encode_rows(report_type, rows, report_format)
+
+
+def report_results(report_type, username, customer_name, os_code=None,
+                   tag_id=None, uri=None, method=None):
     try:
-        data = systems_network_infos
+        data = list(
+            iter_report(report_type, customer_name, os_code, tag_id)
+        )
         results = (
-                GenericResults(
-                    username, uri, method,
-                    ).information_retrieved(data, len(data))
-                )
-    
+            GenericResults(
+                username, uri, method,
+            ).information_retrieved(data, len(data))
+        )
+
     except Exception as e:
         logger.exception(e)
         results = (
-                GenericResults(
-                    username, uri, method
-                    ).something_broke('Systems_os_details', 'failed to retrieve data', e)
-                )
+            GenericResults(
+                username, uri, method
+            ).something_broke(
+                'systems %s details' % (report_type),
+                'failed to retrieve data', e
+            )
+        )
+
     return(results)
+
+
+def systems_os_details(username, customer_name, os_code=None,
+                       tag_id=None, uri=None, method=None):
+    return(
+        report_results(
+            ReportType.Os, username, customer_name, os_code, tag_id,
+            uri, method
+        )
+    )
+
+
+def systems_hardware_details(username, customer_name, os_code=None,
+                             tag_id=None, uri=None, method=None):
+    return(
+        report_results(
+            ReportType.Hardware, username, customer_name, os_code, tag_id,
+            uri, method
+        )
+    )
+
+
+def systems_cpu_details(username, customer_name, os_code=None,
+                        tag_id=None, uri=None, method=None):
+    return(
+        report_results(
+            ReportType.Cpu, username, customer_name, os_code, tag_id,
+            uri, method
+        )
+    )
+
+
+def systems_memory_stats(username, customer_name, os_code=None,
+                         tag_id=None, uri=None, method=None):
+    return(
+        report_results(
+            ReportType.Memory, username, customer_name, os_code, tag_id,
+            uri, method
+        )
+    )
+
+
+def systems_disk_stats(username, customer_name, os_code=None,
+                       tag_id=None, uri=None, method=None):
+    return(
+        report_results(
+            ReportType.Disk, username, customer_name, os_code, tag_id,
+            uri, method
+        )
+    )
+
+
+def systems_network_details(username, customer_name, os_code=None,
+                            tag_id=None, uri=None, method=None):
+    return(
+        report_results(
+            ReportType.Network, username, customer_name, os_code, tag_id,
+            uri, method
+        )
+    )
@@ -0,0 +1,349 @@
+"""
+Job store client and leader elected dispatcher for the vFense scheduler.
+
+The web tier only reads and writes the Redis job store through
+JobStoreClient, it never runs jobs. The scheduler daemon
+(scheduler/schedulerd.py) holds a LeaderLock, and while it is the leader
+it runs a DispatchingScheduler, which pushes every due job onto an RQ
+queue instead of executing it in process.
+"""
+import os
+import socket
+import logging
+from datetime import datetime
+from uuid import uuid4
+
+import redis
+from rq import Queue
+from apscheduler.scheduler import Scheduler
+from apscheduler.jobstores.redis_store import RedisJobStore
+from apscheduler.job import MaxInstancesReachedError
+from apscheduler.events import JobEvent, EVENT_JOB_MISSED
+
+from vFense.db.client import db_create_close, r
+from vFense.server.hierarchy import Collection, CustomerKey
+from vFense.logger.logsetup import configure_logging
+
+rq_host = 'localhost'
+rq_port = 6379
+rq_db = 0
+rq_pool = redis.StrictRedis(host=rq_host, port=rq_port, db=rq_db)
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+SCHEDULER_REDIS_DB = 10
+DEFAULT_JOBSTORE = 'patching'
+DISPATCH_QUEUE = 'scheduled_jobs'
+DISPATCH_TIMEOUT = 3600
+
+
+class SchedulerKey():
+    Leader = 'vfense:scheduler:leader'
+    Version = 'vfense:scheduler:version'
+    Dispatched = 'vfense:scheduler:dispatched:%s:%s'
+    LatencyStats = 'vfense:scheduler:latency'
+    LatencySamples = 'vfense:scheduler:latency:samples'
+
+
+class LatencyStatKey():
+    Count = 'count'
+    Total = 'total_ms'
+    Max = 'max_ms'
+    Last = 'last_ms'
+
+
+LATENCY_SAMPLE_SIZE = 1000
+
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_MAX_SCRIPT = """
+local current = tonumber(redis.call('hget', KEYS[1], ARGV[1]) or '0')
+if tonumber(ARGV[2]) > current then
+    redis.call('hset', KEYS[1], ARGV[1], ARGV[2])
+end
+return 1
+"""
+
+
+def scheduler_redis(redis_db=SCHEDULER_REDIS_DB):
+    return(redis.StrictRedis(host=rq_host, port=rq_port, db=redis_db))
+
+
+class LeaderLock(object):
+    """
+    A Redis lease used to elect the one scheduler daemon that dispatches
+    jobs. The lease expires on its own if the holder dies, so another
+    daemon can take over after at most lease_ms.
+    """
+
+    def __init__(self, connection, key=SchedulerKey.Leader,
+                 lease_ms=15000):
+        self.redis = connection
+        self.key = key
+        self.lease_ms = lease_ms
+        self.token = '%s:%d:%s' % (socket.gethostname(), os.getpid(), uuid4())
+        self._renew = self.redis.register_script(_RENEW_SCRIPT)
+        self._release = self.redis.register_script(_RELEASE_SCRIPT)
+        self.is_leader = False
+
+    def acquire(self):
+        self.is_leader = bool(
+            self.redis.set(self.key, self.token, px=self.lease_ms, nx=True)
+        )
+        return(self.is_leader)
+
+    def renew(self):
+        self.is_leader = bool(
+            self._renew(keys=[self.key], args=[self.token, self.lease_ms])
+        )
+        return(self.is_leader)
+
+    def acquire_or_renew(self):
+        if self.is_leader:
+            return(self.renew())
+
+        return(self.acquire())
+
+    def release(self):
+        released = bool(self._release(keys=[self.key], args=[self.token]))
+        self.is_leader = False
+        return(released)
+
+
+def jobstore_version(connection):
+    return(connection.get(SchedulerKey.Version))
+
+
+def bump_jobstore_version(connection):
+    return(connection.incr(SchedulerKey.Version))
+
+
+@db_create_close
+def get_customer_names(conn=None):
+    customers = (
+        r
+        .table(Collection.Customers)
+        .pluck(CustomerKey.CustomerName)
+        .run(conn)
+    )
+    return(
+        map(lambda x: x[CustomerKey.CustomerName], customers)
+    )
+
+
+def add_customer_jobstores(sched, redis_db=SCHEDULER_REDIS_DB):
+    """Adds a RedisJobStore for every customer the scheduler does not
+    know about yet.
+
+    Args:
+        sched: An apscheduler Scheduler instance.
+        redis_db: The Redis database the job stores live in.
+
+    Returns:
+        List of the job store names that were added.
+    """
+    added = []
+    names = [DEFAULT_JOBSTORE] + get_customer_names()
+    for name in names:
+        if name not in sched._jobstores:
+            sched.add_jobstore(RedisJobStore(db=redis_db), name, quiet=True)
+            added.append(name)
+
+    return(added)
+
+
+class JobStoreClient(Scheduler):
+    """
+    Scheduler front end for the web tier. It is never started, every
+    add or remove is written straight to the Redis job store and the
+    job store version is bumped so the dispatcher reloads it.
+    """
+
+    def __init__(self, redis_db=SCHEDULER_REDIS_DB, **options):
+        self.redis_db = redis_db
+        self.redis = scheduler_redis(redis_db)
+        Scheduler.__init__(self, **options)
+
+    def add_jobstore(self, jobstore, alias, quiet=False):
+        if alias in self._jobstores:
+            return
+
+        Scheduler.add_jobstore(self, jobstore, alias, quiet=True)
+        bump_jobstore_version(self.redis)
+
+    def add_job(self, trigger, func, args, kwargs, jobstore='default',
+                **options):
+        job = Scheduler.add_job(
+            self, trigger, func, args, kwargs, jobstore=jobstore,
+            **options
+        )
+        self._pending_jobs.remove((job, jobstore))
+        self._real_add_job(job, jobstore, False)
+        bump_jobstore_version(self.redis)
+
+        return(job)
+
+    def get_jobs(self, name=None):
+        self._jobstores_lock.acquire()
+        try:
+            jobs = []
+            for alias, jobstore in self._jobstores.items():
+                if not name or name == alias:
+                    jobstore.load_jobs()
+                    jobs.extend(jobstore.jobs)
+
+            return(jobs)
+
+        finally:
+            self._jobstores_lock.release()
+
+    def unschedule_job(self, job):
+        Scheduler.unschedule_job(self, job)
+        bump_jobstore_version(self.redis)
+
+
+class DispatchingScheduler(Scheduler):
+    """
+    Scheduler run by the leader. Due jobs are enqueued on an RQ queue,
+    each (job, run time) pair is claimed in Redis first so a failover or
+    a job loaded by more than one job store is only dispatched once.
+    """
+
+    def __init__(self, redis_db=SCHEDULER_REDIS_DB, queue=DISPATCH_QUEUE,
+                 **options):
+        self.redis_db = redis_db
+        self.redis = scheduler_redis(redis_db)
+        self.queue = Queue(queue, connection=rq_pool)
+        self.version = None
+        self._max = self.redis.register_script(_MAX_SCRIPT)
+        Scheduler.__init__(self, **options)
+
+    def reload_if_changed(self):
+        """Reloads every job store when the web tier changed one.
+
+        Returns:
+            True if the job stores were reloaded, False otherwise.
+        """
+        version = jobstore_version(self.redis)
+        if version == self.version:
+            return(False)
+
+        add_customer_jobstores(self, self.redis_db)
+        self._jobstores_lock.acquire()
+        try:
+            for jobstore in self._jobstores.values():
+                jobstore.load_jobs()
+        finally:
+            self._jobstores_lock.release()
+
+        self.version = version
+        self._wakeup.set()
+        logger.info('scheduler job stores reloaded at version %s' % (version))
+
+        return(True)
+
+    def _claim(self, job, run_time):
+        key = SchedulerKey.Dispatched % (job.id, run_time.isoformat())
+        ttl = max(int(job.misfire_grace_time) * 2, 3600)
+        return(self.redis.set(key, self.version or 0, ex=ttl, nx=True))
+
+    def _record_latency(self, latency_ms):
+        pipe = self.redis.pipeline()
+        pipe.hincrby(SchedulerKey.LatencyStats, LatencyStatKey.Count, 1)
+        pipe.hincrbyfloat(
+            SchedulerKey.LatencyStats, LatencyStatKey.Total, latency_ms
+        )
+        pipe.hset(SchedulerKey.LatencyStats, LatencyStatKey.Last, latency_ms)
+        pipe.lpush(SchedulerKey.LatencySamples, latency_ms)
+        pipe.ltrim(SchedulerKey.LatencySamples, 0, LATENCY_SAMPLE_SIZE - 1)
+        pipe.execute()
+        self._max(
+            keys=[SchedulerKey.LatencyStats],
+            args=[LatencyStatKey.Max, latency_ms]
+        )
+
+    def _run_job(self, job, run_times):
+        for run_time in run_times:
+            difference = datetime.now() - run_time
+            if difference.total_seconds() > job.misfire_grace_time:
+                self._notify_listeners(
+                    JobEvent(EVENT_JOB_MISSED, job, run_time)
+                )
+                logger.warning(
+                    'Run time of job "%s" was missed by %s'
+                    % (job, difference)
+                )
+                continue
+
+            try:
+                job.add_instance()
+            except MaxInstancesReachedError:
+                self._notify_listeners(
+                    JobEvent(EVENT_JOB_MISSED, job, run_time)
+                )
+                break
+
+            try:
+                if self._claim(job, run_time):
+                    self.queue.enqueue_call(
+                        func=job.func, args=job.args, kwargs=job.kwargs,
+                        timeout=DISPATCH_TIMEOUT
+                    )
+                    latency_ms = (
+                        (datetime.now() - run_time).total_seconds() * 1000
+                    )
+                    self._record_latency(latency_ms)
+                    logger.info(
+                        'Dispatched job "%s" scheduled at %s onto %s in %.2fms'
+                        % (job, run_time, self.queue.name, latency_ms)
+                    )
+                else:
+                    logger.info(
+                        'Job "%s" scheduled at %s was already dispatched'
+                        % (job, run_time)
+                    )
+
+            except Exception as e:
+                logger.exception(e)
+
+            finally:
+                job.remove_instance()
+
+            if job.coalesce:
+                break
+
+
+def get_dispatch_latency(redis_db=SCHEDULER_REDIS_DB):
+    """Returns the dispatch latency counters kept by the leader.
+
+    Returns:
+        Dictionary with count, average_ms, max_ms and last_ms.
+    """
+    stats = scheduler_redis(redis_db).hgetall(SchedulerKey.LatencyStats)
+    count = int(stats.get(LatencyStatKey.Count, 0))
+    total = float(stats.get(LatencyStatKey.Total, 0))
+    average = 0.0
+    if count:
+        average = total / count
+
+    return(
+        {
+            LatencyStatKey.Count: count,
+            'average_ms': average,
+            LatencyStatKey.Max: float(stats.get(LatencyStatKey.Max, 0)),
+            LatencyStatKey.Last: float(stats.get(LatencyStatKey.Last, 0)),
+        }
+    )
@@ -2,7 +2,6 @@
 
 from datetime import datetime
 import logging
-import logging.config
 from copy import deepcopy
 import apscheduler
 from apscheduler.scheduler import Scheduler
@@ -18,12 +17,15 @@ from vFense.tagging.tagManager import get_all_tag_ids, get_tags_info, \
 from vFense.plugins.patching import *
 from vFense.plugins.patching.rv_db_calls import \
     get_appids_by_agentid_and_status, get_app_data, get_app_data_by_appids
-from vFense.tagging.tagManager import get_agent_ids_from_tag
+from vFense.tagging.tagManager import get_agent_ids_in_any_tag
 from vFense.plugins.patching.store_operations import StoreOperation
 from vFense.errorz.error_messages import GenericResults, SchedulerResults
 from vFense.server.hierarchy import *
+from vFense.scheduler.dispatcher import JobStoreClient, \
+    add_customer_jobstores
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -67,6 +69,21 @@ def start_scheduler(redis_db=10, conn=None):
         return(started)
 
 
+def connect_scheduler(redis_db=10):
+    """Returns a JobStoreClient for the web tier. Jobs are only run by
+    the leader elected scheduler daemon (scheduler/schedulerd.py), so
+    any number of web processes can share the same job store.
+    """
+    sched = JobStoreClient(redis_db=redis_db)
+    add_customer_jobstores(sched, redis_db)
+    logger.info(
+        'Connected to the job stores for customers %s' %
+        (', '.join(sched._jobstores.keys()))
+    )
+
+    return(sched)
+
+
 def stop_scheduler(sched):
     stopped = False
     try:
@@ -194,23 +211,12 @@ def get_agentids_per_job(job_info, customer_name, username,  conn=None):
 
     elif (all_tags and not all_agents and not
             job_info['agent_ids'] and not job_info['tag_ids']):
-        agent_ids = []
         tag_ids = get_all_tag_ids(customer_name)
-
-        if tag_ids:
-            for tag_id in tag_ids:
-                agent_ids = agent_ids + get_agent_ids_from_tag(tag_id)
-
-        agent_ids = list(set(agent_ids))
+        agent_ids = get_agent_ids_in_any_tag(tag_ids)
 
     elif (job_info['tag_ids'] and not all_agents and not
             job_info['agent_ids'] and not all_tags):
-        agent_ids = []
-        tag_ids = tag_ids
-        for tag_id in tag_ids:
-            agent_ids = agent_ids + get_agent_ids_from_tag(tag_id)
-
-        agent_ids = list(set(agent_ids))
+        agent_ids = get_agent_ids_in_any_tag(tag_ids)
 
     return(agent_ids)
 
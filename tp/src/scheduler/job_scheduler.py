@@ -1,9 +1,9 @@
 import logging
-import logging.config
 from vFense.errorz.error_messages import SchedulerResults, GenericResults
+from vFense.logger.logsetup import configure_logging
 
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
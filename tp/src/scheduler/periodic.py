@@ -0,0 +1,126 @@
+"""
+Periodic system tasks of the scheduler daemon.
+
+Unlike the jobs users schedule these are not kept in a job store, they
+are declared in PERIODIC_TASKS. While the scheduler daemon holds the
+leader lease it enqueues every task once per period onto the
+scheduled_jobs RQ queue. Each (task, period) is claimed in Redis before
+it is enqueued, so a new leader does not run a period again.
+
+The task function is given by its import path, so the daemon does not
+import the plugins, and it is called with the start of the period as a
+unix timestamp. The package store tasks read the whole store, they go to
+the MAINTENANCE_QUEUE so they never hold up scheduled_jobs.
+"""
+import logging
+from time import time
+
+from rq import Queue
+
+from vFense.scheduler.dispatcher import rq_pool, DISPATCH_QUEUE, \
+    DISPATCH_TIMEOUT
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+MAINTENANCE_QUEUE = 'package_maintenance'
+
+
+class PeriodicKey():
+    Claimed = 'vfense:scheduler:periodic:%s:%d'
+
+
+class PeriodicTask(object):
+
+    def __init__(self, name, func, interval, delay=0,
+                 queue=DISPATCH_QUEUE, timeout=DISPATCH_TIMEOUT):
+        """
+        Args:
+            name: Unique name of the task.
+            func: Import path of the function to run.
+            interval: Seconds between runs, periods start at multiples
+                of it.
+
+        Kwargs:
+            delay: Seconds to wait after the start of a period before
+                the task is enqueued.
+        """
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.delay = delay
+        self.queue = queue
+        self.timeout = timeout
+
+    def period(self, now=None):
+        """Returns the start of the period that is due at now."""
+        now = int((now or time()) - self.delay)
+
+        return(now // self.interval * self.interval)
+
+
+PERIODIC_TASKS = [
+    PeriodicTask(
+        'monit_rollups', 'vFense.plugins.monit.timeseries.run_rollups',
+        interval=900, delay=60
+    ),
+    PeriodicTask(
+        'operations_retention', 'vFense.operations.retention.run_retention',
+        interval=3600, delay=600
+    ),
+    PeriodicTask(
+        'reports_cleanup', 'vFense.reports.jobs.remove_expired_artifacts',
+        interval=3600, delay=900
+    ),
+    PeriodicTask(
+        'packages_gc',
+        'vFense.plugins.patching.blob_store.run_garbage_collection',
+        interval=86400, delay=3 * 3600, queue=MAINTENANCE_QUEUE
+    ),
+    # A scrub that has to hash the whole store runs for hours.
+    PeriodicTask(
+        'packages_scrub', 'vFense.plugins.patching.scrubber.run_scrub',
+        interval=86400, delay=4 * 3600, queue=MAINTENANCE_QUEUE,
+        timeout=12 * 3600
+    ),
+]
+
+
+class PeriodicRunner(object):
+
+    def __init__(self, connection, tasks=None):
+        self.redis = connection
+        self.tasks = tasks if tasks is not None else PERIODIC_TASKS
+        self.enqueued = {}
+
+    def _claim(self, task, period):
+        return(
+            bool(
+                self.redis.set(
+                    PeriodicKey.Claimed % (task.name, period), int(time()),
+                    ex=task.interval * 2, nx=True
+                )
+            )
+        )
+
+    def tick(self, now=None):
+        for task in self.tasks:
+            period = task.period(now)
+            if self.enqueued.get(task.name) == period:
+                continue
+
+            try:
+                if self._claim(task, period):
+                    Queue(task.queue, connection=rq_pool).enqueue_call(
+                        func=task.func, args=(period,),
+                        timeout=task.timeout
+                    )
+                    logger.info(
+                        'periodic task %s enqueued for %d'
+                        % (task.name, period)
+                    )
+                self.enqueued[task.name] = period
+
+            except Exception as e:
+                logger.exception(e)
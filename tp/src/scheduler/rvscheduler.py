@@ -8,15 +8,21 @@ from vFense.plugins.cve.bulletin_parser import parse_bulletin_and_updatedb
 from vFense.plugins.cve.get_all_ubuntu_usns import begin_usn_home_page_processing
 
 from vFense.agent.agent_uptime_verifier import all_agent_status
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 get_supported_apps()
 get_agents_apps()
 
 if __name__ == '__main__':
-   
-    sched = start_scheduler(redis_db=11) 
+
+    # This is the one in process scheduler left. Its cron jobs are the
+    # system syncs below, kept in their own job store in Redis db 11,
+    # which the scheduler daemon (schedulerd.py) never loads, and
+    # vFensed starts a single rvscheduler, so they run once without the
+    # leader lease. User jobs go through schedulerd.
+    sched = start_scheduler(redis_db=11)
     jobstore_name = 'patching'
     username='admin'
     list_of_cron_jobs = [
@@ -74,6 +80,15 @@ if __name__ == '__main__':
             'coalesce': True
         },
     ]
+    # Jobs that moved to the periodic tasks of the scheduler daemon.
+    retired_cron_jobs = ['collect_garbage', 'scrub_packages']
+    for name in retired_cron_jobs:
+        if job_exists(
+                sched=sched, jobname=name,
+                username=username, customer_name=jobstore_name):
+            remove_job(sched, name, jobstore_name, username)
+            logger.info('job %s removed' % (name))
+
     for job in list_of_cron_jobs:
         job_exist = (
             job_exists(
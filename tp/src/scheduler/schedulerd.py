@@ -0,0 +1,107 @@
+"""
+Standalone vFense job scheduler daemon.
+
+Any number of these can run against the same Redis job store. Only the
+holder of the leader lease dispatches due jobs, and the periodic tasks
+of vFense.scheduler.periodic, onto the scheduled_jobs RQ queue, the
+others wait to take over when the lease expires.
+"""
+import signal
+import logging
+from time import sleep
+
+import tornado.options
+from tornado.options import define, options
+
+from vFense.scheduler.dispatcher import DispatchingScheduler, LeaderLock, \
+    add_customer_jobstores, scheduler_redis, SCHEDULER_REDIS_DB, \
+    DISPATCH_QUEUE
+from vFense.scheduler.periodic import PeriodicRunner
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+define("redis_db", default=SCHEDULER_REDIS_DB,
+       help="redis db the job stores live in", type=int)
+define("queue", default=DISPATCH_QUEUE,
+       help="rq queue due jobs are dispatched onto", type=str)
+define("lease", default=15000,
+       help="leader lease in milliseconds", type=int)
+
+
+class SchedulerDaemon():
+
+    def __init__(self, redis_db=SCHEDULER_REDIS_DB, queue=DISPATCH_QUEUE,
+                 lease_ms=15000):
+        self.redis_db = redis_db
+        self.queue = queue
+        self.lock = LeaderLock(scheduler_redis(redis_db), lease_ms=lease_ms)
+        self.periodic = PeriodicRunner(self.lock.redis)
+        self.interval = min(lease_ms / 3000.0, 1.0)
+        self.sched = None
+        self.running = True
+
+    def _start_dispatching(self):
+        self.sched = (
+            DispatchingScheduler(
+                redis_db=self.redis_db, queue=self.queue, daemonic=False
+            )
+        )
+        add_customer_jobstores(self.sched, self.redis_db)
+        self.sched.reload_if_changed()
+        self.sched.start()
+        logger.info(
+            'Scheduler leader %s is dispatching jobs for %s' %
+            (self.lock.token, ', '.join(self.sched._jobstores.keys()))
+        )
+
+    def _stop_dispatching(self):
+        if self.sched:
+            self.sched.shutdown(wait=False)
+            self.sched = None
+            logger.info('Scheduler %s stopped dispatching' % (self.lock.token))
+
+    def tick(self):
+        try:
+            leader = self.lock.acquire_or_renew()
+        except Exception as e:
+            logger.exception(e)
+            leader = False
+
+        if leader and not self.sched:
+            self._start_dispatching()
+
+        elif leader:
+            self.sched.reload_if_changed()
+
+        elif self.sched:
+            logger.warn('Scheduler %s lost the leader lease' % (self.lock.token))
+            self._stop_dispatching()
+
+        if leader:
+            self.periodic.tick()
+
+    def stop(self, *args):
+        self.running = False
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        logger.info('Scheduler daemon %s started' % (self.lock.token))
+        while self.running:
+            self.tick()
+            sleep(self.interval)
+
+        self._stop_dispatching()
+        if self.lock.is_leader:
+            self.lock.release()
+        logger.info('Scheduler daemon %s has shutdown' % (self.lock.token))
+
+
+if __name__ == '__main__':
+    tornado.options.parse_command_line()
+    SchedulerDaemon(
+        redis_db=options.redis_db, queue=options.queue,
+        lease_ms=options.lease
+    ).run()
@@ -0,0 +1,155 @@
+"""
+Benchmark of API response encoding.
+
+Builds results shaped like the ones RetrieveAppsByAgentId (the package
+list of an agent) and AgentSearcher (the agent list of a customer)
+return, and encodes them the old way, with json.dumps(indent=4), and
+the way BaseHandler.write_json does, compact and in chunks. Prints the
+encoding time, the size on the wire with and without gzip and the
+largest string held in memory at once.
+
+    python benchmark_json_responses.py --apps=5000 --agents=2000
+"""
+import gzip
+import uuid
+import random
+from time import time
+from cStringIO import StringIO
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+import tornado.options
+from tornado.options import define, options
+
+from vFense.agent import AgentKey
+from vFense.plugins.patching import AppsKey, AppsPerAgentKey
+from vFense.errorz.error_messages import GenericResults
+from vFense.server.response import dumps, iter_chunks
+
+define("apps", default=5000, help="packages in the app list", type=int)
+define("agents", default=2000, help="agents in the agent list", type=int)
+define("rounds", default=5, help="times each payload is encoded", type=int)
+
+
+def app_list(count):
+    apps = []
+    for i in range(count):
+        apps.append(
+            {
+                AppsKey.AppId: uuid.uuid4().hex * 2,
+                AppsKey.Version: '%d.%d.%d' % (
+                    random.randint(0, 9), random.randint(0, 99), i
+                ),
+                AppsKey.Name: 'package-%d-%s' % (i, uuid.uuid4().hex[:8]),
+                AppsKey.Hidden: 'no',
+                AppsPerAgentKey.Update: 5014,
+                AppsKey.ReleaseDate: 1393545600 + i,
+                AppsKey.RvSeverity: random.choice(
+                    ['Critical', 'Recommended', 'Optional']
+                ),
+                AppsKey.RebootRequired: random.choice(['yes', 'no']),
+                AppsKey.FilesDownloadStatus: 5004,
+                AppsPerAgentKey.Dependencies: [
+                    {
+                        'name': 'libdep-%d' % (d),
+                        'version': '1.%d' % (d),
+                        'app_id': uuid.uuid4().hex * 2,
+                    } for d in range(random.randint(0, 3))
+                ],
+                AppsPerAgentKey.InstallDate: 0.0,
+                AppsPerAgentKey.Status: 'available',
+            }
+        )
+
+    return(apps)
+
+
+def agent_list(count):
+    agents = []
+    for i in range(count):
+        name = 'host-%05d' % (i)
+        agents.append(
+            {
+                AgentKey.ComputerName: name,
+                AgentKey.HostName: '%s.example.com' % (name),
+                AgentKey.DisplayName: name,
+                AgentKey.OsCode: 'linux',
+                AgentKey.OsString: 'Ubuntu 12.04 LTS',
+                AgentKey.AgentId: str(uuid.uuid4()),
+                AgentKey.AgentStatus: random.choice(['up', 'down']),
+                AgentKey.NeedsReboot: 'no',
+                AgentKey.ProductionLevel: 'Production',
+                AgentKey.BasicStats: [
+                    {'count': random.randint(0, 900),
+                     'status': 'installed', 'name': 'Software Inventory'},
+                    {'count': random.randint(0, 90),
+                     'status': 'available', 'name': 'OS'},
+                    {'count': random.randint(0, 9),
+                     'status': 'available', 'name': 'Custom'},
+                    {'count': random.randint(0, 9),
+                     'status': 'available', 'name': 'Supported'},
+                    {'count': random.randint(0, 9),
+                     'status': 'available', 'name': 'Agent Updates'},
+                ],
+            }
+        )
+
+    return(agents)
+
+
+def gzipped_size(pieces):
+    buf = StringIO()
+    gz = gzip.GzipFile(mode='wb', fileobj=buf, compresslevel=6)
+    for piece in pieces:
+        gz.write(piece)
+    gz.close()
+
+    return(len(buf.getvalue()))
+
+
+def encode_indented(results):
+    return([json.dumps(results, indent=4)])
+
+
+def encode_compact(results):
+    return([dumps(results)])
+
+
+def encode_chunked(results):
+    return(list(iter_chunks(results)))
+
+
+def run_benchmark():
+    generic = GenericResults('admin', '/api/v1/agent/id/apps/os', 'GET')
+    payloads = (
+        ('RetrieveAppsByAgentId', app_list(options.apps)),
+        ('AgentSearcher', agent_list(options.agents)),
+    )
+    encoders = (
+        ('indent=4', encode_indented),
+        ('compact', encode_compact),
+        ('chunked', encode_chunked),
+    )
+    for payload_name, data in payloads:
+        results = generic.information_retrieved(data, len(data))
+        print '%s, %d items' % (payload_name, len(data))
+        for name, encoder in encoders:
+            start = time()
+            for i in range(options.rounds):
+                pieces = encoder(results)
+            elapsed = (time() - start) / options.rounds
+            print (
+                '    %-9s %8.1fms %10d bytes %9d gzipped, '
+                'largest string %d bytes' % (
+                    name, elapsed * 1000, sum([len(p) for p in pieces]),
+                    gzipped_size(pieces), max([len(p) for p in pieces])
+                )
+            )
+
+
+if __name__ == '__main__':
+    tornado.options.parse_command_line()
+    run_benchmark()
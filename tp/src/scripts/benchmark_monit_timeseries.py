@@ -0,0 +1,130 @@
+"""
+Benchmark of the monit time series storage.
+
+Writes the memory, cpu and file system samples of --agents agents
+reporting every minute for --minutes minutes, the way the listener does
+with update_agent_monit_stats but batched over --batch agents, rolls
+the first 15 minutes up and times range queries of single agents.
+
+Run it against a scratch database, it writes to the monit tables.
+
+    python benchmark_monit_timeseries.py --agents=10000 --minutes=15
+"""
+import uuid
+import random
+import datetime
+from time import time
+
+import tornado.options
+from tornado.options import define, options
+
+from vFense.db.client import db_connect
+from vFense.plugins.monit import Monitor, monit_samples
+from vFense.plugins.monit._db import Collection
+from vFense.plugins.monit.timeseries import Resolution, create_series_tables, \
+    save_samples, rollup, get_points
+
+define("agents", default=10000, help="agents reporting", type=int)
+define("minutes", default=15, help="minutes of samples", type=int)
+define("batch", default=500, help="agents written per batch", type=int)
+define("queries", default=200, help="range queries to time", type=int)
+
+
+def sample(agent_id, timestamp):
+    total = 8 * 1024 * 1024
+    used = random.randint(total / 10, total)
+    idle = random.uniform(0, 100)
+    return(
+        monit_samples(
+            agent_id,
+            {
+                'used': used, 'free': total - used, 'total': total,
+                'used_percent': used * 100.0 / total,
+                'free_percent': (total - used) * 100.0 / total,
+            },
+            {
+                'idle': idle, 'user': (100 - idle) / 2,
+                'system': (100 - idle) / 2, 'iowait': 0.0,
+            },
+            [
+                {
+                    'name': '/dev/sda1', 'mount': '/',
+                    'used': used, 'free': total - used,
+                    'used_percent': used * 100.0 / total,
+                    'free_percent': (total - used) * 100.0 / total,
+                }
+            ],
+            timestamp
+        )[1]
+    )
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return(values[min(len(values) - 1, int(len(values) * percent / 100.0))])
+
+
+def run_benchmark():
+    conn = db_connect()
+    create_series_tables(conn)
+    conn.close()
+
+    agent_ids = [str(uuid.uuid4()) for i in range(options.agents)]
+    start = int(time()) // Resolution.FifteenMinutes * \
+        Resolution.FifteenMinutes - Resolution.Hour
+
+    write_times = []
+    for minute in range(options.minutes):
+        timestamp = start + minute * Resolution.Minute
+        began = time()
+        for first in range(0, len(agent_ids), options.batch):
+            samples = {}
+            for agent_id in agent_ids[first:first + options.batch]:
+                for collection, point in sample(agent_id, timestamp).items():
+                    samples.setdefault(collection, []).append(point)
+            save_samples(samples)
+        write_times.append(time() - began)
+
+    print 'write, %d agents every minute' % (options.agents)
+    print '    %8.2fs per minute of samples, p95 %.2fs, %d points/s' % (
+        sum(write_times) / len(write_times), percentile(write_times, 95),
+        options.agents * 3 * len(write_times) / sum(write_times)
+    )
+
+    began = time()
+    written = 0
+    for collection in (Collection.Memory, Collection.Cpu,
+                       Collection.FileSystem):
+        written += rollup(
+            collection, Resolution.Minute, Resolution.FifteenMinutes, start
+        )
+    print 'rollup of 15 minutes'
+    print '    %8.2fs, %d points written' % (time() - began, written)
+
+    query_times = []
+    for agent_id in random.sample(agent_ids,
+                                  min(options.queries, len(agent_ids))):
+        began = time()
+        Monitor.get_memory_data_since(
+            agent_id, datetime.datetime.fromtimestamp(start)
+        )
+        query_times.append(time() - began)
+
+    print 'range query of one agent, %d queries' % (len(query_times))
+    print '    p50 %.1fms, p95 %.1fms' % (
+        percentile(query_times, 50) * 1000,
+        percentile(query_times, 95) * 1000
+    )
+
+    began = time()
+    get_points(
+        Collection.Memory, agent_ids[0], start - Resolution.Hour * 24 * 7,
+        resolution=Resolution.FifteenMinutes
+    )
+    print 'range query of one agent over a week of 15 minutes'
+    print '    %.1fms' % ((time() - began) * 1000)
+
+
+if __name__ == '__main__':
+    tornado.options.parse_command_line()
+    run_benchmark()
@@ -0,0 +1,101 @@
+"""
+Throughput benchmark for notification email delivery.
+
+Runs a local SMTP sink that accepts and drops every message, then sends
+the same digests once with a new connection and login per message (how
+send_data works) and once over a MailClientPool connection.
+
+    python benchmark_notifications.py --messages=500
+"""
+import smtpd
+import asyncore
+import threading
+from time import time, sleep
+
+import tornado.options
+from tornado.options import define, options
+
+from emailer.mailer import MailClient, MailClientPool
+
+define("messages", default=200, help="messages to send", type=int)
+define("port", default=8025, help="port of the smtp sink", type=int)
+define("latency", default=0.0,
+       help="seconds the sink waits before answering each message",
+       type=float)
+
+
+class SinkServer(smtpd.SMTPServer):
+
+    def __init__(self, address, latency=0.0):
+        smtpd.SMTPServer.__init__(self, address, None)
+        self.latency = latency
+        self.received = 0
+
+    def process_message(self, peer, mailfrom, rcpttos, data):
+        if self.latency:
+            sleep(self.latency)
+        self.received += 1
+
+
+def start_sink(port, latency):
+    sink = SinkServer(('127.0.0.1', port), latency)
+    thread = threading.Thread(target=asyncore.loop, kwargs={'timeout': 0.1})
+    thread.daemon = True
+    thread.start()
+
+    return(sink)
+
+
+def sink_config(port):
+    return(
+        {
+            'server': '127.0.0.1',
+            'port': port,
+            'username': '',
+            'password': '',
+            'from_email': 'alerts@localhost',
+            'to_email': 'admin@localhost',
+            'is_tls': False,
+            'is_ssl': False,
+        }
+    )
+
+
+def send_unpooled(config, messages):
+    for i in range(messages):
+        mailer = MailClient('benchmark', config)
+        mailer.connect()
+        if mailer.connected:
+            mailer.send(
+                'Digest %d' % (i), '<p>benchmark</p>', ['admin@localhost']
+            )
+        mailer.disconnect()
+
+
+def send_pooled(config, messages):
+    mail_pool = MailClientPool()
+    for i in range(messages):
+        mail_pool.send(
+            'benchmark', 'Digest %d' % (i), '<p>benchmark</p>',
+            ['admin@localhost'], config=config
+        )
+    mail_pool.close()
+
+
+def run_benchmark():
+    sink = start_sink(options.port, options.latency)
+    config = sink_config(options.port)
+    for name, sender in (('unpooled', send_unpooled), ('pooled', send_pooled)):
+        received = sink.received
+        start = time()
+        sender(config, options.messages)
+        elapsed = time() - start
+        print '%-9s %d messages in %.2fs, %.1f messages/s, %d received' % (
+            name, options.messages, elapsed, options.messages / elapsed,
+            sink.received - received
+        )
+
+
+if __name__ == '__main__':
+    tornado.options.parse_command_line()
+    run_benchmark()
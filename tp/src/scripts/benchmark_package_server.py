@@ -0,0 +1,176 @@
+"""
+Load benchmark for package downloads.
+
+Starts a number of concurrent package downloads (optionally resuming
+them with Range requests) and, while they run, keeps calling an API
+endpoint to see how much the downloads slow the API down.
+
+    python benchmark_package_server.py \
+        --url=https://127.0.0.1 --package=/packages/<app_id>/<file> \
+        --downloads=200 --concurrency=50
+"""
+import json
+import threading
+from time import time, sleep
+
+import requests
+import tornado.options
+from tornado.options import define, options
+
+define("url", default="https://127.0.0.1", help="server url", type=str)
+define("package", help="package path to download", type=str)
+define("downloads", default=100, help="downloads to run", type=int)
+define("concurrency", default=25, help="concurrent downloads", type=int)
+define("resume", default=False,
+       help="fetch the second half of each file with a Range request",
+       type=bool)
+define("api_call", default="/api/v1/agents", help="api call to time",
+       type=str)
+define("username", default="admin", help="api user", type=str)
+define("password", default="toppatch", help="api password", type=str)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def percentile(values, pct):
+    if not values:
+        return(0.0)
+
+    values = sorted(values)
+    index = min(int(round(pct / 100.0 * (len(values) - 1))), len(values) - 1)
+
+    return(values[index])
+
+
+class DownloadWorker(threading.Thread):
+
+    def __init__(self, url, jobs, results, lock, resume=False):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.url = url
+        self.jobs = jobs
+        self.results = results
+        self.lock = lock
+        self.resume = resume
+        self.session = requests.session()
+
+    def _next_job(self):
+        self.lock.acquire()
+        try:
+            if self.jobs[0] > 0:
+                self.jobs[0] -= 1
+                return(True)
+
+            return(False)
+
+        finally:
+            self.lock.release()
+
+    def run(self):
+        while self._next_job():
+            headers = {}
+            if self.resume:
+                size = int(
+                    self.session.head(self.url, verify=False)
+                    .headers.get('Content-Length', 0)
+                )
+                headers['Range'] = 'bytes=%d-' % (size / 2)
+
+            received = 0
+            status = None
+            start = time()
+            try:
+                response = self.session.get(
+                    self.url, verify=False, stream=True, headers=headers
+                )
+                status = response.status_code
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    received += len(chunk)
+
+            except Exception as e:
+                status = str(e)
+
+            self.lock.acquire()
+            self.results.append((status, received, time() - start))
+            self.lock.release()
+
+
+def time_api_calls(session, url, stop, latencies):
+    while not stop.is_set():
+        start = time()
+        try:
+            session.get(url, verify=False)
+            latencies.append((time() - start) * 1000)
+        except Exception:
+            pass
+
+        sleep(0.2)
+
+
+def run_benchmark():
+    session = requests.session()
+    session.post(
+        options.url + '/login', verify=False,
+        data=json.dumps(
+            {'username': options.username, 'password': options.password}
+        ),
+        headers={'Content-type': 'application/json'}
+    )
+
+    api_url = options.url + options.api_call
+    idle_latencies = []
+    for i in range(20):
+        start = time()
+        session.get(api_url, verify=False)
+        idle_latencies.append((time() - start) * 1000)
+
+    stop = threading.Event()
+    latencies = []
+    timer = threading.Thread(
+        target=time_api_calls, args=(session, api_url, stop, latencies)
+    )
+    timer.daemon = True
+    timer.start()
+
+    lock = threading.Lock()
+    jobs = [options.downloads]
+    results = []
+    workers = [
+        DownloadWorker(
+            options.url + options.package, jobs, results, lock,
+            options.resume
+        )
+        for i in range(options.concurrency)
+    ]
+    start = time()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time() - start
+    stop.set()
+    timer.join()
+
+    received = sum([result[1] for result in results])
+    statuses = {}
+    for result in results:
+        statuses[result[0]] = statuses.get(result[0], 0) + 1
+
+    print 'downloads:          %d in %.2fs' % (len(results), elapsed)
+    print 'status codes:       %s' % (statuses)
+    print 'throughput:         %.2f MB/s' % (
+        received / elapsed / 1024 / 1024
+    )
+    print 'download time p50:  %.2fs' % (
+        percentile([result[2] for result in results], 50)
+    )
+    for name, values in (('idle', idle_latencies), ('loaded', latencies)):
+        print 'api latency %-6s  p50 %.2fms p95 %.2fms p99 %.2fms' % (
+            name, percentile(values, 50), percentile(values, 95),
+            percentile(values, 99)
+        )
+
+
+if __name__ == '__main__':
+    tornado.options.parse_command_line()
+    run_benchmark()
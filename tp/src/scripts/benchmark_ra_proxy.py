@@ -0,0 +1,140 @@
+"""
+Benchmark of the remote desktop proxy.
+
+Starts a TCP echo server standing in for the VNC server at the end of
+the reverse tunnel and --sessions proxy sessions in this process, the
+way the RA proxy daemon serves them, each one with --clients websocket
+clients. Every client sends --messages masked frames of --size bytes
+and waits for each echo. Prints the throughput, the round trip
+percentiles and the metrics the daemon would report, then the time the
+frame unmasking takes per MB with the vectorized mask and with a
+Python loop over the bytes.
+
+    python benchmark_ra_proxy.py --sessions=50 --clients=2 --size=16384
+"""
+import os
+import socket
+from time import time
+
+import tornado.gen
+import tornado.ioloop
+import tornado.options
+import tornado.iostream
+import tornado.tcpserver
+import tornado.websocket
+from tornado.options import define, options
+
+from vFense.plugins.ra.proxy import ProxySession
+from vFense.plugins.ra.novnc.mask import websocket_mask
+
+define("sessions", default=50, help="proxy sessions", type=int)
+define("clients", default=2, help="clients per session", type=int)
+define("messages", default=200, help="messages per client", type=int)
+define("size", default=16384, help="bytes per message", type=int)
+
+
+class EchoServer(tornado.tcpserver.TCPServer):
+
+    @tornado.gen.coroutine
+    def handle_stream(self, stream, address):
+        try:
+            while True:
+                data = yield stream.read_bytes(65536, partial=True)
+                yield stream.write(data)
+
+        except tornado.iostream.StreamClosedError:
+            pass
+
+
+def free_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    return(port)
+
+
+@tornado.gen.coroutine
+def run_client(web_port, payload, latencies):
+    client = yield tornado.websocket.websocket_connect(
+        'ws://127.0.0.1:%d/websockify' % (web_port)
+    )
+    for i in range(options.messages):
+        began = time()
+        client.write_message(payload, binary=True)
+        received = 0
+        while received < len(payload):
+            message = yield client.read_message()
+            if message is None:
+                raise tornado.gen.Return()
+            received += len(message)
+        latencies.append(time() - began)
+
+    client.close()
+
+
+@tornado.gen.coroutine
+def run_proxy():
+    echo_port = free_port()
+    echo = EchoServer()
+    echo.listen(echo_port, '127.0.0.1')
+
+    sessions = []
+    for i in range(options.sessions):
+        session = ProxySession(str(i), free_port(), echo_port)
+        session.start()
+        sessions.append(session)
+
+    payload = os.urandom(options.size)
+    latencies = []
+    began = time()
+    yield [
+        run_client(session.web_port, payload, latencies)
+        for session in sessions
+        for client in range(options.clients)
+    ]
+    elapsed = time() - began
+
+    latencies.sort()
+    total = len(latencies) * options.size * 2
+    print '%d sessions, %d clients, %d round trips of %d bytes' % (
+        options.sessions, options.sessions * options.clients,
+        len(latencies), options.size
+    )
+    print '    %.1fs, %.1f MB/s through the proxy' % (
+        elapsed, total / elapsed / 1024 / 1024
+    )
+    print '    round trip p50 %.2fms, p99 %.2fms' % (
+        latencies[len(latencies) / 2] * 1000,
+        latencies[int(len(latencies) * 0.99)] * 1000
+    )
+    print '    session 0: %s' % (sessions[0].metrics(time()))
+
+    for session in sessions:
+        session.stop()
+    echo.stop()
+
+
+def loop_mask(mask, data):
+    mask = bytearray(mask)
+    unmasked = bytearray(data)
+    for i in xrange(len(unmasked)):
+        unmasked[i] ^= mask[i % 4]
+
+    return(str(unmasked))
+
+
+def run_mask():
+    mask = os.urandom(4)
+    data = os.urandom(1024 * 1024)
+    for name, func in (('vectorized', websocket_mask), ('loop', loop_mask)):
+        began = time()
+        func(mask, data)
+        print '    %s unmask %.1fms per MB' % (name, (time() - began) * 1000)
+
+
+if __name__ == '__main__':
+    tornado.options.parse_command_line()
+    tornado.ioloop.IOLoop.instance().run_sync(run_proxy)
+    run_mask()
@@ -0,0 +1,119 @@
+"""
+Benchmark of the startup of the web tier.
+
+Times the import of vFense_web, the schema check of migrate on a
+database already at SCHEMA_VERSION and the construction of the web
+Application, --runs times each, and counts the RethinkDB queries they
+run. With --max-seconds or --max-queries it exits with status 1 when the
+Application takes longer or runs more queries, and with --history it
+appends the results, one JSON object per line, to track them over time.
+
+Run it against a database that was migrated already.
+
+    python benchmark_startup.py --runs=5 --max-queries=1
+"""
+import sys
+import json
+from time import time
+
+import tornado.options
+from tornado.options import define, options
+from rethinkdb.ast import RqlQuery
+
+define("runs", default=5, help="times each step is timed", type=int)
+define("max_seconds", default=0.0,
+       help="seconds the Application may take, 0 to not check", type=float)
+define("max_queries", default=0,
+       help="queries the Application may run, 0 to not check", type=int)
+define("history", default='', help="file the results are appended to")
+
+_queries = [0]
+_run = RqlQuery.run
+
+
+def _counting_run(self, *args, **kwargs):
+    _queries[0] += 1
+    return(_run(self, *args, **kwargs))
+
+
+def timed(func, runs):
+    """Runs func runs times.
+
+    Returns:
+        Tuple of the best seconds and the queries of the last run.
+    """
+    best = None
+    for run in range(runs):
+        _queries[0] = 0
+        began = time()
+        func()
+        elapsed = time() - began
+        best = elapsed if best is None else min(best, elapsed)
+
+    return(best, _queries[0])
+
+
+def run_benchmark():
+    RqlQuery.run = _counting_run
+
+    _queries[0] = 0
+    began = time()
+    from vFense import vFense_web
+    from vFense.db.migrations import migrate, SCHEMA_VERSION
+    results = {
+        'import_seconds': round(time() - began, 3),
+        'import_queries': _queries[0],
+    }
+
+    version = migrate()
+    if version < SCHEMA_VERSION:
+        print 'the schema is at version %d of %d' % (version, SCHEMA_VERSION)
+        sys.exit(1)
+
+    seconds, queries = timed(migrate, options.runs)
+    results['migrate_seconds'] = round(seconds, 4)
+    results['migrate_queries'] = queries
+
+    seconds, queries = timed(
+        lambda: vFense_web.Application(False), options.runs
+    )
+    results['application_seconds'] = round(seconds, 3)
+    results['application_queries'] = queries
+
+    print 'import of vFense_web'
+    print '    %8.3fs, %d queries' % (
+        results['import_seconds'], results['import_queries']
+    )
+    print 'schema check, best of %d' % (options.runs)
+    print '    %8.4fs, %d queries' % (
+        results['migrate_seconds'], results['migrate_queries']
+    )
+    print 'Application(), best of %d' % (options.runs)
+    print '    %8.3fs, %d queries' % (
+        results['application_seconds'], results['application_queries']
+    )
+
+    if options.history:
+        results['time'] = int(time())
+        results['schema_version'] = version
+        with open(options.history, 'a') as history:
+            history.write(json.dumps(results, sort_keys=True) + '\n')
+
+    failed = False
+    if options.max_seconds and \
+            results['application_seconds'] > options.max_seconds:
+        print 'Application() took more than %.3fs' % (options.max_seconds)
+        failed = True
+
+    if options.max_queries and \
+            results['application_queries'] > options.max_queries:
+        print 'Application() ran more than %d queries' % (options.max_queries)
+        failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    tornado.options.parse_command_line()
+    run_benchmark()
@@ -0,0 +1,118 @@
+"""
+Benchmark of the monitoring threshold evaluator.
+
+Feeds a ThresholdEvaluator synthetic samples of --agents agents
+reporting every minute for --minutes minutes against --rules rules per
+type (cpu, mem and filesystem) covering every agent. --flapping percent
+of the agents jump around the thresholds every sample, --breaching
+percent stay over them. Prints the evaluation time per sample and the
+alerts raised and suppressed, which shows the dedup and rate limit at
+work.
+
+    python benchmark_threshold_alerts.py --agents=10000 --minutes=30
+"""
+import uuid
+import random
+from time import time
+
+import tornado.options
+from tornado.options import define, options
+
+from vFense.notifications import NotificationKeys, CPU, MEM, FS
+from vFense.notifications.thresholds import ThresholdEvaluator, \
+    ThresholdRule, THRESHOLD_KEYS
+
+define("agents", default=10000, help="agents reporting", type=int)
+define("minutes", default=30, help="minutes of samples", type=int)
+define("rules", default=2, help="rules per type", type=int)
+define("duration", default=300,
+       help="seconds a value must stay over the threshold", type=int)
+define("flapping", default=5, help="percent of flapping agents", type=int)
+define("breaching", default=1, help="percent of breaching agents", type=int)
+
+CUSTOMER = 'default'
+
+
+def make_rules():
+    rules = []
+    for rule_type in (CPU, MEM, FS):
+        for i in range(options.rules):
+            rules.append(
+                ThresholdRule(
+                    {
+                        NotificationKeys.NotificationId: str(uuid.uuid4()),
+                        NotificationKeys.NotificationType: rule_type,
+                        NotificationKeys.RuleName: '%s %d' % (rule_type, i),
+                        THRESHOLD_KEYS[rule_type]: 80 + i * 5,
+                        NotificationKeys.ThresholdDuration: options.duration,
+                        NotificationKeys.FileSystem: ['/'],
+                    }
+                )
+            )
+
+    return(rules)
+
+
+def make_sample(behaviour, minute):
+    if behaviour == 'breaching':
+        value = random.uniform(95, 100)
+    elif behaviour == 'flapping':
+        value = random.choice([random.uniform(60, 75), random.uniform(90, 99)])
+    else:
+        value = random.uniform(5, 60)
+
+    return(
+        {'used_percent': value},
+        {'idle': 100 - value, 'user': value / 2, 'system': value / 2},
+        [{'name': '/dev/sda1', 'mount': '/', 'used_percent': value}],
+    )
+
+
+def run_benchmark():
+    evaluator = ThresholdEvaluator()
+    evaluator.set_rules(CUSTOMER, make_rules())
+
+    agents = []
+    for i in range(options.agents):
+        roll = random.uniform(0, 100)
+        if roll < options.breaching:
+            behaviour = 'breaching'
+        elif roll < options.breaching + options.flapping:
+            behaviour = 'flapping'
+        else:
+            behaviour = 'normal'
+        agents.append((str(uuid.uuid4()), behaviour))
+
+    start = int(time())
+    alerts = 0
+    elapsed = 0.0
+    for minute in range(options.minutes):
+        timestamp = start + minute * 60
+        samples = [
+            (agent_id, make_sample(behaviour, minute))
+            for agent_id, behaviour in agents
+        ]
+        began = time()
+        for agent_id, (memory, cpu, file_system) in samples:
+            alerts += len(
+                evaluator.update(
+                    CUSTOMER, agent_id, timestamp, memory, cpu, file_system
+                )
+            )
+        elapsed += time() - began
+
+    samples = options.agents * options.minutes
+    print '%d samples, %d rules, %d tracked states' % (
+        samples, options.rules * 3, len(evaluator.states)
+    )
+    print '    %.1fus per sample, %d samples/s' % (
+        elapsed / samples * 1000000, samples / elapsed
+    )
+    print '    %d alerts raised, %d suppressed by the rate limit' % (
+        alerts, evaluator.pop_suppressed(CUSTOMER)
+    )
+
+
+if __name__ == '__main__':
+    tornado.options.parse_command_line()
+    run_benchmark()
@@ -1,5 +1,8 @@
 #!/usr/bin/env python
-
+"""
+Tables and indexes of the baseline schema, created by migration 1 of
+vFense.db.migrations. New tables and indexes go in a new migration.
+"""
 from vFense.db.client import db_connect, r
 from vFense.agent import *
 from vFense.notifications import *
@@ -8,6 +11,8 @@ from vFense.plugins.patching import *
 from vFense.plugins.mightymouse import *
 from vFense.plugins.cve import *
 from vFense.tagging import *
+from vFense.plugins.monit.timeseries import create_series_tables
+from vFense.operations.retention import create_archive_table
 Id = 'id'
 def initialize_indexes_and_create_tables():
     tables = [
@@ -128,6 +133,9 @@ def initialize_indexes_and_create_tables():
     if not FilesIndexes.FilesDownloadStatus in files_list:
         r.table(FilesCollection).index_create(FilesIndexes.FilesDownloadStatus).run(conn)
 
+    if not FilesIndexes.AgentIds in files_list:
+        r.table(FilesCollection).index_create(FilesIndexes.AgentIds, multi=True).run(conn)
+
 #################################### AppsPerAgentCollection Indexes ###################################################
     if not AppsPerAgentIndexes.Status in app_list:
         r.table(AppsPerAgentCollection).index_create(AppsPerAgentIndexes.Status).run(conn)
@@ -524,6 +532,12 @@ def initialize_indexes_and_create_tables():
                 x[OperationPerAgentKey.OperationId],
                 x[OperationPerAgentKey.AgentId]]).run(conn)
 
+    if not OperationPerAgentIndexes.OperationIdAndStatus in operations_per_agent_list:
+        r.table(OperationsPerAgentCollection).index_create(
+            OperationPerAgentIndexes.OperationIdAndStatus, lambda x: [
+                x[OperationPerAgentKey.OperationId],
+                x[OperationPerAgentKey.Status]]).run(conn)
+
 #################################### OperationsPerAppCollection Indexes ###################################################
     if not OperationPerAppIndexes.OperationId in operations_per_app_list:
         r.table(OperationsPerAppCollection).index_create(OperationPerAppKey.OperationId).run(conn)
@@ -641,4 +655,10 @@ def initialize_indexes_and_create_tables():
                 x[UbuntuSecurityBulletinKey.Apps].map(lambda y:
                     [y['name'], y['version']]), multi=True).run(conn)
 
+#################################### Monit Time Series ###################################################
+    create_series_tables(conn)
+
+#################################### Operations Archive ###################################################
+    create_archive_table(conn)
+
     conn.close()
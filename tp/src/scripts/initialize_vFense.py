@@ -7,9 +7,8 @@ import shutil
 import signal
 import subprocess
 from time import sleep
-import logging, logging.config
+import logging
 
-import create_indexes as ci
 import nginx_config_creator as ncc
 from vFense.utils.security import generate_pass
 from vFense.utils.common import pick_valid_ip_address
@@ -17,7 +16,7 @@ from vFense.db.client import db_connect, r
 
 from vFense.server import hierarchy
 from vFense.server.hierarchy import *
-from vFense.server.hierarchy import db as hierarchy_db
+from vFense.db.migrations import migrate
 from vFense.server.hierarchy.manager import Hierarchy
 from vFense.server.hierarchy.permissions import Permission
 
@@ -26,8 +25,9 @@ from vFense.plugins import cve
 from vFense.plugins.cve.cve_parser import load_up_all_xml_into_db
 from vFense.plugins.cve.bulletin_parser import parse_bulletin_and_updatedb
 from vFense.plugins.cve.get_all_ubuntu_usns import begin_usn_home_page_processing
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 RETHINK_PATH = '/usr/share/rethinkdb'
 RETHINK_USER = 'rethinkdb'
@@ -187,10 +187,9 @@ def initialize_db():
         r.db_create('toppatch_server').run(conn)
         db = r.db('toppatch_server')
         conn.close()
-        ci.initialize_indexes_and_create_tables()
+        migrate()
         conn = db_connect()
 
-        hierarchy_db.init()
         Hierarchy.create_customer(
             DefaultCustomer,
             {
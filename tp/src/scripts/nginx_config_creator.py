@@ -1,5 +1,7 @@
 NGINX_CONFIG_FILE = '/etc/nginx/sites-available/vFense.conf'
-base_nginx_config = """server {
+base_nginx_config = """limit_conn_zone $binary_remote_addr zone=package_clients:10m;
+
+server {
     listen         80;
     server_name    %(server_name)s localhost;
     rewrite        ^ https://$server_name$request_uri? permanent;
@@ -42,6 +44,16 @@ server {
         upload_cleanup 400 404 499 500-505;
     }
       
+    location ^~ /api/v1/apps/custom/upload/chunk/ {
+        proxy_pass              https://rvweb;
+        proxy_http_version      1.1;
+        proxy_request_buffering off;
+        client_max_body_size    0;
+        proxy_set_header        Host $host;
+        proxy_set_header        X-Real-IP $remote_addr;
+        proxy_set_header        X-Forwarded-For $proxy_add_x_forwarded_for;
+    }
+
     location @after_upload {
         proxy_pass              https://rvweb;
     } 
@@ -93,6 +105,30 @@ server {
         proxy_redirect          http:// https://;
     }
 
+    location ^~ /packages/ {
+        proxy_pass              https://rvpackages;
+        proxy_set_header        Host $host;
+        proxy_set_header        X-Real-IP $remote_addr;
+        proxy_set_header        X-Forwarded-For $proxy_add_x_forwarded_for;
+        proxy_set_header        Range $http_range;
+        proxy_set_header        If-Range $http_if_range;
+        proxy_intercept_errors  off;
+    }
+
+    location ^~ /internal/packages/ {
+        internal;
+        alias                   /opt/TopPatch/var/packages/;
+        sendfile                on;
+        tcp_nopush              on;
+        sendfile_max_chunk      1m;
+        limit_conn              package_clients %(package_client_limit)s;
+        limit_conn_status       503;
+        etag                    off;
+        add_header              ETag $upstream_http_etag;
+        add_header              Accept-Ranges bytes;
+        add_header              Cache-Control "public, must-revalidate";
+    }
+
     location ~* \.(?:ico|css|js|gif|jpe?g|png)$ {
         root                    /opt/TopPatch/tp/wwwstatic;
         expires                 max;
@@ -132,7 +168,10 @@ def nginx_config_builder(
         rvlistener_starting_port=9020,
         rvlistener_count=10,
         rvweb_starting_port=9060,
-        rvweb_count=1):
+        rvweb_count=1,
+        rvpackages_starting_port=9080,
+        rvpackages_count=4,
+        package_client_limit=4):
 
     if rvlistener_count >= 41:
         rvlistener_count=40
@@ -152,15 +191,27 @@ def nginx_config_builder(
         rvweb_port += 1
 
     rvweb_config += '}\n\n'
+
+    rvpackages_port = rvpackages_starting_port
+    rvpackages_config = 'upstream rvpackages {\n'
+    for i in range(rvpackages_count):
+        rvpackages_config += '    server 127.0.0.1:%s;\n' % (rvpackages_port)
+        rvpackages_port += 1
+
+    rvpackages_config += '}\n\n'
     replace_config = (
         base_nginx_config %
         {
             'server_name': server_name,
             'server_crt': server_cert,
-            'server_key': server_key
+            'server_key': server_key,
+            'package_client_limit': package_client_limit
         }
     )
-    new_config = rvlistener_config + rvweb_config + replace_config
+    new_config = (
+        rvlistener_config + rvweb_config + rvpackages_config +
+        replace_config
+    )
     CONFIG_FILE = open(NGINX_CONFIG_FILE, 'w', 0)
     CONFIG_FILE.write(new_config)
     CONFIG_FILE.close()
@@ -0,0 +1,190 @@
+"""
+Load simulator of the fair queue.
+
+Simulates the workers of one RQ queue under a skewed load, once with
+the plain FIFO RQ queue and once with the fair queue in front of it
+(the FairPolicy the fair queue daemon uses, with READY_PER_WORKER jobs
+per worker on the RQ queue). The big customer refreshes --big-agents
+agents at once, their inventories go in the ingest lane and the syncs
+that follow in the sync lane. Each of the --small customers registers
+a new agent every --small-interval seconds on average and deletes one
+now and then, in the interactive lane. Jobs take --service seconds on average.
+
+Prints the wait, from enqueue to start, of the jobs of every customer
+and lane, p50, p99 and max, for both runs.
+
+    python simulate_fair_queue.py --workers=4 --big-agents=5000
+"""
+import heapq
+import random
+from collections import deque
+
+import tornado.options
+from tornado.options import define, options
+
+from vFense.receiver.fairqueue import FairPolicy, Lane, LANES, READY_DEPTH, \
+    READY_PER_WORKER
+
+define("workers", default=4, help="RQ workers of the queue", type=int)
+define("service", default=2.0, help="mean seconds a job takes", type=float)
+define("big_agents", default=5000, help="agents the big customer refreshes",
+       type=int)
+define("small", default=10, help="small customers", type=int)
+define("small_interval", default=300.0,
+       help="mean seconds between the new agents of a small customer",
+       type=float)
+define("interactive_ratio", default=0.2,
+       help="share of the small customer jobs that are interactive",
+       type=float)
+define("seed", default=1, help="random seed", type=int)
+
+QUEUE = 'incoming_updates'
+ARRIVE = 0
+FINISH = 1
+
+
+class Job(object):
+
+    def __init__(self, arrival, customer, lane, service):
+        self.arrival = arrival
+        self.customer = customer
+        self.lane = lane
+        self.service = service
+        self.start = None
+
+
+def generate_jobs():
+    random.seed(options.seed)
+    service = lambda: random.expovariate(1.0 / options.service)
+    jobs = []
+    for agent in range(options.big_agents):
+        arrival = random.uniform(0, 60)
+        jobs.append(Job(arrival, 'big', Lane.Ingest, service()))
+        jobs.append(Job(arrival, 'big', Lane.Sync, service()))
+
+    duration = options.big_agents * 2 * options.service / options.workers
+    for customer in range(options.small):
+        name = 'small-%02d' % (customer)
+        arrival = random.expovariate(1.0 / options.small_interval)
+        while arrival < duration:
+            if random.random() < options.interactive_ratio:
+                jobs.append(Job(arrival, name, Lane.Interactive, service()))
+            else:
+                jobs.append(Job(arrival, name, Lane.Ingest, service()))
+                jobs.append(Job(arrival, name, Lane.Sync, service()))
+            arrival += random.expovariate(1.0 / options.small_interval)
+
+    return(jobs)
+
+
+class FifoQueue(object):
+
+    def __init__(self):
+        self.jobs = deque()
+
+    def push(self, job):
+        self.jobs.append(job)
+
+    def pop(self):
+        if self.jobs:
+            return(self.jobs.popleft())
+
+
+class FairQueue(object):
+    """The fair queue lists and the RQ queue the daemon fills."""
+
+    def __init__(self, ready_depth=READY_DEPTH):
+        self.policy = FairPolicy()
+        self.lanes = dict([(lane, {}) for lane in LANES])
+        self.ready = deque()
+        self.ready_depth = ready_depth
+
+    def push(self, job):
+        self.lanes[job.lane].setdefault(job.customer, deque()).append(job)
+
+    def _next(self):
+        pending = [lane for lane in LANES if self.lanes[lane]]
+        if not pending:
+            return
+
+        lane = self.policy.pick_lane(QUEUE, pending)
+        customers = self.lanes[lane]
+        customer = self.policy.pick_customer(QUEUE, lane, customers.keys())
+        self.policy.charge(QUEUE, lane, customer)
+        job = customers[customer].popleft()
+        if not customers[customer]:
+            del customers[customer]
+
+        return(job)
+
+    def pop(self):
+        while len(self.ready) < self.ready_depth:
+            job = self._next()
+            if not job:
+                break
+            self.ready.append(job)
+
+        if self.ready:
+            return(self.ready.popleft())
+
+
+def simulate(jobs, queue, workers):
+    events = [(job.arrival, i, ARRIVE, job) for i, job in enumerate(jobs)]
+    heapq.heapify(events)
+    sequence = len(events)
+    idle = workers
+    while events:
+        now, _, kind, job = heapq.heappop(events)
+        if kind == ARRIVE:
+            queue.push(job)
+        else:
+            idle += 1
+
+        while idle:
+            job = queue.pop()
+            if not job:
+                break
+
+            job.start = now
+            idle -= 1
+            sequence += 1
+            heapq.heappush(events, (now + job.service, sequence, FINISH, job))
+
+
+def percentile(values, fraction):
+    return(values[min(int(len(values) * fraction), len(values) - 1)])
+
+
+def report(name, jobs):
+    waits = {}
+    for job in jobs:
+        waits.setdefault((job.customer, job.lane), []).append(
+            job.start - job.arrival
+        )
+
+    print '%s, %d workers' % (name, options.workers)
+    print '    %-10s %-12s %6s %9s %9s %9s' % (
+        'customer', 'lane', 'jobs', 'p50', 'p99', 'max'
+    )
+    for customer, lane in sorted(waits.keys()):
+        values = sorted(waits[(customer, lane)])
+        print '    %-10s %-12s %6d %8.1fs %8.1fs %8.1fs' % (
+            customer, lane, len(values), percentile(values, 0.5),
+            percentile(values, 0.99), values[-1]
+        )
+
+
+def copy_jobs(jobs):
+    return(
+        [Job(job.arrival, job.customer, job.lane, job.service) for job in jobs]
+    )
+
+
+if __name__ == '__main__':
+    tornado.options.parse_command_line()
+    jobs = generate_jobs()
+    fair = FairQueue(max(READY_DEPTH, READY_PER_WORKER * options.workers))
+    for name, queue in (('FIFO', FifoQueue()), ('fair', fair)):
+        run = copy_jobs(jobs)
+        simulate(run, queue, options.workers)
+        report(name, run)
@@ -2,15 +2,15 @@
 # Safer to use hierarchy and its User, Group, Customer class.
 
 import logging
-import logging.config
 from copy import deepcopy
 from vFense.db.client import *
 
 from vFense.groups import *
 from vFense.users import *
 from vFense.customers import *
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
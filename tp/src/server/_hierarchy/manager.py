@@ -1,5 +1,4 @@
 import logging
-import logging.config
 
 import server.hierarchy._db as _db
 from vFense.server.hierarchy.groups import *
@@ -9,8 +8,9 @@ from vFense.server.hierarchy.customers import *
 from vFense.server.hierarchy import *
 from vFense.server.hierarchy.permissions import Permission
 from vFense.utils.security import Crypto
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
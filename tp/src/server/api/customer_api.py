@@ -1,9 +1,7 @@
-import json
 import logging
-import logging.config
 
 from vFense.agent.agents import get_all_agent_ids
-from vFense.agent.agent_handler import AgentManager
+from vFense.agent.agent_handler import BulkAgentManager
 
 from vFense.server.hierarchy import api
 from vFense.server.hierarchy.permissions import Permission
@@ -12,7 +10,9 @@ from vFense.server.handlers import BaseHandler
 
 from apscheduler.jobstores.redis_store import RedisJobStore
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 ROOT_CUSTOMER = 'default'
@@ -36,7 +36,7 @@ class GetCustomerHandler(BaseHandler):
 
             result = api.Customer.get(user_name=user)
 
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class AddCustomerHandler(BaseHandler):
@@ -54,7 +54,7 @@ class AddCustomerHandler(BaseHandler):
         result = api.Customer.create(name, username)
         self.sched.add_jobstore(RedisJobStore(db=10), name)
 
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class ModifyCustomerHandler(BaseHandler):
@@ -81,7 +81,7 @@ class ModifyCustomerHandler(BaseHandler):
 
         result = api.Customer.edit(**data)
 
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class DeleteCustomerHandler(BaseHandler):
@@ -100,11 +100,10 @@ class DeleteCustomerHandler(BaseHandler):
         if result['pass']:
             # delete all agents of this customer
             all_agents = get_all_agent_ids(customer_name=name)
-            for agent_id in all_agents:
-                agent = AgentManager(
-                    agent_id, customer_name=name
+            if all_agents:
+                agents = BulkAgentManager(customer_name=name)
+                agents.delete_agents(
+                    agent_ids=all_agents, uri=uri, method=method
                 )
-                # TODO: real uri, real method
-                agent.delete_agent(uri, method)
 
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
@@ -1,10 +1,7 @@
 import tornado.httpserver
 import tornado.web
 
-import simplejson as json
-
 import logging
-import logging.config
 import os
 from vFense.server.handlers import BaseHandler, LoginHandler
 from vFense.db.client import *
@@ -15,7 +12,9 @@ from vFense.server.hierarchy.manager import get_current_customer_name
 from vFense.server.hierarchy.decorators import authenticated_request
 from jsonpickle import encode
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -35,8 +34,7 @@ class GetEmailConfigHandler(BaseHandler):
             'is_ssl': mail.is_ssl
             }
      
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class CreateEmailConfigHandler(BaseHandler):
@@ -97,8 +95,7 @@ class CreateEmailConfigHandler(BaseHandler):
                 'pass': False,
                 'message': 'Incorrect Parameters Passed'
                 }
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 
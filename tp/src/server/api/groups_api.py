@@ -1,6 +1,4 @@
-import json
 import logging
-import logging.config
 
 from vFense.server.handlers import BaseHandler
 #from server.hierarchy.manager import get_current_customer_name
@@ -8,8 +6,9 @@ from vFense.server.hierarchy import api
 from vFense.server.hierarchy.decorators import authenticated_request, permission_check
 
 from vFense.server.hierarchy.permissions import Permission
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 ROOT_GROUP = 'default'
@@ -39,7 +38,7 @@ class GetGroupApi(BaseHandler):
 
             result = api.Group.get_groups(customer_context, user)
 
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class AddGroupApi(BaseHandler):
@@ -56,7 +55,7 @@ class AddGroupApi(BaseHandler):
 
         result = api.Group.create(name, user, customer_context)
 
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class ModifyGroupApi(BaseHandler):
@@ -82,7 +81,7 @@ class ModifyGroupApi(BaseHandler):
 
         result = api.Group.edit(**data)
 
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class DeleteGroupApi(BaseHandler):
@@ -105,4 +104,4 @@ class DeleteGroupApi(BaseHandler):
             user_name
         )
 
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
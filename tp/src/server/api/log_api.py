@@ -1,10 +1,7 @@
 import tornado.httpserver
 import tornado.web
 
-import simplejson as json
-
 import logging
-import logging.config
 from vFense.server.handlers import BaseHandler, LoginHandler
 from vFense.db.client import *
 from vFense.utils.common import *
@@ -14,7 +11,9 @@ from vFense.server.hierarchy.manager import get_current_customer_name
 
 from jsonpickle import encode
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -26,14 +25,16 @@ class LoggingModifyerHandler(BaseHandler):
         port = self.get_argument('port', None)
         proto = self.get_argument('proto', 'UDP')
         level = self.get_argument('level', 'INFO')
+        logformat = self.get_argument('format', 'text')
         proto = proto.upper()
         level = level.upper()
+        logformat = logformat.lower()
         if host and port and proto and level:
             rvlogger = RvLogger()
             connected = rvlogger.connect_to_loghost(host, port, proto)
             if connected:
                 rvlogger.create_config(loglevel=level, loghost=host,
-                        logport=port, logproto=proto)
+                        logport=port, logproto=proto, logformat=logformat)
                 results = rvlogger.results
             else:
                 results = {
@@ -43,15 +44,14 @@ class LoggingModifyerHandler(BaseHandler):
                         }
         elif level and not host and not port:
             rvlogger = RvLogger()
-            rvlogger.create_config(loglevel=level)
+            rvlogger.create_config(loglevel=level, logformat=logformat)
             results = rvlogger.results
         else:
             results = {
                     'pass': False,
                     'message': 'incorrect parameters passed'
                     }
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
 
 class LoggingListerHandler(BaseHandler):
@@ -60,5 +60,4 @@ class LoggingListerHandler(BaseHandler):
         rvlogger = RvLogger()
         rvlogger.get_logging_config()
         results = rvlogger.results
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
@@ -1,15 +1,16 @@
-import json
 import logging
-import logging.config
 
 from vFense.server.handlers import BaseHandler
 from vFense.server.hierarchy.decorators import authenticated_request
 
 from vFense.plugins.monit import api
+from vFense.plugins.monit.ingest import ingest_metrics
+from vFense.errorz.error_messages import GenericResults
 
 from vFense.logger.rvlogger import RvLogger
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 ROOT_USER = 'root'
@@ -26,7 +27,7 @@ class GetMemoryStats(BaseHandler):
 
         result = api.get_agent_memory_latest(agent_id)
 
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class GetFileSystemStats(BaseHandler):
@@ -40,7 +41,7 @@ class GetFileSystemStats(BaseHandler):
 
         result = api.get_agent_file_system_latest(agent_id)
 
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class GetCpuStats(BaseHandler):
@@ -54,7 +55,7 @@ class GetCpuStats(BaseHandler):
 
         result = api.get_agent_cpu_latest(agent_id)
 
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class GetAllStats(BaseHandler):
@@ -68,4 +69,32 @@ class GetAllStats(BaseHandler):
 
         result = api.get_agent_latest(agent_id)
 
-        self.write(json.dumps(result, indent=4))
\ No newline at end of file
+        self.write_json(result)
+
+
+class GetIngestStats(BaseHandler):
+
+    @authenticated_request
+    def get(self):
+        username = self.get_current_user()
+        uri = self.request.uri
+        method = self.request.method
+        try:
+            metrics = ingest_metrics()
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).information_retrieved(metrics, 1)
+            )
+
+        except Exception as e:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).something_broke('monit ingest', 'metrics', e)
+            )
+            logger.exception(results)
+
+        self.set_status(results['http_status'])
+        self.write_json(results)
+
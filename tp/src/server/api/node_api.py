@@ -1,11 +1,7 @@
 import tornado.httpserver
 import tornado.web
 
-try: import simplejson as json
-except ImportError: import json
-
 import logging
-import logging.config
 from vFense.models.application import *
 from vFense.server.decorators import authenticated_request
 from vFense.server.handlers import BaseHandler, LoginHandler
@@ -30,7 +26,9 @@ from vFense.sqlalchemy.orm import sessionmaker, class_mapper
 
 from jsonpickle import encode
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -51,8 +49,7 @@ class ModifyDisplayNameHandler(BaseHandler):
                     "message" : "Insufficient arguments"
                     }
         self.session.close()
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class ModifyHostNameHandler(BaseHandler):
@@ -72,8 +69,7 @@ class ModifyHostNameHandler(BaseHandler):
                     "message" : "Insufficient arguments"
                     }
         self.session.close()
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class NodeCleanerHandler(BaseHandler):
@@ -94,8 +90,7 @@ class NodeCleanerHandler(BaseHandler):
                     ('Arguments needed are: nodeid')
                 }
         self.session.close()
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class NodeRemoverHandler(BaseHandler):
@@ -116,8 +111,7 @@ class NodeRemoverHandler(BaseHandler):
                     ('Arguments needed are: nodeid')
                 }
         self.session.close()
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class NodeTogglerHandler(BaseHandler):
@@ -142,8 +136,7 @@ class NodeTogglerHandler(BaseHandler):
                          )
                 })
         self.session.close()
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class NodesHandler(BaseHandler):
@@ -285,8 +278,7 @@ class NodesHandler(BaseHandler):
                 data.append(resultnode)
             resultjson = {"count": total_count, "nodes": data}
         self.session.close()
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(resultjson, indent=4))
+        self.write_json(resultjson)
 
 
 
@@ -308,6 +300,5 @@ class NodeWolHandler(BaseHandler):
                     ('Arguments needed are: nodeid')
                 }
         self.session.close()
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
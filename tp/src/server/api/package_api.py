@@ -0,0 +1,255 @@
+"""
+Serves the files under /opt/TopPatch/var/packages to agents.
+
+ETags are the hash the blob store keeps the file under, so they are the
+same on every server and never have to be computed per request.
+Conditional requests are answered here. In accel mode the body is left
+to nginx through X-Accel-Redirect, so nginx sends it with sendfile and
+handles Range and the per client connection limit. Without nginx in
+front, the handler serves Range requests itself in bounded chunks and
+limits how many downloads a single client can run at once.
+"""
+import os
+import re
+import mimetypes
+import logging
+from time import time
+from email.utils import formatdate, parsedate_tz, mktime_tz
+
+import tornado.gen
+import tornado.web
+
+from vFense.plugins.patching.blob_store import PACKAGES_DIR, BLOB_DIR, \
+    INCOMING_DIR
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvweb')
+
+ACCEL_PREFIX = '/internal/packages/'
+CHUNK_SIZE = 256 * 1024
+MAX_DOWNLOADS_PER_CLIENT = 4
+BLOB_INDEX_REFRESH = 30
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# (st_dev, st_ino) of every blob -> the hash it is stored under.
+_BLOB_INDEX = {'inodes': {}, 'loaded': 0}
+# (st_dev, st_ino, st_size, st_mtime) -> ETag
+_ETAGS = {}
+_ETAGS_MAX = 100000
+_DOWNLOADS = {}
+
+
+def _load_blob_index():
+    inodes = {}
+    for prefix in os.listdir(BLOB_DIR):
+        prefix_dir = BLOB_DIR + prefix
+        if prefix_dir + '/' == INCOMING_DIR or not os.path.isdir(prefix_dir):
+            continue
+
+        for name in os.listdir(prefix_dir):
+            try:
+                stat = os.stat(prefix_dir + '/' + name)
+                inodes[(stat.st_dev, stat.st_ino)] = name
+            except OSError:
+                pass
+
+    _BLOB_INDEX['inodes'] = inodes
+    _BLOB_INDEX['loaded'] = time()
+
+
+def file_etag(stat):
+    """Returns the ETag of a file, the blob hash when the file is linked
+    into the blob store, size and mtime otherwise.
+    """
+    key = (stat.st_dev, stat.st_ino, stat.st_size, int(stat.st_mtime))
+    etag = _ETAGS.get(key)
+    if etag:
+        return(etag)
+
+    inode = (stat.st_dev, stat.st_ino)
+    file_hash = None
+    if stat.st_nlink > 1:
+        file_hash = _BLOB_INDEX['inodes'].get(inode)
+        if (not file_hash and
+                time() - _BLOB_INDEX['loaded'] > BLOB_INDEX_REFRESH):
+            _load_blob_index()
+            file_hash = _BLOB_INDEX['inodes'].get(inode)
+
+    if file_hash:
+        etag = '"%s"' % (file_hash)
+    else:
+        etag = '"%x-%x"' % (int(stat.st_mtime), stat.st_size)
+
+    if len(_ETAGS) >= _ETAGS_MAX:
+        _ETAGS.clear()
+    _ETAGS[key] = etag
+
+    return(etag)
+
+
+def parse_range(header, size):
+    """Parses a single "bytes=start-end" Range header.
+
+    Returns:
+        (start, end) inclusive, None when the whole file should be sent
+        and False when the range can not be satisfied.
+    """
+    if not header:
+        return(None)
+
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return(None)
+
+    start, end = match.groups()
+    if not start:
+        start = max(size - int(end), 0)
+        end = size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+
+    if start >= size or start > end:
+        return(False)
+
+    return(start, end)
+
+
+class PackageFileHandler(tornado.web.RequestHandler):
+
+    def initialize(self, path=PACKAGES_DIR, accel=False,
+                   max_per_client=MAX_DOWNLOADS_PER_CLIENT):
+        self.root = os.path.abspath(path)
+        self.accel = accel
+        self.max_per_client = max_per_client
+        self.client = None
+
+    def _client_ip(self):
+        return(
+            self.request.headers.get('X-Real-Ip', self.request.remote_ip)
+        )
+
+    def _resolve(self, path):
+        abspath = os.path.abspath(os.path.join(self.root, path))
+        if not abspath.startswith(self.root + os.sep):
+            raise tornado.web.HTTPError(403)
+
+        blobs = os.path.abspath(BLOB_DIR)
+        if abspath == blobs or abspath.startswith(blobs + os.sep):
+            raise tornado.web.HTTPError(404)
+
+        if not os.path.isfile(abspath):
+            raise tornado.web.HTTPError(404)
+
+        return(abspath)
+
+    def _not_modified(self, etag, mtime):
+        if_none_match = self.request.headers.get('If-None-Match')
+        if if_none_match:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return(etag in tags or '*' in tags)
+
+        if_modified_since = self.request.headers.get('If-Modified-Since')
+        if if_modified_since:
+            date = parsedate_tz(if_modified_since)
+            if date and int(mtime) <= mktime_tz(date):
+                return(True)
+
+        return(False)
+
+    def _range(self, etag, size):
+        if_range = self.request.headers.get('If-Range')
+        if if_range and if_range != etag:
+            return(None)
+
+        return(parse_range(self.request.headers.get('Range'), size))
+
+    def head(self, path):
+        return(self.get(path, include_body=False))
+
+    @tornado.gen.coroutine
+    def get(self, path, include_body=True):
+        abspath = self._resolve(path)
+        stat = os.stat(abspath)
+        etag = file_etag(stat)
+        self.set_header('ETag', etag)
+        self.set_header(
+            'Last-Modified', formatdate(stat.st_mtime, usegmt=True)
+        )
+        self.set_header('Accept-Ranges', 'bytes')
+
+        if self._not_modified(etag, stat.st_mtime):
+            self.set_status(304)
+            return
+
+        if self.accel:
+            self.set_header(
+                'X-Accel-Redirect',
+                ACCEL_PREFIX + os.path.relpath(abspath, self.root)
+            )
+            return
+
+        content_type, _ = mimetypes.guess_type(abspath)
+        self.set_header(
+            'Content-Type', content_type or 'application/octet-stream'
+        )
+
+        size = stat.st_size
+        byte_range = self._range(etag, size)
+        if byte_range is False:
+            self.set_status(416)
+            self.set_header('Content-Range', 'bytes */%d' % (size))
+            return
+
+        start, end = 0, size - 1
+        if byte_range:
+            start, end = byte_range
+            self.set_status(206)
+            self.set_header(
+                'Content-Range', 'bytes %d-%d/%d' % (start, end, size)
+            )
+
+        self.set_header('Content-Length', end - start + 1)
+        if not include_body or size == 0:
+            return
+
+        client = self._client_ip()
+        if _DOWNLOADS.get(client, 0) >= self.max_per_client:
+            self.clear_header('Content-Length')
+            self.clear_header('Content-Range')
+            self.set_header('Retry-After', 30)
+            raise tornado.web.HTTPError(503)
+
+        _DOWNLOADS[client] = _DOWNLOADS.get(client, 0) + 1
+        self.client = client
+        package = open(abspath, 'rb')
+        try:
+            package.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = package.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+
+                remaining -= len(chunk)
+                self.write(chunk)
+                yield self.flush()
+
+        finally:
+            package.close()
+            self._release()
+
+    def _release(self):
+        if self.client:
+            count = _DOWNLOADS.get(self.client, 1) - 1
+            if count > 0:
+                _DOWNLOADS[self.client] = count
+            else:
+                _DOWNLOADS.pop(self.client, None)
+
+            self.client = None
+
+    def on_connection_close(self):
+        self._release()
@@ -1,4 +1,3 @@
-import json
 from vFense.server.handlers import BaseHandler
 from vFense.server.hierarchy.decorators import authenticated_request
 from vFense.server.hierarchy.permissions import Permission
@@ -30,4 +29,4 @@ class GetPermissionsApi(BaseHandler):
         d['data'] = Permission.get_permissions()
         d['message'] = 'Permissions available.'
 
-        self.write(json.dumps(d, indent=4))
+        self.write_json(d)
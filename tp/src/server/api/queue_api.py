@@ -0,0 +1,120 @@
+import logging
+
+import tornado.web
+
+from vFense.server.handlers import BaseHandler
+from vFense.receiver.fairqueue import queue_metrics, set_customer_weight
+from vFense.receiver.rqsupervisor import supervisor_report
+from vFense.server.hierarchy.permissions import Permission
+from vFense.server.hierarchy.decorators import authenticated_request, \
+    permission_check
+from vFense.errorz.error_messages import GenericResults
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+
+class QueueMetricsHandler(BaseHandler):
+
+    @authenticated_request
+    @permission_check(permission=Permission.Admin)
+    def get(self):
+        username = self.get_current_user()
+        uri = self.request.uri
+        method = self.request.method
+        try:
+            metrics = queue_metrics()
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).information_retrieved(metrics, 1)
+            )
+
+        except Exception as e:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).something_broke('fair queue', 'metrics', e)
+            )
+            logger.exception(results)
+
+        self.set_status(results['http_status'])
+        self.write_json(results)
+
+
+class WorkerPoolsHandler(BaseHandler):
+
+    @authenticated_request
+    @permission_check(permission=Permission.Admin)
+    def get(self):
+        username = self.get_current_user()
+        uri = self.request.uri
+        method = self.request.method
+        try:
+            report = supervisor_report()
+            if report:
+                results = (
+                    GenericResults(
+                        username, uri, method
+                    ).information_retrieved(report, 1)
+                )
+
+            else:
+                results = (
+                    GenericResults(
+                        username, uri, method
+                    ).does_not_exists('rq supervisor', 'report')
+                )
+
+        except Exception as e:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).something_broke('rq supervisor', 'report', e)
+            )
+            logger.exception(results)
+
+        self.set_status(results['http_status'])
+        self.write_json(results)
+
+
+class QueueWeightHandler(BaseHandler):
+
+    @authenticated_request
+    @permission_check(permission=Permission.Admin)
+    def post(self, customer_name):
+        username = self.get_current_user()
+        uri = self.request.uri
+        method = self.request.method
+        try:
+            weight = float(self.get_argument('weight'))
+            if weight <= 0:
+                raise ValueError('weight has to be greater than 0')
+
+            set_customer_weight(customer_name, weight)
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).object_updated(
+                    customer_name, 'fair queue weight', {'weight': weight}
+                )
+            )
+
+        except (ValueError, tornado.web.MissingArgumentError):
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).incorrect_arguments()
+            )
+
+        except Exception as e:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).something_broke(customer_name, 'fair queue weight', e)
+            )
+            logger.exception(results)
+
+        self.set_status(results['http_status'])
+        self.write_json(results)
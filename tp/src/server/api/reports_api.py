@@ -1,15 +1,18 @@
+import os
+
+import tornado.gen
 import tornado.httpserver
 import tornado.web
-
-import simplejson as json
+from tornado.iostream import StreamClosedError
 
 import logging
-import logging.config
 from vFense.server.handlers import BaseHandler
 from vFense.db.client import *
 from vFense.errorz.error_messages import GenericResults
 from vFense.errorz.status_codes import GenericCodes
 from reports.stats import *
+from vFense.reports.jobs import start_report_job, report_job, \
+    artifact_path, ReportJobKey, ReportJobStatus
 from vFense.server.hierarchy.manager import get_current_customer_name
 from vFense.server.hierarchy.decorators import authenticated_request, permission_check
 from vFense.server.hierarchy.permissions import Permission
@@ -19,7 +22,9 @@ from datetime import datetime
 
 from jsonpickle import encode
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 class AgentsOsDetailsHandler(BaseHandler):
@@ -33,10 +38,9 @@ class AgentsOsDetailsHandler(BaseHandler):
             os_code=self.get_argument('os_code', None)
             tag_id=self.get_argument('tag_id', None)
             results = systems_os_details(username=username, customer_name=customer_name,
-                    os_code=None,tag_id=None, uri=uri, method=method)
+                    os_code=os_code, tag_id=tag_id, uri=uri, method=method)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -46,8 +50,7 @@ class AgentsOsDetailsHandler(BaseHandler):
                     )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 class AgentsHardwareDetailsHandler(BaseHandler):
     @authenticated_request
@@ -64,8 +67,7 @@ class AgentsHardwareDetailsHandler(BaseHandler):
                     os_code=os_code, tag_id=tag_id, 
                     uri=uri, method=method)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -75,8 +77,7 @@ class AgentsHardwareDetailsHandler(BaseHandler):
                     )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 class AgentsCPUDetailsHandler(BaseHandler):
     @authenticated_request
@@ -94,8 +95,7 @@ class AgentsCPUDetailsHandler(BaseHandler):
                     uri=uri, method=method
                     )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -105,8 +105,7 @@ class AgentsCPUDetailsHandler(BaseHandler):
                     )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 class AgentsMemoryDetailsHandler(BaseHandler):
     @authenticated_request
@@ -124,8 +123,7 @@ class AgentsMemoryDetailsHandler(BaseHandler):
                     uri=uri, method=method,
                     )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -135,8 +133,7 @@ class AgentsMemoryDetailsHandler(BaseHandler):
                     )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 class AgentsDiskDetailsHandler(BaseHandler):
     @authenticated_request
@@ -154,8 +151,7 @@ class AgentsDiskDetailsHandler(BaseHandler):
                     uri=uri, method=method
                     )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -165,8 +161,7 @@ class AgentsDiskDetailsHandler(BaseHandler):
                     )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 class AgentsNetworkDetailsHandler(BaseHandler):
     @authenticated_request
@@ -184,8 +179,7 @@ class AgentsNetworkDetailsHandler(BaseHandler):
                     uri=uri, method=method
                     )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -195,5 +189,226 @@ class AgentsNetworkDetailsHandler(BaseHandler):
                     )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))                    
+            self.write_json(results)
+
+
+# Bytes of an artifact read and flushed at a time.
+ARTIFACT_CHUNK_SIZE = 256 * 1024
+
+
+def _invalid_report(report_type, username, uri, method):
+    """The 400 answer to a report that is not in REPORTS."""
+    results = (
+        GenericResults(
+            username, uri, method
+        ).invalid_id(report_type, 'report')
+    )
+    results['http_status'] = 400
+
+    return(results)
+
+
+class ReportExportHandler(BaseHandler):
+    """Streams a report as CSV or NDJSON, chunk by chunk, while the
+    cursor on the agents is read.
+    """
+
+    @authenticated_request
+    @tornado.gen.coroutine
+    def get(self, report_type):
+        username = self.get_current_user()
+        customer_name = get_current_customer_name(username)
+        uri = self.request.uri
+        method = self.request.method
+        os_code = self.get_argument('os_code', None)
+        tag_id = self.get_argument('tag_id', None)
+        report_format = self.get_argument('format', ReportFormat.Csv)
+        if report_type not in REPORTS:
+            results = _invalid_report(report_type, username, uri, method)
+            self.set_status(results['http_status'])
+            self.write_json(results)
+            return
+
+        if report_format not in CONTENT_TYPES:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).incorrect_arguments()
+            )
+            self.set_status(results['http_status'])
+            self.write_json(results)
+            return
+
+        self.set_header('Content-Type', CONTENT_TYPES[report_format])
+        self.set_header(
+            'Content-Disposition',
+            'attachment; filename="%s.%s"' % (report_type, report_format)
+        )
+        chunks = iter_report_chunks(
+            report_type, customer_name, os_code=os_code, tag_id=tag_id,
+            report_format=report_format
+        )
+        try:
+            for chunk in chunks:
+                self.write(chunk)
+                yield self.flush()
+
+        except StreamClosedError:
+            return
+
+        except Exception as e:
+            logger.exception(e)
+            if not self._headers_written:
+                self.clear()
+                results = (
+                    GenericResults(
+                        username, uri, method
+                    ).something_broke(report_type, 'report export', e)
+                )
+                self.set_status(results['http_status'])
+                self.write_json(results)
+
+        finally:
+            chunks.close()
+
+
+class ReportJobsHandler(BaseHandler):
+
+    @authenticated_request
+    def post(self):
+        username = self.get_current_user()
+        customer_name = get_current_customer_name(username)
+        uri = self.request.uri
+        method = self.request.method
+        try:
+            report_type = self.get_argument('report')
+            report_format = self.get_argument('format', ReportFormat.Csv)
+            if report_format not in CONTENT_TYPES:
+                raise ValueError('unknown format')
+
+            if report_type not in REPORTS:
+                results = _invalid_report(report_type, username, uri, method)
+
+            else:
+                job = start_report_job(
+                    username, customer_name, report_type,
+                    report_format=report_format,
+                    os_code=self.get_argument('os_code', None),
+                    tag_id=self.get_argument('tag_id', None)
+                )
+                results = (
+                    GenericResults(
+                        username, uri, method
+                    ).object_created(
+                        job[ReportJobKey.JobId], 'report job', job
+                    )
+                )
+
+        except (ValueError, tornado.web.MissingArgumentError):
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).incorrect_arguments()
+            )
+
+        except Exception as e:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).something_broke('report job', 'queue', e)
+            )
+            logger.exception(results)
+
+        self.set_status(results['http_status'])
+        self.write_json(results)
+
+
+def _customer_report_job(job_id, customer_name):
+    job = report_job(job_id)
+    if job and job[ReportJobKey.CustomerName] == customer_name:
+        return(job)
+
+
+class ReportJobHandler(BaseHandler):
+
+    @authenticated_request
+    def get(self, job_id):
+        username = self.get_current_user()
+        customer_name = get_current_customer_name(username)
+        uri = self.request.uri
+        method = self.request.method
+        try:
+            job = _customer_report_job(job_id, customer_name)
+            if job:
+                results = (
+                    GenericResults(
+                        username, uri, method
+                    ).information_retrieved(job, 1)
+                )
+
+            else:
+                results = (
+                    GenericResults(
+                        username, uri, method
+                    ).does_not_exists(job_id, 'report job')
+                )
+
+        except Exception as e:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).something_broke(job_id, 'report job', e)
+            )
+            logger.exception(results)
+
+        self.set_status(results['http_status'])
+        self.write_json(results)
+
+
+class ReportDownloadHandler(BaseHandler):
+    """Sends the gzipped artifact of a finished report job."""
+
+    @authenticated_request
+    @tornado.gen.coroutine
+    def get(self, job_id):
+        username = self.get_current_user()
+        customer_name = get_current_customer_name(username)
+        uri = self.request.uri
+        method = self.request.method
+        job = _customer_report_job(job_id, customer_name)
+        path = None
+        if job and job[ReportJobKey.Status] == ReportJobStatus.Done:
+            path = artifact_path(job_id, job[ReportJobKey.Format])
+
+        if not path or not os.path.isfile(path):
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).does_not_exists(job_id, 'report artifact')
+            )
+            self.set_status(results['http_status'])
+            self.write_json(results)
+            return
+
+        self.set_header('Content-Type', 'application/gzip')
+        self.set_header(
+            'Content-Disposition',
+            'attachment; filename="%s-%s.%s.gz"'
+            % (job[ReportJobKey.Report], job_id, job[ReportJobKey.Format])
+        )
+        self.set_header('Content-Length', os.path.getsize(path))
+        artifact = open(path, 'rb')
+        try:
+            while True:
+                chunk = artifact.read(ARTIFACT_CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                self.write(chunk)
+                yield self.flush()
+
+        except StreamClosedError:
+            return
+
+        finally:
+            artifact.close()
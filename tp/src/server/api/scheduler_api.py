@@ -1,15 +1,13 @@
 import tornado.httpserver
 import tornado.web
 
-import simplejson as json
-
 import logging
-import logging.config
 from vFense.server.handlers import BaseHandler
 from vFense.db.client import *
 from vFense.errorz.error_messages import GenericResults
 from vFense.errorz.status_codes import GenericCodes
 from vFense.scheduler.jobManager import *
+from vFense.scheduler.dispatcher import get_dispatch_latency
 from vFense.server.hierarchy.manager import get_current_customer_name
 from vFense.server.hierarchy.decorators import authenticated_request, permission_check
 from vFense.server.hierarchy.permissions import Permission
@@ -19,7 +17,9 @@ from datetime import datetime
 
 from jsonpickle import encode
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -39,8 +39,7 @@ class ScheduleListerHandler(BaseHandler):
             )
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -51,8 +50,36 @@ class ScheduleListerHandler(BaseHandler):
 
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
+
+
+class ScheduleDispatchLatencyHandler(BaseHandler):
+    @authenticated_request
+    @permission_check(permission=Permission.Admin)
+    def get(self):
+        username = self.get_current_user()
+        uri = self.request.uri
+        method = self.request.method
+        try:
+            data = get_dispatch_latency()
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).information_retrieved(data, 1)
+            )
+            self.set_status(results['http_status'])
+            self.write_json(results)
+
+        except Exception as e:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).something_broke('getting dispatch latency', '', e)
+            )
+
+            logger.exception(e)
+            self.set_status(results['http_status'])
+            self.write_json(results)
 
 
 class ScheduleAppDetailHandler(BaseHandler):
@@ -72,8 +99,7 @@ class ScheduleAppDetailHandler(BaseHandler):
                 )
             )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
         except Exception as e:
             results = (
                 GenericResults(
@@ -83,8 +109,7 @@ class ScheduleAppDetailHandler(BaseHandler):
 
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
     @authenticated_request
     def delete(self, jobname):
@@ -103,8 +128,7 @@ class ScheduleAppDetailHandler(BaseHandler):
                 )
             )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -115,8 +139,7 @@ class ScheduleAppDetailHandler(BaseHandler):
 
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class SchedulerYearlyRecurrentJobHandler(BaseHandler):
@@ -157,8 +180,7 @@ class SchedulerYearlyRecurrentJobHandler(BaseHandler):
                 )
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -169,8 +191,7 @@ class SchedulerYearlyRecurrentJobHandler(BaseHandler):
 
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 class SchedulerMonthlyRecurrentJobHandler(BaseHandler):
 
@@ -212,8 +233,7 @@ class SchedulerMonthlyRecurrentJobHandler(BaseHandler):
                     )
                 )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -224,8 +244,7 @@ class SchedulerMonthlyRecurrentJobHandler(BaseHandler):
 
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class SchedulerDailyRecurrentJobHandler(BaseHandler):
@@ -265,8 +284,7 @@ class SchedulerDailyRecurrentJobHandler(BaseHandler):
                     )
                 )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -277,8 +295,7 @@ class SchedulerDailyRecurrentJobHandler(BaseHandler):
 
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class SchedulerWeeklyRecurrentJobHandler(BaseHandler):
@@ -318,8 +335,7 @@ class SchedulerWeeklyRecurrentJobHandler(BaseHandler):
             )
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -330,8 +346,7 @@ class SchedulerWeeklyRecurrentJobHandler(BaseHandler):
 
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class SchedulerDateBasedJobHandler(BaseHandler):
@@ -369,8 +384,7 @@ class SchedulerDateBasedJobHandler(BaseHandler):
             )
             
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -381,8 +395,7 @@ class SchedulerDateBasedJobHandler(BaseHandler):
 
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class SchedulerCustomRecurrentJobHandler(BaseHandler):
@@ -421,8 +434,7 @@ class SchedulerCustomRecurrentJobHandler(BaseHandler):
                 )
             )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -433,5 +445,4 @@ class SchedulerCustomRecurrentJobHandler(BaseHandler):
 
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
@@ -2,10 +2,7 @@
 import tornado.httpserver
 import tornado.web
 
-import simplejson as json
-
 import logging
-import logging.config
 from vFense.server.handlers import BaseHandler
 from vFense.db.client import *
 from vFense.errorz.error_messages import GenericResults
@@ -19,8 +16,9 @@ from vFense.server.hierarchy.manager import get_current_customer_name
 from vFense.server.hierarchy.decorators import authenticated_request
 from vFense.server.hierarchy.decorators import convert_json_to_arguments
 from vFense.server.hierarchy.decorators import authenticated_request, permission_check
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -48,8 +46,7 @@ class TagsHandler(BaseHandler):
             results = tag.search_by_name(query)
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
     @convert_json_to_arguments
     @authenticated_request
@@ -71,8 +68,7 @@ class TagsHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
     @convert_json_to_arguments
     @authenticated_request
@@ -95,8 +91,7 @@ class TagsHandler(BaseHandler):
                 )
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -106,8 +101,7 @@ class TagsHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class TagHandler(BaseHandler):
@@ -120,8 +114,7 @@ class TagHandler(BaseHandler):
         tag = TagSearcher(username, customer_name, uri, method)
         results = tag.get_tag(tag_id)
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
 
     @authenticated_request
@@ -160,8 +153,7 @@ class TagHandler(BaseHandler):
                 )
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -171,8 +163,7 @@ class TagHandler(BaseHandler):
             )
             logger.exception(e)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
     @convert_json_to_arguments
@@ -200,8 +191,7 @@ class TagHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
     @convert_json_to_arguments
     @authenticated_request
@@ -227,11 +217,33 @@ class TagHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
 
 class TagsAgentHandler(BaseHandler):
+    def _add_agent(self, tag, agent_id, tag_id):
+        """Adds the agent to the tag through the batched path, which
+        leaves out agents and tags of other customers.
+        """
+        username = self.get_current_user()
+        results = tag.add_agents_to_tags([agent_id], [tag_id])
+        if results['http_status'] == 200:
+            if results['data']['invalid_agent_ids']:
+                results = (
+                    GenericResults(
+                        username, self.request.uri, self.request.method
+                    ).invalid_id(agent_id, 'agent')
+                )
+
+            elif results['data']['invalid_tag_ids']:
+                results = (
+                    GenericResults(
+                        username, self.request.uri, self.request.method
+                    ).invalid_id(tag_id, 'tag')
+                )
+
+        return(results)
+
     @authenticated_request
     def get(self, agent_id):
         username = self.get_current_user()
@@ -247,8 +259,7 @@ class TagsAgentHandler(BaseHandler):
             results = tag.get_tags(uri, method)
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
 
     @convert_json_to_arguments
@@ -270,8 +281,8 @@ class TagsAgentHandler(BaseHandler):
             tag_created = tag.create_tag(tag_name)
             if tag_created['http_status'] == 200:
                 agent_added = (
-                    tag.add_agents_to_tag(
-                        agent_id, tag_created['data']['tag_id']
+                    self._add_agent(
+                        tag, agent_id, tag_created['data']['tag_id']
                     )
                 )
                 if agent_added['http_status'] == 200:
@@ -298,7 +309,7 @@ class TagsAgentHandler(BaseHandler):
                     results = agent_added
 
         elif tag_id and not tag_name:
-            agent_added = tag.add_agents_to_tag(agent_id, tag_id)
+            agent_added = self._add_agent(tag, agent_id, tag_id)
             if agent_added['http_status'] == 200:
                 results = (
                     TagResults(
@@ -318,8 +329,7 @@ class TagsAgentHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
 
     @convert_json_to_arguments
     @authenticated_request
@@ -346,5 +356,98 @@ class TagsAgentHandler(BaseHandler):
             )
 
         self.set_status(results['http_status'])
-        self.set_header('Content-Type', 'application/json')
-        self.write(json.dumps(results, indent=4))
+        self.write_json(results)
+
+
+class TagsAgentsHandler(BaseHandler):
+    @convert_json_to_arguments
+    @authenticated_request
+    def put(self):
+        username = self.get_current_user()
+        customer_name = get_current_customer_name(username)
+        agent_ids = self.arguments.get('agent_ids', None)
+        tag_ids = self.arguments.get('tag_ids', None)
+        uri = self.request.uri
+        method = self.request.method
+        tag = TagsManager(username, customer_name, uri, method)
+        if (isinstance(agent_ids, list) and agent_ids
+                and isinstance(tag_ids, list) and tag_ids):
+            results = tag.add_agents_to_tags(agent_ids, tag_ids)
+
+        else:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).incorrect_arguments()
+            )
+
+        self.set_status(results['http_status'])
+        self.write_json(results)
+
+    @convert_json_to_arguments
+    @authenticated_request
+    def delete(self):
+        username = self.get_current_user()
+        customer_name = get_current_customer_name(username)
+        agent_ids = self.arguments.get('agent_ids', None)
+        tag_ids = self.arguments.get('tag_ids', None)
+        uri = self.request.uri
+        method = self.request.method
+        tag = TagsManager(username, customer_name, uri, method)
+        if (isinstance(agent_ids, list) and agent_ids
+                and isinstance(tag_ids, list) and tag_ids):
+            results = tag.remove_agents_from_tags(agent_ids, tag_ids)
+
+        else:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).incorrect_arguments()
+            )
+
+        self.set_status(results['http_status'])
+        self.write_json(results)
+
+
+class TagExpressionHandler(BaseHandler):
+    @convert_json_to_arguments
+    @authenticated_request
+    def post(self):
+        username = self.get_current_user()
+        customer_name = get_current_customer_name(username)
+        expression = self.arguments.get('expression', None)
+        uri = self.request.uri
+        method = self.request.method
+        try:
+            customer_tag_ids = set(get_all_tag_ids(customer_name))
+            tag_ids = expression_tag_ids(expression)
+            unknown_tag_ids = tag_ids - customer_tag_ids
+            if unknown_tag_ids:
+                raise ValueError(
+                    'unknown tag ids %s' % (', '.join(unknown_tag_ids))
+                )
+
+            agent_ids = resolve_tag_expression(expression)
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).information_retrieved(agent_ids, len(agent_ids))
+            )
+
+        except ValueError as e:
+            results = (
+                TagResults(
+                    username, uri, method
+                ).invalid_tag_expression(e)
+            )
+
+        except Exception as e:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).something_broke('tag expression', '', e)
+            )
+            logger.exception(e)
+
+        self.set_status(results['http_status'])
+        self.write_json(results)
@@ -1,16 +1,14 @@
-import json
 import logging
-import logging.config
 #import customers.manager
 
 from vFense.logger.rvlogger import RvLogger
 #from server.decorators import authenticated_request
 from vFense.server.handlers import BaseHandler
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
-from json import dumps
 from vFense.db.client import *
 
 conn=db_connect()
@@ -27,7 +25,7 @@ class TopCriticalPatches(BaseHandler):
             patchlist[i]['count']=patchlist[i].pop(count)
             patches.append(patchlist[i])
 
-        self.write(json.dumps(patches, indent=4))
+        self.write_json(patches)
 
 class TopRecommendedPatches(BaseHandler):
         def get(self):
@@ -38,7 +36,7 @@ class TopRecommendedPatches(BaseHandler):
             for i in range(len(patchlist)):
                 patchlist[i]['count']=patchlist[i].pop(count)
                 patches.append(patchlist[i])
-            self.write(json.dumps(patches, indent=4))
+            self.write_json(patches)
 
 class TopOptionalPatches(BaseHandler):
         def get(self):
@@ -50,7 +48,7 @@ class TopOptionalPatches(BaseHandler):
                 patchlist[i]['count']=patchlist[i].pop(count)
                 patches.append(patchlist[i])
 
-            self.write(json.dumps(patches, indent=4))
+            self.write_json(patches)
 
 class TopListedPatches(BaseHandler):
     def get(self):
@@ -62,4 +60,4 @@ class TopListedPatches(BaseHandler):
             patchlist[i]['count']=patchlist[i].pop(count)
             patches.append(patchlist[i])
 
-        self.write(json.dumps(patches, indent=4))
+        self.write_json(patches)
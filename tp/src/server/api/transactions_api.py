@@ -1,15 +1,15 @@
-import simplejson as json
 import re
 import logging
-import logging.config
 from vFense.server.handlers import BaseHandler
 from vFense.operations import *
 from vFense.operations.retriever import OperationRetriever, oper_exists
+from vFense.operations.retention import retention_metrics
 from vFense.server.hierarchy.manager import get_current_customer_name
 from vFense.server.hierarchy.decorators import authenticated_request
 from vFense.errorz.error_messages import GenericResults
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -45,8 +45,7 @@ class GetTransactionsHandler(BaseHandler):
                 results = operations.get_all_operations()
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -56,8 +55,7 @@ class GetTransactionsHandler(BaseHandler):
             )
             logger.exception(results)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 class AgentOperationsHandler(BaseHandler):
     @authenticated_request
@@ -82,8 +80,7 @@ class AgentOperationsHandler(BaseHandler):
             results = operations.get_all_operations_by_agentid(agent_id)
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -93,8 +90,7 @@ class AgentOperationsHandler(BaseHandler):
             )
             logger.exception(results)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 
 class TagOperationsHandler(BaseHandler):
@@ -120,8 +116,7 @@ class TagOperationsHandler(BaseHandler):
             results = operations.get_all_operations_by_tagid(tag_id)
 
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -131,8 +126,7 @@ class TagOperationsHandler(BaseHandler):
             )
             logger.exception(results)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
 class OperationHandler(BaseHandler):
     @authenticated_request
@@ -166,8 +160,7 @@ class OperationHandler(BaseHandler):
                     ).invalid_id(oper_id, 'operation')
                 )
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
 
         except Exception as e:
             results = (
@@ -177,5 +170,159 @@ class OperationHandler(BaseHandler):
             )
             logger.exception(results)
             self.set_status(results['http_status'])
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps(results, indent=4))
+            self.write_json(results)
+
+
+class OperationSummaryHandler(BaseHandler):
+    @authenticated_request
+    def get(self, oper_id):
+        username = self.get_current_user()
+        customer_name = get_current_customer_name(username)
+        uri = self.request.uri
+        method = self.request.method
+        try:
+            operations = (
+                OperationRetriever(
+                    username, customer_name, uri, method
+                )
+            )
+            results = operations.get_operation_summary(oper_id)
+            self.set_status(results['http_status'])
+            self.write_json(results)
+
+        except Exception as e:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).something_broke('operation', 'operation summary', e)
+            )
+            logger.exception(results)
+            self.set_status(results['http_status'])
+            self.write_json(results)
+
+
+class OperationAgentsHandler(BaseHandler):
+    @authenticated_request
+    def get(self, oper_id):
+        username = self.get_current_user()
+        customer_name = get_current_customer_name(username)
+        uri = self.request.uri
+        method = self.request.method
+        try:
+            count = int(self.get_argument('count', 50))
+            offset = int(self.get_argument('offset', 0))
+            sort = self.get_argument('sort', 'asc')
+            status = self.get_argument('status', None)
+            operations = (
+                OperationRetriever(
+                    username, customer_name,
+                    uri, method, count, offset, sort
+                )
+            )
+            results = operations.get_operation_agents(oper_id, status)
+            self.set_status(results['http_status'])
+            self.write_json(results)
+
+        except Exception as e:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).something_broke('operation', 'operation agents', e)
+            )
+            logger.exception(results)
+            self.set_status(results['http_status'])
+            self.write_json(results)
+
+
+class OperationAgentAppsHandler(BaseHandler):
+    @authenticated_request
+    def get(self, oper_id, agent_id):
+        username = self.get_current_user()
+        customer_name = get_current_customer_name(username)
+        uri = self.request.uri
+        method = self.request.method
+        try:
+            count = int(self.get_argument('count', 50))
+            offset = int(self.get_argument('offset', 0))
+            sort = self.get_argument('sort', 'asc')
+            operations = (
+                OperationRetriever(
+                    username, customer_name,
+                    uri, method, count, offset, sort
+                )
+            )
+            results = (
+                operations.get_operation_agent_apps(oper_id, agent_id)
+            )
+            self.set_status(results['http_status'])
+            self.write_json(results)
+
+        except Exception as e:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).something_broke('operation', 'operation applications', e)
+            )
+            logger.exception(results)
+            self.set_status(results['http_status'])
+            self.write_json(results)
+
+
+class ArchivedOperationsHandler(BaseHandler):
+    @authenticated_request
+    def get(self):
+        username = self.get_current_user()
+        customer_name = get_current_customer_name(username)
+        uri = self.request.uri
+        method = self.request.method
+        try:
+            count = int(self.get_argument('count', 20))
+            offset = int(self.get_argument('offset', 0))
+            sort = self.get_argument('sort', 'desc')
+            sort_by = self.get_argument('sort_by', OperationKey.CreatedTime)
+            operations = (
+                OperationRetriever(
+                    username, customer_name,
+                    uri, method, count, offset,
+                    sort, sort_by
+                )
+            )
+            results = operations.get_archived_operations()
+            self.set_status(results['http_status'])
+            self.write_json(results)
+
+        except Exception as e:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).something_broke('operation', 'archived operations', e)
+            )
+            logger.exception(results)
+            self.set_status(results['http_status'])
+            self.write_json(results)
+
+
+class OperationRetentionHandler(BaseHandler):
+    @authenticated_request
+    def get(self):
+        username = self.get_current_user()
+        uri = self.request.uri
+        method = self.request.method
+        try:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).information_retrieved(retention_metrics(), 1)
+            )
+            self.set_status(results['http_status'])
+            self.write_json(results)
+
+        except Exception as e:
+            results = (
+                GenericResults(
+                    username, uri, method
+                ).something_broke('operation', 'retention metrics', e)
+            )
+            logger.exception(results)
+            self.set_status(results['http_status'])
+            self.write_json(results)
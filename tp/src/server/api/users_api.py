@@ -1,6 +1,4 @@
-import json
 import logging
-import logging.config
 
 from vFense.utils.security import check_password
 from vFense.server.handlers import BaseHandler
@@ -10,8 +8,9 @@ from vFense.server.hierarchy.permissions import Permission
 from vFense.server.hierarchy.decorators import authenticated_request, permission_check
 
 from vFense.logger.rvlogger import RvLogger
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -27,7 +26,7 @@ class GetUserApi(BaseHandler):
 
         result = api.User.get(active_user, name)
 
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 class GetUsersApi(BaseHandler):
 
@@ -45,7 +44,7 @@ class GetUsersApi(BaseHandler):
             all_users=True
         )
 
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class CreateUserApi(BaseHandler):
@@ -84,7 +83,7 @@ class CreateUserApi(BaseHandler):
                 }
             )
 
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class ModifyUserApi(BaseHandler):
@@ -107,7 +106,7 @@ class ModifyUserApi(BaseHandler):
                 result = {}
                 result['pass'] = False
                 result['message'] = 'Password must be 8 characters in length and contain lower and upper case characters: Strength = %s' % complexity,
-                self.write(json.dumps(result, indent=4))
+                self.write_json(result)
                 return
             if password:
 
@@ -117,7 +116,7 @@ class ModifyUserApi(BaseHandler):
                     result['pass'] = False
                     result['message'] = 'Incorrect username or password.'
 
-                    self.write(json.dumps(result, indent=4))
+                    self.write_json(result)
                     return
             else:
 
@@ -125,7 +124,7 @@ class ModifyUserApi(BaseHandler):
                 result['pass'] = False
                 result['message'] = 'Current password not provided.'
 
-                self.write(json.dumps(result, indent=4))
+                self.write_json(result)
                 return
 
         parameters['username'] = username
@@ -147,7 +146,7 @@ class ModifyUserApi(BaseHandler):
 
         result = api.User.edit(**parameters)
 
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
 
 
 class DeleteUserApi(BaseHandler):
@@ -162,4 +161,4 @@ class DeleteUserApi(BaseHandler):
 
         result = api.User.delete(name)
 
-        self.write(json.dumps(result, indent=4))
+        self.write_json(result)
@@ -0,0 +1,200 @@
+"""
+Fan out of Redis pub/sub messages to the websockets of a web server.
+
+The web server subscribes once, with one tornadoredis client, to the
+operation events (see operations/events.py) and to the legacy rv
+channel, and hands every message to the websockets that registered with
+the hub. Operation events go through the EventBuffer of each websocket,
+which keeps the events matching its filters, coalesces the ones about
+the same agent or application and sends them as one list every
+FLUSH_INTERVAL seconds. A client that falls behind by more than
+MAX_PENDING events gets a resync event per operation and reloads it.
+"""
+import json
+import logging
+from datetime import timedelta
+from collections import OrderedDict
+
+import tornado.gen
+import tornado.ioloop
+import tornadoredis
+
+from vFense.operations.events import EventKey, OperationEvent
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
+logger = logging.getLogger('rvapi')
+
+LEGACY_CHANNEL = 'rv'
+FLUSH_INTERVAL = 1
+MAX_PENDING = 500
+RECONNECT_DELAY = 5
+
+
+class EventBuffer(object):
+    """Events waiting to be sent to one client.
+
+    Args:
+        customer_name (str): Only events of this customer are kept.
+
+    Kwargs:
+        operation_ids (list): Only events of these operations are kept,
+            every operation of the customer when empty.
+        max_pending (int): Events kept between two flushes.
+    """
+
+    def __init__(self, customer_name, operation_ids=None,
+                 max_pending=MAX_PENDING):
+        self.customer_name = customer_name
+        self.operation_ids = set(operation_ids or [])
+        self.max_pending = max_pending
+        self.pending = OrderedDict()
+        self.overflowed = set()
+
+    def watch(self, operation_ids):
+        self.operation_ids = set(operation_ids or [])
+
+    def matches(self, event):
+        if event.get(EventKey.CustomerName) != self.customer_name:
+            return(False)
+
+        return(
+            not self.operation_ids
+            or event.get(EventKey.OperationId) in self.operation_ids
+        )
+
+    def add(self, event):
+        if not self.matches(event):
+            return
+
+        operation_id = event.get(EventKey.OperationId)
+        if operation_id in self.overflowed:
+            return
+
+        key = (
+            operation_id, event.get(EventKey.Event),
+            event.get(EventKey.AgentId), event.get(EventKey.AppId)
+        )
+        queued = self.pending.get(key)
+        if queued:
+            queued[EventKey.Data].update(event.get(EventKey.Data, {}))
+
+        elif len(self.pending) < self.max_pending:
+            # The event is shared with the other clients.
+            event = dict(event)
+            event[EventKey.Data] = dict(event.get(EventKey.Data, {}))
+            self.pending[key] = event
+
+        else:
+            self.overflowed.add(operation_id)
+
+    def drain(self):
+        events = [
+            event for event in self.pending.values()
+            if event[EventKey.OperationId] not in self.overflowed
+        ]
+        for operation_id in self.overflowed:
+            events.append(
+                {
+                    EventKey.Event: OperationEvent.Resync,
+                    EventKey.OperationId: operation_id,
+                    EventKey.CustomerName: self.customer_name,
+                    EventKey.Data: {},
+                }
+            )
+        self.pending = OrderedDict()
+        self.overflowed = set()
+
+        return(events)
+
+
+class EventHub(object):
+    """The Redis subscription shared by the websockets of the process.
+
+    A listener implements push_event(event), push_raw(body) and
+    flush_events(), it is called on the IOLoop.
+    """
+
+    def __init__(self, channels=(EventKey.Channel, LEGACY_CHANNEL),
+                 flush_interval=FLUSH_INTERVAL):
+        self.channels = list(channels)
+        self.flush_interval = flush_interval
+        self.listeners = set()
+        self.client = None
+        self.flusher = None
+
+    def add(self, listener):
+        self.listeners.add(listener)
+        if not self.client:
+            self._subscribe()
+
+        if not self.flusher:
+            self.flusher = tornado.ioloop.PeriodicCallback(
+                self.flush, self.flush_interval * 1000
+            )
+            self.flusher.start()
+
+    def remove(self, listener):
+        self.listeners.discard(listener)
+
+    @tornado.gen.engine
+    def _subscribe(self):
+        self.client = tornadoredis.Client()
+        self.client.connect()
+        yield tornado.gen.Task(self.client.subscribe, self.channels)
+        self.client.listen(self._on_message)
+
+    def _reconnect(self):
+        if self.listeners and not self.client:
+            self._subscribe()
+
+    def _on_message(self, message):
+        if message.kind == 'disconnect':
+            logger.warn('Event hub lost its Redis subscription')
+            self.client = None
+            tornado.ioloop.IOLoop.instance().add_timeout(
+                timedelta(seconds=RECONNECT_DELAY), self._reconnect
+            )
+            return
+
+        if message.kind != 'message':
+            return
+
+        if message.channel == EventKey.Channel:
+            try:
+                event = json.loads(message.body)
+            except ValueError:
+                logger.error('Event hub got an invalid operation event')
+                return
+
+            self._deliver(lambda listener: listener.push_event(event))
+
+        else:
+            body = str(message.body)
+            self._deliver(lambda listener: listener.push_raw(body))
+
+    def _deliver(self, push):
+        """Calls push with every listener, a listener that raises, a
+        closed websocket, is logged and dropped.
+        """
+        for listener in list(self.listeners):
+            try:
+                push(listener)
+
+            except Exception as e:
+                logger.exception(e)
+                self.listeners.discard(listener)
+
+    def flush(self):
+        self._deliver(lambda listener: listener.flush_events())
+
+
+_hub = None
+
+
+def event_hub():
+    global _hub
+    if not _hub:
+        _hub = EventHub()
+
+    return(_hub)
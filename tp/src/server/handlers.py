@@ -6,12 +6,13 @@ except ImportError:
     import json
 
 import re
+import logging
 import tornado
 import tornado.gen
+import tornado.concurrent
 import tornado.web
 import tornado.websocket
-import tornadoredis
-from datetime import datetime, timedelta
+from datetime import datetime
 from vFense.db.client import *
 from jsonpickle import encode
 #from models.node import NodeInfo
@@ -20,12 +21,14 @@ from jsonpickle import encode
 from vFense.server.hierarchy.decorators import authenticated_request
 from vFense.server.hierarchy.decorators import convert_json_to_arguments
 from vFense.server.hierarchy import api
-from time import sleep
-from tornado import ioloop
+from tornado.iostream import StreamClosedError
 #from users.manager import *
 #from users.manager import list_user, list_users
 
 from vFense.server.hierarchy.manager import Hierarchy
+from vFense.server.hierarchy.manager import get_current_customer_name
+from vFense.server.event_hub import EventBuffer, event_hub
+from vFense.server.response import dumps, should_stream, iter_chunks
 
 LISTENERS = []
 
@@ -35,6 +38,42 @@ class BaseHandler(tornado.web.RequestHandler):
         #self.clear_all_cookies()
         return self.get_secure_cookie("user")
 
+    def write_json(self, results):
+        """Writes results as compact JSON. A result with a long data list
+        is streamed to the client in chunks and the request is finished
+        once the last one is sent, the handler must not write anything
+        after it.
+
+        Returns:
+            A Future that resolves once the response is written, a
+            coroutine handler can yield it.
+        """
+        self.set_header('Content-Type', 'application/json')
+        if not should_stream(results):
+            self.write(dumps(results))
+            future = tornado.concurrent.Future()
+            future.set_result(None)
+            return(future)
+
+        self._auto_finish = False
+        return(self._stream_json(results))
+
+    @tornado.gen.coroutine
+    def _stream_json(self, results):
+        try:
+            for chunk in iter_chunks(results):
+                self.write(chunk)
+                yield self.flush()
+
+        except StreamClosedError:
+            return
+
+        except Exception as e:
+            logging.getLogger('rvapi').exception(e)
+
+        if not self._finished:
+            self.finish()
+
 
 class RootHandler(BaseHandler):
     @authenticated_request
@@ -121,44 +160,73 @@ class RvlLoginHandler(BaseHandler):
 
 
 class WebSocketHandler(BaseHandler, tornado.websocket.WebSocketHandler):
+    """Forwards the messages of the rv channel, through the event hub of
+    the process instead of a Redis subscription per client.
+    """
+
+    def open(self):
 
-    def __init__(self, *args, **kwargs):
+        event_hub().add(self)
 
-        super(WebSocketHandler, self).__init__(*args, **kwargs)
-        self.listen()
+    def push_event(self, event):
+        pass
 
-    @tornado.gen.engine
-    def listen(self):
+    def push_raw(self, body):
 
-        self.client = tornadoredis.Client()
-        self.client.connect()
+        self.write_message(body)
 
-        yield tornado.gen.Task(self.client.subscribe, 'rv')
+    def flush_events(self):
+        pass
 
-        self.client.listen(self.on_message)
+    def on_close(self):
 
-    def on_message(self, msg):
+        event_hub().remove(self)
 
-        if msg.kind == 'message':
 
-            self.write_message(str(msg.body))
+class OperationEventsHandler(BaseHandler, tornado.websocket.WebSocketHandler):
+    """Sends the progress events of the operations of the customer of the
+    user, as a JSON list every event_hub.FLUSH_INTERVAL seconds. The
+    operation_id arguments, or a {"operation_ids": [...]} message sent
+    by the client, limit the events to these operations.
+    """
 
-    def on_close(self):
+    def open(self):
 
-        self.client.unsubscribe('rv')
+        username = self.get_current_user()
+        if not username:
+            self.close()
+            return
 
-        def check():
+        self.events = EventBuffer(
+            get_current_customer_name(username),
+            self.get_arguments('operation_id')
+        )
+        event_hub().add(self)
 
-            if self.client.connection.in_progress:
+    def on_message(self, message):
 
-                ioloop.IOLoop.instance().add_timeout(timedelta(0.00001), check)
+        try:
+            self.events.watch(json.loads(message).get('operation_ids'))
 
-            else:
+        except (ValueError, AttributeError):
+            pass
+
+    def push_event(self, event):
+
+        self.events.add(event)
 
-                self.client.disconnect()
+    def push_raw(self, body):
+        pass
+
+    def flush_events(self):
+
+        events = self.events.drain()
+        if events:
+            self.write_message(json.dumps(events))
+
+    def on_close(self):
 
-        ioloop.IOLoop.instance().add_timeout(timedelta(0.00001), check)
-        self.client.disconnect()
+        event_hub().remove(self)
 
 
 class LogoutHandler(BaseHandler):
@@ -1,13 +1,13 @@
 import logging
-import logging.config
 from vFense.db.client import *
 
 from vFense.server.hierarchy import *
+from vFense.logger.logsetup import configure_logging
 #from server.hierarchy.group import *
 #from server.hierarchy.user import *
 #from server.hierarchy.customer import *
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 _main_db = 'toppatch_server'
@@ -1,11 +1,11 @@
 import logging
-import logging.config
 from vFense.db.client import db_create_close, r
 
 from vFense.server.hierarchy import Collection, GroupKey, UserKey, CustomerKey
 from vFense.server.hierarchy import GroupsPerUserKey, UsersPerCustomerKey
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
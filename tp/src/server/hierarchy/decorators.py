@@ -1,12 +1,12 @@
 import functools
 import urllib
 import urlparse
-import json
 
 from tornado.web import HTTPError
 
 from vFense.server.hierarchy.manager import Hierarchy
 from vFense.server.hierarchy.permissions import Permission
+from vFense.server.request import parse_json, RequestBodyError
 
 
 class permission_check(object):
@@ -72,7 +72,7 @@ class permission_check(object):
             'message': 'Permission denied.'
         }
 
-        tornado_handler.write(json.dumps(denied, indent=4))
+        tornado_handler.write_json(denied)
 
 
 def authenticated_request(method):
@@ -136,7 +136,7 @@ def agent_authenticated_request(method):
     return wrapper
 
 
-def convert_json_to_arguments(fn):
+def _json_arguments(fn, streams=None):
 
     @functools.wraps(fn)
     def wrapper(self, *args, **kwargs):
@@ -144,7 +144,19 @@ def convert_json_to_arguments(fn):
         content_type = self.request.headers.get("Content-Type", "")
 
         if content_type.startswith("application/json"):
-            self.arguments = json.loads(self.request.body)
+            consumers = {}
+            if streams:
+                consumers = dict(
+                    [(path, consumer()) for path, consumer in streams.items()]
+                )
+            try:
+                self.arguments = parse_json(self.request, consumers)
+
+            except RequestBodyError as e:
+                self.set_status(400)
+                self.write(str(e))
+                return
+
             return fn(self, *args, **kwargs)
 
         else:
@@ -154,20 +166,26 @@ def convert_json_to_arguments(fn):
 
     return wrapper
 
-def convert_json_to_arguments(fn):
 
-    @functools.wraps(fn)
-    def wrapper(self, *args, **kwargs):
-
-        content_type = self.request.headers.get("Content-Type", "")
+def convert_json_to_arguments(fn):
+    """Decodes the JSON body of the request into self.arguments. gzip
+    and deflate encoded bodies are accepted.
+    """
+    return(_json_arguments(fn))
 
-        if content_type.startswith("application/json"):
-            self.arguments = json.loads(self.request.body)
-            return fn(self, *args, **kwargs)
 
-        else:
+def stream_json_to_arguments(consumer, *paths):
+    """Like convert_json_to_arguments, but the items of the lists at the
+    dotted paths are handed to a new consumer per list while the body is
+    parsed, see vFense.server.request.parse_json.
 
-            self.set_status(415)
-            self.write("Content-type application/json is expected.")
+        @stream_json_to_arguments(StagedList, 'plugins.rv.data')
+    """
+    def decorator(fn):
+        return(
+            _json_arguments(
+                fn, dict([(path, consumer) for path in paths])
+            )
+        )
 
-    return wrapper
+    return(decorator)
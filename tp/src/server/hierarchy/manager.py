@@ -1,5 +1,4 @@
 import logging
-import logging.config
 from vFense.utils.security import generate_pass
 from vFense.server.hierarchy import *
 from vFense.server.hierarchy._db import actions
@@ -9,8 +8,9 @@ from vFense.server.hierarchy.customer import Customer
 
 from vFense.server.hierarchy.permissions import Permission
 from vFense.utils.security import Crypto
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -0,0 +1,215 @@
+"""
+Decoding of JSON request bodies.
+
+Agents may send their bodies gzip or deflate encoded (Content-Encoding),
+they are decompressed a block at a time while they are parsed, the
+decompressed body is never held in memory as a whole.
+
+parse_json can hand the items of large lists, such as the application
+inventory an agent uploads, to a consumer while the body is parsed
+instead of building the list. With ijson installed the body is parsed
+incrementally and only one batch of items exists at a time, without it
+the body is parsed with json and the list is handed over once parsed.
+"""
+import zlib
+import json
+from decimal import Decimal
+
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+except ImportError:
+    ijson = None
+
+READ_SIZE = 65536
+MAX_BODY_SIZE = 512 * 1024 * 1024
+BATCH_SIZE = 500
+
+GZIP_ENCODINGS = ('gzip', 'x-gzip')
+DEFLATE_ENCODINGS = ('deflate',)
+
+
+class RequestBodyError(Exception):
+    pass
+
+
+class BodyReader(object):
+    """File like reader of a request body, decompresses it as it is
+    read when it is gzip or deflate encoded.
+    """
+
+    def __init__(self, body, encoding=None, max_size=MAX_BODY_SIZE):
+        self.body = body
+        self.offset = 0
+        self.size = 0
+        self.max_size = max_size
+        self.pending = ''
+        self.decompressor = None
+        encoding = (encoding or '').strip().lower()
+        if encoding in GZIP_ENCODINGS:
+            self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        elif encoding in DEFLATE_ENCODINGS:
+            # Some clients send raw deflate data without the zlib header.
+            if (len(body) > 1 and ord(body[0]) & 0x0f == 8
+                    and ((ord(body[0]) << 8) + ord(body[1])) % 31 == 0):
+                self.decompressor = zlib.decompressobj()
+            else:
+                self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+
+        elif encoding and encoding != 'identity':
+            raise RequestBodyError(
+                'Content-Encoding %s is not supported' % (encoding)
+            )
+
+    def _fill(self, size):
+        blocks = [self.pending]
+        available = len(self.pending)
+        while available < size and self.offset < len(self.body):
+            block = self.body[self.offset:self.offset + READ_SIZE]
+            self.offset += READ_SIZE
+            if self.decompressor:
+                try:
+                    block = self.decompressor.decompress(block)
+                    if self.offset >= len(self.body):
+                        block += self.decompressor.flush()
+                except zlib.error as e:
+                    raise RequestBodyError('invalid request body: %s' % (e))
+
+            self.size += len(block)
+            if self.size > self.max_size:
+                raise RequestBodyError(
+                    'request body is larger than %d bytes' % (self.max_size)
+                )
+            blocks.append(block)
+            available += len(block)
+
+        self.pending = ''.join(blocks)
+
+    def read(self, size=-1):
+        if size < 0:
+            size = self.max_size
+
+        self._fill(size)
+        data = self.pending[:size]
+        self.pending = self.pending[size:]
+
+        return(data)
+
+
+def body_reader(request):
+    return(
+        BodyReader(
+            request.body, request.headers.get('Content-Encoding')
+        )
+    )
+
+
+def _set_path(document, path, value):
+    keys = path.split('.')
+    for key in keys[:-1]:
+        document = document.get(key)
+        if not isinstance(document, dict):
+            return
+
+    if keys[-1] in document:
+        document[keys[-1]] = value
+
+
+def _get_path(document, path):
+    for key in path.split('.'):
+        if not isinstance(document, dict):
+            return(None)
+        document = document.get(key)
+
+    return(document)
+
+
+def _parse_loaded(reader, streams):
+    document = json.load(reader)
+    for path, consumer in streams.items():
+        items = _get_path(document, path)
+        if not isinstance(items, list):
+            continue
+
+        _set_path(document, path, None)
+        for start in xrange(0, len(items), BATCH_SIZE):
+            consumer.add(items[start:start + BATCH_SIZE])
+        del items
+        _set_path(document, path, consumer.close())
+
+    return(document)
+
+
+def _parse_incremental(reader, streams):
+    document = ObjectBuilder()
+    item = None
+    stream_path = None
+    batch = []
+    for prefix, event, value in ijson.parse(reader):
+        if isinstance(value, Decimal):
+            value = float(value)
+
+        if stream_path:
+            if prefix == stream_path and event == 'end_array':
+                if batch:
+                    streams[stream_path].add(batch)
+                    batch = []
+                document.event('string', streams[stream_path].close())
+                stream_path = None
+                continue
+
+            if item is None:
+                item = ObjectBuilder()
+            item.event(event, value)
+            if (prefix == stream_path + '.item'
+                    and event not in ('start_map', 'start_array', 'map_key')):
+                batch.append(item.value)
+                item = None
+                if len(batch) >= BATCH_SIZE:
+                    streams[stream_path].add(batch)
+                    batch = []
+            continue
+
+        if prefix in streams and event == 'start_array':
+            stream_path = prefix
+            continue
+
+        document.event(event, value)
+
+    return(document.value)
+
+
+def parse_json(request, streams=None):
+    """Parses the JSON body of a request.
+
+    Args:
+        request: The tornado HTTPServerRequest.
+
+    Kwargs:
+        streams (dict): Dotted path (plugins.rv.data) of a list in the
+            body to the consumer of its items. consumer.add(items) is
+            called with batches of items, the list in the returned
+            document is replaced with what consumer.close() returns.
+
+    Returns:
+        The decoded body.
+
+    Raises:
+        RequestBodyError: The body could not be decompressed or decoded.
+    """
+    reader = body_reader(request)
+    try:
+        if streams and ijson:
+            return(_parse_incremental(reader, streams))
+
+        if streams:
+            return(_parse_loaded(reader, streams))
+
+        return(json.load(reader))
+
+    except RequestBodyError:
+        raise
+
+    except Exception as e:
+        raise RequestBodyError('invalid JSON body: %s' % (e))
@@ -0,0 +1,66 @@
+"""
+JSON encoding of API and listener responses.
+
+Responses are encoded compactly. With indent set, the json encoders
+skip their C speedups and fall back to the pure Python encoder, and the
+whitespace makes a large package list several times bigger on the wire.
+
+When the data of a result is a long list, BaseHandler.write_json does
+not build the whole document. It writes the envelope, then the items
+CHUNK_ITEMS at a time, and waits for every chunk to be flushed to the
+client before it encodes the next one. gzip is negotiated by tornado,
+see the compress_response setting of the applications.
+"""
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+from vFense.errorz.error_messages import data as DataKey
+
+SEPARATORS = (',', ':')
+STREAM_MIN_ITEMS = 500
+CHUNK_ITEMS = 200
+
+_encoder = json.JSONEncoder(separators=SEPARATORS)
+
+
+def dumps(results):
+    """Encodes results as compact JSON."""
+    return(_encoder.encode(results))
+
+
+def should_stream(results, min_items=STREAM_MIN_ITEMS):
+    """Returns True when the data of results is a list long enough to be
+    written in chunks.
+    """
+    return(
+        isinstance(results, dict)
+        and isinstance(results.get(DataKey), list)
+        and len(results[DataKey]) >= min_items
+    )
+
+
+def iter_chunks(results, chunk_items=CHUNK_ITEMS):
+    """Yields the JSON document of results in pieces, the envelope first
+    and then chunk_items items of its data list at a time. Joining the
+    pieces gives the same document dumps would.
+    """
+    envelope = dict(
+        [(key, value) for key, value in results.items() if key != DataKey]
+    )
+    head = dumps(envelope)[:-1]
+    if envelope:
+        head += ','
+    yield '%s%s:[' % (head, dumps(DataKey))
+
+    items = results[DataKey]
+    for start in xrange(0, len(items), chunk_items):
+        chunk = ','.join(
+            [_encoder.encode(item) for item in items[start:start + chunk_items]]
+        )
+        if start:
+            chunk = ',' + chunk
+        yield chunk
+
+    yield ']}'
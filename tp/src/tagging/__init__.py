@@ -25,3 +25,8 @@ class TagsPerAgentIndexes():
     TagId = 'tag_id'
     CustomerName = 'customer_name'
     AgentIdAndTagId = 'agent_id_and_tag_id'
+
+class TagExpressionKey():
+    Any = 'any'
+    All = 'all'
+    Exclude = 'exclude'
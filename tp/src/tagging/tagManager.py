@@ -1,6 +1,5 @@
 #!/usr/bin/env python
 import logging
-import logging.config
 
 from vFense.tagging import *
 from vFense.agent import *
@@ -12,13 +11,15 @@ from vFense.errorz.error_messages import GenericResults, TagResults
 import redis
 from rq import Connection, Queue
 
+from vFense.logger.logsetup import configure_logging
+
 rq_host = 'localhost'
 rq_port = 6379
 rq_db = 0
 
 rq_pool = redis.StrictRedis(host=rq_host, port=rq_port, db=rq_db)
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 @db_create_close
@@ -94,6 +95,151 @@ def get_agent_ids_from_tag(tag_id=None, conn=None):
     return(agent_ids)
 
 
+@db_create_close
+def get_agent_ids_from_tags(tag_ids, conn=None):
+    """Resolves many tags with one query.
+
+    Returns:
+        Dictionary of tag_id to the set of agent ids in the tag, every
+        tag id passed in is a key.
+    """
+    agents_per_tag = dict([(tag_id, set()) for tag_id in tag_ids or []])
+    if agents_per_tag:
+        members = (
+            r
+            .table(TagsPerAgentCollection)
+            .get_all(*agents_per_tag.keys(), index=TagsPerAgentIndexes.TagId)
+            .pluck(TagsPerAgentKey.TagId, TagsPerAgentKey.AgentId)
+            .run(conn)
+        )
+        for member in members:
+            agents_per_tag[member[TagsPerAgentKey.TagId]].add(
+                member[TagsPerAgentKey.AgentId]
+            )
+
+    return(agents_per_tag)
+
+
+def get_agent_ids_in_any_tag(tag_ids):
+    """Returns the ids of the agents in at least one of the tags."""
+    return(list(set().union(*get_agent_ids_from_tags(tag_ids).values())))
+
+
+def get_agent_ids_in_all_tags(tag_ids):
+    """Returns the ids of the agents that are in every one of the tags."""
+    agent_sets = get_agent_ids_from_tags(tag_ids).values()
+    if not agent_sets:
+        return([])
+
+    return(list(set.intersection(*agent_sets)))
+
+
+def _collect_tag_ids(expression, tag_ids):
+    if isinstance(expression, basestring):
+        tag_ids.add(expression)
+
+    elif isinstance(expression, list):
+        for sub_expression in expression:
+            _collect_tag_ids(sub_expression, tag_ids)
+
+    elif isinstance(expression, dict):
+        unknown = (
+            set(expression.keys()) -
+            set([TagExpressionKey.Any, TagExpressionKey.All,
+                 TagExpressionKey.Exclude])
+        )
+        if unknown:
+            raise ValueError('unknown operators %s' % (', '.join(unknown)))
+
+        if (not expression.get(TagExpressionKey.Any)
+                and not expression.get(TagExpressionKey.All)):
+            raise ValueError('%s or %s is required'
+                             % (TagExpressionKey.Any, TagExpressionKey.All))
+
+        for sub_expression in expression.values():
+            _collect_tag_ids(sub_expression, tag_ids)
+
+    else:
+        raise ValueError('%r is not a tag id or an expression' % (expression))
+
+    return(tag_ids)
+
+
+def expression_tag_ids(expression):
+    """Returns the set of tag ids a tag expression uses.
+
+    Raises:
+        ValueError: The expression is not valid.
+    """
+    return(_collect_tag_ids(expression, set()))
+
+
+def _evaluate_expression(expression, agents_per_tag):
+    if isinstance(expression, basestring):
+        return(agents_per_tag[expression])
+
+    if isinstance(expression, list):
+        return(
+            set().union(
+                *[_evaluate_expression(e, agents_per_tag) for e in expression]
+            )
+        )
+
+    agent_ids = None
+    if expression.get(TagExpressionKey.All):
+        all_of = expression[TagExpressionKey.All]
+        if not isinstance(all_of, list):
+            all_of = [all_of]
+        agent_ids = set.intersection(
+            *[_evaluate_expression(e, agents_per_tag) for e in all_of]
+        )
+
+    if expression.get(TagExpressionKey.Any):
+        any_of = (
+            _evaluate_expression(
+                expression[TagExpressionKey.Any], agents_per_tag
+            )
+        )
+        if agent_ids is None:
+            agent_ids = any_of
+        else:
+            agent_ids = agent_ids & any_of
+
+    if expression.get(TagExpressionKey.Exclude):
+        agent_ids = agent_ids - (
+            _evaluate_expression(
+                expression[TagExpressionKey.Exclude], agents_per_tag
+            )
+        )
+
+    return(agent_ids)
+
+
+def resolve_tag_expression(expression):
+    """Returns the ids of the agents a tag expression targets. All the
+    tags of the expression are resolved with one query.
+
+    An expression is a tag id, a list of expressions (the agents in any
+    of them) or a dictionary of TagExpressionKey operators:
+
+        {
+            'all': ['<linux tag id>', '<production tag id>'],
+            'any': ['<web tag id>', '<db tag id>'],
+            'exclude': '<maintenance tag id>'
+        }
+
+    targets the production linux agents that are web or db servers and
+    are not in maintenance.
+
+    Raises:
+        ValueError: The expression is not valid.
+    """
+    tag_ids = expression_tag_ids(expression)
+    agents_per_tag = get_agent_ids_from_tags(list(tag_ids))
+
+    return(list(_evaluate_expression(expression, agents_per_tag)))
+
+
 @db_create_close
 def get_tags_info(customer_name=None,
                   keys_to_pluck=None, conn=None):
@@ -144,6 +290,26 @@ def delete_agent_from_all_tags(agent_id, conn=None):
     return(deleted)
 
 
+@db_create_close
+def delete_agents_from_all_tags(agent_ids, conn=None):
+    deleted = True
+    try:
+        if agent_ids:
+            (
+                r
+                .table(TagsPerAgentCollection)
+                .get_all(*agent_ids, index=TagsPerAgentIndexes.AgentId)
+                .delete()
+                .run(conn)
+            )
+
+    except Exception as e:
+        logger.exception(e)
+        deleted = False
+
+    return(deleted)
+
+
 @db_create_close
 def get_tags_info_from_tag_ids(tag_ids, keys_to_pluck=None, conn=None):
 
@@ -391,6 +557,175 @@ class TagsManager(object):
     def add_agents_to_tag(self, agent_id, tag_id):
         return(self.add_tags_to_agent(tag_id, agent_id))
 
+    @db_create_close
+    def add_agents_to_tags(self, agent_ids, tag_ids, conn=None):
+        """Adds every agent to every tag. The tags, the agents and the
+        memberships that already exist are each looked up with one
+        get_all, the new memberships are written with one insert.
+        Tags and agents of other customers are left out.
+        """
+        try:
+            agent_ids = list(set(agent_ids))
+            tag_ids = list(set(tag_ids))
+            valid_tag_ids = []
+            valid_agent_ids = []
+            if tag_ids and agent_ids:
+                valid_tag_ids = list(
+                    r
+                    .table(TagsCollection)
+                    .get_all(*tag_ids)
+                    .filter({TagsKey.CustomerName: self.customer_name})
+                    .map(lambda x: x[TagsKey.TagId])
+                    .run(conn)
+                )
+                valid_agent_ids = list(
+                    r
+                    .table(AgentsCollection)
+                    .get_all(*agent_ids)
+                    .filter({AgentKey.CustomerName: self.customer_name})
+                    .map(lambda x: x[AgentKey.AgentId])
+                    .run(conn)
+                )
+
+            pairs = [
+                [agent_id, tag_id]
+                for agent_id in valid_agent_ids for tag_id in valid_tag_ids
+            ]
+            existing = set()
+            if pairs:
+                existing = set(
+                    [
+                        (x[TagsPerAgentKey.AgentId], x[TagsPerAgentKey.TagId])
+                        for x in r
+                        .table(TagsPerAgentCollection)
+                        .get_all(
+                            *pairs, index=TagsPerAgentIndexes.AgentIdAndTagId
+                        )
+                        .pluck(TagsPerAgentKey.AgentId, TagsPerAgentKey.TagId)
+                        .run(conn)
+                    ]
+                )
+
+            new_members = [
+                {
+                    TagsPerAgentKey.AgentId: agent_id,
+                    TagsPerAgentKey.TagId: tag_id,
+                }
+                for agent_id, tag_id in pairs
+                if (agent_id, tag_id) not in existing
+            ]
+            inserted = 0
+            if new_members:
+                inserted = (
+                    r
+                    .table(TagsPerAgentCollection)
+                    .insert(new_members)
+                    .run(conn)
+                )['inserted']
+
+            data = {
+                'inserted': inserted,
+                'existing': len(existing),
+                'invalid_tag_ids': list(set(tag_ids) - set(valid_tag_ids)),
+                'invalid_agent_ids': (
+                    list(set(agent_ids) - set(valid_agent_ids))
+                ),
+            }
+            status = (
+                TagResults(
+                    self.username, self.uri, self.method
+                ).agents_added_to_tags(valid_tag_ids, valid_agent_ids, data)
+            )
+
+            logger.info(status['message'])
+
+        except Exception as e:
+            status = (
+                GenericResults(
+                    self.username, self.uri,
+                    self.method
+                ).something_broke(
+                    ','.join(tag_ids), 'adding agents to tags', e
+                )
+            )
+
+            logger.exception(e)
+
+        return(status)
+
+    @db_create_close
+    def remove_agents_from_tags(self, agent_ids, tag_ids, conn=None):
+        """Removes every agent from every tag with one delete. Tags and
+        agents of other customers are left out.
+        """
+        try:
+            agent_ids = list(set(agent_ids))
+            tag_ids = list(set(tag_ids))
+            valid_tag_ids = []
+            valid_agent_ids = []
+            if tag_ids and agent_ids:
+                valid_tag_ids = list(
+                    r
+                    .table(TagsCollection)
+                    .get_all(*tag_ids)
+                    .filter({TagsKey.CustomerName: self.customer_name})
+                    .map(lambda x: x[TagsKey.TagId])
+                    .run(conn)
+                )
+                valid_agent_ids = list(
+                    r
+                    .table(AgentsCollection)
+                    .get_all(*agent_ids)
+                    .filter({AgentKey.CustomerName: self.customer_name})
+                    .map(lambda x: x[AgentKey.AgentId])
+                    .run(conn)
+                )
+
+            pairs = [
+                [agent_id, tag_id]
+                for agent_id in valid_agent_ids for tag_id in valid_tag_ids
+            ]
+            deleted = 0
+            if pairs:
+                deleted = (
+                    r
+                    .table(TagsPerAgentCollection)
+                    .get_all(*pairs, index=TagsPerAgentIndexes.AgentIdAndTagId)
+                    .delete()
+                    .run(conn)
+                )['deleted']
+
+            data = {
+                'deleted': deleted,
+                'invalid_tag_ids': list(set(tag_ids) - set(valid_tag_ids)),
+                'invalid_agent_ids': (
+                    list(set(agent_ids) - set(valid_agent_ids))
+                ),
+            }
+            status = (
+                TagResults(
+                    self.username, self.uri, self.method
+                ).agents_removed_from_tags(
+                    valid_tag_ids, valid_agent_ids, data
+                )
+            )
+
+            logger.info(status['message'])
+
+        except Exception as e:
+            status = (
+                GenericResults(
+                    self.username, self.uri,
+                    self.method
+                ).something_broke(
+                    ','.join(tag_ids), 'removing agents from tags', e
+                )
+            )
+
+            logger.exception(e)
+
+        return(status)
+
     @db_create_close
     def remove_tag_from_agent(self, tag_id, agent_id, genstats=True, conn=None):
         try:
@@ -426,53 +761,20 @@ class TagsManager(object):
     @db_create_close
     def remove_all_agents_from_tag(self, tag_id, conn=None):
         try:
-            agents_deleted = 0
-            agent_ids = list(
+            (
                 r
                 .table(TagsPerAgentCollection)
-                .get_all(tag_id, index=TagsPerAgentKey.TagId)
-                .map(lambda x: x[TagsPerAgentKey.AgentId])
+                .get_all(tag_id, index=TagsPerAgentIndexes.TagId)
+                .delete()
                 .run(conn)
             )
-            total_agents = len(agent_ids)
-
-            if len(agent_ids) > 0:
-                for agent_id in agent_ids:
-                    agent_deleted_from_tag = (
-                        self.remove_tag_from_agent(
-                            tag_id, agent_id, genstats=False
-                        )
-                    )
-                    if agent_deleted_from_tag['http_status'] == 200:
-                        agents_deleted += 1
-
-                if total_agents == agents_deleted:
-                    status = (
-                        TagResults(
-                            self.username, self.uri, self.method
-                        ).removed_all_agents_from_tag(tag_id)
-                    )
-
-                    logger.info(status['message'])
-
-                else:
-                    status = (
-                        TagResults(
-                            self.username, self.uri, self.method
-                        ).failed_to_remove_all_agents_from_tag(tag_id)
-                    )
-
-                    logger.error(status['message'])
-
-
-            else:
-                status = (
-                    TagResults(
-                        self.username, self.uri, self.method
-                    ).removed_all_agents_from_tag(tag_id)
-                )
+            status = (
+                TagResults(
+                    self.username, self.uri, self.method
+                ).removed_all_agents_from_tag(tag_id)
+            )
 
-                logger.info(status['message'])
+            logger.info(status['message'])
 
         except Exception as e:
             status = (
@@ -1,5 +1,4 @@
 import logging
-import logging.config
 from hashlib import sha256
 from datetime import datetime
 
@@ -12,8 +11,9 @@ from vFense.plugins.patching import *
 from vFense.plugins.patching.rv_db_calls import get_all_avail_stats_by_tagid, \
     get_all_app_stats_by_tagid
 from vFense.errorz.error_messages import GenericResults, TagResults
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 
@@ -1,13 +1,8 @@
 import subprocess
 
-from vFense.tunnels import _db as db
-
 _sshd_config_path = '/etc/ssh/sshd_config'
 
 
-db.tunnels_initialization()
-
-
 class TunnelKey:
 
     HostPort = 'host_port'
@@ -1,6 +1,6 @@
 import os
 
-import tunnels
+from vFense.tunnels import _db as db
 
 #home = expanduser('~')
 #_known_host = home + '/.ssh/known_hosts'
@@ -11,7 +11,7 @@ _authorized_keys = '/home/toppatch/.ssh/authorized_keys'
 
 def add_authorized_key(agent_id, key):
 
-    if tunnels.db.register_authorized_key(
+    if db.register_authorized_key(
         agent_id=agent_id,
         key=key,
         force=False
@@ -8,9 +8,10 @@ from dateutil.tz import *
 
 from netifaces import ifaddresses, interfaces
 import logging
-import logging.config
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+from vFense.logger.logsetup import configure_logging
+
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 twentyfour_hour = {
@@ -358,6 +359,58 @@ def return_modified_list(list_to_modify):
     return(list_to_modify)
 
 
+HASH_CHUNK_SIZE = 1024 * 1024
+# Algorithms a hex digest can be of, by its length. A digest of any other
+# length is checked against all of them.
+HASH_ALGORITHMS = {
+    32: ('md5',),
+    40: ('sha1',),
+    64: ('sha256',),
+}
+DEFAULT_HASH_ALGORITHMS = ('sha1', 'sha256', 'md5')
+
+
+def hash_algorithms(digest):
+    return(HASH_ALGORITHMS.get(len(digest), DEFAULT_HASH_ALGORITHMS))
+
+
+def file_digests(file_path, algorithms=DEFAULT_HASH_ALGORITHMS,
+                 chunk_size=HASH_CHUNK_SIZE, rate=None):
+    """Hashes a file with every algorithm in one pass, chunk_size bytes
+    are held in memory at a time.
+
+    Args:
+        file_path: Path of the file.
+
+    Kwargs:
+        algorithms: hashlib names of the algorithms.
+        chunk_size: Bytes read at a time.
+        rate: Bytes read per second at most, no limit when None.
+
+    Returns:
+        Dictionary of algorithm name to hex digest.
+    """
+    hashes = [hashlib.new(algorithm) for algorithm in algorithms]
+    began = time.time()
+    read = 0
+    with open(file_path, 'rb') as package:
+        while True:
+            chunk = package.read(chunk_size)
+            if not chunk:
+                break
+
+            for lhash in hashes:
+                lhash.update(chunk)
+
+            read += len(chunk)
+            if rate:
+                wait = read / float(rate) - (time.time() - began)
+                if wait > 0:
+                    time.sleep(wait)
+
+    return(dict([(lhash.name, lhash.hexdigest()) for lhash in hashes]))
+
+
 def hash_verifier(orig_hash=None, file_path=None):
     completed = False
     msg = (
@@ -365,24 +418,20 @@ def hash_verifier(orig_hash=None, file_path=None):
         % (orig_hash, file_path)
     )
 
-    hashlibs = [hashlib.sha1, hashlib.sha256, hashlib.md5]
-
     if orig_hash and file_path:
         file_exists = os.path.exists(file_path)
 
         if file_exists:
-            file_in_mem = open(file_path, 'rb').read()
+            expected = str(orig_hash).strip().lower()
+            digests = file_digests(file_path, hash_algorithms(expected))
 
-            for hlib in hashlibs:
-                lhash = hlib()
-                lhash.update(file_in_mem)
-                local_hash = lhash.hexdigest()
+            for name, local_hash in digests.items():
 
-                if local_hash == orig_hash:
+                if local_hash == expected:
                     completed = True
                     msg = (
                         'Remote Hash %s verified against %s using hash type %s'
-                        % (orig_hash, file_path.split('/')[-1], lhash.name)
+                        % (orig_hash, file_path.split('/')[-1], name)
                     )
                     break
 
@@ -1,11 +1,12 @@
 import os
 import socket
-import logging, logging.config
+import logging
 from datetime import datetime
 from vFense.OpenSSL import crypto
 
 from vFense.db.update_table import *
 from vFense.db.query_table import *
+from vFense.logger.logsetup import configure_logging
 
 FILE_TYPE_PEM = crypto.FILETYPE_PEM
 DUMP_PKEY = crypto.dump_privatekey
@@ -32,7 +33,7 @@ EXTENSION = {
             }
 
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 logger = logging.getLogger('rvapi')
 
 def load_private_key(privkey=CA_PKEY):
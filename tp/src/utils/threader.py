@@ -1,10 +1,11 @@
 import Queue
 from time import sleep
 from random import randint
-import logging, logging.config
+import logging
 from vFense.threading import Thread
+from vFense.logger.logsetup import configure_logging
 
-logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
+configure_logging()
 
 class Worker(Thread):
     """Thread executing tasks from a given tasks queue"""
@@ -5,7 +5,6 @@ import base64
 import uuid
 import os
 import logging
-import logging.config
 
 import tornado.httpserver
 import tornado.ioloop
@@ -27,13 +26,15 @@ from vFense.receiver.api.ra.results import RemoteDesktopResults
 from vFense.receiver.api.monitoring.monitoringdata import UpdateMonitoringStatsV1
 
 from vFense.db.client import *
-from vFense.scheduler.jobManager import start_scheduler
 
+from vFense.logger.logsetup import configure_logging
 from tornado.options import define, options
 
 #import newrelic.agent
 #newrelic.agent.initialize('/opt/TopPatch/conf/newrelic.ini')
 
+configure_logging()
+
 define("port", default=9001, help="run on port", type=int)
 define("debug", default=True, help="enable debugging features", type=bool)
 
@@ -79,13 +80,13 @@ class Application(tornado.web.Application):
         settings = {
             "cookie_secret": "patching-0.7",
             "login_url": "/rvl/login",
+            "compress_response": True,
         }
         tornado.web.Application.__init__(self, handlers,
                                          template_path=template_path,
                                          debug=True, **settings)
 
     def log_request(self, handler):
-        logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
         log = logging.getLogger('rvweb')
         log_method = log.debug
         if handler.get_status() <= 299:
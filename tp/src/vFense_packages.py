@@ -0,0 +1,77 @@
+"""
+Package file server of the Top Patch Server.
+
+Agents download packages from here instead of from the API processes.
+nginx proxies /packages/ to these processes, which answer conditional
+requests and hand the body back to nginx through X-Accel-Redirect, so
+it is sent with sendfile and never goes through Python.
+"""
+import os
+import logging
+
+import tornado.httpserver
+import tornado.ioloop
+import tornado.web
+import tornado.options
+
+from vFense.server.api.package_api import PackageFileHandler
+from vFense.logger.logsetup import configure_logging
+
+from tornado.options import define, options
+
+define("port", default=9080, help="run on port", type=int)
+define("debug", default=False, help="enable debugging features", type=bool)
+define("accel", default=True,
+       help="let nginx send the file with X-Accel-Redirect", type=bool)
+define("max_per_client", default=4,
+       help="concurrent downloads per client when not accelerated",
+       type=int)
+
+
+class Application(tornado.web.Application):
+    def __init__(self, debug, accel, max_per_client):
+        handlers = [
+            (r"/packages/*/(.*?)", PackageFileHandler,
+                {
+                    "path": "/opt/TopPatch/var/packages",
+                    "accel": accel,
+                    "max_per_client": max_per_client
+                }
+            ),
+        ]
+
+        tornado.web.Application.__init__(self, handlers, debug=debug)
+
+    def log_request(self, handler):
+        log = logging.getLogger('rvweb')
+        log_method = log.info
+        if handler.get_status() >= 400:
+            log_method = log.error
+        request_time = 1000.0 * handler.request.request_time()
+        real_ip = handler.request.headers.get('X-Real-Ip', None)
+        user_agent = handler.request.headers.get('User-Agent')
+        log_message = (
+            '%d %s %s %s, %.2fms' %
+            (
+                handler.get_status(), handler._request_summary(),
+                real_ip, user_agent, request_time
+            )
+        )
+        log_method(log_message)
+
+if __name__ == '__main__':
+    tornado.options.parse_command_line()
+    configure_logging()
+    https_server = tornado.httpserver.HTTPServer(
+        Application(options.debug, options.accel, options.max_per_client),
+        ssl_options={
+            "certfile": os.path.join(
+                "/opt/TopPatch/tp/data/ssl/",
+                "server.crt"),
+            "keyfile": os.path.join(
+                "/opt/TopPatch/tp/data/ssl/",
+                "server.key"),
+        }
+    )
+    https_server.listen(options.port)
+    tornado.ioloop.IOLoop.instance().start()
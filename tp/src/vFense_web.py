@@ -5,7 +5,6 @@ import base64
 import uuid
 import os
 import logging
-import logging.config
 
 import tornado.httpserver
 import tornado.ioloop
@@ -16,10 +15,12 @@ from redis import StrictRedis
 from rq import Connection, Queue
 
 from vFense.server.handlers import RootHandler, LoginHandler, LogoutHandler
-from vFense.server.handlers import WebSocketHandler, AdminHandler
+from vFense.server.handlers import WebSocketHandler, AdminHandler, \
+    OperationEventsHandler
 from vFense.server.api.scheduler_api import ScheduleListerHandler
 #from server.api.scheduler_api import ScheduleRemoveHandler
 from vFense.server.api.scheduler_api import ScheduleAppDetailHandler
+from vFense.server.api.scheduler_api import ScheduleDispatchLatencyHandler
 from vFense.server.api.scheduler_api import SchedulerDateBasedJobHandler
 from vFense.server.api.scheduler_api import SchedulerDailyRecurrentJobHandler
 from vFense.server.api.scheduler_api import SchedulerMonthlyRecurrentJobHandler
@@ -29,7 +30,7 @@ from vFense.server.api.scheduler_api import SchedulerCustomRecurrentJobHandler
 from vFense.server.api.reports_api import *
 
 from vFense.db.client import *
-from vFense.scheduler.jobManager import start_scheduler
+from vFense.scheduler.jobManager import connect_scheduler
 ##from server.api.auth_api import LoginHandler, LogoutHandler
 from vFense.plugins.patching.Api.app_data import *
 from vFense.plugins.patching.Api.node_api import *
@@ -44,7 +45,7 @@ from vFense.plugins.mightymouse.api.relay_servers import *
 from vFense.plugins.ra.api.status import RDStatusQueue
 from vFense.plugins.ra.api.rdsession import RDSession
 from vFense.plugins.ra.api.settings import SetPassword
-from vFense.server.hierarchy import db as hierarchy_db
+from vFense.plugins.ra.api.proxy import ProxyMetrics
 from vFense.server.api.transactions_api import *
 from vFense.server.api.log_api import *
 from vFense.server.api.email_api import *
@@ -54,10 +55,16 @@ from vFense.server.api.groups_api import *
 from vFense.server.api.customer_api import *
 from vFense.server.api.permissions_api import *
 from vFense.server.api.monit_api import *
-from vFense.scripts.create_indexes import initialize_indexes_and_create_tables
+from vFense.server.api.queue_api import QueueMetricsHandler, \
+    QueueWeightHandler, WorkerPoolsHandler
+from vFense.server.api.package_api import PackageFileHandler
+from vFense.db.migrations import migrate
 
+from vFense.logger.logsetup import configure_logging
 from tornado.options import define, options
 
+configure_logging()
+
 define("port", default=9000, help="run on port", type=int)
 define("debug", default=True, help="enable debugging features", type=bool)
 
@@ -82,6 +89,7 @@ class Application(tornado.web.Application):
             (r"/login/?", LoginHandler),
             (r"/logout/?", LogoutHandler),
             #(r"/ws/?", WebSocketHandler),
+            (r"/ws/operations/?", OperationEventsHandler),
             (r"/adminForm", AdminHandler),
 
             ##### User and Groups API
@@ -113,10 +121,12 @@ class Application(tornado.web.Application):
             (r"/api/monitor/memory/?", GetMemoryStats),
             (r"/api/monitor/filesystem/?", GetFileSystemStats),
             (r"/api/monitor/cpu/?", GetCpuStats),
+            (r"/api/monitor/ingest/?", GetIngestStats),
             (r"/api/monitor/?", GetAllStats),
 
             ##### RA Api
             (r"/api/ra/rd/password/?", SetPassword),
+            (r"/api/ra/rd/proxy/metrics/?", ProxyMetrics),
             (r"/api/ra/rd/([^/]+)/?", RDSession),
             (r"/ws/ra/status/?", RDStatusQueue),
 
@@ -130,6 +140,7 @@ class Application(tornado.web.Application):
 
             ##### Scheduler API Handlers
             (r"/api/v1/schedules?", ScheduleListerHandler),
+            (r"/api/v1/schedules/dispatch/latency?", ScheduleDispatchLatencyHandler),
             (r"/api/v1/schedule/([A-Za-z0-9_ ]+.*)?", ScheduleAppDetailHandler),
             (r"/api/v1/schedules/recurrent/none?", SchedulerDateBasedJobHandler),
             (r"/api/v1/schedules/recurrent/daily?", SchedulerDailyRecurrentJobHandler),
@@ -145,6 +156,10 @@ class Application(tornado.web.Application):
             (r"/api/v1/reports/memorydetails?",AgentsMemoryDetailsHandler),
             (r"/api/v1/reports/diskdetails?",AgentsDiskDetailsHandler),
             (r"/api/v1/reports/networkdetails?",AgentsNetworkDetailsHandler),
+            (r"/api/v1/reports/export/([a-z]+)/?", ReportExportHandler),
+            (r"/api/v1/reports/jobs/?", ReportJobsHandler),
+            (r"/api/v1/reports/jobs/([a-f0-9]{32})/?", ReportJobHandler),
+            (r"/api/v1/reports/jobs/([a-f0-9]{32})/download/?", ReportDownloadHandler),
 
 
             ##### Agent API Handlers
@@ -160,6 +175,7 @@ class Application(tornado.web.Application):
 
             ##### Agents API Handlers
             (r"/api/v1/agents", AgentsHandler),
+            (r"/api/v1/agents/purge/([a-f0-9]{32})/?", AgentPurgeHandler),
 
             ##### Tag API Handlers
             (r"/api/v1/tag/([a-f0-9]{8}-[a-f0-9]{4}-4[a-f0-9]{3}-[a-f0-9]{4}-[a-f0-9]{12})?", TagHandler),
@@ -175,6 +191,8 @@ class Application(tornado.web.Application):
 
             ##### Tags API Handlers
             (r"/api/v1/tags", TagsHandler),
+            (r"/api/v1/tags/agents/?", TagsAgentsHandler),
+            (r"/api/v1/tags/resolve/?", TagExpressionHandler),
 
             ##### FileData API Handlers
             (r'/api/v1/apps/info?', FileInfoHandler),
@@ -195,6 +213,7 @@ class Application(tornado.web.Application):
 
             (r"/api/v1/apps/custom/upload/finalize?", ThirdPartyPackageUploadHandler),
             (r"/api/v1/apps/custom/upload/data?",ThirdPartyUploadHandler),
+            (r"/api/v1/apps/custom/upload/chunk/([a-f0-9]{8}-[a-f0-9]{4}-4[a-f0-9]{3}-[a-f0-9]{4}-[a-f0-9]{12})?", ThirdPartyChunkUploadHandler),
             (r"/upload/package?",ThirdPartyPackageUploadHandler),
             (r"/api/v1/apps/custom/upload/uuid?", GetThirdPartyUuidHandler),
 
@@ -219,7 +238,17 @@ class Application(tornado.web.Application):
 
             ##### Operations API Handlers
             (r"/api/v1/operations?", GetTransactionsHandler),
+            (r"/api/v1/operations/archived/?", ArchivedOperationsHandler),
+            (r"/api/v1/operations/retention/?", OperationRetentionHandler),
             (r"/api/v1/operation/([a-f0-9]{8}-[a-f0-9]{4}-4[a-f0-9]{3}-[a-f0-9]{4}-[a-f0-9]{12})?", OperationHandler),
+            (r"/api/v1/operation/([a-f0-9]{8}-[a-f0-9]{4}-4[a-f0-9]{3}-[a-f0-9]{4}-[a-f0-9]{12})/summary/?", OperationSummaryHandler),
+            (r"/api/v1/operation/([a-f0-9]{8}-[a-f0-9]{4}-4[a-f0-9]{3}-[a-f0-9]{4}-[a-f0-9]{12})/agents/?", OperationAgentsHandler),
+            (r"/api/v1/operation/([a-f0-9]{8}-[a-f0-9]{4}-4[a-f0-9]{3}-[a-f0-9]{4}-[a-f0-9]{12})/agent/([a-f0-9]{8}-[a-f0-9]{4}-4[a-f0-9]{3}-[a-f0-9]{4}-[a-f0-9]{12})/applications/?", OperationAgentAppsHandler),
+
+            ##### Work Queue API Handlers
+            (r"/api/v1/queues/?", QueueMetricsHandler),
+            (r"/api/v1/queues/weights/([^/]+)/?", QueueWeightHandler),
+            (r"/api/v1/queues/workers/?", WorkerPoolsHandler),
 
             ##### Generic API Handlers
             (r"/api/v1/supported/operating_systems?", FetchSupportedOperatingSystems),
@@ -235,7 +264,7 @@ class Application(tornado.web.Application):
                 {"path": "wwwstatic/img"}),
             (r"/js/(.*?)", tornado.web.StaticFileHandler,
                 {"path": "wwwstatic/js"}),
-            (r"/packages/*/(.*?)", tornado.web.StaticFileHandler,
+            (r"/packages/*/(.*?)", PackageFileHandler,
                 {"path": "/opt/TopPatch/var/packages"})
         ]
 
@@ -244,17 +273,16 @@ class Application(tornado.web.Application):
             "cookie_secret": base64.b64encode(uuid.uuid4().bytes +
                                               uuid.uuid4().bytes),
             "login_url": "/login",
+            "compress_response": True,
         }
-        self.scheduler = start_scheduler()
-        initialize_indexes_and_create_tables()
-        hierarchy_db.init()
+        self.scheduler = connect_scheduler()
+        migrate()
 
         tornado.web.Application.__init__(self, handlers,
                                          template_path=template_path,
                                          debug=debug, **settings)
 
     def log_request(self, handler):
-        logging.config.fileConfig('/opt/TopPatch/conf/logging.config')
         log = logging.getLogger('rvweb')
         log_method = log.debug
         if handler.get_status() <= 299: